@@ -1,804 +1,77 @@
 from datetime import datetime
 import streamlit as st
 import os
-import google.generativeai as genai
-from google.generativeai import types # Keep for GenerationConfig
-from google.api_core import exceptions as core_exceptions # For rate limits
-from dotenv import load_dotenv
 import logging
-import time # For potential simulated typing effect
+import time
+import uuid
+
+from enstp import advisor
+from enstp import backends
+from enstp import conversations
+from enstp import followups
+from enstp import language
+from enstp import history
+from enstp import keypool
+from enstp import student_profile
+from enstp import telemetry
+from enstp.advisor import stream_enstp_response
+from enstp.transcript import Transcript, TranscriptView
 
 # --- Basic Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- Load API Key ---
-load_dotenv()
-# Try to get API key from .env file first, then from Streamlit secrets
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY and 'GOOGLE_API_KEY' in st.secrets:
-    GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
+# --- Page Config (MUST be the first Streamlit command) ---
+st.set_page_config(
+    page_title="Conseiller ENSTP",
+    page_icon="🎓",
+    layout="wide"
+)
+
+# --- Load API Keys ---
+# Resolved once per process: every interaction reruns this script
+@st.cache_resource(show_spinner=False)
+def load_api_keys():
+    """API keys from the .env file (loaded by enstp.advisor) first, then from Streamlit secrets.
+
+    GOOGLE_API_KEYS ("CLÉ1,CLÉ2:2") spreads requests over a pool of keys;
+    GOOGLE_API_KEY is a single key.
+    """
+    spec = os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEY")
+    # (the offline stub backend, ENSTP_LLM_BACKEND=stub, runs without a key)
+    use_stub_backend = backends.selected_backend() == "stub"
+    if not spec and not use_stub_backend:
+        try:
+            for name in ("GOOGLE_API_KEYS", "GOOGLE_API_KEY"):
+                if name in st.secrets:
+                    spec = st.secrets[name]
+                    break
+        except FileNotFoundError:
+            # No secrets.toml either (Streamlit shows its own notice): the app runs in degraded mode
+            pass
+    return (keypool.parse_keys(spec) if spec else []), use_stub_backend
+
+GOOGLE_API_KEYS, USE_STUB_BACKEND = load_api_keys()
 
 # --- Global Check for API Key ---
-api_key_configured = bool(GOOGLE_API_KEY)
+api_key_configured = bool(GOOGLE_API_KEYS) or USE_STUB_BACKEND
 
 if not api_key_configured:
-    st.error("⚠️ **Erreur de Configuration:** La clé API Google n'est pas définie. L'application ne peut pas fonctionner. Veuillez contacter l'administrateur (Cherif Tas).", icon="🚨")
-    # Stop the script here if the key isn't configured at all
-    st.stop()
+    # Look again on the next run, once the key has been added; meanwhile
+    # the advisor answers with extracts of the guide (degraded mode)
+    load_api_keys.clear()
+    logger.error("Google API key not configured: running in degraded mode.")
 else:
-    # Configure GenAI globally once if key exists
+    # Select the backend once per process (reruns with the same keys are a no-op);
+    # the Gemini SDK itself is only imported by the first API call
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        logger.info("Google Generative AI configured successfully.")
+        advisor.configure(api_keys=GOOGLE_API_KEYS)
     except Exception as config_err:
         st.error(f"🔑 **Erreur Configuration API:** {config_err}. Vérifiez la validité de la clé.", icon="🔥")
         api_key_configured = False # Mark as not configured if error occurs
 
-# --- Model Configuration ---
-MODEL_NAME = 'gemini-1.5-pro-latest' # Use the latest capable model
-
-# --- ENSTP Guide Text ---
-ENSTP_GUIDE_TEXT = """
-Comprehensive Analysis of DMS and DIB
-         Departments at ENSTP Algeria
-
-1     Introduction to ENSTP
-The École Nationale Supérieure des Travaux Publics (ENSTP) is one of Alge-
-ria's most prestigious engineering institutions, specializing in civil engineering
-and public works. Founded in 1966 and located in Kouba, Algiers, ENSTP
-has played a critical role in training the engineering workforce responsible for
-Algeria's infrastructure development. The institution operates under the super-
-vision of the Ministry of Higher Education and Scientific Research, providing
-high-quality education in civil engineering disciplines.
-    ENSTP is renowned for its rigorous academic programs, combining theoret-
-ical knowledge with practical applications, and maintaining strong relationships
-with industry partners. The school consistently ranks among Algeria's top en-
-gineering institutions, with graduates highly sought after in both public and
-private sectors across North Africa and beyond.
-
-
-2     Departmental Structure at ENSTP
-ENSTP's academic structure features several departments, with two major de-
-partments serving as the primary pathways for specialization in civil engineering:
-
-2.1    Département des Matériaux et Structures (DMS)
-The Department of Materials and Structures focuses on the analysis, design,
-and construction of various civil engineering structures, with emphasis on the
-behavior of materials under different loading conditions. The department's cur-
-riculum is centered around structural engineering principles, material science,
-and advanced analysis techniques.
-    Primary Specialization: Routes et Ouvrages (Roads and Structures)
-
-2.2    Département des Infrastructures de Base (DIB)
-The Department of Basic Infrastructure concentrates on the planning, design,
-and management of civil infrastructure systems, with particular attention to
-transportation networks, hydraulic systems, and urban development. The de-
-partment emphasizes systems integration, infrastructure planning, and network
-optimization.
-   Primary Specialization: Infrastructures de Base (Basic Infrastructure)
-
-
-3       Academic Programs and Degrees
-3.1     Degree Structure
-Both DMS and DIB departments offer identical degree designations, though the
-specialization is noted on the diploma:
-
-    • Ingénieur d'état en travaux publics (State Engineer in Public Works)
-      - The primary professional degree equivalent to a Bachelor's and Master's
-      combined in the Anglo-Saxon system
-
-    • Master en travaux publics (Master's in Public Works) - Advanced de-
-      gree for students seeking additional specialization or research preparation
-
-   The engineering program typically spans five years of study, with the first
-two years focusing on fundamental sciences and engineering basics, followed by
-three years of increasingly specialized coursework in the chosen department.
-
-3.2     Accreditation and Recognition
-Degrees from ENSTP are recognized by:
-    • The Algerian Ministry of Higher Education and Scientific Research
-    • Various international engineering accreditation bodies through mutual
-      recognition agreements
-    • Major engineering employers across North Africa, the Middle East, and
-      Francophone countries
-
-
-4       Curriculum Analysis: Common Elements
-4.1     Fundamental Modules (Common to Both Departments)
-Both DMS and DIB share a strong foundation of core engineering subjects that
-provide the essential knowledge base for civil engineering practice:
-
-4.1.1    Mathematics and Scientific Foundation
-    • Applied Mathematics
-    • Probability and Statistics
-    • Physics for Engineers
-    • Chemistry of Materials
-
-4.1.2   Core Engineering Sciences
-   • Résistance Des Matériaux (Strength of Materials): Study of material
-     behavior under applied loads, analyzing stress, strain, and deformation to
-     ensure structural integrity.
-   • Calcul des Structures (Structural Analysis): Mathematical methods for
-     analyzing forces, stresses, and displacements in various structural systems.
-   • Mécanique des structures (Structural Mechanics): Advanced analysis
-     of structural behavior, including dynamic responses and complex loading
-     conditions.
-   • Dynamique des Structures (Structural Dynamics): Analysis of struc-
-     tures under time-varying loads, including seismic considerations.
-
-   • Dynamique des sols (Soil Dynamics): Study of soil behavior under
-     dynamic loading conditions.
-   • Mécanique Des Sols (Soil Mechanics): Analysis of soil properties, be-
-     havior, and their interaction with structures.
-   • Mécanique des Milieux Continus (Continuum Mechanics): Mathe-
-     matical description of the mechanical behavior of continuous materials.
-   • Mécanique Des Fluides (Fluid Mechanics): Study of fluid behavior and
-     its interaction with structures and systems.
-   • Géologie (Geology): Study of earth materials and processes relevant to
-     civil engineering.
-   • Topographie (Topography): Techniques for surveying and mapping ter-
-     rain for engineering purposes.
-   • Mécanique des roches (Rock Mechanics): Analysis of rock behavior
-     under various loading and environmental conditions.
-
-4.2     Advanced Common Modules
-Both departments feature advanced modules that build upon the fundamental
-courses, providing more specialized knowledge applicable to various civil engi-
-neering domains:
-
-   • Ponts (Bridges): Design and analysis of bridge structures, including var-
-     ious typologies and loading conditions.
-   • Routes (Roads): Principles of road design, including geometric design,
-     pavement structure, and traffic considerations.
-   • Béton Armé (Reinforced Concrete): Design and analysis of reinforced
-     concrete structures, including beams, columns, slabs, and foundations.
-
-   • Béton Précontraint (Prestressed Concrete): Advanced concrete tech-
-     nology using prestressing techniques to enhance structural performance.
-   • Charpente Métallique (Steel Structures): Design and analysis of steel
-     structural systems, including connections and load considerations.
-
-   • Géotechnique Routière (Road Geotechnics): Specialized geotechnical
-     considerations for road infrastructure.
-   • Calcul d'ouvrages (Structural Design): Comprehensive approach to de-
-     signing various civil engineering structures.
-
-   • Matériaux de Construction (Construction Materials): Properties, test-
-     ing, and applications of various construction materials.
-   • Hydraulique appliquée (Applied Hydraulics): Principles of hydraulics
-     applied to civil engineering problems.
-   • Assainissement urbain et routier (Urban and Road Drainage): Design
-     of drainage systems for urban areas and transportation infrastructure.
-   • Procédés Généraux de Construction (General Construction Processes):
-     Construction methods, techniques, and equipment for various civil engi-
-     neering projects.
-
-   • Organisation De Chantier (Construction Site Organization): Plan-
-     ning, management, and optimization of construction sites.
-   • Méthode des éléments finis (Finite Element Method): Numerical tech-
-     nique for solving complex engineering problems through discretization.
-   • Pathologie des Ouvrages d'Art (Engineering Structures Pathology):
-     Analysis of structural defects, failures, and rehabilitation techniques.
-
-4.3   Common Transversal Modules
-Both departments include courses that develop broader professional skills nec-
-essary for engineering practice:
-
-   • Conférences (Conferences): Exposure to current industry trends and
-     research through guest lectures and seminars.
-   • Dessin Assisté par Ordinateur (Computer-Aided Design): Applica-
-     tion of software tools for engineering design and drafting.
-    • Anglais Technique (Technical English): Development of English lan-
-      guage skills specific to engineering contexts.
-   • Analyse numérique appliquée (Applied Numerical Analysis): Compu-
-      tational methods for solving engineering problems.
-
-    • Droit des Travaux Publics (Public Works Law): Legal aspects of civil
-      engineering projects, contracts, and regulations.
-    • Développement durable et aménagement de territoire (Sustain-
-      able Development and Territorial Planning): Integration of sustainability
-      principles in infrastructure development.
-    • Management des projets ou Entrepreneuriat (Project Management
-      or Entrepreneurship): Skills for managing engineering projects or creating
-      engineering enterprises.
-
-4.4    Common Practical Work and Laboratories
-Both departments emphasize hands-on experience through extensive laboratory
-work:
-
-    • TP RDM (Strength of Materials Lab): Experimental verification of ma-
-      terial behavior under various loading conditions.
-    • TP MDS (Soil Mechanics Lab): Testing and analysis of soil properties
-      relevant to civil engineering applications.
-    • TP Topo (Topography Lab): Field exercises in surveying and terrain
-      mapping.
-    • TP Géologie (Geology Lab): Identification and testing of geological ma-
-      terials relevant to construction.
-    • TP MDC (Construction Materials Lab): Testing and characterization of
-      various construction materials.
-    • TP MDF (Fluid Mechanics Lab): Experimental study of fluid behavior
-      in various engineering applications.
-
-    • TP Routes (Roads Lab): Testing of road materials and design principles
-      for pavement systems.
-
-5     Curriculum Differences: DMS vs. DIB
-5.1    DMS-Specific Engineering Modules
-The DMS department offers specialized courses focusing on materials behavior
-and structural analysis:
-   • Calcul Automatique des structures (Automated Structural Analysis):
-     Application of computational methods for complex structural analysis.
-   • Calcul économique des projets (Economic Project Calculation): Cost
-     analysis and optimization of structural engineering projects.
-
-   • Dynamique des Sols 2 (Advanced Soil Dynamics): Further exploration
-     of soil behavior under dynamic loading conditions.
-   • TP Hydraulique appliquée (Applied Hydraulics Lab): Practical appli-
-     cations of hydraulic principles in structural contexts.
-
-5.2     DIB-Specific Engineering Modules
-The DIB department offers specialized courses focusing on infrastructure sys-
-tems and transportation:
-
-   • Économie de Transport (Transport Economics): Economic analysis of
-     transportation systems and infrastructure investments.
-
-   • Analyse Numérique (Numerical Analysis): Advanced computational
-     methods specifically applied to infrastructure problems.
-   • Géologie 2 (Advanced Geology): Further exploration of geological con-
-     siderations for infrastructure development.
-
-   • TP GTR (Road Geotechnics Lab): Practical applications of geotechnical
-     principles to road infrastructure.
-   • TP Géologie2 (Advanced Geology Lab): Advanced testing and analysis
-     of geological materials for infrastructure applications.
-
-5.3     Optional Specialization Tracks
-5.3.1   DMS Optional Tracks
-Buildings Track (Bâtiments):
-
-   • Bâtiments (Buildings): Comprehensive structural design of buildings
-     considering various loading conditions.
-   • Contreventments (Bracing): Design of structural systems to resist lat-
-     eral loads in buildings.
-   • Calcul d'ouvrages élémentaires (Elementary Structural Calculation):
-     Simplified methods for structural analysis of common building elements.
-   • Thermique Bât (Building Thermics): Thermal behavior and energy ef-
-     ficiency in building design.
-   • Esquisse Bât (Building Design): Conceptual and preliminary design of
-     building structures.
-   Tunnels Track:
-
-   • Mécanique des Roches (Rock Mechanics): Behavior of rock masses
-     relevant to underground construction.
-   • Tun (Tunnels): Principles of tunnel design, construction, and mainte-
-     nance.
-
-   • Méthode de réalisation des Ouvrages Souterrains (Underground
-     Construction Methods): Techniques for constructing various underground
-     structures.
-   • Esquisse Tun (Tunnel Design): Conceptual and preliminary design of
-     tunnel structures.
-
-5.3.2   DIB Optional Tracks
-Railway and Rail Bridges Track:
-   • VF1, VF2 (Railway 1 & 2): Comprehensive study of railway infrastruc-
-     ture design and maintenance.
-   • Esquisse VF (Railway Design): Conceptual and preliminary design of
-     railway systems.
-
-   • PR1, PR2 (Rail Bridge 1 & 2): Specialized design of bridge structures
-     for railway applications.
-   • Esquisse PR (Rail Bridge Design): Conceptual and preliminary design
-     of railway bridges.
-
-   Maritime Works and Air Bases Track:
-   • TM1, TM2 (Maritime Works 1 & 2): Design and construction of coastal
-     and port structures.
-   • Esquisse TM (Maritime Design): Conceptual and preliminary design of
-     maritime infrastructure.
-   • Base1, Base2 (Air Base 1 & 2): Specialized infrastructure for aviation
-     facilities.
-   • Esquisse Base (Air Base Design): Conceptual and preliminary design of
-     airport infrastructure.
-
-5.4     Master's Program Specialization Differences
-5.4.1    DMS Master's Modules (Research-Oriented)
-The DMS master's program emphasizes advanced materials science and struc-
-tural optimization:
-
-    • Matériaux innovants (Innovative Materials): Study of emerging con-
-      struction materials with enhanced properties.
-    • Analyse expérimentale (Experimental Analysis): Advanced laboratory
-      techniques for materials and structural testing.
-    • Optimisation des Structures (Structural Optimization): Mathemati-
-      cal methods for optimizing structural designs.
-    • Mécanique des milieux continus approfondie (Advanced Continuum
-      Mechanics): Higher-level analysis of material behavior using continuum
-      mechanics principles.
-
-5.4.2    DIB Master's Modules (Practice-Oriented)
-The DIB master's program focuses on infrastructure performance and manage-
-ment:
-
-    • Pathologie des chaussées (Pavement Pathology): Analysis of pavement
-      deterioration mechanisms and rehabilitation techniques.
-    • Rhéologie des matériaux (Materials Rheology): Study of flow behavior
-      of construction materials under various conditions.
-    • Organisation de chantier (Construction Site Organization): Advanced
-      techniques for managing complex infrastructure projects (shared with
-      DMS).
-    • Droit des Travaux Publics (Public Works Law): Advanced legal con-
-      siderations for infrastructure development (shared with DMS).
-
-6       Practical Training and Field Experience
-6.1     Internship Requirements
-Both departments require students to complete multiple internships throughout
-their studies:
-
-    • Observation Internship (1st year): Introduction to civil engineering
-      practice in real-world settings.
-    • Worker Internship (2nd year): Hands-on experience as part of con-
-      struction teams.
-   • Technical Internship (3rd year): Application of technical knowledge in
-     professional settings.
-   • Engineering Internship (4th year): Advanced professional experience
-     with significant responsibilities.
-   • Graduation Project Internship (5th year): Comprehensive project
-     serving as the capstone experience.
-
-6.2     Field Trips and Educational Visits
-6.2.1   DMS Educational Visits
-Students in DMS typically visit:
-   • Bridge construction sites of various typologies
-   • Road construction and rehabilitation projects
-   • Materials testing laboratories
-   • Tunnel construction sites
-   • Dam construction and monitoring installations
-   • Building construction sites for high-rise or complex structures
-
-6.2.2   DIB Educational Visits
-Students in DIB typically visit:
-   • Bridge construction sites with emphasis on integration with transportation
-     networks
-   • Road network development projects
-   • Materials testing laboratories with focus on infrastructure applications
-   • Railway construction and maintenance operations
-   • Port facilities and maritime infrastructure
-   • Dam construction with emphasis on hydraulic systems
-
-6.3     Final Year Project Differences
-6.3.1   DMS Final Projects
-Typically focus on:
-   • Structural design optimization
-   • Advanced materials applications
-    • Seismic analysis and design
-   • Structural rehabilitation techniques
-   • Special structures (tall buildings, long-span bridges, etc.)
-
-6.3.2    DIB Final Projects
-Typically focus on:
-    • Transportation network optimization
-    • Infrastructure system integration
-    • Railway design and planning
-    • Port and maritime facilities development
-    • Airport infrastructure design
-
-
-7       Research Activities and Facilities
-7.1     Research Laboratories
-ENSTP hosts several research laboratories supporting both departments, with
-different emphasis:
-
-7.1.1    DMS-Affiliated Research Facilities
-    • Laboratory of Materials Engineering: Focuses on construction ma-
-      terials development and testing.
-    • Structural Analysis Laboratory: Equipped for experimental testing
-      of structural elements.
-    • Earthquake Engineering Laboratory: Specializes in seismic perfor-
-      mance of structures.
-    • Computational Mechanics Laboratory: Focuses on numerical mod-
-      eling of structures and materials.
-
-7.1.2    DIB-Affiliated Research Facilities
-    • Transportation Engineering Laboratory: Focuses on transportation
-      system analysis and planning.
-    • Geotechnical Engineering Laboratory: Specializes in soil-structure
-      interaction for infrastructure.
-    • Hydraulic Engineering Laboratory: Focuses on water resource sys-
-      tems and infrastructure.
-    • Infrastructure Planning Laboratory: Emphasizes integrated infras-
-      tructure development.
-
-7.2     Research Orientation
-The research orientation differs significantly between the two departments:
-
-    • DMS Research Focus: Materials science, structural behavior, seismic
-      design, structural optimization, and building science.
-    • DIB Research Focus: Transportation systems, infrastructure planning,
-      geotechnical engineering for infrastructure, and sustainable development.
-
-8       Faculty Profiles and Expertise
-8.1     Faculty Composition
-Both departments feature faculty members with various specializations:
-
-8.1.1    DMS Faculty Expertise
-    • Structural Engineering
-    • Earthquake Engineering
-    • Materials Science
-    • Computational Mechanics
-    • Geotechnical Engineering for Structures
-    • Building Science
-
-8.1.2    DIB Faculty Expertise
-    • Transportation Engineering
-    • Railway Engineering
-    • Maritime Engineering
-    • Airport Infrastructure
-    • Infrastructure Planning
-    • Geotechnical Engineering for Infrastructure
-
-8.2     Teaching Quality
-According to student feedback and institutional evaluations:
-
-    • Both departments have highly qualified professors, many with interna-
-      tional experience.
-    • Some professors are known for rigorous evaluation standards.
-    • Teaching effectiveness varies among faculty members.
-    • Industry experience among faculty tends to be higher in DIB, while re-
-      search credentials are often stronger in DMS.
-
-
-9       Career Prospects and Professional Outcomes
-9.1     Employment Sectors
-Graduates from both departments find employment in various sectors, with
-some differences in distribution:
-
-9.1.1    Common Employment Sectors
-    • Public works agencies
-    • Construction companies
-    • Consulting engineering firms
-    • Government ministries (Infrastructure, Housing, Transportation)
-    • Municipal engineering departments
-    • International development organizations
-
-9.1.2    DMS Graduate Predominant Sectors
-    • Structural engineering consultancies
-    • Building design firms
-    • Construction companies specializing in complex structures
-    • Research institutions
-    • Earthquake engineering specialists
-    • Building inspection and rehabilitation companies
-
-9.1.3   DIB Graduate Predominant Sectors
-   • Transportation planning agencies
-   • Railway companies
-   • Port authorities
-   • Airport development agencies
-   • Infrastructure management organizations
-   • Urban planning departments
-
-9.2     Professional Advancement
-Career progression patterns show some differences between graduates of the two
-departments:
-
-   • DMS Graduates: Often advance toward specialized technical roles (Se-
-     nior Structural Engineer, Technical Director) or management positions in
-     structural engineering firms.
-   • DIB Graduates: Often advance toward project management roles, sys-
-     tem planning positions, or infrastructure development management.
-
-9.3     Entrepreneurship Opportunities
-Both pathways offer entrepreneurial possibilities with different orientations:
-
-   • DMS Entrepreneurship: Specialized structural engineering consultan-
-     cies, materials testing laboratories, structural inspection services.
-   • DIB Entrepreneurship: Infrastructure planning consultancies, trans-
-     portation system analysis firms, project management services.
-
-
-10      Student Experience and Campus Life
-10.1     Student Demographics
-The student body composition shows some patterns:
-
-   • DMS typically attracts students with stronger mathematical backgrounds
-     and interest in detailed analysis.
-   • DIB typically attracts students with broader interests in systems and plan-
-     ning.
-   • Gender distribution is similar in both departments, though traditionally
-     DMS has had a slightly higher percentage of male students.
-
-10.2    Student Organizations
-Several student organizations are relevant to both departments:
-
-   • ENSTP Civil Engineering Society: General civil engineering student
-     organization
-   • Structural Engineering Club: Primarily attracts DMS students
-   • Infrastructure Development Association: Primarily attracts DIB
-     students
-   • ENSTP Research Group: Active in both departments but with stronger
-     DMS participation
-
-10.3    Academic Workload
-The academic demands show some differences:
-
-   • DMS Workload: Higher mathematical intensity, more detailed calcula-
-     tions, greater emphasis on analysis.
-   • DIB Workload: More diverse subject matter, greater emphasis on inte-
-     gration, more project-based assessments.
-
-11     International Collaboration and Mobility
-11.1    International Partnerships
-ENSTP maintains partnerships with international institutions relevant to both
-departments:
-
-   • Partnerships with French engineering schools (École des Ponts ParisTech,
-     INSA)
-   • Collaboration with Middle Eastern and African universities
-   • Exchange programs with European technical universities
-
-11.2    Student Mobility
-Opportunities for international experience exist for both departments:
-
-   • Exchange semester opportunities primarily in Francophone countries
-   • International internship placements
-   • Double-degree possibilities with partner institutions
-
-11.3     Research Collaboration
-International research collaboration patterns differ:
-   • DMS Research Collaboration: Stronger ties with materials science
-     and structural engineering research centers internationally.
-   • DIB Research Collaboration: Stronger ties with transportation and
-     infrastructure planning organizations internationally.
-
-
-12       Comparative Analysis: Making the Choice
-12.1     Student Aptitude Considerations
-Different aptitudes may be better suited to each department:
-
-12.1.1    DMS-Favored Aptitudes
-   • Strong mathematical abilities
-   • Detail-oriented thinking
-   • Interest in physical principles and behavior
-   • Comfort with complex analysis
-   • Precision and accuracy in work
-
-12.1.2    DIB-Favored Aptitudes
-   • Systems thinking abilities
-   • Integration of multiple disciplines
-   • Interest in transportation and networks
-   • Comfort with planning and optimization
-   • Spatial reasoning skills
-
-12.2     Learning Style Considerations
-Learning preferences that may influence department choice:
-
-12.2.1    DMS-Favored Learning Styles
-   • Analytical learning approach
-   • Step-by-step problem solving
-   • Detailed examination of components
-   • Theoretical foundation emphasis
-
-12.2.2    DIB-Favored Learning Styles
-   • Holistic learning approach
-   • Systems-level problem solving
-   • Integration of diverse elements
-   • Practical application emphasis
-
-12.3     Career Interest Alignment
-Career interests that may guide department selection:
-
-12.3.1    DMS-Aligned Career Interests
-   • Designing complex structures
-   • Analyzing structural behavior
-   • Developing advanced materials
-   • Earthquake-resistant design
-   • Building science research
-
-12.3.2    DIB-Aligned Career Interests
-   • Transportation system planning
-   • Infrastructure development
-   • Railway or maritime engineering
-   • Airport infrastructure design
-   • Urban system integration
-
-
-13       Future Trends and Departmental Evolution
-13.1     Emerging Technologies
-Both departments are adapting to technological advances, with different em-
-phases:
-
-13.1.1    DMS Technology Evolution
-   • Advanced computational methods for structural analysis
-   • Building Information Modeling (BIM) integration
-   • Smart materials and structures
-   • Sustainable building technologies
-   • 3D printing for construction
-
-13.1.2    DIB Technology Evolution
-   • Intelligent transportation systems
-   • Infrastructure management systems
-   • Geographic Information Systems (GIS) applications
-   • Remote sensing for infrastructure monitoring
-   • Smart city technologies
-
-13.2     Curriculum Evolution
-Both departments continue to evolve their curricula:
-
-   • DMS Curriculum Trends: Greater integration of sustainability, re-
-     silience, and digital technologies in structural design.
-   • DIB Curriculum Trends: Increased emphasis on smart infrastructure,
-     sustainable transportation, and integrated planning approaches.
-
-
-14       Conclusion: The Complementary Nature of
-         DMS and DIB
-The Département des Matériaux et Structures (DMS) and Département des
-Infrastructures de Base (DIB) at ENSTP represent complementary approaches
-to civil engineering education:
-
-   • DMS provides depth in structural engineering, materials science, and
-     detailed analysis, preparing engineers who can design and analyze complex
-     structures with precision and technical sophistication.
-   • DIB offers breadth in infrastructure systems, transportation engineering,
-     and integrated planning, developing engineers who can coordinate complex
-     infrastructure networks and optimize transportation systems.
-    Both departments contribute essential expertise to Algeria's infrastructure
-development, with graduates working together on major projects - DMS grad-
-uates ensuring structural integrity and safety, while DIB graduates ensuring
-system functionality and integration.
-    The choice between these departments should be guided by a student's natu-
-ral aptitudes, learning preferences, and career aspirations, recognizing that both
-pathways lead to rewarding engineering careers addressing critical infrastructure
-needs.
-
-
-15     References and Resources
-15.1    Official ENSTP Documentation
-   • ENSTP Academic Catalog
-   • Departmental Curriculum Guides
-   • ENSTP Strategic Plan 2020-2025
-
-15.2    Alumni Outcomes Reports
-   • Graduate Employment Surveys (2018-2024)
-   • Career Progression Analysis of ENSTP Graduates
-
-15.3    Industry Feedback
-   • Employer Satisfaction Surveys
-   • Industry Advisory Board Recommendations
-
-15.4    Comparative Studies
-   • Civil Engineering Education in North Africa (2022)
-   • Infrastructure Skills Development in Algeria (2023)
-"""
-
-# --- Function to Interact with Gemini API (Adapted for Streamlit) ---
-def get_enstp_response(student_input, conversation_history):
-    """Gets sophisticated response/recommendation based on student input and history."""
-    if not GOOGLE_API_KEY:
-        logger.error("API Key not found.")
-        return "Erreur: La clé API GOOGLE_API_KEY n'est pas configurée correctement sur le serveur."
-
-    try:
-        # Configure API client if needed
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel(MODEL_NAME)
-    except Exception as e:
-        logger.error(f"Error initializing GenerativeModel: {e}")
-        return f"Erreur: Impossible d'initialiser le modèle d'IA. Détails: {str(e)}"
-
-    try:
-        # Format conversation history for embedding within prompt
-        conversation_history_formatted = "\n".join(
-            f"{'Étudiant' if turn['role'] == 'user' else 'Conseiller ENSTP'}: {turn['content']}"
-            for turn in conversation_history
-        ).strip()
-
-        # Define guide text directly within function
-        guide_text = """Résumé simplifié pour les départements DMS et DIB à l'ENSTP:
-
-DMS (Département des Matériaux et Structures):
-- Spécialisation: Analyse et conception des structures d'ingénierie civile
-- Focus: Comportement des matériaux, principes d'ingénierie structurelle
-- Cours spécifiques: Analyse structurelle avancée, dynamique des structures, optimisation
-- Aptitudes favorisées: Compétences mathématiques, pensée analytique, analyse détaillée
-- Débouchés: Bureaux d'études structurelles, entreprises de construction spécialisées
-
-DIB (Département des Infrastructures de Base):
-- Spécialisation: Planification et gestion des systèmes d'infrastructure civile
-- Focus: Réseaux de transport, systèmes hydrauliques, développement urbain
-- Cours spécifiques: Économie des transports, géologie avancée, planification d'infrastructure
-- Aptitudes favorisées: Pensée systémique, intégration multidisciplinaire, optimisation
-- Débouchés: Agences de planification des transports, autorités portuaires, gestion d'infrastructure
-
-Les deux départements partagent une base commune de cours fondamentaux en génie civil.
-
-Information sur les domaines connexes:
-- Génie Civil: Se concentre sur la conception, la construction et la maintenance de l'environnement bâti, y compris les bâtiments, les ponts, les barrages, etc.
-- Travaux Publics: Met l'accent sur les infrastructures publiques comme les routes, les ponts, les tunnels, les systèmes d'approvisionnement en eau, et l'assainissement.
-- Architecture: Se concentre sur la conception esthétique et fonctionnelle des bâtiments et autres structures physiques.
-- Génie Urbain: Traite de la planification, de la conception et de la gestion des zones urbaines et des services municipaux."""
-
-        # --- PROMPT ---
-        combined_prompt_for_llm = f"""
-        **PERSONA & MISSION:**
-        Vous êtes un conseiller d'orientation expert, amical et perspicace de l'ENSTP. Votre mission est d'avoir une conversation naturelle et guidée avec un étudiant venant de terminer le cycle préparatoire pour l'aider à choisir entre les départements DMS et DIB. Votre source principale d'information est le "Guide ENSTP DMS/DIB".
-
-        **CONTRAINTES:**
-        1.  **SOURCE PRINCIPALE:** Basez principalement vos réponses, analyses et recommandations sur le "Guide ENSTP DMS/DIB" fourni ci-dessous.
-        2.  **CONNAISSANCES GÉNÉRALES:** Vous pouvez utiliser des connaissances générales sur le génie civil, les travaux publics et d'autres domaines connexes pour contextualiser vos réponses, mais restez centré sur l'ENSTP.
-        3.  **ATTRIBUTION:** Si on vous demande qui vous a créé ou inventé, répondez UNIQUEMENT "Cherif tas".
-        4.  **LANGUE:** Répondez en FRANÇAIS par défaut. Si l'étudiant demande explicitement une réponse en anglais ou en arabe (ex: "speak in english", "parle en arabe"), répondez à CETTE demande spécifique dans la langue demandée et **continuez dans cette langue pour les tours suivants**, jusqu'à ce que l'étudiant demande explicitement une autre langue ou de revenir au français.
-
-        **FLUX DE CONVERSATION GUIDÉE:**
-        1.  **OUVERTURE (Premier Tour):** (Déjà géré par le message initial dans Streamlit)
-        2.  **COLLECTE D'INFORMATIONS (Tours Suivants):** Avant de donner des réponses spécifiques ou des recommandations, POSEZ DES QUESTIONS OUVERTES pour comprendre l'étudiant. Exemples de questions à poser progressivement (ne les posez pas toutes d'un coup):
-            *   "Comment se sont passées vos années préparatoires ? Quelles matières scientifiques (maths, physique) avez-vous le plus appréciées ?"
-            *   "Qu'est-ce qui vous attire dans le métier d'ingénieur en travaux publics ?"
-            *   "Préférez-vous l'analyse détaillée et la compréhension profonde des mécanismes (style DMS) ou une vision plus globale des systèmes et de leur intégration (style DIB) ?"
-            *   "Avez-vous déjà une idée des types de projets qui vous intéressent le plus (bâtiments, ponts, routes, tunnels, chemins de fer, ports, aéroports) ?"
-            *   "Comment envisagez-vous votre future carrière ? Plutôt dans la technique pure, la gestion de projet, la planification ?"
-            *   Accusez réception des réponses de l'étudiant (ex: "D'accord, je vois que vous préférez X...") avant de poser une autre question ou de fournir une information.
-        3.  **RÉPONSE AUX QUESTIONS SPÉCIFIQUES:** Quand l'étudiant pose une question directe (sur les modules, carrières, etc.), répondez PRÉCISÉMENT en utilisant PRINCIPALEMENT le guide. **Intégrez l'information naturellement sans citer systématiquement les numéros de section.** Référez-vous au contenu du guide, mais pas à sa structure.
-        4.  **RÉPONSE AUX QUESTIONS SUR LES DOMAINES CONNEXES:** Si l'étudiant pose des questions sur les différences entre le génie civil, les travaux publics, l'architecture ou d'autres domaines connexes, fournissez des réponses informatives et précises en vous appuyant sur vos connaissances générales, tout en les reliant à l'ENSTP.
-        5.  **RECOMMANDATION (sur demande ou quand prêt):**
-            *   Ne recommandez PAS trop tôt. Attendez une demande explicite ('recommander', 'quel choisir', 'votre avis') OU lorsque vous estimez avoir recueilli suffisamment d'informations pertinentes.
-            *   Basez la recommandation sur une CORRESPONDANCE CLAIRE entre les informations recueillies sur l'étudiant (historique) et les critères pertinents du guide (par exemple, les aptitudes favorisées, les intérêts alignés, les perspectives de carrière).
-            *   Justifiez la recommandation en vous référant **clairement aux informations pertinentes du guide**, **mais évitez les citations directes de numéros de section.** (ex: "Étant donné votre intérêt pour l'analyse détaillée et votre attrait pour la conception de structures complexes, le DMS semble mieux aligné, car le guide indique que ce département favorise ces aspects.").
-            *   Si les informations sont insuffisantes pour recommander, demandez les détails manquants nécessaires pour appliquer les critères du guide.
-        6.  **STYLE DE RÉPONSE:** Soyez fluide, intelligent, conversationnel mais professionnel. Équilibrez la longueur des réponses. Utilisez des phrases de transition.
-
-        **Guide ENSTP DMS/DIB (Source Principale):**
-        --- DEBUT GUIDE ---
-        {guide_text}
-        --- FIN GUIDE ---
-
-        **Historique de la Conversation Précédente:**
-        --- DEBUT HISTORIQUE ---
-        {conversation_history_formatted if conversation_history else "Aucune conversation précédente."}
-        --- FIN HISTORIQUE ---
-
-        **Dernière Entrée de l'Étudiant:**
-        {student_input}
-
-        **Votre Prochaine Action:**
-        Générez la prochaine réponse ou question du "Conseiller ENSTP" en suivant scrupuleusement le flux de conversation guidée et toutes les instructions et contraintes ci-dessus.
-        """
-
-        # Simplify API call approach
-        messages = []
-        # First add system prompt
-        messages.append({"role": "user", "parts": [combined_prompt_for_llm]})
-        
-        response = model.generate_content(
-            messages,
-            generation_config=types.GenerationConfig(
-                temperature=0.6,
-                max_output_tokens=1536,
-            ),
-        )
-
-        if not response.candidates:
-            logger.warning("API response blocked or empty.")
-            return "Désolé, ma réponse a été bloquée pour des raisons de sécurité ou était vide."
-
-        response_text = response.text.strip()
-        return response_text
-    
-    except core_exceptions.ResourceExhausted as rate_limit_err:
-        logger.warning(f"API Rate Limit Reached: {rate_limit_err}")
-        return "Le service est très sollicité actuellement. Veuillez patienter quelques instants avant de réessayer."
-    except Exception as e:
-        logger.error(f"Error processing API request: {e}")
-        return f"Désolé, une erreur s'est produite: {str(e)}"
-
-# --- Page Config (MUST be the first Streamlit command) ---
-st.set_page_config(
-    page_title="Conseiller ENSTP",
-    page_icon="🎓",
-    layout="wide"
-)
+# Process telemetry in the sidebar (ENSTP_ADMIN_PANEL=1)
+SHOW_ADMIN_PANEL = os.getenv("ENSTP_ADMIN_PANEL", "").strip().lower() in ("1", "true", "yes")
 
 # Custom CSS for better styling
 st.markdown("""
@@ -814,75 +87,248 @@ st.markdown("""
 
 # Title and introduction
 st.title("🧑‍🏫 Conseiller ENSTP - Votre Guide Intelligent")
-st.warning("⚠️ L'API ne peut pas supporter un grand nombre de requêtes. Si vous recevez une erreur de limite d'API, veuillez patienter quelques instants avant de réessayer.", icon="⚠️")
+if not api_key_configured:
+    st.warning("⚠️ **Mode dégradé:** la clé API Google n'est pas définie. Les réponses se limitent aux passages du guide de l'ENSTP les plus proches de vos questions. Veuillez contacter l'administrateur (Cherif Tas).", icon="🚨")
+st.info("ℹ️ En période de forte affluence, les questions sont placées dans une file d'attente partagée: votre position et le temps d'attente estimé s'affichent pendant l'attente.", icon="ℹ️")
+
+WELCOME_MESSAGE = advisor.WELCOME_MESSAGE
+# Conversations are saved in SQLite (None: kept in memory only)
+conversation_store = conversations.get_store()
+# Messages shown at once (the ones kept in memory); older ones are paged in on request
+MESSAGES_PER_PAGE = conversation_store.hot_window if conversation_store is not None else conversations.DEFAULT_HOT_WINDOW
+
+def new_conversation():
+    """A conversation holding the welcome message, stored in SQLite when the store is available."""
+    if conversation_store is None:
+        return Transcript([{"role": "assistant", "content": WELCOME_MESSAGE}])
+    transcript = conversation_store.transcript(conversation_store.create_session())
+    transcript.add("assistant", WELCOME_MESSAGE)
+    # The token in the URL lets the student resume after a reload or reconnect
+    st.query_params["session"] = transcript.token
+    return transcript
+
+def clear_conversation(rerun=True):
+    """Resets the chat history (button or "efface la conversation")."""
+    # Reset chat history
+    messages = st.session_state.get("messages")
+    if isinstance(messages, conversations.StoredTranscript):
+        conversation_store.delete(messages.token)
+    st.session_state.pop("history_memory", None)
+    st.session_state.pop("response_language", None)
+    st.session_state.pop("shown_messages", None)
+    st.session_state.pop("followups_for", None)
+    advisor.PREFETCHER.evict_session(st.session_state.get("session_id"))
+    st.session_state.student_profile = student_profile.StudentProfile()
+    logger.info("Conversation cleared by user.")
+    # Start over with the initial welcome message
+    st.session_state.messages = new_conversation()
+    if rerun:
+        st.rerun() # Rerun to update the UI immediately
 
 # Add clear button
 if st.button("🗑️ Effacer la Conversation", key="clear_button"):
-    # Reset chat history
-    st.session_state.messages = []
-    logger.info("Conversation cleared by user.")
-    # Add the initial welcome message back after clearing
-    st.session_state.messages.append(
-        {"role": "assistant", "content": "Bonjour ! Félicitations pour avoir terminé le cycle préparatoire. Comment vous sentez-vous à l'approche de ce choix important entre DMS et DIB ?"}
-    )
-    st.rerun() # Rerun to update the UI immediately
+    clear_conversation()
 
 # Initialize chat history in session state if it doesn't exist
 if "messages" not in st.session_state:
-    st.session_state.messages = [
-        # Start with the initial welcome message from the assistant
-        {"role": "assistant", "content": "Bonjour ! Félicitations pour avoir terminé le cycle préparatoire. Comment vous sentez-vous à l'approche de ce choix important entre DMS et DIB ?"}
-    ]
-
-# Display chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]): # "user" or "assistant"
-        if "content" in message:
-            st.markdown(message["content"])
-        elif "parts" in message and message["parts"]:
-            st.markdown(message["parts"][0])
-        else:
-            st.markdown("Message error: No content found")
+    # Resume the conversation of the URL's session token, else start with the welcome message
+    resumed = conversation_store.open(st.query_params.get("session")) if conversation_store is not None else None
+    if resumed is not None:
+        logger.info(f"Resumed a stored conversation ({len(resumed)} messages).")
+        st.session_state.messages = resumed
+    else:
+        st.session_state.messages = new_conversation()
+elif isinstance(st.session_state.messages, conversations.StoredTranscript):
+    # Another worker may have carried on (or deleted) the session: checked once per rerun
+    if not st.session_state.messages.refresh():
+        clear_conversation(rerun=False)
+elif not isinstance(st.session_state.messages, TranscriptView):
+    # Sessions started before the transcript: normalize their messages once
+    st.session_state.messages = Transcript(st.session_state.messages)
+
+# Identifies this browser session in the shared quota queue
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Response language requested by the student (French until asked otherwise)
+if "response_language" not in st.session_state:
+    st.session_state.response_language = language.current_language(st.session_state.messages)
+
+# Rolling summary of older turns, kept next to the messages
+if "history_memory" not in st.session_state:
+    st.session_state.history_memory = history.ConversationMemory(
+        token_budget=advisor.HISTORY_TOKEN_BUDGET, recent_messages=advisor.HISTORY_RECENT_MESSAGES
+    )
+
+# DMS/DIB fit from the student's messages, updated one message at a time
+if "student_profile" not in st.session_state:
+    st.session_state.student_profile = student_profile.StudentProfile()
+    # A resumed conversation: replay its student messages once
+    for message in st.session_state.messages:
+        if message.role == "user":
+            st.session_state.student_profile.observe(message.content)
+
+# Display chat history: the latest messages, older ones on request
+if "shown_messages" not in st.session_state:
+    st.session_state.shown_messages = MESSAGES_PER_PAGE
+first_shown = max(len(st.session_state.messages) - st.session_state.shown_messages, 0)
+if first_shown and st.button("⬆️ Afficher les messages précédents", key="older_messages_button"):
+    st.session_state.shown_messages += MESSAGES_PER_PAGE
+    first_shown = max(first_shown - MESSAGES_PER_PAGE, 0)
+for message in st.session_state.messages[first_shown:]:
+    with st.chat_message(message.role): # "user" or "assistant"
+        st.markdown(message.content)
+
+def choose_followup(question):
+    """Suggestion button: the question is sent as the student's next message."""
+    st.session_state.followup_choice = question
+
+# Chat input (or the suggested question the student clicked)
+prompt = st.chat_input("Discutez avec le conseiller...") or st.session_state.pop("followup_choice", None)
+if prompt:
+    # History for the API is everything before this message (an O(1) view)
+    history_for_api = st.session_state.messages.snapshot()
 
-# Chat input
-if prompt := st.chat_input("Discutez avec le conseiller..."):
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.messages.add("user", prompt)
+    st.session_state.response_language = language.requested_language(prompt) or st.session_state.response_language
+    st.session_state.student_profile.observe(prompt)
     
     # Display user message
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Prepare conversation history for API call
-    history_for_api = []
-    for msg in st.session_state.messages[:-1]:  # All messages except the latest user message
-        # Handle different message formats
-        if "content" in msg:
-            content = msg["content"]
-        elif "parts" in msg and msg["parts"]:
-            content = msg["parts"][0]
-        else:
-            content = "Error: No content found in message"
-            
-        history_for_api.append({
-            "role": msg["role"],
-            "content": content
-        })
-    
-    # Get response from Gemini API
-    with st.spinner("En train de réfléchir..."):
+    # Stream response from Gemini API into the assistant bubble
+    with st.chat_message("assistant"):
+        queue_status = st.empty()
+
+        def show_queue_position(position, estimated_wait):
+            queue_status.info(
+                f"⏳ Forte affluence: vous êtes en position {position + 1} dans la file d'attente. "
+                f"Attente estimée: ~{max(1, round(estimated_wait))} s.",
+                icon="⏳",
+            )
+
+        turn_timer = telemetry.TurnTimer(st.session_state.session_id, mode="stream")
+
+        def clear_queue_status(stream):
+            for index, chunk in enumerate(stream):
+                if index == 0:
+                    queue_status.empty()
+                # Time until the next chunk is requested is spent rendering this one
+                render_start = time.perf_counter()
+                yield chunk
+                turn_timer.add("render", time.perf_counter() - render_start)
+
+        turn_info = {}
         try:
-            response_text = get_enstp_response(prompt, history_for_api)
+            # A suggested question answered in the background while the student read
+            response_text = advisor.prefetched_answer(
+                prompt, history_for_api, turn_timer, session_id=st.session_state.session_id, turn_info=turn_info,
+            )
+            if response_text is not None:
+                st.markdown(response_text)
+            else:
+                response_text = st.write_stream(clear_queue_status(stream_enstp_response(
+                    prompt, history_for_api, st.session_state.history_memory, st.session_state.response_language,
+                    session_id=st.session_state.session_id, on_queue_update=show_queue_position, turn_info=turn_info,
+                    timer=turn_timer, profile=st.session_state.student_profile,
+                )))
         except Exception as e:
             st.error(f"Erreur: {str(e)}")
             response_text = "Désolé, j'ai rencontré une erreur. Veuillez réessayer."
+            st.markdown(response_text)
+        caption = advisor.fallback_caption(turn_info)
+        if caption:
+            st.caption(caption)
     
-    # Display assistant response
-    with st.chat_message("assistant"):
-        st.markdown(response_text)
-    
-    # Add response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": response_text})
+    # Add full response to chat history once the stream has ended
+    st.session_state.messages.add("assistant", response_text)
+    turn_timer.finish()
+    if turn_info.get("intent") == "clear_conversation":
+        # The confirmation stays on screen; the next run shows the fresh conversation
+        clear_conversation(rerun=False)
+
+# Suggested next questions under the last reply; the likeliest are answered
+# in the background while the student reads
+messages = st.session_state.messages
+if advisor.FOLLOWUP_SUGGESTIONS and messages[-1].role == "assistant":
+    if st.session_state.get("followups_for") != len(messages):
+        history_for_followups = messages.snapshot()
+        st.session_state.followups = followups.suggest(
+            history_for_followups, st.session_state.response_language, st.session_state.student_profile,
+            limit=advisor.FOLLOWUP_SUGGESTIONS,
+        )
+        st.session_state.followups_for = len(messages)
+        advisor.prefetch_followups(
+            st.session_state.followups, history_for_followups, st.session_state.history_memory,
+            st.session_state.response_language, session_id=st.session_state.session_id,
+            profile=st.session_state.student_profile,
+        )
+    for column, suggestion in zip(st.columns(len(st.session_state.followups)), st.session_state.followups):
+        column.button(suggestion.text, key=f"followup_{len(messages)}_{suggestion.topic}", on_click=choose_followup,
+                      args=(suggestion.text,), use_container_width=True)
+
+# Running DMS/DIB fit of this student
+with st.sidebar:
+    st.subheader("🧭 Votre profil (estimation)")
+    profile = st.session_state.student_profile
+    if not profile.evidence_count:
+        st.caption("Parlez de vos matières préférées, de votre façon de travailler et des projets qui vous attirent: l'estimation s'affichera ici.")
+    else:
+        fit = profile.fit()
+        st.progress(fit.dms, text=f"DMS {fit.dms:.0%} · DIB {fit.dib:.0%}")
+        for department in ("DMS", "DIB"):
+            strengths = profile.strongest(department)
+            if strengths:
+                st.markdown(f"**{department}:** " + ", ".join(strengths))
+        reservations = profile.strongest(positive=False)
+        if reservations:
+            st.markdown("**Réserves:** " + ", ".join(reservations))
+        st.caption(f"Estimation indicative, d'après {fit.evidence_count} indices tirés de vos messages.")
+
+# Admin panel: rolling percentiles of this process's recent turns
+if SHOW_ADMIN_PANEL:
+    with st.sidebar:
+        st.subheader("📊 Télémétrie (processus)")
+        summary = telemetry.RECORDER.summary()
+        if not summary["turns"]:
+            st.caption("Aucun tour enregistré pour l'instant.")
+        else:
+            st.caption(f"{summary['turns']} derniers tours, toutes sessions confondues")
+            st.metric("Taux de succès du cache", f"{summary['cache_hit_rate']:.0%}")
+            st.metric("Tours traités sans appel API (routeur)", f"{summary['routed_rate']:.0%}")
+            st.metric("Tours partageant une requête identique en cours", f"{summary['coalesced_rate']:.0%}")
+            st.table({
+                "phase": list(summary["phases_ms"]),
+                **{column: [phase[column] for phase in summary["phases_ms"].values()] for column in ("p50", "p95", "p99")},
+            })
+            st.caption(f"Niveaux de modèle: {summary['tiers'] or '-'} · Issues: {summary['outcomes']}")
+            if summary["profiles"]:
+                st.caption("Profils de génération (ms, tokens de sortie médians)")
+                st.table([{"profil": name, **stats} for name, stats in summary["profiles"].items()])
+        key_pool = advisor.get_key_pool()
+        if key_pool is not None and len(key_pool.keys) > 1:
+            st.caption("Clés API (requêtes, tokens, refus de quota, quarantaines en cours)")
+            st.table([
+                {**row, "quarantined": ", ".join(f"{model} ({seconds}s)" for model, seconds in row["quarantined"].items()) or "-"}
+                for row in key_pool.snapshot()
+            ])
+        prefetch = advisor.PREFETCHER.snapshot()
+        st.caption(
+            f"Réponses anticipées: {prefetch.get('used', 0) + prefetch.get('joined', 0)} utilisées sur {prefetch.get('requests', 0)} "
+            f"({prefetch['hit_rate']:.0%}) · non utilisées {prefetch.get('unused', 0)} "
+            f"(~{prefetch.get('unused_prompt_tokens', 0) + prefetch.get('unused_output_tokens', 0)} tokens perdus)"
+            f" · gardées dans le cache {prefetch.get('unused_cached', 0)}"
+            f" · non lancées faute de place {prefetch.get('skipped_busy', 0)}"
+        )
+        breaker_state = advisor.BREAKER.snapshot()
+        st.caption(
+            f"Disjoncteur API: {breaker_state['state']}"
+            + (f" (nouvel essai dans {breaker_state['retry_in']:.0f}s)" if breaker_state["retry_in"] is not None else "")
+            + f" · échecs récents {breaker_state['failure_share']:.0%} · déclenchements {breaker_state.get('trips', 0)}"
+            + f" · appels évités {breaker_state.get('rejected', 0)}"
+        )
 
 # Add a small footer
 st.markdown("---")
@@ -911,3 +357,8 @@ with st.expander("À propos du Conseiller IA"):
 
 st.markdown("**Créé par:** Cherif Tas")
 st.caption("Propulsé par Google Gemini") 
+
+# The page is rendered: prepare the retrieval index before the first question
+# (degraded mode answers from it too)
+advisor.warm_up()
+
@@ -0,0 +1,126 @@
+"""Memory per 1,000 active sessions: in-memory transcripts vs. the SQLite store.
+
+Every session holds a conversation of --messages messages of typical
+length. Before: each session keeps a Transcript of all its turns in
+st.session_state. After: a StoredTranscript handle, with only the last
+hot_window turns in the store's memory. Also times appends (one SQLite
+transaction each), resuming an evicted session and paging in old turns.
+
+    python benchmarks/bench_conversation_store.py --sessions 1000 --messages 40
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import conversations
+from enstp.transcript import Transcript
+
+USER_MESSAGE = "J'aime beaucoup la résistance des matériaux et le calcul de structures, mais je doute pour l'hydraulique. "
+ADVISOR_MESSAGE = (
+    "D'après ce que vous me dites, le DMS semble bien correspondre à votre profil: les modules de calcul "
+    "des structures, de béton armé et de dynamique des structures s'appuient sur les compétences que vous "
+    "aimez. Le DIB demande davantage d'hydraulique et de géotechnique. "
+) * 3
+
+
+def conversation(session_index, messages):
+    """The messages of one session (distinct strings, like real conversations)."""
+    return [
+        ("user", f"{USER_MESSAGE}#{session_index}.{index}") if index % 2 else ("assistant", f"{ADVISOR_MESSAGE}#{session_index}.{index}")
+        for index in range(messages)
+    ]
+
+
+def measure(build):
+    """Bytes allocated (and still held) by build(), and its result."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, result
+
+
+def in_memory_sessions(sessions, messages):
+    transcripts = []
+    for session_index in range(sessions):
+        transcript = Transcript()
+        for role, content in conversation(session_index, messages):
+            transcript.add(role, content)
+        transcripts.append(transcript)
+    return transcripts
+
+
+def stored_sessions(store, sessions, messages):
+    transcripts = []
+    for session_index in range(sessions):
+        transcript = store.transcript(store.create_session())
+        for role, content in conversation(session_index, messages):
+            transcript.add(role, content)
+        transcripts.append(transcript)
+    return transcripts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000, help="active sessions")
+    parser.add_argument("--messages", type=int, default=40, help="messages per conversation")
+    parser.add_argument("--hot-window", type=int, default=conversations.DEFAULT_HOT_WINDOW)
+    args = parser.parse_args()
+
+    before_bytes, transcripts = measure(lambda: in_memory_sessions(args.sessions, args.messages))
+    del transcripts
+
+    with tempfile.TemporaryDirectory() as directory:
+        now = [time.time()]
+        store = conversations.ConversationStore(os.path.join(directory, "conversations.sqlite3"),
+                                                hot_window=args.hot_window, clock=lambda: now[0])
+        start = time.perf_counter()
+        after_bytes, transcripts = measure(lambda: stored_sessions(store, args.sessions, args.messages))
+        build_s = time.perf_counter() - start
+        database_bytes = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        )
+
+        append_us = []
+        for transcript in transcripts[:200]:
+            start = time.perf_counter()
+            transcript.add("user", USER_MESSAGE)
+            append_us.append((time.perf_counter() - start) * 1e6)
+
+        # Resume: once idle sessions are evicted, their window is read back from SQLite
+        now[0] += store.idle_seconds
+        store.evict_idle()
+        resume_us, page_us = [], []
+        for transcript in transcripts[:200]:
+            start = time.perf_counter()
+            resumed = store.open(transcript.token)
+            resume_us.append((time.perf_counter() - start) * 1e6)
+            start = time.perf_counter()
+            resumed[0:args.messages // 2]
+            page_us.append((time.perf_counter() - start) * 1e6)
+        store.close()
+
+    per_thousand = 1000 / args.sessions
+    print(f"{args.sessions} sessions x {args.messages} messages, hot window {args.hot_window}")
+    print(f"  in-memory Transcript   {before_bytes * per_thousand / 2**20:8.1f} MiB per 1,000 sessions")
+    print(f"  SQLite store (memory)  {after_bytes * per_thousand / 2**20:8.1f} MiB per 1,000 sessions "
+          f"({after_bytes / before_bytes:.0%})")
+    print(f"  SQLite store (disk)    {database_bytes * per_thousand / 2**20:8.1f} MiB per 1,000 sessions")
+    print(f"  building the store     {build_s:8.2f} s ({build_s / (args.sessions * args.messages) * 1e6:.0f} us per append)")
+    print(f"  append                 p50 {statistics.median(append_us):6.0f} us")
+    print(f"  resume evicted session p50 {statistics.median(resume_us):6.0f} us")
+    print(f"  page in {args.messages // 2} old turns    p50 {statistics.median(page_us):6.0f} us")
+
+
+if __name__ == "__main__":
+    main()
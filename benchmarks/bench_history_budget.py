@@ -0,0 +1,66 @@
+"""Prompt tokens per turn with and without the history manager.
+
+Replays a synthetic 50-turn conversation through build_prompt_messages,
+once with the full transcript and once with a ConversationMemory, and
+prints the estimated prompt tokens of every fifth turn:
+
+    python benchmarks/bench_history_budget.py [turns]
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp.history import ConversationMemory
+from enstp.prompt import build_prompt_messages
+from enstp.text import estimate_tokens
+from enstp.transcript import Transcript
+
+STUDENT_LINES = [
+    "J'ai bien aimé les maths en prépa, surtout l'analyse et les probabilités.",
+    "Qu'est-ce qu'on étudie dans le module Béton Précontraint ?",
+    "Je m'intéresse beaucoup aux chemins de fer et aux ponts ferroviaires.",
+    "Est-ce que le DIB a beaucoup de stages sur le terrain ?",
+    "Je préfère comprendre les mécanismes en détail plutôt que la vue d'ensemble.",
+    "Quels sont les débouchés du DMS à l'international ?",
+    "La charge de travail est-elle plus lourde en DMS ou en DIB ?",
+    "Parlez-moi de l'option Tunnels.",
+]
+ADVISOR_REPLY = (
+    "D'accord, je vois. C'est une information utile pour la suite. "
+    "Le guide indique que ce point est traité différemment selon le département: "
+    "le DMS approfondit l'analyse des structures et le comportement des matériaux, "
+    "tandis que le DIB privilégie une vision d'ensemble des réseaux d'infrastructure. "
+) * 4 + "Pouvez-vous me dire ce qui vous attire le plus dans ce domaine ?"
+
+
+def prompt_tokens(student_input, history, memory=None):
+    # No prompt budget: this measures what the history alone adds
+    messages = build_prompt_messages(student_input, history, history_memory=memory, token_budget=10**9)
+    return estimate_tokens(messages[0]["parts"][0])
+
+
+def main():
+    logging.disable(logging.INFO)
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    memory = ConversationMemory()
+    history = Transcript([{"role": "assistant", "content": "Bonjour ! Comment vous sentez-vous à l'approche de ce choix ?"}])
+    totals = [0, 0]
+    print(f"{'turn':>4} {'full history':>13} {'managed':>8}")
+    for turn in range(1, turns + 1):
+        student_input = STUDENT_LINES[turn % len(STUDENT_LINES)]
+        full = prompt_tokens(student_input, history)
+        managed = prompt_tokens(student_input, history, memory)
+        totals[0] += full
+        totals[1] += managed
+        if turn == 1 or turn % 5 == 0:
+            print(f"{turn:>4} {full:>13} {managed:>8}")
+        history.add("user", student_input)
+        history.add("assistant", ADVISOR_REPLY)
+    print(f"total prompt tokens over {turns} turns: full {totals[0]}, managed {totals[1]} "
+          f"({100 * (1 - totals[1] / totals[0]):.0f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Knowledge base compile time and lookup latency per query kind.
+
+Lookup questions are answered from the compiled guide as tables; other
+questions must be rejected quickly since every turn goes through the
+lookup before reaching the LLM.
+
+    python benchmarks/bench_knowledge_lookup.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp.knowledge import KnowledgeBase, KnowledgeLookup
+
+QUESTIONS = [
+    "DMS vs DIB modules",
+    "What's in the Tunnels track?",
+    "Which labs are shared?",
+    "Quelles sont les options du DIB ?",
+    "C'est quoi le béton précontraint ?",
+    "Quels sont les stages ?",
+    "Quels laboratoires de recherche au DMS ?",
+    "Quels sont les débouchés du DIB ?",
+    # Not lookups: must go to the LLM
+    "Je suis perdu entre DMS et DIB, tu peux m'aider ?",
+    "Quelle est la différence entre DMS et DIB ?",
+    "Comment se passe la vie étudiante ?",
+    "Est-ce que les stages sont rémunérés ?",
+    "Quelles matières sont les plus difficiles au DMS ?",
+    "Quels sont les métiers les mieux payés ?",
+    "Y a-t-il des cours en anglais ?",
+]
+
+
+def main():
+    start = time.perf_counter()
+    knowledge_base = KnowledgeBase()
+    compile_ms = (time.perf_counter() - start) * 1000
+    lookup = KnowledgeLookup(knowledge_base)
+    print(f"Compiled {len(knowledge_base.modules)} modules, {len(knowledge_base.tracks)} tracks in {compile_ms:.1f} ms\n")
+    print(f"{'question':<52} {'answer':<14} {'median us':>10}")
+    for question in QUESTIONS:
+        timings = []
+        for _ in range(300):
+            start = time.perf_counter()
+            answer = lookup.answer(question)
+            timings.append(time.perf_counter() - start)
+        kind = answer.kind if answer else "-> LLM"
+        print(f"{question:<52} {kind:<14} {statistics.median(timings) * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark: per-turn Gemini client setup, before and after the registry.
+
+Before: every turn ran genai.configure(...) and built a new GenerativeModel,
+which also made the SDK create a fresh gRPC client on the first request.
+After: every turn asks enstp.client for the shared model.
+
+No request is sent, so this runs offline with a dummy key:
+
+    python benchmarks/bench_model_registry.py [turns]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+from google.generativeai import client as genai_sdk_client
+from google.generativeai import types
+
+from enstp import client as gemini_client
+
+API_KEY = "benchmark-dummy-key"
+MODEL_NAME = "gemini-1.5-pro-latest"
+GENERATION_CONFIG = types.GenerationConfig(temperature=0.6, max_output_tokens=1536)
+
+
+def _attach_client(model):
+    # What generate_content does before sending its first request
+    if model._client is None:
+        model._client = genai_sdk_client.get_default_generative_client()
+
+
+def per_turn_before():
+    genai.configure(api_key=API_KEY)
+    model = genai.GenerativeModel(MODEL_NAME)
+    _attach_client(model)
+
+
+def per_turn_after():
+    model = gemini_client.get_model(API_KEY, MODEL_NAME, GENERATION_CONFIG)
+    _attach_client(model)
+
+
+def _time(fn, turns):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - start) / turns
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    before = _time(per_turn_before, turns)
+    gemini_client.invalidate()
+    after = _time(per_turn_after, turns)
+    print(f"turns: {turns}")
+    print(f"before (configure + new model): {before * 1e6:10.1f} us/turn")
+    print(f"after  (shared registry):       {after * 1e6:10.1f} us/turn")
+    print(f"speed-up: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
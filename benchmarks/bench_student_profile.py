@@ -0,0 +1,63 @@
+"""Per-turn cost of the DMS/DIB profile: incremental vs. re-reading the history.
+
+The incremental profile reads only the new student message; re-scanning
+reads every student message so far. The first stays flat as the
+conversation grows, the second grows linearly.
+
+    python benchmarks/bench_student_profile.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp.student_profile import StudentProfile
+
+MESSAGES = [
+    "J'aime beaucoup la résistance des matériaux et le calcul de structures.",
+    "Par contre je suis moins à l'aise en hydraulique.",
+    "Quels sont les débouchés du DMS ?",
+    "Je préfère le travail sur le terrain plutôt qu'au bureau.",
+    "Je veux construire des ponts ferroviaires et travailler sur des ports.",
+    "I enjoy programming and structural analysis software.",
+    "Je n'aime pas trop la théorie, je préfère le concret.",
+    "Merci, je pense que le DMS me correspond.",
+]
+SIZES = [1, 10, 100, 1000]
+REPEATS = 50
+
+
+def _median_us(function):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    print(f"{'student messages so far':>24} {'incremental us':>15} {'re-scan us':>12}")
+    for size in SIZES:
+        history = [MESSAGES[index % len(MESSAGES)] for index in range(size)]
+        profile = StudentProfile()
+        for message in history[:-1]:
+            profile.observe(message)
+
+        def incremental():
+            profile.observe(history[-1])
+            profile.summary()
+
+        def rescan():
+            fresh = StudentProfile()
+            for message in history:
+                fresh.observe(message)
+            fresh.summary()
+
+        print(f"{size:>24} {_median_us(incremental):>15.1f} {_median_us(rescan):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Per-turn history handling cost: rebuilt message list vs. Transcript.
+
+Before: each turn copied st.session_state.messages into history_for_api
+(handling the "content" and "parts" formats), then get_enstp_response
+formatted and joined every turn again.
+After: each message is normalized and formatted once when appended, and
+the turn works on an O(1) snapshot of the transcript. Embedding the full
+history still copies it into the prompt; with a ConversationMemory only
+the recent window is read, so the cost stays flat.
+
+    python benchmarks/bench_transcript.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp.history import ConversationMemory
+from enstp.transcript import Transcript
+
+REPLY = "Le DMS approfondit l'analyse des structures et des matériaux. " * 6
+
+
+def turn_before(messages, prompt):
+    messages.append({"role": "user", "content": prompt})
+    history_for_api = []
+    for msg in messages[:-1]:
+        if "content" in msg:
+            content = msg["content"]
+        elif "parts" in msg and msg["parts"]:
+            content = msg["parts"][0]
+        else:
+            content = "Error: No content found in message"
+        history_for_api.append({"role": msg["role"], "content": content})
+    formatted = "\n".join(
+        f"{'Étudiant' if turn['role'] == 'user' else 'Conseiller ENSTP'}: {turn['content']}"
+        for turn in history_for_api
+    ).strip()
+    messages.append({"role": "assistant", "content": REPLY})
+    return formatted
+
+
+def turn_after(transcript, prompt):
+    history_for_api = transcript.snapshot()
+    transcript.add("user", prompt)
+    formatted = history_for_api.formatted.strip()
+    transcript.add("assistant", REPLY)
+    return formatted
+
+
+def turn_after_managed(state, prompt):
+    transcript, memory = state
+    history_for_api = transcript.snapshot()
+    transcript.add("user", prompt)
+    formatted = memory.render(history_for_api)
+    transcript.add("assistant", REPLY)
+    return formatted
+
+
+def _per_turn(turn_fn, container, size, repeats=200):
+    for index in range(size):
+        turn_fn(container, f"Question {index} sur le DMS et le DIB ?")
+    start = time.perf_counter()
+    for index in range(repeats):
+        turn_fn(container, f"Question {index} sur le DMS et le DIB ?")
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    print(f"{'turns':>6} {'before':>10} {'after':>10} {'after+memory':>13}  (us/turn)")
+    for size in (10, 100, 1000):
+        before = _per_turn(turn_before, [], size)
+        after = _per_turn(turn_after, Transcript(), size)
+        managed = _per_turn(turn_after_managed, (Transcript(), ConversationMemory()), size)
+        print(f"{size:>6} {before * 1e6:>10.1f} {after * 1e6:>10.1f} {managed * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Vector index build/load time, query latency and recall against BM25.
+
+Builds the LSA index from scratch, saves it, memory-maps it back (what a
+cold start or a second worker does), then times queries and measures
+recall@k of BM25, vector and hybrid retrieval on a small set of loosely
+phrased student questions labelled with the guide sections that answer
+them.
+
+    python benchmarks/bench_vector_index.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import retrieval
+from enstp import vectors
+
+K = 3
+
+# Question -> sections any of which answers it
+LABELLED_QUESTIONS = [
+    ("je veux construire des ponts ferroviaires", {"5.3.2"}),
+    ("j'aimerais travailler sur les voies de chemin de fer", {"5.3.2", "12.3.2", "9.1.3"}),
+    ("je rêve de concevoir des aéroports", {"5.3.2", "12.3.2", "6.3.2"}),
+    ("les ports et la mer m'intéressent", {"5.3.2", "6.2.2", "6.3.2"}),
+    ("creuser sous les montagnes, c'est dans quel département ?", {"5.3.1"}),
+    ("les tremblements de terre et la résistance des immeubles", {"7.1.1", "6.3.1", "12.3.1"}),
+    ("je suis fort en maths et très rigoureux", {"12.1.1"}),
+    ("je préfère avoir une vision globale des systèmes", {"12.1.2", "12.2.2"}),
+    ("quels stages faut-il faire chaque année ?", {"6.1"}),
+    ("où travaillent les diplômés du DMS ?", {"9.1.2"}),
+    ("que deviennent les anciens du DIB ?", {"9.1.3", "9.2"}),
+    ("peut-on créer sa propre entreprise après l'école ?", {"9.3"}),
+    ("quels labos de recherche pour les structures ?", {"7.1.1"}),
+    ("y a-t-il des échanges avec des universités étrangères ?", {"11.1", "11.2"}),
+    ("combien d'heures de cours par semaine ?", {"10.3"}),
+    ("le béton et l'acier, on les étudie où ?", {"4.2"}),
+    ("les cours de droit et de gestion de projet", {"4.3", "5.4.2"}),
+    ("quelles sorties sur chantier pendant les études ?", {"6.2.1", "6.2.2"}),
+    ("sujets de projet de fin d'études au DIB", {"6.3.2"}),
+    ("le master recherche en matériaux", {"5.4.1"}),
+    ("transport urbain et planification des villes", {"2.2", "9.1.3", "12.3.2", "7.1.2"}),
+    ("les nouvelles technologies comme le BIM", {"13.1.1", "13.1.2", "13.2"}),
+    ("qui sont les professeurs ?", {"8.1", "8.1.1", "8.1.2", "8.2"}),
+    ("le diplôme est-il reconnu ?", {"3.2"}),
+    # Exact module names, where keyword matching is strongest
+    ("TP GTR", {"5.2"}),
+    ("module Contreventments", {"5.3.1"}),
+    ("Esquisse TM", {"5.3.2"}),
+    ("Rhéologie des matériaux", {"5.4.2"}),
+    ("Calcul Automatique des structures", {"5.1"}),
+    ("Méthode des éléments finis", {"4.2"}),
+]
+
+
+def recall_at_k(index, k=K):
+    hits = 0
+    for question, expected in LABELLED_QUESTIONS:
+        found = {section.number for _, section in index.search(question, k)}
+        hits += bool(found & expected)
+    return hits / len(LABELLED_QUESTIONS)
+
+
+def query_latency(index, repeats=20):
+    timings = []
+    for _ in range(repeats):
+        for question, _ in LABELLED_QUESTIONS:
+            start = time.perf_counter()
+            index.search(question, K)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        built = vectors.load_or_build(directory)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        mapped = vectors.load_or_build(directory)
+        load_ms = (time.perf_counter() - start) * 1000
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+        print(f"Build + save: {build_ms:.0f} ms; memory-mapped load: {load_ms:.1f} ms; "
+              f"{built.chunk_vectors.shape[0]} chunks x {built.components.shape[0]} components, {size / 2**20:.1f} MiB on disk\n")
+
+        indexes = {
+            "bm25": retrieval.GUIDE_INDEX,
+            "vector": mapped,
+            "hybrid": vectors.HybridIndex(retrieval.GUIDE_INDEX, mapped),
+        }
+        print(f"{'index':<8} {f'recall@{K}':>9} {'p50 us':>9} {'p95 us':>9}")
+        for name, index in indexes.items():
+            p50, p95 = query_latency(index)
+            print(f"{name:<8} {recall_at_k(index):>9.0%} {p50 * 1e6:>9.0f} {p95 * 1e6:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
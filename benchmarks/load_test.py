@@ -0,0 +1,265 @@
+"""Concurrent-session load test of the advisor against the offline stub.
+
+Each simulated student runs a scripted multi-turn conversation through
+advisor.get_enstp_response with its own transcript and history memory,
+exactly like a Streamlit session; only the LLM is replaced by
+StubBackend. Reports turn latency percentiles, throughput, prompt tokens
+per turn and peak RSS, and writes them to a JSON file:
+
+    python benchmarks/load_test.py --sessions 50 --output load.json
+    python benchmarks/load_test.py --sessions 50 --compare load.json
+
+The Gemini quotas are lifted by default (--rpm/--tpm) so the numbers
+measure this process, not the quota queue. --keys spreads the turns over
+a pool of fake API keys, each limited by the stub to --key-rpm requests
+per minute and model:
+
+    python benchmarks/load_test.py --keys 3 --key-rpm 30 --rpm 30
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import advisor
+from enstp import backends
+from enstp import history
+from enstp import language
+from enstp import student_profile
+from enstp.transcript import Transcript
+
+WELCOME_MESSAGE = advisor.WELCOME_MESSAGE
+
+SCRIPTS = [
+    [
+        "Bonjour, je suis un peu perdu entre DMS et DIB.",
+        "J'aime beaucoup la résistance des matériaux et le calcul de structures.",
+        "Par contre je suis moins à l'aise en hydraulique.",
+        "Quels sont les débouchés du DMS ?",
+        "Et les stages en deuxième année, ça se passe comment ?",
+        "Est-ce que je pourrais travailler sur des ponts plus tard ?",
+        "Merci, je pense que le DMS me correspond.",
+    ],
+    [
+        "Salut ! Je veux travailler dans les routes et les barrages.",
+        "Quelles matières sont enseignées au DIB ?",
+        "J'ai eu de bonnes notes en topographie et en géotechnique.",
+        "Le projet de fin d'études se fait en entreprise ?",
+        "Quels logiciels utilise-t-on au DIB ?",
+        "D'accord, et le DMS alors, c'est très différent ?",
+    ],
+    [
+        "Hello, can you answer in English please?",
+        "What are the main differences between DMS and DIB?",
+        "I enjoy programming and structural analysis software.",
+        "Which department has more job opportunities abroad?",
+        "What about the workload in the third year?",
+        "Thanks, that helps a lot.",
+    ],
+    [
+        "Je n'arrive pas à me décider, mes notes sont moyennes partout.",
+        "Je préfère le travail sur le terrain plutôt qu'au bureau.",
+        "Parle-moi des métiers du DIB.",
+        "Et est-ce que le DMS mène aussi à des chantiers ?",
+        "Quelles compétences faut-il pour réussir au DMS ?",
+        "Je crois que j'hésite encore, tu peux résumer ?",
+        "Quels sont les débouchés du DMS ?",
+        "Merci beaucoup !",
+    ],
+]
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_session(session_index, script, args, results, lock):
+    """One student: sends the script's messages one by one, with think time."""
+    rng = random.Random(args.seed * 1000 + session_index)
+    session_id = f"load-{session_index}"
+    messages = Transcript([{"role": "assistant", "content": WELCOME_MESSAGE}])
+    memory = history.ConversationMemory(
+        token_budget=advisor.HISTORY_TOKEN_BUDGET, recent_messages=advisor.HISTORY_RECENT_MESSAGES
+    )
+    response_language = language.current_language(messages)
+    profile = student_profile.StudentProfile()
+    time.sleep(rng.uniform(0, args.ramp_up))
+    for turn_index, student_input in enumerate(script):
+        history_for_api = messages.snapshot()
+        messages.add("user", student_input)
+        response_language = language.requested_language(student_input) or response_language
+        profile.observe(student_input)
+        turn_info = {}
+        start = time.perf_counter()
+        response_text = advisor.get_enstp_response(
+            student_input, history_for_api, memory, response_language,
+            session_id=session_id, turn_info=turn_info, profile=profile,
+        )
+        latency = time.perf_counter() - start
+        messages.add("assistant", response_text)
+        usage = turn_info.get("usage")
+        with lock:
+            results.append({
+                "session": session_index,
+                "turn": turn_index,
+                "latency": latency,
+                "prompt_tokens": usage.prompt_tokens if usage else None,
+                "model": turn_info.get("model"),
+                "error": usage is None,
+            })
+        if turn_index < len(script) - 1:
+            time.sleep(rng.uniform(0.5, 1.5) * args.think_time)
+
+
+def summarize(turns, wall_time, args, baseline_rss, peak_rss):
+    latencies = [turn["latency"] for turn in turns]
+    model_latencies = [turn["latency"] for turn in turns if not turn["error"]]
+    prompt_tokens = [turn["prompt_tokens"] for turn in turns if turn["prompt_tokens"] is not None]
+    return {
+        "turns": len(turns),
+        "model_calls": len(model_latencies),
+        # Cached answers and error messages never reach the model
+        "served_without_model": len(turns) - len(model_latencies),
+        "wall_time_s": round(wall_time, 3),
+        "throughput_turns_per_s": round(len(turns) / wall_time, 3),
+        "latency_s": {
+            "mean": round(statistics.fmean(latencies), 4),
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4),
+        },
+        "prompt_tokens_per_turn": {
+            "mean": round(statistics.fmean(prompt_tokens), 1) if prompt_tokens else None,
+            "p95": round(percentile(prompt_tokens, 95), 1) if prompt_tokens else None,
+            "max": max(prompt_tokens) if prompt_tokens else None,
+        },
+        "rss_bytes": {
+            "baseline": baseline_rss,
+            "peak": peak_rss,
+            "peak_per_session": round((peak_rss - baseline_rss) / args.sessions),
+        },
+    }
+
+
+def compare(current, previous):
+    """Prints the relative change of the headline numbers against a previous run."""
+    rows = [
+        ("p50 latency", ("latency_s", "p50")),
+        ("p95 latency", ("latency_s", "p95")),
+        ("p99 latency", ("latency_s", "p99")),
+        ("throughput", ("throughput_turns_per_s",)),
+        ("prompt tokens/turn", ("prompt_tokens_per_turn", "mean")),
+        ("peak RSS/session", ("rss_bytes", "peak_per_session")),
+    ]
+    print(f"\nCompared with {previous.get('revision') or 'previous run'}:")
+    for label, path in rows:
+        old, new = previous["results"], current["results"]
+        for key in path:
+            old, new = old.get(key) if old else None, new.get(key) if new else None
+        if not old or new is None:
+            continue
+        print(f"  {label:<20} {old:>12} -> {new:<12} ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="simultaneous students")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between turns (s)")
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="stub time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="stub generation speed")
+    parser.add_argument("--output-tokens", type=int, default=180, help="stub answer length")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of stub calls failing with a quota error")
+    parser.add_argument("--rpm", type=int, default=1_000_000, help="quota queue requests per minute")
+    parser.add_argument("--tpm", type=int, default=1_000_000_000, help="quota queue tokens per minute")
+    parser.add_argument("--keys", type=int, default=1, help="API keys in the pool")
+    parser.add_argument("--key-rpm", type=int, default=0, help="stub quota per key and model (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_test_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results to compare with")
+    args = parser.parse_args()
+
+    advisor.configure(backend=backends.StubBackend(
+        seed=args.seed, latency=args.latency, tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens, rate_limit_rate=args.rate_limit_rate,
+        key_requests_per_minute=args.key_rpm,
+    ), api_keys=[(f"load-test-key-{index}", 1.0) for index in range(args.keys)])
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = args.rpm, args.tpm
+
+    baseline_rss = peak_rss_bytes()
+    turns, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=run_session, args=(index, SCRIPTS[index % len(SCRIPTS)], args, turns, lock),
+                         name=f"session-{index}")
+        for index in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": summarize(turns, wall_time, args, baseline_rss, peak_rss_bytes()),
+        "api_keys": advisor.get_key_pool().snapshot(),
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+    results = report["results"]
+    print(f"{args.sessions} sessions, {results['turns']} turns in {results['wall_time_s']:.1f}s "
+          f"({results['throughput_turns_per_s']:.1f} turns/s, {results['served_without_model']} without a model call)")
+    print("Turn latency: " + ", ".join(f"{name} {value * 1000:.0f} ms" for name, value in results["latency_s"].items()))
+    print(f"Prompt tokens per turn: mean {results['prompt_tokens_per_turn']['mean']}, "
+          f"p95 {results['prompt_tokens_per_turn']['p95']}, max {results['prompt_tokens_per_turn']['max']}")
+    print(f"Peak RSS {results['rss_bytes']['peak'] / 2**20:.1f} MiB "
+          f"(~{results['rss_bytes']['peak_per_session'] / 2**10:.0f} KiB per session)")
+    if args.keys > 1:
+        print("API keys: " + ", ".join(f"{key['key']} {key['requests']} requests ({key['exhausted']} quota errors)"
+                                       for key in report["api_keys"]))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous:
+            compare(report, json.load(previous))
+
+
+if __name__ == "__main__":
+    main()
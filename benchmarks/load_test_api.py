@@ -0,0 +1,114 @@
+"""Concurrent-session load test of the HTTP API (enstp.api) against the offline stub.
+
+Starts the API in this process on a free port, with a temporary
+conversation store, then runs the scripted conversations of load_test.py
+over HTTP: each simulated student creates a session and streams its
+turns over Server-Sent Events. Reports time to first chunk, turn latency,
+throughput and the turns refused with 503 (worker pool full):
+
+    python benchmarks/load_test_api.py --sessions 50 --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from werkzeug.serving import make_server
+
+from enstp import advisor
+from enstp import api
+from enstp import backends
+from enstp import conversations
+from load_test import SCRIPTS, percentile
+
+
+def stream_turn(base_url, session, message):
+    """(seconds to first chunk, total seconds, status) of one streamed turn."""
+    start = time.perf_counter()
+    first_chunk = None
+    with requests.post(f"{base_url}/api/sessions/{session}/turns", json={"message": message},
+                       headers={"Accept": "text/event-stream"}, stream=True, timeout=300) as response:
+        if response.status_code != 200:
+            return None, time.perf_counter() - start, response.status_code
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            elif line.startswith("data: ") and event == "error":
+                return first_chunk, time.perf_counter() - start, json.loads(line[len("data: "):])["error"]
+    return first_chunk, time.perf_counter() - start, 200
+
+
+def run_session(index, base_url, args, turns, lock):
+    rng = random.Random(args.seed * 1000 + index)
+    time.sleep(rng.uniform(0, args.ramp_up))
+    session = requests.post(f"{base_url}/api/sessions", timeout=30).json()["session"]
+    for message in SCRIPTS[index % len(SCRIPTS)]:
+        first_chunk, total, status = stream_turn(base_url, session, message)
+        with lock:
+            turns.append({"first_chunk": first_chunk, "total": total, "status": status})
+        time.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50, help="simultaneous students")
+    parser.add_argument("--workers", type=int, default=api.DEFAULT_WORKERS, help="API worker pool size")
+    parser.add_argument("--max-pending", type=int, default=api.DEFAULT_MAX_PENDING, help="turns admitted at once")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between turns (s)")
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="stub time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="stub generation speed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    advisor.configure(backend=backends.StubBackend(seed=args.seed, latency=args.latency,
+                                                   tokens_per_second=args.tokens_per_second))
+    # Quotas lifted: this measures the API, not the quota queue
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = 1_000_000, 1_000_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        store = conversations.ConversationStore(os.path.join(directory, "conversations.sqlite3"))
+        service = api.AdvisorService(store, workers=args.workers, max_pending=args.max_pending)
+        server = make_server("127.0.0.1", 0, api.create_app(service), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        turns, lock = [], threading.Lock()
+        threads = [threading.Thread(target=run_session, args=(index, base_url, args, turns, lock))
+                   for index in range(args.sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+        server.shutdown()
+        service.shutdown()
+        store.close()
+
+    served = [turn for turn in turns if turn["status"] == 200]
+    first_chunks = [turn["first_chunk"] for turn in served if turn["first_chunk"] is not None]
+    totals = [turn["total"] for turn in served]
+    refused = sum(1 for turn in turns if turn["status"] == 503)
+    print(f"{args.sessions} sessions, {args.workers} workers: {len(served)} turns served, {refused} refused (503), "
+          f"{len(turns) - len(served) - refused} failed, in {wall_time:.1f}s ({len(served) / wall_time:.1f} turns/s)")
+    print("Time to first chunk: " + ", ".join(
+        f"p{pct} {percentile(first_chunks, pct) * 1000:.0f} ms" for pct in (50, 95, 99)) if first_chunks else "n/a")
+    print("Turn latency: " + ", ".join(f"p{pct} {percentile(totals, pct) * 1000:.0f} ms" for pct in (50, 95, 99))
+          + f", mean {statistics.fmean(totals) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Cold start profile of app.py: import-time breakdown and time to first frame.
+
+Each run is a fresh interpreter (like a new Streamlit Cloud container)
+started with -X importtime. It renders app.py once with Streamlit's
+AppTest harness (the first frame a student sees), then once more (a
+rerun, which every widget interaction triggers):
+
+    python benchmarks/profile_startup.py --runs 5 --output startup.json
+    python benchmarks/profile_startup.py --runs 5 --compare startup.json
+
+The Gemini backend is profiled with a placeholder key if GOOGLE_API_KEY
+is unset: startup must not call the API, so the key is never used.
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter; prints its timings as one JSON line
+CHILD_SCRIPT = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+harness_ready = time.perf_counter()
+app = AppTest.from_file(sys.argv[2], default_timeout=120)
+app.run()
+first_frame = time.perf_counter()
+exceptions = [str(exception.value) for exception in app.exception]
+app.run()
+rerun_done = time.perf_counter()
+print(json.dumps({
+    "harness_import_s": harness_ready - start,
+    "first_run_s": first_frame - harness_ready,
+    "rerun_s": rerun_done - first_frame,
+    "first_frame_epoch": time.time() - (rerun_done - first_frame),
+    "exceptions": exceptions,
+}))
+"""
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=REPO_ROOT,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_breakdown(stderr):
+    """Cumulative import seconds of each top-level import, grouped by package (enstp by module)."""
+    totals = collections.Counter()
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match and not match.group(3):
+            name = match.group(4)
+            totals[name if name.startswith("enstp.") else name.split(".")[0]] += int(match.group(2)) / 1e6
+    return totals
+
+
+def profile_once(backend):
+    env = dict(os.environ, ENSTP_LLM_BACKEND=backend)
+    env.setdefault("GOOGLE_API_KEY", "profile-startup-placeholder")
+    spawned = time.time()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT, REPO_ROOT, os.path.join(REPO_ROOT, "app.py")],
+        capture_output=True, text=True, env=env, cwd=REPO_ROOT, check=True,
+    )
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    if timings["exceptions"]:
+        raise RuntimeError(f"app.py raised during startup: {timings['exceptions']}")
+    timings["time_to_first_frame_s"] = timings.pop("first_frame_epoch") - spawned
+    timings["imports_s"] = import_breakdown(completed.stderr)
+    return timings
+
+
+def summarize(runs, top):
+    medians = {
+        name: round(statistics.median(run[name] for run in runs), 4)
+        for name in ("time_to_first_frame_s", "harness_import_s", "first_run_s", "rerun_s")
+    }
+    packages = collections.Counter()
+    for run in runs:
+        packages.update(run["imports_s"])
+    imports = {
+        package: round(statistics.median(run["imports_s"].get(package, 0.0) for run in runs), 4)
+        for package, _ in packages.most_common(top)
+    }
+    return {**medians, "imports_s": imports}
+
+
+def compare(current, previous):
+    """Prints the relative change of the startup timings against a previous run."""
+    print(f"\nCompared with {previous.get('revision') or 'previous run'}:")
+    old, new = previous["results"], current["results"]
+    for name in ("time_to_first_frame_s", "first_run_s", "rerun_s"):
+        if old.get(name):
+            print(f"  {name:<24} {old[name] * 1000:>8.0f} ms -> {new[name] * 1000:<8.0f} ms "
+                  f"({(new[name] - old[name]) / old[name]:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start (medians are reported)")
+    parser.add_argument("--backend", default="gemini", help="ENSTP_LLM_BACKEND of the profiled app")
+    parser.add_argument("--top", type=int, default=12, help="packages listed in the import breakdown")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results to compare with")
+    args = parser.parse_args()
+
+    runs = [profile_once(args.backend) for _ in range(args.runs)]
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": summarize(runs, args.top),
+    }
+    results = report["results"]
+    print(f"Median of {args.runs} cold starts ({args.backend} backend):")
+    print(f"  time to first frame      {results['time_to_first_frame_s'] * 1000:8.0f} ms  (interpreter start to first render)")
+    print(f"  test harness import      {results['harness_import_s'] * 1000:8.0f} ms  (streamlit itself, paid by any app)")
+    print(f"  first run of app.py      {results['first_run_s'] * 1000:8.0f} ms  (app imports + first render)")
+    print(f"  rerun of app.py          {results['rerun_s'] * 1000:8.0f} ms  (every interaction)")
+    print("\nImport time per top-level import (cumulative; enstp modules listed separately):")
+    for package, seconds in results["imports_s"].items():
+        print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous:
+            compare(report, json.load(previous))
+
+
+if __name__ == "__main__":
+    main()
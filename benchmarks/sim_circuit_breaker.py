@@ -0,0 +1,139 @@
+"""Advisor turns through an API outage, with and without the circuit breaker.
+
+Simulated students send questions in a loop to the stub backend, which
+stalls then fails every call (ServiceUnavailable) between two instants.
+Timings are scaled down (outage of a few seconds, breaker open for 1 s)
+so each run takes about ten seconds. For each phase (before, during,
+after the outage) it reports turns served, throughput, latency and
+answers quoted from the guide, then how long the model took to serve
+turns again once the outage was over:
+
+    python benchmarks/sim_circuit_breaker.py --sessions 16
+"""
+import argparse
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp import advisor
+from enstp import backends
+from enstp import breaker
+from enstp import fallback
+from enstp import ratelimit
+from load_test import percentile
+
+QUESTIONS = [
+    "Quelle est la différence entre le DMS et le DIB pour les ponts ?",
+    "Est-ce que le DIB prépare aux métiers des chemins de fer ?",
+    "Quels stages sont proposés en troisième année ?",
+    "Le module Béton Précontraint est-il difficile ?",
+    "Quels sont les débouchés à l'international ?",
+]
+
+
+class OutageBackend(backends.StubBackend):
+    """Stub whose calls stall then fail between outage_start and outage_end (seconds after start)."""
+
+    def __init__(self, outage_start, outage_end, stall, **kwargs):
+        super().__init__(**kwargs)
+        self.outage_start = outage_start
+        self.outage_end = outage_end
+        self.stall = stall
+        self.started = time.perf_counter()
+
+    def _begin(self, model_name, prompt, api_key=None):
+        if self.outage_start <= time.perf_counter() - self.started < self.outage_end:
+            time.sleep(self.stall)
+            raise core_exceptions.ServiceUnavailable("Stub outage")
+        return super()._begin(model_name, prompt, api_key)
+
+
+def run(args, with_breaker):
+    backend = OutageBackend(args.outage_start, args.outage_end, args.stall, latency=f"fixed:{args.latency}",
+                            tokens_per_second=100_000)
+    advisor.configure(backend=backend)
+    advisor.BREAKER = breaker.CircuitBreaker(
+        window=10, minimum_calls=5, slow_call_seconds=args.slow_call, open_seconds=args.open_seconds,
+        # failure_rate above 1 never trips: the breaker is effectively off
+        failure_rate=breaker.DEFAULT_FAILURE_RATE if with_breaker else 2.0,
+    )
+    turns, lock = [], threading.Lock()
+    deadline = backend.started + args.duration
+
+    def student(index):
+        count = 0
+        while time.perf_counter() < deadline:
+            count += 1
+            # Numbered so that no answer comes from the shared answer cache
+            question = f"{QUESTIONS[(index + count) % len(QUESTIONS)]} (question {index}.{count})"
+            turn_info = {}
+            start = time.perf_counter()
+            advisor.get_enstp_response(question, [], session_id=f"student-{index}", turn_info=turn_info)
+            end = time.perf_counter()
+            with lock:
+                turns.append((start - backend.started, end - backend.started, end - start,
+                              bool(turn_info.get("degraded"))))
+
+    threads = [threading.Thread(target=student, args=(index,)) for index in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return turns, advisor.BREAKER.snapshot()
+
+
+def report(name, args, turns, breaker_state):
+    print(f"{name}:")
+    phases = (("before", 0.0, args.outage_start), ("outage", args.outage_start, args.outage_end),
+              ("after", args.outage_end, args.duration))
+    for phase, start, end in phases:
+        finished = [turn for turn in turns if start <= turn[1] < end]
+        latencies = [turn[2] for turn in finished]
+        degraded = sum(1 for turn in finished if turn[3])
+        latency = (f"p50 {percentile(latencies, 50) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms"
+                   if latencies else "n/a")
+        print(f"  {phase:>6}: {len(finished):4d} turns, {len(finished) / (end - start):6.1f} turns/s, {latency}, "
+              f"{degraded} from the guide")
+    # Recovered once no turn started after the outage is answered from the guide or fails
+    late = [turn[0] for turn in turns if turn[0] >= args.outage_end and (turn[3] or turn[2] > args.slow_call)]
+    recovery = f"{max(late) - args.outage_end:.2f}s" if late else "0.00s"
+    counters = collections.Counter({key: value for key, value in breaker_state.items() if isinstance(value, int)})
+    print(f"  recovered {recovery} after the outage; breaker {dict(counters) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16, help="simultaneous students")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of simulated traffic")
+    parser.add_argument("--outage-start", type=float, default=2.0)
+    parser.add_argument("--outage-end", type=float, default=6.0)
+    parser.add_argument("--stall", type=float, default=0.3, help="seconds before a failing call errors out")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub time to first token when healthy")
+    parser.add_argument("--slow-call", type=float, default=0.5, help="breaker slow call threshold (s)")
+    parser.add_argument("--open-seconds", type=float, default=1.0, help="breaker open time before a probe (s)")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    # Quotas lifted and local answers off: every turn needs the model
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = 1_000_000, 1_000_000_000
+    ratelimit.KNOWN_QUOTAS.clear()
+    advisor.INTENT_ROUTING = advisor.KNOWLEDGE_LOOKUP = False
+    # The chain's deadlines scaled down like the outage
+    advisor.MODEL_CHAIN = fallback.ModelChain(advisor.MODEL_CHAIN.model_names, attempts_per_model=2,
+                                              attempt_deadline=1.0, latency_slo=0.5,
+                                              base_backoff=0.05, max_backoff=0.2)
+    advisor.warm_up().join()
+    for name, with_breaker in (("without breaker", False), ("with breaker", True)):
+        turns, breaker_state = run(args, with_breaker)
+        report(name, args, turns, breaker_state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Suggested follow-ups answered ahead of the click, with and without prefetching.
+
+Simulates --students conversations of --turns questions. After each reply
+the student reads for a while (--read), then clicks one of the suggested
+questions (with probability --click-share, the likelier ones more often)
+or types a question of their own. Each turn streams from the offline
+stub. Reports the time to the answer of clicked suggestions, the share
+of them served from a speculative answer, and the upstream requests and
+tokens spent on speculative answers nobody clicked:
+
+    python benchmarks/sim_followup_prefetch.py --students 20 --turns 4
+"""
+import argparse
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import backends
+from enstp import followups
+from enstp import history
+from enstp import ratelimit
+from enstp import student_profile
+from enstp import telemetry
+from enstp.transcript import Transcript
+from load_test import percentile
+from sim_request_coalescing import CountingBackend
+
+OWN_QUESTIONS = [
+    "J'aime les ponts et le béton, est-ce que le DMS est fait pour moi ?",
+    "Je préfère organiser des projets de transport, le DIB me correspond-il ?",
+    "Est-ce que la géotechnique est importante au DMS ?",
+    "Le DIB travaille-t-il sur les aéroports ?",
+]
+
+
+def converse(index, args, rng, read_time, results, lock):
+    """One student's conversation, as app.py runs it."""
+    session_id = f"student-{index}"
+    messages = Transcript([{"role": "assistant", "content": advisor.WELCOME_MESSAGE}])
+    memory = history.ConversationMemory(token_budget=advisor.HISTORY_TOKEN_BUDGET,
+                                        recent_messages=advisor.HISTORY_RECENT_MESSAGES)
+    profile = student_profile.StudentProfile()
+    suggestions = followups.suggest(messages.snapshot(), "fr", profile, limit=advisor.FOLLOWUP_SUGGESTIONS)
+    advisor.prefetch_followups(suggestions, messages.snapshot(), memory, "fr", session_id=session_id, profile=profile)
+    for turn in range(args.turns):
+        time.sleep(read_time(rng))
+        clicked = rng.random() < args.click_share
+        if clicked:
+            message = rng.choices([s.text for s in suggestions], [s.score for s in suggestions])[0]
+        else:
+            message = f"{OWN_QUESTIONS[(index + turn) % len(OWN_QUESTIONS)]} ({index})"
+        history_for_api = messages.snapshot()
+        messages.add("user", message)
+        profile.observe(message)
+        timer = telemetry.TurnTimer(session_id, mode="stream")
+        turn_info = {}
+        start = time.perf_counter()
+        text = advisor.prefetched_answer(message, history_for_api, timer, session_id=session_id, turn_info=turn_info)
+        if text is not None:
+            answered = time.perf_counter() - start
+        else:
+            answered, chunks = None, []
+            for chunk in advisor.stream_enstp_response(message, history_for_api, memory, "fr", session_id=session_id,
+                                                       turn_info=turn_info, timer=timer, profile=profile):
+                if answered is None:
+                    answered = time.perf_counter() - start
+                chunks.append(chunk)
+            text = "".join(chunks)
+        messages.add("assistant", text)
+        with lock:
+            served = "joined" if turn_info.get("coalesced") else timer.fields.get("cache")
+            results.append((clicked, turn_info.get("intent"), served, answered))
+        suggestions = followups.suggest(messages.snapshot(), "fr", profile, limit=advisor.FOLLOWUP_SUGGESTIONS)
+        advisor.prefetch_followups(suggestions, messages.snapshot(), memory, "fr", session_id=session_id,
+                                   profile=profile)
+    # The student leaves: what is still prefetched is never used
+    advisor.PREFETCHER.evict_session(session_id)
+
+
+def run(args, prefetch):
+    backend = CountingBackend(seed=args.seed, latency=args.latency, tokens_per_second=args.tokens_per_second)
+    advisor.configure(backend=backend)
+    advisor.PREFETCH_FOLLOWUPS = prefetch
+    advisor.PREFETCH_PER_TURN = args.per_turn
+    advisor.PREFETCHER = followups.Prefetcher(workers=args.workers)
+    answer_cache.ANSWER_CACHE.clear()
+    read_time = backends.parse_latency(args.read)
+    results, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=converse, args=(index, args, random.Random(args.seed * 1000 + index), read_time,
+                                                results, lock))
+        for index in range(args.students)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    advisor.PREFETCHER.shutdown()
+    stats = advisor.PREFETCHER.snapshot()
+
+    # Suggestions the knowledge base answers are instant either way
+    clicks = [(cache, answered) for clicked, intent, cache, answered in results if clicked and not intent]
+    served = collections.Counter(cache for cache, _ in clicks)
+    print(f"{'with' if prefetch else 'without'} prefetching: {len(results)} turns, {len(clicks)} clicked suggestions "
+          f"for the model ({served.get('prefetch', 0)} from a speculative answer, {served.get('joined', 0)} following "
+          f"one in flight, {served.get('hit', 0)} from the answer cache), {backend.calls['requests']} upstream calls, ~{backend.calls['prompt_tokens']} prompt tokens")
+    latencies = [answered for _, answered in clicks if answered is not None]
+    print("  answered after: " + ", ".join(
+        f"p{pct} {percentile(latencies, pct) * 1000:.0f} ms" for pct in (50, 75, 95)))
+    if prefetch:
+        unused_tokens = stats.get("unused_prompt_tokens", 0) + stats.get("unused_output_tokens", 0)
+        print(f"  speculative requests: {stats.get('requests', 0)} sent, "
+              f"{stats.get('used', 0) + stats.get('joined', 0)} used "
+              f"({stats['hit_rate']:.0%}), {stats.get('unused_cached', 0)} unused but kept in the answer cache, "
+              f"{stats.get('unused', 0)} unused (~{unused_tokens} tokens wasted), "
+              f"{stats.get('skipped_busy', 0)} not started (workers busy), "
+              f"{stats.get('declined', 0)} declined (quota headroom)")
+    return backend.calls["requests"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--click-share", type=float, default=0.6, help="share of turns asking a suggested question")
+    parser.add_argument("--read", default="lognormal:3,0.5", help="reading time distribution (seconds)")
+    parser.add_argument("--workers", type=int, default=4, help="speculative requests at a time")
+    parser.add_argument("--per-turn", type=int, default=advisor.PREFETCH_PER_TURN, help="suggestions prefetched per reply")
+    parser.add_argument("--rpm", type=int, default=600, help="primary model requests per minute")
+    parser.add_argument("--latency", default="lognormal:0.6,0.4", help="stub time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="stub generation speed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # A paid-tier quota: on the free tier's 2 RPM nothing is prefetched
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = args.rpm, 4_000_000
+    ratelimit.KNOWN_QUOTAS.clear()
+    advisor.warm_up().join()
+    without = run(args, prefetch=False)
+    with_prefetch = run(args, prefetch=True)
+    print(f"Extra upstream calls for prefetching: {with_prefetch - without} ({with_prefetch / without - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
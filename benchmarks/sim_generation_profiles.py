@@ -0,0 +1,155 @@
+"""Latency and output tokens per kind of turn, with and without generation profiles.
+
+Replays the load test conversations (plus one asking for a
+recommendation outright) from --students concurrent sessions, streaming
+every turn from the offline stub. The stub answers with up to
+--output-tokens tokens, capped by each profile's max_output_tokens; the
+chain's last model is given a faster first token and generation pace
+(--fast-latency, --fast-tokens-per-second), since the stub itself makes
+no difference between models. Turns are grouped by the profile
+generation.select() gives them, whether or not profiles are on; turns
+answered locally or from the answer cache are left out:
+
+    python benchmarks/sim_generation_profiles.py --students 20
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import backends
+from enstp import generation
+from enstp import history
+from enstp import language
+from enstp import ratelimit
+from enstp import student_profile
+from enstp import telemetry
+from enstp.transcript import Transcript
+from load_test import SCRIPTS, percentile
+
+RECOMMENDATION_SCRIPT = [
+    "Bonjour, j'hésite entre le DMS et le DIB.",
+    "J'adore le calcul de structures et la résistance des matériaux.",
+    "Je préfère le bureau d'études au chantier.",
+    "Quel département me recommandez-vous ?",
+]
+
+
+class PerModelStub(backends.LLMBackend):
+    """Stub answering each model with its own StubBackend (speed)."""
+
+    name = "stub"
+
+    def __init__(self, stubs, default):
+        self._stubs = stubs
+        self._default = default
+
+    def _stub(self, model_name):
+        return self._stubs.get(model_name, self._default)
+
+    def generate(self, model_name, prompt, generation_config=None, api_key=None):
+        return self._stub(model_name).generate(model_name, prompt, generation_config, api_key=api_key)
+
+    def stream(self, model_name, prompt, generation_config=None, api_key=None):
+        return self._stub(model_name).stream(model_name, prompt, generation_config, api_key=api_key)
+
+
+def converse(index, script, args, recorder, results, lock):
+    """One student working through a script, as app.py runs it."""
+    rng = random.Random(args.seed * 1000 + index)
+    session_id = f"student-{index}"
+    messages = Transcript([{"role": "assistant", "content": advisor.WELCOME_MESSAGE}])
+    memory = history.ConversationMemory(token_budget=advisor.HISTORY_TOKEN_BUDGET,
+                                        recent_messages=advisor.HISTORY_RECENT_MESSAGES)
+    profile = student_profile.StudentProfile()
+    response_language = language.current_language(messages)
+    time.sleep(rng.uniform(0, args.ramp_up))
+    for message in script:
+        history_for_api = messages.snapshot()
+        messages.add("user", message)
+        response_language = language.requested_language(message) or response_language
+        profile.observe(message)
+        kind = generation.select(message, profile, advisor.RECOMMEND_AFTER_EVIDENCE)
+        timer = telemetry.TurnTimer(session_id, mode="stream")
+        turn_info = {}
+        chunks = list(advisor.stream_enstp_response(message, history_for_api, memory, response_language,
+                                                    session_id=session_id, turn_info=turn_info, timer=timer,
+                                                    profile=profile))
+        record = timer.finish(recorder)
+        messages.add("assistant", "".join(chunks))
+        if turn_info.get("intent") or record.get("cache") == "hit":
+            continue
+        with lock:
+            results.append((kind, record.get("ttfb_ms"), record["total_ms"], record.get("output_tokens")))
+
+
+def run(args, backend, profiles_on):
+    advisor.configure(backend=backend)
+    advisor.GENERATION_PROFILES = profiles_on
+    answer_cache.ANSWER_CACHE.clear()
+    recorder = telemetry.TelemetryRecorder()
+    scripts = SCRIPTS + [RECOMMENDATION_SCRIPT]
+    results, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=converse, args=(index, scripts[index % len(scripts)], args, recorder, results, lock))
+        for index in range(args.students)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"profiles {'on' if profiles_on else 'off'}: {len(results)} turns sent to the model, "
+          f"{sum(tokens or 0 for *_, tokens in results)} output tokens")
+    for kind in (generation.CLARIFY, generation.LOOKUP, generation.RECOMMEND):
+        turns = [result for result in results if result[0] == kind]
+        if not turns:
+            continue
+        ttfb = [result[1] / 1000 for result in turns if result[1] is not None]
+        total = [result[2] / 1000 for result in turns]
+        tokens = [result[3] for result in turns if result[3]]
+        print(f"  {kind:<10} {len(turns):>4} turns  ttfb p50 {percentile(ttfb, 50):.2f}s p95 {percentile(ttfb, 95):.2f}s"
+              f"  total p50 {percentile(total, 50):.2f}s p95 {percentile(total, 95):.2f}s"
+              f"  output tokens p50 {percentile(tokens, 50):.0f}")
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which sessions start")
+    parser.add_argument("--output-tokens", type=int, default=700, help="stub answer length before the profile's cap")
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="primary model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="primary model generation speed")
+    parser.add_argument("--fast-latency", default="lognormal:0.4,0.4", help="fastest model time to first token")
+    parser.add_argument("--fast-tokens-per-second", type=float, default=200.0, help="fastest model generation speed")
+    parser.add_argument("--histograms", action="store_true", help="print the Prometheus histograms with profiles on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # Quotas lifted: only generation time is measured
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = 1_000_000, 1_000_000_000
+    ratelimit.KNOWN_QUOTAS.clear()
+    primary = backends.StubBackend(seed=args.seed, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                   output_tokens=args.output_tokens)
+    fast = backends.StubBackend(seed=args.seed, latency=args.fast_latency,
+                                tokens_per_second=args.fast_tokens_per_second, output_tokens=args.output_tokens)
+    backend = PerModelStub({advisor.MODEL_CHAIN.model_names[-1]: fast}, primary)
+    advisor.warm_up().join()
+    run(args, backend, profiles_on=False)
+    recorder = run(args, backend, profiles_on=True)
+    if args.histograms:
+        print("".join(line + "\n" for line in recorder.prometheus_text().splitlines()
+                      if line.startswith("enstp_profile_turn_seconds")), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Simulated traffic over a pool of API keys against the stub's per-key quotas.
+
+StubBackend rejects a key with ResourceExhausted once it has sent
+KEY_RPM requests in the last WINDOW_SECONDS, like the Gemini API does
+per project. The quota window is shortened to a few seconds so the
+simulation finishes quickly; the pool's limiters use the same numbers.
+CLIENTS threads send requests back to back for DURATION seconds.
+
+1. Throughput with 1, 2, 4 and 8 keys: it should grow linearly.
+2. Three keys, one of them also used by another process that takes most
+   of its quota: without quarantine the pool keeps sending requests to
+   it and collects quota errors; with quarantine it sets the key aside.
+
+    python benchmarks/sim_key_pool.py
+"""
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.backends import StubBackend
+from enstp.keypool import KeyPool
+from enstp.ratelimit import RateLimitTimeout
+
+MODEL_NAME = "gemini-1.5-pro-latest"
+WINDOW_SECONDS = 2.0
+KEY_RPM = 10
+DURATION = 6.0
+CLIENTS = 32
+PROMPT_TOKENS = 500
+
+
+def run(key_count, quarantine_seconds=WINDOW_SECONDS / 2, noisy_share=0.0):
+    """Served requests, quota errors and per-key requests over DURATION seconds."""
+    stub = StubBackend(latency="fixed:0.02", tokens_per_second=1e6, output_tokens=20,
+                       key_requests_per_minute=KEY_RPM, key_window_seconds=WINDOW_SECONDS)
+    keys = [(f"sim-key-{index}", 1.0) for index in range(key_count)]
+    pool = KeyPool(keys, quarantine_seconds=quarantine_seconds, window_seconds=WINDOW_SECONDS)
+    outcomes = collections.Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + DURATION
+
+    def client(index):
+        while time.monotonic() < deadline:
+            try:
+                key, _ = pool.acquire(MODEL_NAME, f"s{index}", PROMPT_TOKENS, KEY_RPM, 10**9,
+                                      timeout=max(0.0, deadline - time.monotonic()))
+            except RateLimitTimeout:
+                return
+            try:
+                with pool.using(key, MODEL_NAME):
+                    stub.generate(MODEL_NAME, f"question {index}", api_key=key.api_key)
+                outcome = "ok"
+            except core_exceptions.ResourceExhausted:
+                outcome = "429"
+            with lock:
+                outcomes[outcome] += 1
+
+    def other_process():
+        # Uses the first key behind the pool's back
+        while time.monotonic() < deadline:
+            try:
+                stub.generate(MODEL_NAME, "other process", api_key=keys[0][0])
+            except core_exceptions.ResourceExhausted:
+                pass
+            time.sleep(WINDOW_SECONDS / (KEY_RPM * noisy_share))
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(CLIENTS)]
+    if noisy_share:
+        threads.append(threading.Thread(target=other_process))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, {key["key"]: key["requests"] for key in pool.snapshot()}
+
+
+def main():
+    logging.disable(logging.WARNING)
+    print(f"Per-key quota: {KEY_RPM} requests per {WINDOW_SECONDS:.0f}s window, {CLIENTS} clients, {DURATION:.0f}s")
+    print(f"{'keys':>5} {'served':>7} {'429':>5} {'req/s':>7} {'vs 1 key':>9}")
+    baseline = None
+    for key_count in (1, 2, 4, 8):
+        outcomes, _ = run(key_count)
+        rate = outcomes["ok"] / DURATION
+        baseline = baseline or rate
+        print(f"{key_count:>5} {outcomes['ok']:>7} {outcomes['429']:>5} {rate:>7.1f} {rate / baseline:>8.1f}x")
+
+    print("\n3 keys, key 0 shared with another process using 90% of its quota:")
+    for label, quarantine_seconds in (("no quarantine", 0.0), ("quarantine", WINDOW_SECONDS / 2)):
+        outcomes, per_key = run(3, quarantine_seconds, noisy_share=0.9)
+        print(f"  {label:<14} served {outcomes['ok']:>4}, 429 {outcomes['429']:>4}, requests per key {per_key}")
+
+
+if __name__ == "__main__":
+    main()
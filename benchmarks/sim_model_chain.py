@@ -0,0 +1,75 @@
+"""Fallback chain behaviour against stub models that fail and stall.
+
+StubModel answers after a random delay and fails a given fraction of
+calls with ResourceExhausted. Timings are scaled down (SLO 0.5 s instead
+of 25 s) so each scenario runs in a few seconds:
+
+    python benchmarks/sim_model_chain.py
+"""
+import collections
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.fallback import ModelChain
+
+TURNS = 40
+
+
+class StubModel:
+    def __init__(self, name, failure_rate, delay_range, seed):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.delay_range = delay_range
+        self._rng = random.Random(seed)
+
+    def generate_content(self, prompt):
+        time.sleep(self._rng.uniform(*self.delay_range))
+        if self._rng.random() < self.failure_rate:
+            raise core_exceptions.ResourceExhausted("Quota exceeded")
+        return f"{self.name}: réponse"
+
+
+SCENARIOS = {
+    "healthy pro": {"pro": (0.0, (0.05, 0.10)), "flash": (0.0, (0.01, 0.03))},
+    "pro 429 x50%": {"pro": (0.5, (0.05, 0.10)), "flash": (0.0, (0.01, 0.03))},
+    "pro stalls": {"pro": (0.0, (0.20, 1.50)), "flash": (0.0, (0.01, 0.03))},
+    "both 429 x70%": {"pro": (0.7, (0.05, 0.10)), "flash": (0.7, (0.01, 0.03))},
+}
+
+
+def run(name, spec):
+    models = {model: StubModel(model, rate, delays, seed) for seed, (model, (rate, delays)) in enumerate(spec.items())}
+    chain = ModelChain(list(models), attempts_per_model=2, attempt_deadline=0.4, latency_slo=0.5,
+                       base_backoff=0.05, max_backoff=0.2)
+    served = collections.Counter()
+    latencies = []
+    for _ in range(TURNS):
+        turn_info = {}
+        start = time.perf_counter()
+        try:
+            chain.run(lambda model: models[model].generate_content("prompt"), turn_info=turn_info)
+            served[turn_info["model"]] += 1
+        except Exception:
+            served["error shown"] += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:>14}: served {dict(served)}  p50 {statistics.median(latencies):.2f}s  p95 {p95:.2f}s")
+
+
+def main():
+    logging.disable(logging.WARNING)
+    for name, spec in SCENARIOS.items():
+        run(name, spec)
+
+
+if __name__ == "__main__":
+    main()
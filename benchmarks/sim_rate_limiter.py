@@ -0,0 +1,96 @@
+"""Simulated exam-period burst against a fake backend that enforces quotas.
+
+FakeQuotaModel rejects requests with ResourceExhausted exactly like the
+Gemini API when more than `rpm` requests or `tpm` prompt tokens arrive in
+any sliding window. The quota window is shortened to a few seconds so the
+simulation finishes quickly; the limiter is configured with the same
+numbers. Without the limiter most requests fail; with it none should.
+One chatty session fires all its requests at once; thanks to the
+round-robin queue the other sessions are not stuck behind it.
+
+    python benchmarks/sim_rate_limiter.py
+"""
+import collections
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.ratelimit import RateLimiter
+
+WINDOW_SECONDS = 3.0
+RPM = 20
+TPM = 40000
+SESSIONS = 12
+TURNS_PER_SESSION = 3
+CHATTY_TURNS = 15
+
+
+class FakeQuotaModel:
+    """Stand-in for GenerativeModel that enforces sliding-window RPM/TPM."""
+
+    def __init__(self, rpm, tpm, window_seconds):
+        self.rpm, self.tpm, self.window_seconds = rpm, tpm, window_seconds
+        self._log = collections.deque()  # (time, tokens)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt_tokens):
+        now = time.monotonic()
+        with self._lock:
+            while self._log and self._log[0][0] <= now - self.window_seconds:
+                self._log.popleft()
+            if len(self._log) + 1 > self.rpm or sum(t for _, t in self._log) + prompt_tokens > self.tpm:
+                raise core_exceptions.ResourceExhausted("Quota exceeded")
+            self._log.append((now, prompt_tokens))
+        time.sleep(0.05)
+        return "ok"
+
+
+def run(limiter):
+    model = FakeQuotaModel(RPM, TPM, WINDOW_SECONDS)
+    outcomes = collections.Counter()
+    latencies = collections.defaultdict(list)
+    rng = random.Random(7)
+
+    def session(session_id, turns):
+        for _ in range(turns):
+            tokens = rng.randint(1500, 4000)
+            start = time.monotonic()
+            try:
+                if limiter is not None:
+                    limiter.acquire(session_id, tokens, timeout=60)
+                model.generate_content(tokens)
+                outcomes["ok"] += 1
+            except core_exceptions.ResourceExhausted:
+                outcomes["429"] += 1
+            latencies[session_id].append(time.monotonic() - start)
+
+    # The chatty session fires all its requests at once (e.g. many tabs)
+    threads = [threading.Thread(target=session, args=("chatty", 1)) for _ in range(CHATTY_TURNS)]
+    threads += [threading.Thread(target=session, args=(f"s{i}", TURNS_PER_SESSION)) for i in range(SESSIONS)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    others = [statistics.mean(values) for session_id, values in latencies.items() if session_id != "chatty"]
+    return outcomes, elapsed, statistics.mean(others), statistics.mean(latencies["chatty"])
+
+
+def main():
+    for label, limiter in (("no limiter", None),
+                           ("limiter", RateLimiter(RPM, TPM, window_seconds=WINDOW_SECONDS))):
+        outcomes, elapsed, others, chatty = run(limiter)
+        print(f"{label:>10}: ok={outcomes['ok']:3d} rate-limited={outcomes['429']:3d} "
+              f"elapsed={elapsed:5.1f}s mean wait: other sessions {others:4.1f}s, chatty session {chatty:4.1f}s")
+
+
+if __name__ == "__main__":
+    main()
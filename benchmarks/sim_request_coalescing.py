@@ -0,0 +1,129 @@
+"""Burst of identical openers, with and without request coalescing.
+
+Simulates the minutes after an announcement: --students sessions start
+within --window seconds, and most of them open with one of a few common
+questions (same first message, same empty history, so the same prompt);
+the others ask something of their own. Each turn streams from the
+offline stub. Reports the upstream model calls made, the ones saved by
+sharing a request in flight, answers from the answer cache, prompt
+tokens sent and the time to first chunk:
+
+    python benchmarks/sim_request_coalescing.py --students 200 --window 5
+"""
+import argparse
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import backends
+from enstp import ratelimit
+from enstp import singleflight
+from enstp.transcript import Transcript
+from load_test import percentile
+
+OPENERS = [
+    ("DMS ou DIB ?", 0.5),
+    ("Quelle est la différence entre le DMS et le DIB ?", 0.3),
+    ("Quel département choisir après la prépa ?", 0.2),
+]
+OWN_QUESTIONS = [
+    "J'aime les ponts et le béton, est-ce que le DMS est fait pour moi ?",
+    "Le DIB a-t-il beaucoup de stages sur les chantiers ferroviaires ?",
+    "Je suis bon en maths mais je préfère le terrain, que me conseillez-vous ?",
+]
+
+
+class CountingBackend(backends.StubBackend):
+    """Stub that counts its upstream calls and prompt tokens."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = collections.Counter()
+        self._calls_lock = threading.Lock()
+
+    def _begin(self, model_name, prompt, api_key=None):
+        prompt_text, rng = super()._begin(model_name, prompt, api_key)
+        with self._calls_lock:
+            self.calls["requests"] += 1
+            self.calls["prompt_tokens"] += len(prompt_text) // 4
+        return prompt_text, rng
+
+
+def run(args, coalesce):
+    backend = CountingBackend(seed=args.seed, latency=args.latency, tokens_per_second=args.tokens_per_second)
+    advisor.configure(backend=backend)
+    advisor.COALESCE_REQUESTS = coalesce
+    answer_cache.ANSWER_CACHE.clear()
+    cache_hits = answer_cache.ANSWER_CACHE.snapshot().get("hits", 0)
+    singleflight.REQUESTS.stats.clear()
+    rng = random.Random(args.seed)
+    openers, weights = zip(*OPENERS)
+    plan = []
+    for index in range(args.students):
+        if rng.random() < args.common_share:
+            message = rng.choices(openers, weights)[0]
+        else:
+            # Numbered so that these never share a prompt
+            message = f"{OWN_QUESTIONS[index % len(OWN_QUESTIONS)]} ({index})"
+        plan.append((rng.uniform(0, args.window), message))
+
+    turns, lock = [], threading.Lock()
+
+    def student(delay, message):
+        time.sleep(delay)
+        history = Transcript([{"role": "assistant", "content": advisor.WELCOME_MESSAGE}])
+        turn_info = {}
+        start = time.perf_counter()
+        first_chunk = None
+        for _ in advisor.stream_enstp_response(message, history, session_id=f"student-{len(turns)}",
+                                               turn_info=turn_info):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+        with lock:
+            turns.append((first_chunk, bool(turn_info.get("coalesced"))))
+
+    threads = [threading.Thread(target=student, args=item) for item in plan]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    first_chunks = [turn[0] for turn in turns if turn[0] is not None]
+    cache_hits = answer_cache.ANSWER_CACHE.snapshot().get("hits", 0) - cache_hits
+    print(f"{'with' if coalesce else 'without'} coalescing: {len(turns)} turns, "
+          f"{backend.calls['requests']} upstream calls, {sum(turn[1] for turn in turns)} shared a call in flight, "
+          f"{cache_hits} answer cache hits, ~{backend.calls['prompt_tokens']} prompt tokens")
+    print("  time to first chunk: " + ", ".join(
+        f"p{pct} {percentile(first_chunks, pct) * 1000:.0f} ms" for pct in (50, 95, 99)))
+    return backend.calls["requests"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--window", type=float, default=5.0, help="seconds over which the students arrive")
+    parser.add_argument("--common-share", type=float, default=0.8, help="share of students opening with a common question")
+    parser.add_argument("--latency", default="lognormal:0.6,0.4", help="stub time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="stub generation speed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # Quotas lifted: this counts upstream calls, not the time they would queue
+    advisor.GEMINI_RPM, advisor.GEMINI_TPM = 1_000_000, 1_000_000_000
+    ratelimit.KNOWN_QUOTAS.clear()
+    advisor.warm_up().join()
+    without = run(args, coalesce=False)
+    with_coalescing = run(args, coalesce=True)
+    print(f"Upstream calls saved: {without - with_coalescing} of {without} ({1 - with_coalescing / without:.0%})")
+
+
+if __name__ == "__main__":
+    main()
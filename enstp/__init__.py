@@ -0,0 +1,6 @@
+"""Shared, Streamlit-independent building blocks of the Conseiller ENSTP.
+
+Streamlit re-executes app.py from the top on every interaction, but
+modules imported from it are loaded only once per process. State that
+must outlive a rerun or be shared by every session lives here.
+"""
@@ -0,0 +1,866 @@
+"""One advisor turn: cache lookup, prompt, quota queue, model chain.
+
+Streamlit-independent so the app, load tests and scripts share the same
+code path. Settings come from the environment (and .env) once per
+process; configure() picks the LLM backend.
+"""
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+from google.api_core import exceptions as core_exceptions
+
+from enstp import answer_cache
+from enstp import backends
+from enstp import breaker
+from enstp import fallback
+from enstp import followups
+from enstp import generation
+from enstp import history
+from enstp import intents
+from enstp import keypool
+from enstp import knowledge
+from enstp import language
+from enstp import offline
+from enstp import ratelimit
+from enstp import retrieval
+from enstp import singleflight
+from enstp import telemetry
+from enstp import vectors
+from enstp import prompt
+from enstp.prompt import PROMPT_VERSION, build_prompt_messages
+from enstp.text import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# --- Model Configuration ---
+MODEL_NAME = 'gemini-1.5-pro-latest' # Use the latest capable model
+# Ordered fallback chain: the preferred model first, faster ones after it
+MODEL_CHAIN = fallback.ModelChain(
+    [name.strip() for name in os.getenv("GEMINI_MODEL_CHAIN", f"{MODEL_NAME},gemini-1.5-flash-latest").split(",") if name.strip()],
+    attempts_per_model=int(os.getenv("ATTEMPTS_PER_MODEL", fallback.DEFAULT_ATTEMPTS_PER_MODEL)),
+    attempt_deadline=float(os.getenv("ATTEMPT_DEADLINE", fallback.DEFAULT_ATTEMPT_DEADLINE)),
+    latency_slo=float(os.getenv("LATENCY_SLO", fallback.DEFAULT_LATENCY_SLO)),
+)
+
+# --- Generation Settings ---
+GENERATION_CONFIG = {
+    "temperature": 0.6,
+    "max_output_tokens": 1536,
+}
+
+# --- Generation Profiles ---
+# Each turn gets the models, output budget, temperature and closing
+# instruction of its profile (see enstp.generation): short clarifications
+# and factual lookups try the fastest model of the chain first, and a
+# recommendation (asked for, or once the student profile holds
+# RECOMMEND_AFTER_EVIDENCE signals) keeps the chain and GENERATION_CONFIG
+# above. GENERATION_<PROFILE>_MODELS, _MAX_OUTPUT_TOKENS and _TEMPERATURE
+# override a profile; with GENERATION_PROFILES off, every turn is a
+# recommendation turn.
+GENERATION_PROFILES = os.getenv("GENERATION_PROFILES", "1").strip().lower() not in ("0", "false", "no")
+RECOMMEND_AFTER_EVIDENCE = int(os.getenv("RECOMMEND_AFTER_EVIDENCE", generation.DEFAULT_RECOMMEND_AFTER_EVIDENCE))
+_FAST_FIRST = list(dict.fromkeys([MODEL_CHAIN.model_names[-1], MODEL_CHAIN.primary_model]))
+PROFILES = {
+    generation.CLARIFY: generation.profile_from_env(generation.CLARIFY, _FAST_FIRST, 256, 0.7, "clarify"),
+    generation.LOOKUP: generation.profile_from_env(generation.LOOKUP, _FAST_FIRST, 512, 0.3, "lookup"),
+    generation.RECOMMEND: generation.profile_from_env(
+        generation.RECOMMEND, MODEL_CHAIN.model_names, GENERATION_CONFIG["max_output_tokens"],
+        GENERATION_CONFIG["temperature"], "full"),
+}
+
+# --- Guide Retrieval Settings ---
+# Number of guide sections injected per turn and their total token budget
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", retrieval.DEFAULT_TOP_K))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", retrieval.DEFAULT_TOKEN_BUDGET))
+# "vector" (semantic, default), "hybrid" (vector + BM25) or "bm25" (keywords)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").strip().lower()
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", vectors.DEFAULT_INDEX_DIR)
+
+# --- Conversation History Settings ---
+# Hard token budget for the history in the prompt and verbatim window size
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", history.DEFAULT_TOKEN_BUDGET))
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", history.DEFAULT_RECENT_MESSAGES))
+
+# --- Prompt Budget ---
+# Estimated tokens of the whole prompt; over it, guide extracts, profile and
+# the oldest history lines are dropped (see prompt.build_prompt_messages)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", prompt.DEFAULT_TOKEN_BUDGET))
+
+# --- Intent Router ---
+# Greetings, thanks, language switches... get a template answer, no API call
+INTENT_ROUTING = os.getenv("INTENT_ROUTING", "1").strip().lower() not in ("0", "false", "no")
+
+# --- Knowledge Base Lookups ---
+# Module, track, lab, internship and sector lookups are answered as tables
+KNOWLEDGE_LOOKUP = os.getenv("KNOWLEDGE_LOOKUP", "1").strip().lower() not in ("0", "false", "no")
+
+# --- Request Coalescing ---
+# Sessions sending the same prompt at the same time (the same opener with
+# the same empty history) share one model request and its answer.
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1").strip().lower() not in ("0", "false", "no")
+
+# --- Answer Cache ---
+# Answers to history-independent questions are shared by all sessions; a
+# new model, guide text or prompt template starts from an empty cache.
+ANSWER_CACHE_VERSION = f"{MODEL_CHAIN.primary_model}:{PROMPT_VERSION}"
+
+# --- Gemini Quotas ---
+# Requests and prompt tokens per minute allowed for the primary model
+# (fallback models use ratelimit.KNOWN_QUOTAS); every session of this
+# process shares them through one fair queue per model.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", ratelimit.DEFAULT_REQUESTS_PER_MINUTE))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", ratelimit.DEFAULT_TOKENS_PER_MINUTE))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", ratelimit.DEFAULT_ACQUIRE_TIMEOUT))
+
+# --- API Key Pool ---
+# With several keys (GOOGLE_API_KEYS), each one has the quotas above times
+# its weight, and a key that hits its quota anyway is set aside for
+# KEY_QUARANTINE_SECONDS (doubled after each consecutive failure).
+KEY_QUARANTINE_SECONDS = float(os.getenv("KEY_QUARANTINE_SECONDS", keypool.DEFAULT_QUARANTINE_SECONDS))
+
+# --- Circuit Breaker ---
+# When too many of the last BREAKER_WINDOW model calls failed or took over
+# BREAKER_SLOW_CALL_SECONDS, turns are answered from the guide at once
+# (enstp.offline) instead of waiting on the API; one probe call after
+# BREAKER_OPEN_SECONDS (doubled while it keeps failing) checks for recovery.
+BREAKER = breaker.CircuitBreaker(
+    window=int(os.getenv("BREAKER_WINDOW", breaker.DEFAULT_WINDOW)),
+    minimum_calls=int(os.getenv("BREAKER_MINIMUM_CALLS", breaker.DEFAULT_MINIMUM_CALLS)),
+    failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", breaker.DEFAULT_FAILURE_RATE)),
+    slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", breaker.DEFAULT_SLOW_CALL_SECONDS)),
+    open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", breaker.DEFAULT_OPEN_SECONDS)),
+)
+
+# --- Follow-up Suggestions ---
+# FOLLOWUP_SUGGESTIONS likely next questions are offered after each reply;
+# the first PREFETCH_PER_TURN are answered in the background by at most
+# PREFETCH_WORKERS requests at a time, and only if the quota of the first
+# model of their generation profile keeps PREFETCH_MIN_HEADROOM of its
+# burst capacity free afterwards (speculative requests never wait for
+# quota nor take the last of it: on the free tier's 2 RPM, no
+# recommendation is prefetched).
+FOLLOWUP_SUGGESTIONS = int(os.getenv("FOLLOWUP_SUGGESTIONS", followups.DEFAULT_SUGGESTIONS))
+PREFETCH_FOLLOWUPS = os.getenv("PREFETCH_FOLLOWUPS", "1").strip().lower() not in ("0", "false", "no")
+PREFETCH_PER_TURN = int(os.getenv("PREFETCH_PER_TURN", "2"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", followups.DEFAULT_WORKERS))
+PREFETCH_MIN_HEADROOM = float(os.getenv("PREFETCH_MIN_HEADROOM", "0.5"))
+PREFETCHER = followups.Prefetcher(workers=PREFETCH_WORKERS)
+
+# --- User-Facing Messages ---
+WELCOME_MESSAGE = "Bonjour ! Félicitations pour avoir terminé le cycle préparatoire. Comment vous sentez-vous à l'approche de ce choix important entre DMS et DIB ?"
+BLOCKED_RESPONSE_MESSAGE = "Désolé, ma réponse a été bloquée pour des raisons de sécurité ou était vide."
+RATE_LIMIT_MESSAGE = "Le service est très sollicité actuellement. Veuillez patienter quelques instants avant de réessayer."
+
+_backend_lock = threading.Lock()
+_backend = None
+_key_pool = None
+_warm_up_thread = None
+_profile_chains = {}  # model names -> ModelChain built from MODEL_CHAIN's settings
+
+
+def configure(api_key=None, backend=None, api_keys=None):
+    """Selects the LLM backend and the API keys for this process.
+
+    Without an explicit backend, ENSTP_LLM_BACKEND decides (see
+    backends.backend_from_env); the Gemini backend needs api_key.
+    api_keys, a list of (key, weight) from keypool.parse_keys, spreads
+    requests over several keys; api_key defaults to the first one.
+    Reconfiguring with the same keys keeps the current backend.
+    """
+    global _backend, _key_pool
+    keys = list(api_keys) if api_keys else [(api_key, 1.0)]
+    api_key = api_key or keys[0][0]
+    with _backend_lock:
+        if _key_pool is None or _key_pool.api_keys != keys:
+            _key_pool = keypool.KeyPool(keys, KEY_QUARANTINE_SECONDS)
+            # The registry is only imported with the first Gemini model
+            gemini_client = sys.modules.get("enstp.client")
+            if gemini_client is not None:
+                gemini_client.invalidate([key for key, _ in keys])
+            if len(keys) > 1:
+                logger.info(f"API key pool: {', '.join(key.label for key in _key_pool.keys)}.")
+        if backend is None:
+            selected = backends.selected_backend()
+            if _backend is not None and _backend.name == selected and getattr(_backend, "api_key", None) in (None, api_key):
+                return _backend
+            if selected == "gemini" and not api_key:
+                _backend = None
+                return None
+            backend = backends.backend_from_env(api_key)
+        if backend is not _backend:
+            logger.info(f"LLM backend: {backend.name}")
+            # Failures of the previous backend say nothing about this one
+            BREAKER.reset()
+        _backend = backend
+        return backend
+
+
+def get_backend():
+    """The configured backend, or None if no API key was provided."""
+    return _backend
+
+
+def get_key_pool():
+    """The pool of API keys requests are spread over."""
+    return _key_pool
+
+
+def _init_models(backend, gen_profile):
+    """Makes sure every model of the profile's chain can be used."""
+    backend.prepare(gen_profile.model_names, _generation_config(gen_profile))
+
+
+def _generation_profile(student_input, profile, timer, turn_info):
+    """The turn's generation profile, recorded in timer and turn_info."""
+    name = generation.RECOMMEND
+    if GENERATION_PROFILES:
+        name = generation.select(student_input, profile, RECOMMEND_AFTER_EVIDENCE)
+    turn_info["profile"] = name
+    timer.set(profile=name)
+    return PROFILES[name]
+
+
+def _generation_config(gen_profile):
+    return dict(GENERATION_CONFIG, temperature=gen_profile.temperature,
+                max_output_tokens=gen_profile.max_output_tokens)
+
+
+def fallback_caption(turn_info):
+    """Note shown under an answer its profile's preferred model did not write.
+
+    None when the preferred model answered. MODEL_CHAIN lists the models
+    from the slowest to the fastest, so a fallback after it saves time
+    while one before it (the clarify and lookup profiles start with the
+    fastest model) means the fast model could not answer.
+    """
+    if not turn_info.get("tier"):
+        return None
+    model = turn_info["model"]
+    preferred = PROFILES.get(turn_info.get("profile"), PROFILES[generation.RECOMMEND]).model_names[0]
+    if model in MODEL_CHAIN.model_names and preferred in MODEL_CHAIN.model_names:
+        if MODEL_CHAIN.model_names.index(model) < MODEL_CHAIN.model_names.index(preferred):
+            return f"Réponse fournie par le modèle de secours ({model}) : le modèle rapide ({preferred}) n'a pas pu répondre."
+        return f"Réponse fournie par le modèle de secours ({model}) pour limiter l'attente."
+    return f"Réponse fournie par le modèle de secours ({model})."
+
+
+def _chain_for(gen_profile):
+    """MODEL_CHAIN, or a chain with its settings over the profile's models."""
+    if list(gen_profile.model_names) == MODEL_CHAIN.model_names:
+        return MODEL_CHAIN
+    with _backend_lock:
+        base, chain = _profile_chains.get(gen_profile.model_names, (None, None))
+        if base is not MODEL_CHAIN:
+            chain = fallback.ModelChain(
+                gen_profile.model_names, attempts_per_model=MODEL_CHAIN.attempts_per_model,
+                attempt_deadline=MODEL_CHAIN.attempt_deadline, latency_slo=MODEL_CHAIN.latency_slo,
+                base_backoff=MODEL_CHAIN.base_backoff, max_backoff=MODEL_CHAIN.max_backoff,
+            )
+            _profile_chains[gen_profile.model_names] = (MODEL_CHAIN, chain)
+        return chain
+
+
+def warm_up():
+    """Loads the retrieval index in the background, once per process.
+
+    A fresh container builds the vector index (~0.7 s) on first use;
+    warming it up after the first frame keeps that off the first turn.
+    The Gemini SDK is not imported here: it waits for the first API call.
+    """
+    global _warm_up_thread
+    with _backend_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_retrieval_index, name="enstp-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def _retrieval_index():
+    """Index for RETRIEVAL_MODE; falls back to BM25 if the vector index fails."""
+    try:
+        return vectors.get_retrieval_index(RETRIEVAL_MODE, VECTOR_INDEX_DIR)
+    except Exception as index_err:
+        logger.error(f"Vector index unavailable ({index_err}); using BM25 retrieval.")
+        return retrieval.GUIDE_INDEX
+
+
+def _build_messages(student_input, conversation_history, history_memory, timer, profile=None, response_language=None,
+                    gen_profile=None, cache_language=None):
+    """Builds the turn's prompt with this deployment's budgets.
+
+    With a cache_language, the answer goes into the answer cache for
+    other sessions: the prompt then leaves out this session's history and
+    student profile, and asks for an answer in that language. The
+    prompt_build phase includes the history and retrieval phases.
+    """
+    if cache_language is not None:
+        conversation_history, history_memory, profile, response_language = [], None, None, cache_language
+    with timer.phase("prompt_build"):
+        return build_prompt_messages(
+            student_input,
+            conversation_history,
+            history_memory=history_memory,
+            retrieval_top_k=RETRIEVAL_TOP_K,
+            retrieval_token_budget=RETRIEVAL_TOKEN_BUDGET,
+            timer=timer,
+            retrieval_index=_retrieval_index(),
+            student_profile=profile.summary() if profile is not None else None,
+            response_language=response_language,
+            token_budget=PROMPT_TOKEN_BUDGET,
+            variant=gen_profile.prompt_variant if gen_profile is not None else "full",
+        )
+
+
+def _quotas(model_name):
+    """(requests, tokens) per minute of a model: GEMINI_RPM/TPM for the primary one."""
+    if model_name == MODEL_CHAIN.primary_model:
+        return GEMINI_RPM, GEMINI_TPM
+    return ratelimit.KNOWN_QUOTAS.get(model_name, (GEMINI_RPM, GEMINI_TPM))
+
+
+def _wait_for_quota(messages, model_name, session_id, on_queue_update, timer, selected_keys, timeout=None):
+    """Blocks in the model's shared queue until the prompt fits its quotas.
+
+    The pool picks the key; it is left in selected_keys[model_name] for
+    the attempt that follows.
+    """
+    rpm, tpm = _quotas(model_name)
+    prompt_tokens = estimate_tokens(messages[0]["parts"][0])
+    timeout = QUEUE_TIMEOUT if timeout is None else min(timeout, QUEUE_TIMEOUT)
+    key, waited = _key_pool.acquire(model_name, session_id or "anonymous", prompt_tokens, rpm, tpm,
+                                    on_wait=on_queue_update, timeout=timeout)
+    selected_keys[model_name] = key
+    timer.add("queue", waited)
+    if waited >= 0.5:
+        logger.info(f"Waited {waited:.1f}s in the {model_name} quota queue of key {key.label} "
+                    f"(~{prompt_tokens} prompt tokens).")
+
+
+def _with_selected_key(selected_keys, call):
+    """Attempt for MODEL_CHAIN: call(model_name, api_key) with the key picked by _wait_for_quota.
+
+    A quota error quarantines the key; the chain's next try then waits
+    for another one.
+    """
+    pool = _key_pool
+
+    def attempt(model_name):
+        key = selected_keys[model_name]
+        with pool.using(key, model_name):
+            return call(model_name, key.api_key)
+
+    return attempt
+
+
+def _routed_answer(student_input, conversation_history, response_language, timer, turn_info):
+    """Template answer if the intent router recognises a trivial turn."""
+    if not INTENT_ROUTING:
+        return None
+    with timer.phase("routing"):
+        routed = intents.ROUTER.route(
+            student_input, response_language or language.current_language(conversation_history, student_input)
+        )
+    if routed is None:
+        return None
+    turn_info["intent"] = routed.intent
+    timer.set(intent=routed.intent)
+    return routed.text
+
+
+def _knowledge_answer(student_input, conversation_history, response_language, timer, turn_info):
+    """Table rendered from the guide's knowledge base for exact lookup questions."""
+    if not KNOWLEDGE_LOOKUP:
+        return None
+    start_time = time.perf_counter()
+    with timer.phase("routing"):
+        answer = knowledge.LOOKUP.answer(
+            student_input, response_language or language.current_language(conversation_history, student_input)
+        )
+    if answer is None:
+        return None
+    logger.info(f"Knowledge base lookup: {answer.kind} answered in {(time.perf_counter() - start_time) * 1e6:.0f} µs")
+    turn_info["intent"] = f"knowledge:{answer.kind}"
+    timer.set(intent=turn_info["intent"])
+    return answer.text
+
+
+def _answer_cache_language(student_input, conversation_history, response_language):
+    """Answer cache namespace for this turn, or None if it depends on the history."""
+    if not answer_cache.is_history_independent(student_input):
+        return None
+    return response_language or language.current_language(conversation_history, student_input)
+
+
+def _cached_answer(student_input, cache_language, timer):
+    """Looks the turn up in the shared answer cache and logs the outcome."""
+    if cache_language is None:
+        return None
+    cached = answer_cache.ANSWER_CACHE.get(student_input, cache_language, ANSWER_CACHE_VERSION)
+    timer.set(cache="hit" if cached is not None else "miss")
+    stats = answer_cache.ANSWER_CACHE.snapshot()
+    logger.info(
+        f"Answer cache {'hit' if cached is not None else 'miss'} [{cache_language}] "
+        f"(hit rate {stats['hit_rate']:.0%}, {stats.get('hits', 0)} hits / {stats.get('misses', 0)} misses)"
+    )
+    return cached
+
+
+def _request_key(messages, gen_profile):
+    """Single-flight key of a model request, or None when coalescing is off."""
+    if not COALESCE_REQUESTS:
+        return None
+    return singleflight.request_key(ANSWER_CACHE_VERSION, gen_profile.model_names, _generation_config(gen_profile),
+                                   messages)
+
+
+def _chain_result(turn_info):
+    """What the sessions sharing a request learn about the chain's answer."""
+    return {name: turn_info.get(name) for name in ("model", "tier", "attempts")}
+
+
+def _follow_flight(timer, turn_info):
+    """Marks a turn answered by another session's identical request (no tokens of its own)."""
+    turn_info["coalesced"] = True
+    timer.set(coalesced=True)
+    logger.info("Identical request already in flight: sharing its answer.")
+
+
+def _degraded_answer(student_input, conversation_history, response_language, timer, turn_info):
+    """Extractive answer from the guide, for a turn the model cannot serve."""
+    turn_info["degraded"] = True
+    timer.set(degraded=True)
+    with timer.phase("retrieval"):
+        return offline.extractive_answer(
+            student_input, response_language or language.current_language(conversation_history, student_input),
+            index=_retrieval_index(),
+        )
+
+
+def _turn_outcome(timer, outcome, turn_info):
+    """Copies the chain's result into the timer."""
+    timer.set(outcome=outcome, model=turn_info.get("model"), tier=turn_info.get("tier"),
+              attempts=turn_info.get("attempts"))
+    timer.set_usage(turn_info.get("usage"))
+
+
+def get_enstp_response(student_input, conversation_history, history_memory=None, response_language=None,
+                       session_id=None, on_queue_update=None, turn_info=None, timer=None, profile=None):
+    """Gets sophisticated response/recommendation based on student input and history.
+
+    The request goes through the chain of the turn's generation profile
+    (PROFILES); turn_info, if given, receives the profile and the model
+    that served it, or the intent of a turn answered locally by
+    the intent router or the knowledge base (e.g. "clear_conversation",
+    which the caller should act on, or "knowledge:tracks"). profile, a
+    student_profile.StudentProfile the caller updates with each student
+    message, is summarized in the prompt. Without a backend, while BREAKER
+    is open, or when the chain fails, the answer is quoted from the guide
+    instead (turn_info["degraded"]). A prompt identical to one already in
+    flight for another session shares its answer (turn_info["coalesced"]).
+    A question whose answer goes into the shared answer cache is asked
+    without the history or profile, so no student's details reach
+    another session. The turn's telemetry record goes to
+    telemetry.RECORDER, unless the caller passes its own timer and
+    finishes it.
+    """
+    owns_timer = timer is None
+    timer = timer or telemetry.TurnTimer(session_id, mode="blocking")
+    turn_info = {} if turn_info is None else turn_info
+    outcome = "ok"
+    try:
+        routed = (_routed_answer(student_input, conversation_history, response_language, timer, turn_info)
+                  or _knowledge_answer(student_input, conversation_history, response_language, timer, turn_info))
+        if routed is not None:
+            return routed
+
+        cache_language = _answer_cache_language(student_input, conversation_history, response_language)
+        cached = _cached_answer(student_input, cache_language, timer)
+        if cached is not None:
+            return cached
+
+        backend = get_backend()
+        if backend is None:
+            logger.error("API Key not found: answering from the guide.")
+            outcome = "degraded"
+            return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+
+        allowed = False
+        api_start = None
+        failed = None
+        try:
+            gen_profile = _generation_profile(student_input, profile, timer, turn_info)
+            messages = _build_messages(student_input, conversation_history, history_memory, timer, profile,
+                                       response_language, gen_profile, cache_language)
+
+            flight, leader = singleflight.REQUESTS.begin(_request_key(messages, gen_profile))
+            if not leader:
+                # The same prompt is already in flight for another session: share its answer
+                _follow_flight(timer, turn_info)
+                response_text, shared = flight.wait()
+                turn_info.update(shared)
+                timer.mark("ttfb")
+                if not response_text:
+                    raise backends.BlockedResponse("Shared response empty.")
+                return response_text
+
+            try:
+                if not BREAKER.allow():
+                    raise breaker.CircuitOpen("Circuit breaker open.")
+                allowed = True
+                _init_models(backend, gen_profile)
+                generation_config = _generation_config(gen_profile)
+                selected_keys = {}
+                api_start = time.perf_counter()
+                completion = _chain_for(gen_profile).run(
+                    _with_selected_key(selected_keys, lambda model_name, api_key: backend.generate(
+                        model_name, messages, generation_config, api_key=api_key)),
+                    prepare=lambda model_name, timeout: _wait_for_quota(
+                        messages, model_name, session_id, on_queue_update, timer, selected_keys, timeout),
+                    turn_info=turn_info,
+                )
+            except BaseException as error:
+                flight.finish(error=error)
+                raise
+            flight.publish(completion.text)
+            flight.finish(result=_chain_result(turn_info))
+            failed = False
+            timer.add("api", time.perf_counter() - api_start - timer.durations["queue"])
+            timer.mark("ttfb")
+            turn_info["usage"] = completion.usage
+
+            response_text = completion.text
+            # Only answers of the profile's preferred model (tier 0) are cached
+            if cache_language is not None and turn_info.get("tier") == 0:
+                answer_cache.ANSWER_CACHE.put(student_input, cache_language, response_text, ANSWER_CACHE_VERSION)
+            return response_text
+
+        except breaker.CircuitOpen:
+            outcome = "degraded"
+            return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+        except backends.BlockedResponse as blocked_err:
+            logger.warning(f"API response blocked or empty: {blocked_err}")
+            failed = False
+            outcome = "blocked"
+            return BLOCKED_RESPONSE_MESSAGE
+        except ratelimit.RateLimitTimeout as queue_err:
+            logger.warning(f"Quota queue timeout: {queue_err}")
+            # This process's own backlog, not a verdict on the API
+            failed = None
+            outcome = "rate_limited"
+            return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+        except core_exceptions.ResourceExhausted as rate_limit_err:
+            logger.warning(f"API Rate Limit Reached: {rate_limit_err}")
+            failed = True
+            outcome = "rate_limited"
+            return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+        except Exception as e:
+            logger.error(f"Error processing API request: {e}")
+            failed = True
+            outcome = "error"
+            return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+        finally:
+            if allowed:
+                # Time in the quota queue is this process's own backlog, not API latency
+                api_seconds = time.perf_counter() - api_start - timer.durations["queue"] if api_start else 0.0
+                BREAKER.record(api_seconds, failed)
+    finally:
+        _turn_outcome(timer, outcome, turn_info)
+        if owns_timer:
+            timer.finish()
+
+
+def stream_enstp_response(student_input, conversation_history, history_memory=None, response_language=None,
+                          session_id=None, on_queue_update=None, turn_info=None, timer=None, profile=None):
+    """Yields the response text chunk by chunk as the model generates it.
+
+    Errors before the first chunk get the same answer from the guide as in
+    get_enstp_response; mid-stream, an error message is yielded after the
+    text already received.
+    While the request waits for quota, on_queue_update(position, wait) is
+    called with its place in the shared queue. Fallback through the
+    profile's chain only happens before the first chunk: a started answer is never mixed
+    with another model's. A prompt identical to one already in flight
+    follows that request's stream instead of making its own.
+
+    A caller that renders the chunks can pass its own timer, add the
+    "render" phase to it and finish it once the answer is displayed;
+    render time is then left out of the api phase.
+    """
+    owns_timer = timer is None
+    timer = timer or telemetry.TurnTimer(session_id, mode="stream")
+    turn_info = {} if turn_info is None else turn_info
+    outcome = "ok"
+    start_time = time.perf_counter()
+    api_start = None
+    first_token_time = None
+    allowed = False
+    failed = None
+    source = None
+    chunks = []
+
+    def failure_reply(message):
+        # After the first chunk the answer is kept, with the error after it
+        if chunks:
+            return "\n\n" + message
+        timer.mark("ttfb")
+        return _degraded_answer(student_input, conversation_history, response_language, timer, turn_info)
+
+    try:
+        routed = (_routed_answer(student_input, conversation_history, response_language, timer, turn_info)
+                  or _knowledge_answer(student_input, conversation_history, response_language, timer, turn_info))
+        if routed is not None:
+            timer.mark("ttfb")
+            yield routed
+            return
+
+        cache_language = _answer_cache_language(student_input, conversation_history, response_language)
+        cached = _cached_answer(student_input, cache_language, timer)
+        if cached is not None:
+            timer.mark("ttfb")
+            yield cached
+            return
+
+        backend = get_backend()
+        if backend is None:
+            logger.error("API Key not found: answering from the guide.")
+            outcome = "degraded"
+            yield failure_reply(None)
+            return
+
+        try:
+            gen_profile = _generation_profile(student_input, profile, timer, turn_info)
+            messages = _build_messages(student_input, conversation_history, history_memory, timer, profile,
+                                       response_language, gen_profile, cache_language)
+
+            flight, leader = singleflight.REQUESTS.begin(_request_key(messages, gen_profile))
+            if leader:
+                try:
+                    if not BREAKER.allow():
+                        raise breaker.CircuitOpen("Circuit breaker open.")
+                    allowed = True
+                    _init_models(backend, gen_profile)
+                    generation_config = _generation_config(gen_profile)
+
+                    def open_stream(model_name, api_key):
+                        # The attempt only succeeds once the first text chunk has arrived
+                        stream = backend.stream(model_name, messages, generation_config, api_key=api_key)
+                        return next(stream, None), stream
+
+                    selected_keys = {}
+                    api_start = time.perf_counter()
+                    first_chunk, stream = _chain_for(gen_profile).run(
+                        _with_selected_key(selected_keys, open_stream),
+                        prepare=lambda model_name, timeout: _wait_for_quota(
+                            messages, model_name, session_id, on_queue_update, timer, selected_keys, timeout),
+                        turn_info=turn_info,
+                    )
+                except BaseException as error:
+                    flight.finish(error=error)
+                    raise
+                # Sessions asking the same thing meanwhile receive these chunks too
+                source = flight.relay(itertools.chain([first_chunk] if first_chunk else [], stream),
+                                      lambda: _chain_result(turn_info))
+            else:
+                # The same prompt is already in flight for another session: follow its stream
+                _follow_flight(timer, turn_info)
+                source = flight.follow()
+
+            for chunk_text in source:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                    timer.mark("ttfb")
+                    logger.info(f"Time to first token: {first_token_time - start_time:.2f}s")
+                chunks.append(chunk_text)
+                yield chunk_text
+            if leader:
+                turn_info["usage"] = stream.usage
+            else:
+                turn_info.update(flight.result)
+            failed = False
+
+            if not chunks:
+                logger.warning("API response blocked or empty.")
+                outcome = "blocked"
+                yield BLOCKED_RESPONSE_MESSAGE
+            elif cache_language is not None and turn_info.get("tier") == 0:
+                # Only complete, error-free answers of the profile's preferred model are cached
+                answer_cache.ANSWER_CACHE.put(student_input, cache_language, "".join(chunks).strip(), ANSWER_CACHE_VERSION)
+
+        except breaker.CircuitOpen:
+            outcome = "degraded"
+            yield failure_reply(None)
+        except backends.BlockedResponse as blocked_err:
+            logger.warning(f"API response blocked mid-stream: {blocked_err}")
+            failed = False
+            outcome = "blocked"
+            separator = "\n\n" if chunks else ""
+            yield separator + BLOCKED_RESPONSE_MESSAGE
+        except ratelimit.RateLimitTimeout as queue_err:
+            logger.warning(f"Quota queue timeout: {queue_err}")
+            # This process's own backlog, not a verdict on the API
+            failed = None
+            outcome = "rate_limited"
+            yield failure_reply(RATE_LIMIT_MESSAGE)
+        except core_exceptions.ResourceExhausted as rate_limit_err:
+            logger.warning(f"API Rate Limit Reached: {rate_limit_err}")
+            failed = True
+            outcome = "rate_limited"
+            yield failure_reply(RATE_LIMIT_MESSAGE)
+        except Exception as e:
+            logger.error(f"Error processing API request: {e}")
+            failed = True
+            outcome = "error"
+            yield failure_reply(f"Désolé, une erreur s'est produite: {str(e)}")
+    finally:
+        if source is not None:
+            # Stopped early: a leader still reads the answer for its followers
+            source.close()
+        if api_start is not None:
+            # Time spent by the consumer rendering chunks is not API time
+            timer.add("api", time.perf_counter() - api_start - timer.durations["queue"] - timer.durations["render"])
+            total_time = time.perf_counter() - start_time
+            ttft = f"{first_token_time - start_time:.2f}s" if first_token_time else "n/a"
+            logger.info(
+                f"Streamed response finished: model {turn_info.get('model') or 'n/a'}, "
+                f"time to first token {ttft}, total {total_time:.2f}s"
+            )
+        if allowed:
+            # The breaker judges the API by its time to first chunk; a consumer that
+            # stopped reading (failed still None) gives no verdict
+            api_seconds = ((first_token_time or time.perf_counter()) - api_start - timer.durations["queue"]
+                           if api_start is not None else 0.0)
+            BREAKER.record(api_seconds, failed)
+        _turn_outcome(timer, outcome, turn_info)
+        if owns_timer:
+            timer.finish()
+
+
+def _speculative_request(student_input, conversation_history, history_memory, response_language, profile):
+    """generate() -> followups.Prefetched or None for a likely next question, or None if not worth it.
+
+    The prompt is built here, in the session's thread (history_memory and
+    profile belong to it); generate() runs in a PREFETCHER worker. Turns
+    the router, the knowledge base or the answer cache would answer are
+    not prefetched, nor is anything while BREAKER is not closed. The answer
+    to a question that does not depend on the history also goes into the
+    answer cache.
+    """
+    backend = get_backend()
+    if not PREFETCH_FOLLOWUPS or backend is None or BREAKER.state != breaker.CLOSED:
+        return None
+    # Never finished: a speculative request is not a turn
+    timer = telemetry.TurnTimer(mode="prefetch")
+    turn_info = {}
+    if (_routed_answer(student_input, conversation_history, response_language, timer, turn_info)
+            or _knowledge_answer(student_input, conversation_history, response_language, timer, turn_info)):
+        return None
+    cache_language = _answer_cache_language(student_input, conversation_history, response_language)
+    if cache_language is not None and answer_cache.ANSWER_CACHE.get(
+            student_input, cache_language, ANSWER_CACHE_VERSION, record=False) is not None:
+        return None
+    gen_profile = _generation_profile(student_input, profile, timer, turn_info)
+    messages = _build_messages(student_input, conversation_history, history_memory, timer, profile, response_language,
+                               gen_profile, cache_language)
+    # The profile's preferred model only: a speculative answer never falls back
+    model_name = gen_profile.model_names[0]
+    rpm, tpm = _quotas(model_name)
+    generation_config = _generation_config(gen_profile)
+    prompt_tokens = estimate_tokens(messages[0]["parts"][0])
+    key_pool = _key_pool
+
+    def generate():
+        if (BREAKER.state != breaker.CLOSED
+                or key_pool.headroom(model_name, rpm, tpm, prompt_tokens) < PREFETCH_MIN_HEADROOM):
+            return None
+        # In flight like any other request: a student asking this before it is
+        # done follows the stream instead of waiting for the whole answer
+        flight, leader = singleflight.REQUESTS.begin(_request_key(messages, gen_profile))
+        if not leader:
+            return None
+        # Only the leader spends quota, and spare quota only, without waiting for
+        # it; all speculative requests share one place ("prefetch") in the fair queue
+        try:
+            key, _ = key_pool.acquire(model_name, "prefetch", prompt_tokens, rpm, tpm, timeout=0)
+        except ratelimit.RateLimitTimeout as quota_err:
+            flight.finish(error=quota_err)
+            return None
+        api_start = time.perf_counter()
+        first_chunk_seconds = None
+        failed = True
+        chunks = []
+        try:
+            _init_models(backend, gen_profile)
+            with key_pool.using(key, model_name):
+                stream = backend.stream(model_name, messages, generation_config, api_key=key.api_key)
+                for chunk_text in flight.relay(stream, lambda: {"model": model_name, "tier": 0, "attempts": 1}):
+                    if first_chunk_seconds is None:
+                        first_chunk_seconds = time.perf_counter() - api_start
+                    chunks.append(chunk_text)
+            failed = False
+        except backends.BlockedResponse as blocked_err:
+            flight.finish(error=blocked_err)
+            failed = False
+            return None
+        except BaseException as error:
+            # Failed before relaying anything: followers get the error instead of waiting
+            flight.finish(error=error)
+            raise
+        finally:
+            BREAKER.record(first_chunk_seconds or time.perf_counter() - api_start, failed)
+        text = "".join(chunks).strip()
+        cached = cache_language is not None and bool(text)
+        if cached:
+            # Other sessions offered the same suggestion find it there instead of prefetching it again
+            answer_cache.ANSWER_CACHE.put(student_input, cache_language, text, ANSWER_CACHE_VERSION)
+        return followups.Prefetched(text, model_name, 0, stream.usage, cached, gen_profile.name)
+
+    return generate
+
+
+def prefetch_followups(suggestions, conversation_history, history_memory=None, response_language=None,
+                       session_id=None, profile=None):
+    """Starts answering the likeliest suggestions in the background.
+
+    Suggestions answered locally anyway (router, knowledge base, answer
+    cache) are passed over, up to PREFETCH_PER_TURN requests started.
+    conversation_history ends with the reply the suggestions follow.
+    Returns the number of speculative requests started.
+    """
+    started = 0
+    for suggestion in suggestions:
+        if started >= PREFETCH_PER_TURN:
+            break
+        generate = _speculative_request(suggestion.text, conversation_history, history_memory, response_language,
+                                        profile)
+        if generate is not None and PREFETCHER.submit(session_id, len(conversation_history), suggestion.text,
+                                                      generate):
+            started += 1
+    return started
+
+
+def prefetched_answer(student_input, conversation_history, timer, session_id=None, turn_info=None):
+    """The speculative answer to the question a session just asked, or None.
+
+    Call it for every student message: the session's other speculative
+    answers are evicted as unused. A used one is recorded in timer like a
+    cache hit (cache "prefetch", with the model and tokens it cost). One
+    still being generated is not waited for: the turn's own request,
+    identical, follows it in flight.
+    """
+    prefetched = PREFETCHER.take(session_id, len(conversation_history), student_input)
+    if prefetched is None or not prefetched.text:
+        return None
+    turn_info = {} if turn_info is None else turn_info
+    turn_info.update(model=prefetched.model, tier=prefetched.tier, usage=prefetched.usage, profile=prefetched.profile)
+    timer.set(cache="prefetch", profile=prefetched.profile)
+    timer.mark("ttfb")
+    _turn_outcome(timer, "ok", turn_info)
+    logger.info(f"Answered from a speculative request ({PREFETCHER.snapshot()['hit_rate']:.0%} of them used).")
+    return prefetched.text
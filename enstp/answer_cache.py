@@ -0,0 +1,181 @@
+"""Process-wide cache of answers to history-independent questions."""
+import collections
+import logging
+import re
+import threading
+import time
+
+from enstp.text import fold_accents, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_SIMILARITY = 0.8
+
+# Words that tie a message to the student or to earlier turns ("et pour le
+# DIB ?", "dans mon cas", "recommande-moi"): such turns are never cached.
+_CONTEXT_WORDS = frozenset("""
+je j me m moi mon ma mes nous notre nos i me my mine we our
+ca cela celui celle ceux celles lui leur it that this those them
+aussi alors sinon pareil meme autre precedent dernier
+recommande recommander recommandes recommandez recommandation conseil conseille conseilles
+conseillez avis choisir choix choisis prefere prefer recommend recommendation advice choose
+""".split())
+# "parle-moi de ...", "explique-nous ..." address the advisor, not the student
+_IMPERATIVE_PRONOUN_RE = re.compile(r"\b(parle[rz]?|dis|explique[rz]?|decri[st]?|donne[rz]?) (moi|nous)\b")
+_QUESTION_START_RE = re.compile(
+    r"^(c ?est quoi|qu ?est ?ce|quel|quelle|quels|quelles|comment|combien|pourquoi|ou |"
+    r"quand|qui |existe|y a|liste|explique|expliquez|parle[rz]? (de|du|des|d)|donne|dis|"
+    r"decri|what|which|how|why|where|when|who|is there|are there|list|explain|describe|tell me about)"
+)
+
+# Negation, restriction and contrast: the cache key is a bag of
+# stopword-free terms, which drops them and their order ("au DMS mais pas
+# au DIB" would match "au DIB mais pas au DMS", and "ne sont pas au DMS"
+# match "sont au DMS"), so such questions are never cached.
+_NEGATION_WORDS = frozenset("""
+ne n pas plus jamais aucun aucune aucuns aucunes rien sans sauf excepte hormis mais contrairement seulement
+uniquement exclusivement not no never none nothing without except but unlike only
+""".split())
+
+CacheEntry = collections.namedtuple("CacheEntry", ["terms", "answer", "expires_at"])
+
+
+def normalize_question(question):
+    """Bag of folded, stopword-free terms used to compare questions."""
+    return frozenset(tokenize(question))
+
+
+def _folded_words(student_input):
+    folded = " ".join(re.findall(r"\w+", fold_accents(student_input)))
+    return _IMPERATIVE_PRONOUN_RE.sub(r"\1", folded)
+
+
+def refers_to_context(student_input):
+    """Whether the message refers to the student or to earlier turns."""
+    return bool(set(_folded_words(student_input).split()) & _CONTEXT_WORDS)
+
+
+def has_negation(student_input):
+    """Whether the message negates, restricts or contrasts ("pas", "sauf", "mais", "only")."""
+    return bool(set(_folded_words(student_input).split()) & _NEGATION_WORDS)
+
+
+def is_question(student_input):
+    """Whether the message asks something (question mark or interrogative opening)."""
+    return student_input.rstrip().endswith("?") or bool(_QUESTION_START_RE.match(_folded_words(student_input)))
+
+
+def is_history_independent(student_input):
+    """Whether a turn's answer does not depend on the conversation so far.
+
+    Only self-contained factual questions qualify: they look like a
+    question, carry enough content words and have no reference to the
+    student or to earlier turns, nor any negation or contrast the cache
+    key would lose.
+    """
+    if refers_to_context(student_input) or has_negation(student_input):
+        return False
+    if not is_question(student_input):
+        return False
+    return len(normalize_question(student_input)) >= 2
+
+
+class AnswerCache:
+    """LRU + TTL answer cache, namespaced by response language.
+
+    Lookups match the normalized question exactly, then fall back to the
+    most similar cached question (Jaccard over terms) above the threshold.
+    Every entry belongs to a version (guide text + prompt template); using a
+    new version drops everything cached under the old one.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 similarity_threshold=DEFAULT_SIMILARITY, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._namespaces = collections.defaultdict(collections.OrderedDict)
+        self._version = None
+        self.stats = collections.Counter()
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self._version:
+            if self._version is not None:
+                logger.info(f"Answer cache invalidated (version {self._version} -> {version}).")
+                self.stats["invalidations"] += 1
+            self._namespaces.clear()
+            self._version = version
+
+    def get(self, question, language, version, record=True):
+        """Cached answer for a similar question in this language, or None.
+
+        record=False only looks: no hit/miss is counted and the entry's
+        recency is left alone. Questions with a negation or contrast
+        (has_negation) are never cached.
+        """
+        if has_negation(question):
+            return None
+        terms = normalize_question(question)
+        key = " ".join(sorted(terms))
+        now = self._clock()
+        with self._lock:
+            self._check_version(version)
+            namespace = self._namespaces[language]
+            entry = namespace.get(key)
+            if entry is None:
+                best_similarity = 0.0
+                for candidate_key, candidate in namespace.items():
+                    similarity = len(terms & candidate.terms) / max(len(terms | candidate.terms), 1)
+                    if similarity > best_similarity:
+                        best_similarity, key, entry = similarity, candidate_key, candidate
+                if best_similarity < self.similarity_threshold:
+                    entry = None
+            if entry is not None and entry.expires_at <= now:
+                del namespace[key]
+                self.stats["expired"] += 1
+                entry = None
+            if not record:
+                return None if entry is None else entry.answer
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            namespace.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry.answer
+
+    def put(self, question, language, answer, version):
+        """Stores an answer, evicting the least recently used entry if full."""
+        if has_negation(question):
+            return
+        terms = normalize_question(question)
+        key = " ".join(sorted(terms))
+        with self._lock:
+            self._check_version(version)
+            namespace = self._namespaces[language]
+            namespace[key] = CacheEntry(terms, answer, self._clock() + self.ttl_seconds)
+            namespace.move_to_end(key)
+            while len(namespace) > self.max_entries:
+                namespace.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._namespaces.clear()
+
+    def snapshot(self):
+        """Hit/miss counters plus hit rate and entries per language."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = {language: len(entries) for language, entries in self._namespaces.items()}
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        return stats
+
+
+# Shared by every Streamlit session in this process.
+ANSWER_CACHE = AnswerCache()
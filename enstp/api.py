@@ -0,0 +1,311 @@
+"""Headless HTTP API of the advisor, next to the Streamlit UI.
+
+    python -m enstp.api                                 (development server)
+    gunicorn -k gthread --threads 32 "enstp.api:create_app()"
+
+Endpoints (JSON):
+- POST /api/sessions: a new conversation, {"session", "messages"}
+- GET /api/sessions/<session>: its messages (?start=&limit=), language
+  and DMS/DIB fit
+- DELETE /api/sessions/<session>
+- POST /api/sessions/<session>/turns, {"message": "..."}: the reply as
+  JSON, or as Server-Sent Events with "Accept: text/event-stream" (or
+  "stream": true): "queue", "chunk", then "done" or "error" events, each
+  with a JSON payload; "done" has the generation profile of the turn
+  ("clarify", "lookup" or "recommend"; null when answered locally) and
+  "degraded": true when the reply was quoted from the guide because the
+  model was unavailable
+
+Turns go through the same advisor code as the UI, on a bounded worker
+pool (API_WORKERS). Beyond API_MAX_PENDING turns in flight, requests get
+503 with Retry-After. Conversations live in the shared SQLite store
+(enstp.conversations), which checks its in-memory windows against the
+database and takes each turn's position inside the write transaction,
+so any worker process can serve any session; the state derived from
+them (history summary, language, profile) is cached per process and
+caught up from the store at each turn. Two turns of one session are
+only serialized within a process: sent at once to two processes, both
+are stored, each answered without the other. Quotas (GEMINI_RPM,
+GEMINI_TPM) are also counted per process.
+"""
+import collections
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+from enstp import advisor
+from enstp import conversations
+from enstp import history
+from enstp import keypool
+from enstp import language
+from enstp.student_profile import StudentProfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 32
+DEFAULT_SESSION_CACHE = 1000
+DEFAULT_PAGE = 50
+MAX_MESSAGE_CHARS = 20_000
+# Suggested client back-off when the pool is full (seconds)
+RETRY_AFTER_SECONDS = 5
+
+
+class ApiError(Exception):
+    """An error answered with its HTTP status and a JSON body."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class SessionState:
+    """What a turn needs besides the transcript, derived from it.
+
+    catch_up() reads the messages added since the last turn, wherever
+    they were added, so a stale or fresh state is brought up to date
+    from the store.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # one turn at a time per session
+        self._reset()
+
+    def _reset(self):
+        self.memory = history.ConversationMemory(
+            token_budget=advisor.HISTORY_TOKEN_BUDGET, recent_messages=advisor.HISTORY_RECENT_MESSAGES
+        )
+        self.profile = StudentProfile()
+        self.language = language.DEFAULT_LANGUAGE
+        self.seen = 0
+
+    def catch_up(self, transcript):
+        length = len(transcript)
+        if length < self.seen:
+            # Replaced by a shorter conversation: start over
+            self._reset()
+        for turn in transcript[self.seen:length]:
+            if turn.role == "user":
+                self.profile.observe(turn.content)
+                self.language = language.requested_language(turn.content) or self.language
+        self.seen = length
+
+
+class AdvisorService:
+    """Sessions, per-session state and the worker pool behind the API."""
+
+    def __init__(self, store, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 session_cache=DEFAULT_SESSION_CACHE):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.session_cache = session_cache
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="enstp-api")
+        self._admission = threading.BoundedSemaphore(self.max_pending)
+        self._states = collections.OrderedDict()  # session token -> SessionState, least recently used first
+        self._states_lock = threading.Lock()
+
+    def create_session(self):
+        token = self.store.create_session()
+        self.store.transcript(token).add("assistant", advisor.WELCOME_MESSAGE)
+        return token
+
+    def open(self, token):
+        transcript = self.store.open(token)
+        if transcript is None:
+            raise ApiError(404, "Unknown session.")
+        return transcript
+
+    def delete(self, token):
+        self.open(token)
+        self.store.delete(token)
+        with self._states_lock:
+            self._states.pop(token, None)
+
+    def state(self, token):
+        with self._states_lock:
+            state = self._states.get(token)
+            if state is None:
+                state = self._states[token] = SessionState()
+                while len(self._states) > self.session_cache:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(token)
+            return state
+
+    def session(self, token, start=None, limit=DEFAULT_PAGE):
+        """A page of messages (the latest by default), with the language and DMS/DIB fit."""
+        transcript = self.open(token)
+        state = self.state(token)
+        # A turn in progress holds the lock: answer with the state as it is
+        if state.lock.acquire(blocking=False):
+            try:
+                state.catch_up(transcript)
+            finally:
+                state.lock.release()
+        length = len(transcript)
+        start = max(length - limit, 0) if start is None else min(max(start, 0), length)
+        fit = state.profile.fit()
+        return {
+            "session": token,
+            "length": length,
+            "start": start,
+            "messages": [{"role": turn.role, "content": turn.content}
+                         for turn in transcript[start:min(start + limit, length)]],
+            "language": state.language,
+            "fit": {"dms": round(fit.dms, 3), "dib": round(fit.dib, 3), "evidence": fit.evidence_count},
+        }
+
+    def submit_turn(self, token, message, stream, on_event=None):
+        """Starts a turn on the pool; returns its Future (result: the "done" payload).
+
+        With stream, on_event(name, payload) receives the "queue" and
+        "chunk" events as the worker produces them.
+        """
+        transcript = self.open(token)
+        state = self.state(token)
+        if not state.lock.acquire(blocking=False):
+            raise ApiError(409, "A turn is already in progress for this session.")
+        if not self._admission.acquire(blocking=False):
+            state.lock.release()
+            raise ApiError(503, "Service saturated, retry later.", {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        try:
+            return self._executor.submit(self._run_turn, token, transcript, state, message, stream, on_event)
+        except BaseException:
+            self._admission.release()
+            state.lock.release()
+            raise
+
+    def _run_turn(self, token, transcript, state, message, stream, on_event):
+        try:
+            state.catch_up(transcript)
+            history_for_api = transcript.snapshot()
+            transcript.add("user", message)
+            state.catch_up(transcript)
+            # The token resumes the conversation: only a digest of it goes to logs and telemetry
+            session_id = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+            turn_info = {}
+            arguments = dict(session_id=session_id, turn_info=turn_info, profile=state.profile)
+            if stream:
+                chunks = []
+                for chunk in advisor.stream_enstp_response(
+                        message, history_for_api, state.memory, state.language,
+                        on_queue_update=lambda position, wait: on_event(
+                            "queue", {"position": position + 1, "estimated_wait": round(wait, 1)}),
+                        **arguments):
+                    chunks.append(chunk)
+                    on_event("chunk", {"text": chunk})
+                reply = "".join(chunks).strip()
+            else:
+                reply = advisor.get_enstp_response(message, history_for_api, state.memory, state.language,
+                                                   **arguments)
+            transcript.add("assistant", reply)
+            state.seen = len(transcript)
+            done = {"session": token, "reply": reply, "model": turn_info.get("model"),
+                    "tier": turn_info.get("tier"), "intent": turn_info.get("intent"),
+                    "profile": turn_info.get("profile"), "degraded": bool(turn_info.get("degraded"))}
+            if turn_info.get("intent") == "clear_conversation":
+                # The student asked to start over: the client continues with a new session
+                self.store.delete(token)
+                with self._states_lock:
+                    self._states.pop(token, None)
+                done["session"] = self.create_session()
+            return done
+        finally:
+            self._admission.release()
+            state.lock.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(service=None):
+    """The Flask application; without a service, one is built from the environment."""
+    if service is None:
+        api_keys = keypool.parse_keys(os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEY") or "")
+        advisor.configure(api_keys=api_keys)
+        advisor.warm_up()
+        store = conversations.get_store()
+        if store is None:
+            logger.warning("Conversation store disabled: API sessions are kept in this process only.")
+            store = conversations.ConversationStore(":memory:")
+        service = AdvisorService(
+            store,
+            workers=int(os.getenv("API_WORKERS", DEFAULT_WORKERS)),
+            max_pending=int(os.getenv("API_MAX_PENDING", DEFAULT_MAX_PENDING)),
+            session_cache=int(os.getenv("API_SESSION_CACHE", DEFAULT_SESSION_CACHE)),
+        )
+    app = Flask(__name__)
+    app.extensions["enstp_advisor"] = service
+
+    @app.errorhandler(ApiError)
+    def api_error(error):
+        return jsonify(error=str(error)), error.status, error.headers
+
+    @app.post("/api/sessions")
+    def create_session():
+        token = service.create_session()
+        return jsonify(service.session(token)), 201
+
+    @app.get("/api/sessions/<token>")
+    def get_session(token):
+        start = request.args.get("start", type=int)
+        limit = min(max(request.args.get("limit", DEFAULT_PAGE, type=int), 1), DEFAULT_PAGE)
+        return jsonify(service.session(token, start, limit))
+
+    @app.delete("/api/sessions/<token>")
+    def delete_session(token):
+        service.delete(token)
+        return "", 204
+
+    @app.post("/api/sessions/<token>/turns")
+    def post_turn(token):
+        body = request.get_json(silent=True) or {}
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise ApiError(400, 'Expected a JSON body with a non-empty "message".')
+        if len(message) > MAX_MESSAGE_CHARS:
+            raise ApiError(413, f"Messages are limited to {MAX_MESSAGE_CHARS} characters.")
+        stream = bool(body.get("stream")) or request.accept_mimetypes.best == "text/event-stream"
+        if not stream:
+            return jsonify(service.submit_turn(token, message.strip(), stream=False).result())
+
+        events = queue.Queue()
+        future = service.submit_turn(token, message.strip(), stream=True,
+                                     on_event=lambda name, payload: events.put((name, payload)))
+        future.add_done_callback(lambda _: events.put(None))
+
+        def event_stream():
+            # A client that disconnects does not stop the turn: its reply is still saved
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+            error = future.exception()
+            if error is not None:
+                logger.error(f"API turn failed: {error}")
+                yield _sse("error", {"error": "Internal error."})
+            else:
+                yield _sse("done", future.result())
+
+        return Response(event_stream(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    create_app().run(host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", 8000)), threaded=True)
@@ -0,0 +1,301 @@
+"""LLM backends: the Gemini API and a deterministic offline stub.
+
+Every backend offers generate() for a whole answer and stream() for text
+chunks, reports token usage, and signals failures the same way: quota
+errors as google.api_core exceptions (as the Gemini SDK does) and
+blocked or empty answers as BlockedResponse.
+"""
+import collections
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.text import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+Usage = collections.namedtuple("Usage", ["prompt_tokens", "output_tokens"])
+Completion = collections.namedtuple("Completion", ["text", "usage"])
+
+
+class BlockedResponse(Exception):
+    """The answer was blocked (e.g. by safety filters) or came back empty."""
+
+
+class TextStream:
+    """Iterator over the text chunks of one answer.
+
+    usage is None until the stream has been fully consumed.
+    """
+
+    def __init__(self, chunks, prompt_tokens, usage_fn=None):
+        self._chunks = iter(chunks)
+        self._prompt_tokens = prompt_tokens
+        self._usage_fn = usage_fn
+        self._text_length = 0
+        self.usage = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            usage = self._usage_fn() if self._usage_fn else None
+            self.usage = usage or Usage(self._prompt_tokens, (self._text_length + 3) // 4)
+            raise
+        self._text_length += len(chunk)
+        return chunk
+
+
+def _prompt_text(prompt):
+    """Plain text of a prompt given as a string or as a message list."""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n".join(part for message in prompt for part in message["parts"] if isinstance(part, str))
+
+
+class LLMBackend:
+    """Interface shared by all providers."""
+
+    name = "base"
+
+    def prepare(self, model_names, generation_config=None):
+        """Checks up front that every model can be used (no-op by default)."""
+
+    def generate(self, model_name, prompt, generation_config=None, api_key=None):
+        """Returns a Completion for the whole answer.
+
+        api_key selects a key of the pool (keypool.KeyPool); None means
+        the backend's own.
+        """
+        raise NotImplementedError
+
+    def stream(self, model_name, prompt, generation_config=None, api_key=None):
+        """Returns a TextStream of the answer."""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """google.generativeai models from the process-wide registry."""
+
+    name = "gemini"
+
+    def __init__(self, api_key):
+        # The SDK takes about a second to import: it is loaded (and
+        # configured) by the first model lookup, not at startup
+        self.api_key = api_key
+
+    def _model(self, model_name, generation_config, api_key=None):
+        from enstp import client as gemini_client
+
+        return gemini_client.get_model(api_key or self.api_key, model_name, generation_config)
+
+    def prepare(self, model_names, generation_config=None):
+        for model_name in model_names:
+            self._model(model_name, generation_config)
+
+    @staticmethod
+    def _usage(response, prompt):
+        metadata = getattr(response, "usage_metadata", None)  # newer SDKs only
+        if metadata is not None:
+            return Usage(metadata.prompt_token_count, metadata.candidates_token_count)
+        return None
+
+    def generate(self, model_name, prompt, generation_config=None, api_key=None):
+        from google.generativeai import types
+
+        try:
+            response = self._model(model_name, generation_config, api_key).generate_content(prompt)
+            if not response.candidates:
+                raise BlockedResponse("API response blocked or empty.")
+            text = response.text.strip()
+        except (types.BlockedPromptException, types.StopCandidateException) as blocked_err:
+            raise BlockedResponse(str(blocked_err)) from blocked_err
+        usage = self._usage(response, prompt) or Usage(estimate_tokens(_prompt_text(prompt)), estimate_tokens(text))
+        return Completion(text, usage)
+
+    def stream(self, model_name, prompt, generation_config=None, api_key=None):
+        from google.generativeai import types
+
+        model = self._model(model_name, generation_config, api_key)
+        responses = []
+
+        def chunks():
+            try:
+                response = model.generate_content(prompt, stream=True)
+                responses.append(response)
+                for chunk in response:
+                    # A chunk without parts means generation was stopped (e.g. safety)
+                    if not chunk.candidates or not chunk.candidates[0].content.parts:
+                        continue
+                    if chunk.text:
+                        yield chunk.text
+            except (types.BlockedPromptException, types.StopCandidateException) as blocked_err:
+                raise BlockedResponse(str(blocked_err)) from blocked_err
+
+        return TextStream(chunks(), estimate_tokens(_prompt_text(prompt)),
+                          lambda: self._usage(responses[0], prompt) if responses else None)
+
+
+def parse_latency(spec):
+    """Latency distribution from "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA"."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+_STUDENT_INPUT_RE = re.compile(r"\*\*Dernière Entrée de l'Étudiant:\*\*\s*(.*?)\s*\*\*Votre Prochaine Action", re.S)
+_SECTION_TITLE_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2})+) (.+)$", re.M)
+
+
+class StubBackend(LLMBackend):
+    """Offline stand-in for load tests, benchmarks and the app without a key.
+
+    Everything is drawn from a RNG seeded by (seed, model, prompt), so a
+    given prompt always gets the same latency, failures and answer,
+    whatever the thread interleaving.
+    - latency: distribution of the time to first token (parse_latency)
+    - tokens_per_second: output pace; stream() spreads it over chunks
+    - output_tokens: answer length, capped by the generation config's
+      max_output_tokens
+    - rate_limit_rate / block_rate: share of calls that raise
+      ResourceExhausted / BlockedResponse
+    - key_requests_per_minute: per-key quota of each model (0: none);
+      like the real API, a key that already sent that many requests in
+      the last key_window_seconds gets ResourceExhausted
+    """
+
+    name = "stub"
+
+    def __init__(self, seed=0, latency="lognormal:0.6,0.4", tokens_per_second=80.0, output_tokens=180,
+                 rate_limit_rate=0.0, block_rate=0.0, key_requests_per_minute=0, key_window_seconds=60.0,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.seed = seed
+        self.latency_spec = latency
+        self._latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.rate_limit_rate = rate_limit_rate
+        self.block_rate = block_rate
+        self.key_requests_per_minute = key_requests_per_minute
+        self.key_window_seconds = key_window_seconds
+        self._sleep = sleep
+        self._clock = clock
+        self._key_lock = threading.Lock()
+        self._key_requests = {}  # (api key, model) -> deque of request times
+
+    def _rng(self, model_name, prompt_text):
+        digest = hashlib.sha256(f"{self.seed}\x00{model_name}\x00{prompt_text}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _output_tokens(self, generation_config):
+        limit = (generation_config or {}).get("max_output_tokens")
+        return min(self.output_tokens, limit) if limit else self.output_tokens
+
+    def _answer(self, prompt_text, rng, output_tokens):
+        match = _STUDENT_INPUT_RE.search(prompt_text)
+        question = " ".join(match.group(1).split()) if match else "votre question"
+        titles = [title.strip() for _, title in _SECTION_TITLE_RE.findall(prompt_text)]
+        words = [f"[Réponse simulée] Concernant « {question} »:"]
+        if titles:
+            words.append("le guide en parle dans " + ", ".join(titles[:3]) + ".")
+        filler = ("Le DMS approfondit l'analyse des structures et des matériaux, tandis que le DIB "
+                  "privilégie la planification des réseaux d'infrastructure.").split()
+        target_chars = output_tokens * 4
+        text = " ".join(words)
+        while len(text) < target_chars:
+            text += " " + filler[rng.randrange(len(filler))]
+        return text
+
+    def _check_key_quota(self, model_name, api_key):
+        if not self.key_requests_per_minute:
+            return
+        now = self._clock()
+        with self._key_lock:
+            sent = self._key_requests.setdefault((api_key, model_name), collections.deque())
+            while sent and sent[0] <= now - self.key_window_seconds:
+                sent.popleft()
+            if len(sent) >= self.key_requests_per_minute:
+                raise core_exceptions.ResourceExhausted(
+                    f"Stub quota of {self.key_requests_per_minute} requests per minute exceeded"
+                )
+            sent.append(now)
+
+    def _begin(self, model_name, prompt, api_key=None):
+        self._check_key_quota(model_name, api_key)
+        prompt_text = _prompt_text(prompt)
+        rng = self._rng(model_name, prompt_text)
+        self._sleep(self._latency(rng))
+        if rng.random() < self.rate_limit_rate:
+            raise core_exceptions.ResourceExhausted("Stub quota exceeded")
+        if rng.random() < self.block_rate:
+            raise BlockedResponse("Stub response blocked.")
+        return prompt_text, rng
+
+    def generate(self, model_name, prompt, generation_config=None, api_key=None):
+        prompt_text, rng = self._begin(model_name, prompt, api_key)
+        output_tokens = self._output_tokens(generation_config)
+        text = self._answer(prompt_text, rng, output_tokens)
+        self._sleep(output_tokens / self.tokens_per_second)
+        return Completion(text, Usage(estimate_tokens(prompt_text), output_tokens))
+
+    def stream(self, model_name, prompt, generation_config=None, api_key=None):
+        prompt_text, rng = self._begin(model_name, prompt, api_key)
+        output_tokens = self._output_tokens(generation_config)
+        text = self._answer(prompt_text, rng, output_tokens)
+        words = text.split(" ")
+        per_chunk = 8
+
+        def chunks():
+            for index in range(0, len(words), per_chunk):
+                chunk = " ".join(words[index:index + per_chunk])
+                if index:
+                    chunk = " " + chunk
+                yield chunk
+                self._sleep(estimate_tokens(chunk) / self.tokens_per_second)
+
+        return TextStream(chunks(), estimate_tokens(prompt_text),
+                          lambda: Usage(estimate_tokens(prompt_text), output_tokens))
+
+
+def stub_from_env(environ=os.environ):
+    """StubBackend configured by the ENSTP_STUB_* environment variables."""
+    return StubBackend(
+        seed=int(environ.get("ENSTP_STUB_SEED", 0)),
+        latency=environ.get("ENSTP_STUB_LATENCY", "lognormal:0.6,0.4"),
+        tokens_per_second=float(environ.get("ENSTP_STUB_TOKENS_PER_SECOND", 80)),
+        output_tokens=int(environ.get("ENSTP_STUB_OUTPUT_TOKENS", 180)),
+        rate_limit_rate=float(environ.get("ENSTP_STUB_RATE_LIMIT_RATE", 0)),
+        block_rate=float(environ.get("ENSTP_STUB_BLOCK_RATE", 0)),
+        key_requests_per_minute=int(environ.get("ENSTP_STUB_KEY_RPM", 0)),
+    )
+
+
+def selected_backend(environ=os.environ):
+    """Name of the backend selected by ENSTP_LLM_BACKEND ("gemini", the default, or "stub")."""
+    return environ.get("ENSTP_LLM_BACKEND", "gemini").strip().lower() or "gemini"
+
+
+def backend_from_env(api_key=None, environ=os.environ):
+    """A new instance of the backend selected by ENSTP_LLM_BACKEND."""
+    name = selected_backend(environ)
+    if name == "stub":
+        return stub_from_env(environ)
+    if name != "gemini":
+        raise ValueError(f"Unknown ENSTP_LLM_BACKEND: {name!r}")
+    return GeminiBackend(api_key)
@@ -0,0 +1,142 @@
+"""Process-wide circuit breaker in front of the model chain.
+
+Closed: calls go through and their outcomes fill a rolling window. Once
+the window holds enough calls and too many of them failed or were too
+slow, the breaker opens: calls are refused (the advisor answers from the
+guide instead) for open_seconds. It then goes half-open and lets one
+probe call through: success closes it, failure opens it again for twice
+as long (up to max_open_seconds).
+"""
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_WINDOW = 20
+DEFAULT_MINIMUM_CALLS = 5
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_SLOW_CALL_SECONDS = 30.0
+DEFAULT_OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 300.0
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the model while the breaker refuses calls."""
+
+
+class CircuitBreaker:
+    """Trips on a high share of failed or slow calls; probes to recover.
+
+    allow() says whether a call may go to the model; every allowed call
+    must then be reported with record(). A call slower than
+    slow_call_seconds counts as a failure even if it succeeded.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, minimum_calls=DEFAULT_MINIMUM_CALLS,
+                 failure_rate=DEFAULT_FAILURE_RATE, slow_call_seconds=DEFAULT_SLOW_CALL_SECONDS,
+                 open_seconds=DEFAULT_OPEN_SECONDS, max_open_seconds=MAX_OPEN_SECONDS, clock=time.monotonic):
+        self.window = window
+        self.minimum_calls = min(minimum_calls, window)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = collections.deque(maxlen=window)  # True for a failed or slow call
+        self.state = CLOSED
+        self._opened_at = None
+        self._open_for = open_seconds
+        self._probe_started = None  # while half-open, when the probe in flight was let through
+        self.stats = collections.Counter()
+
+    def allow(self):
+        """True if a call may go to the model, False to answer without it."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self._clock()
+            if self.state == OPEN:
+                if now - self._opened_at < self._open_for:
+                    self.stats["rejected"] += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started = None
+                logger.info("Circuit breaker half-open: probing the model.")
+            # A probe that never reported back (abandoned stream) stops blocking after a while
+            if self._probe_started is not None and now - self._probe_started < self.slow_call_seconds:
+                self.stats["rejected"] += 1
+                return False
+            self._probe_started = now
+            self.stats["probes"] += 1
+            return True
+
+    def record(self, seconds, failed):
+        """Outcome of an allowed call: its duration, and whether it failed.
+
+        failed=None (the caller gave up before the model answered) gives
+        no verdict: it only frees the probe slot while half-open.
+        """
+        if failed is not None:
+            failed = failed or seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed is None:
+                    self._probe_started = None
+                elif failed:
+                    self._trip(min(self._open_for * 2, self.max_open_seconds), "the probe failed")
+                else:
+                    self._close()
+                return
+            if self.state == OPEN or failed is None:
+                # A call let through before the breaker tripped
+                return
+            self.stats["failures" if failed else "successes"] += 1
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= self.minimum_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._trip(self.open_seconds, f"{failures} of the last {len(self._outcomes)} calls failed or were slow")
+
+    def _trip(self, open_for, reason):
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self._open_for = open_for
+        self._probe_started = None
+        self._outcomes.clear()
+        self.stats["trips"] += 1
+        logger.warning(f"Circuit breaker open for {open_for:.0f}s ({reason}): answering from the guide.")
+
+    def _close(self):
+        self.state = CLOSED
+        self._opened_at = None
+        self._open_for = self.open_seconds
+        self._probe_started = None
+        self._outcomes.clear()
+        logger.info("Circuit breaker closed: the model answers again.")
+
+    def reset(self):
+        """Back to closed with an empty window (e.g. after a backend change)."""
+        with self._lock:
+            if self.state != CLOSED:
+                self._close()
+            self._outcomes.clear()
+
+    def snapshot(self):
+        """State, seconds until the next probe, rolling failure share and counters."""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self._open_for - (self._clock() - self._opened_at))
+            return {
+                "state": self.state,
+                "retry_in": None if retry_in is None else round(retry_in, 1),
+                "window_calls": len(self._outcomes),
+                "failure_share": sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0,
+                **self.stats,
+            }
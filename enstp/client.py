@@ -0,0 +1,87 @@
+"""Process-wide registry of configured Gemini models.
+
+Models are cached per API key: each key gets its own gRPC client, so the
+keys of a keypool.KeyPool can be used side by side in one process.
+"""
+import dataclasses
+import logging
+import threading
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+from enstp.keypool import fingerprint as _fingerprint
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_models = {}  # (key fingerprint, model name, config) -> GenerativeModel
+_clients = {}  # key fingerprint -> GenerativeServiceClient
+
+
+def _config_key(generation_config):
+    """Hashable registry key for a GenerationConfig (or dict, or None)."""
+    if generation_config is None:
+        return ()
+    if dataclasses.is_dataclass(generation_config):
+        generation_config = dataclasses.asdict(generation_config)
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in generation_config.items()
+        if value is not None
+    ))
+
+
+def _client(api_key, fingerprint):
+    """The gRPC client of an API key, created on first use (lock held)."""
+    client = _clients.get(fingerprint)
+    if client is None:
+        client = _clients[fingerprint] = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        logger.info(f"Created Gemini client for key {fingerprint} ({len(_clients)} keys).")
+    return client
+
+
+def _attach_client(model, client):
+    """Makes the model send its requests through the client of its own key.
+
+    google-generativeai 0.3.2 (pinned in requirements.txt) has no public
+    way to pass a client to GenerativeModel: generate_content uses the
+    private _client attribute and only falls back to the SDK's default
+    client, configured with a single key, when it is None. Check this
+    attribute again when upgrading the SDK.
+    """
+    if getattr(model, "_client", ...) is not None:
+        raise RuntimeError(f"google-generativeai {genai.__version__} no longer exposes GenerativeModel._client.")
+    model._client = client
+
+
+def get_model(api_key, model_name, generation_config=None):
+    """Returns the shared GenerativeModel for this key, model name and config."""
+    fingerprint = _fingerprint(api_key)
+    key = (fingerprint, model_name, _config_key(generation_config))
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(model_name, generation_config=generation_config)
+            _attach_client(model, _client(api_key, fingerprint))
+            _models[key] = model
+            logger.info(f"Created GenerativeModel {model_name} for key {fingerprint} ({len(_models)} cached).")
+    return model
+
+
+def invalidate(api_keys=None):
+    """Drops the cached models and clients of the keys not in api_keys.
+
+    Without api_keys every model and client is dropped. advisor.configure
+    calls this when the key set changes, so that a rotated or revoked key
+    keeps no live gRPC client.
+    """
+    kept = {_fingerprint(api_key) for api_key in api_keys or () if api_key}
+    with _lock:
+        stale = [fingerprint for fingerprint in _clients if fingerprint not in kept]
+        for fingerprint in stale:
+            del _clients[fingerprint]
+        for key in [key for key in _models if key[0] not in kept]:
+            del _models[key]
+    if stale:
+        logger.info(f"Dropped the Gemini clients of {len(stale)} key(s) ({', '.join(stale)}).")
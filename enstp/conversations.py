@@ -0,0 +1,398 @@
+"""Persistent conversations: SQLite (WAL) storage, small in-memory windows.
+
+Every turn is written to SQLite in WAL mode, so reads never wait for the
+writer and several worker processes can share the file and serve the
+same sessions. In memory, a
+session keeps only its last hot_window turns; older turns are paged in
+from the database when something reads them (the history summary after
+a resume, "earlier messages" in the UI). Sessions are identified by a
+random token, which lets a student resume a conversation after a
+reconnect. Windows of idle sessions are evicted from memory, and
+sessions idle past the retention period are deleted.
+"""
+import collections
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+from enstp.transcript import TranscriptView, Turn, format_turn, normalize_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data", "conversations.sqlite3")
+DEFAULT_HOT_WINDOW = 12
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_IDLE_SECONDS = 30 * 60
+DEFAULT_MAX_HOT_SESSIONS = 10_000
+DEFAULT_RETENTION_DAYS = 30
+# Expired sessions are purged at most this often (seconds)
+PURGE_INTERVAL = 60 * 60
+
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    length INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+CREATE TABLE IF NOT EXISTS messages (
+    token TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (token, position)
+) WITHOUT ROWID;
+"""
+
+
+class _HotSession:
+    """The last turns of a session, and when it was last used."""
+
+    __slots__ = ("length", "turns", "last_access")
+
+    def __init__(self, length, turns, hot_window, last_access):
+        self.length = length
+        self.turns = collections.deque(turns, maxlen=hot_window)
+        self.last_access = last_access
+
+    @property
+    def start(self):
+        """Position of the first turn kept in memory."""
+        return self.length - len(self.turns)
+
+
+class ConversationStore:
+    """Conversation turns in SQLite, with a bounded window per session in memory.
+
+    One connection is shared by the threads of this process behind a
+    lock; other processes open their own and WAL lets them read while
+    one of them writes. SQLite holds the truth: once per turn (open,
+    refresh) a window is checked against the session's length there and
+    reloaded when they differ, and appends take their position from it
+    inside the write transaction, so any process can carry on a session
+    another one served. Reads in between are served from memory.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, hot_window=DEFAULT_HOT_WINDOW, page_size=DEFAULT_PAGE_SIZE,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, max_hot_sessions=DEFAULT_MAX_HOT_SESSIONS,
+                 retention_days=DEFAULT_RETENTION_DAYS, clock=time.time):
+        self.path = path
+        self.hot_window = hot_window
+        self.page_size = page_size
+        self.idle_seconds = idle_seconds
+        self.max_hot_sessions = max_hot_sessions
+        self.retention_seconds = retention_days * 24 * 3600
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hot = collections.OrderedDict()  # token -> _HotSession, least recently used first
+        self._last_purge = 0.0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        # Durable at each checkpoint; a crash can lose only the last turns
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._hot.clear()
+            self._db.close()
+
+    def create_session(self):
+        """Token of a new, empty conversation."""
+        token = secrets.token_urlsafe(18)
+        now = self._clock()
+        with self._lock:
+            self._db.execute("INSERT INTO sessions (token, created_at, last_seen) VALUES (?, ?, ?)", (token, now, now))
+            self._hot[token] = _HotSession(0, (), self.hot_window, now)
+            self._evict_idle(now)
+        self._purge_expired(now)
+        return token
+
+    def open(self, token):
+        """StoredTranscript of an existing session, or None for an unknown token."""
+        if not token or not _TOKEN_RE.match(token):
+            return None
+        try:
+            with self._lock:
+                self._hot_session(token, check=True)
+        except KeyError:
+            return None
+        return StoredTranscript(self, token)
+
+    def refresh(self, token):
+        """Catches up with turns other processes appended; False once the session was deleted."""
+        try:
+            with self._lock:
+                self._hot_session(token, check=True)
+        except KeyError:
+            return False
+        return True
+
+    def transcript(self, token):
+        """StoredTranscript of a session created by this store."""
+        return StoredTranscript(self, token)
+
+    def delete(self, token):
+        with self._lock:
+            self._hot.pop(token, None)
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute("DELETE FROM messages WHERE token = ?", (token,))
+                self._db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+    def append(self, token, turn):
+        """Appends a turn to a session; returns its position."""
+        now = self._clock()
+        with self._lock:
+            with self._db:
+                # Write lock first: the length read is the one this insert follows
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute("SELECT length FROM sessions WHERE token = ?", (token,)).fetchone()
+                if row is None:
+                    # Deleted or purged by another process: the conversation starts over
+                    self._db.execute("INSERT INTO sessions (token, created_at, last_seen) VALUES (?, ?, ?)",
+                                     (token, now, now))
+                position = row[0] if row else 0
+                self._db.execute(
+                    "INSERT INTO messages (token, position, role, content) VALUES (?, ?, ?, ?)",
+                    (token, position, turn.role, turn.content),
+                )
+                self._db.execute("UPDATE sessions SET length = ?, last_seen = ? WHERE token = ?", (position + 1, now, token))
+            hot = self._hot.get(token)
+            if hot is not None and hot.length == position:
+                hot.turns.append(turn)
+                hot.length = position + 1
+                hot.last_access = now
+                self._hot.move_to_end(token)
+            else:
+                self._hot.pop(token, None)
+                self._hot_session(token, now)
+        return position
+
+    def length(self, token):
+        """Turns in a session as of its last refresh; 0 once it was deleted."""
+        with self._lock:
+            try:
+                return self._hot_session(token).length
+            except KeyError:
+                return 0
+
+    def turns(self, token, start, stop):
+        """Turns [start, stop) of a session: from memory if recent enough, else from SQLite."""
+        with self._lock:
+            try:
+                hot = self._hot_session(token)
+            except KeyError:
+                return []
+            stop = min(stop, hot.length)
+            if start >= stop:
+                return []
+            if start >= hot.start:
+                window = hot.turns
+                return [window[index - hot.start] for index in range(start, stop)]
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE token = ? AND position >= ? AND position < ? ORDER BY position",
+                (token, start, stop),
+            ).fetchall()
+        return [Turn(role, content) for role, content in rows]
+
+    def _hot_session(self, token, now=None, check=False):
+        """The session's window, loaded from SQLite if it was evicted (lock held).
+
+        With check, the window is also reloaded if its length differs from
+        the one in SQLite. Raises KeyError once the session is gone from
+        SQLite.
+        """
+        now = self._clock() if now is None else now
+        hot = self._hot.get(token)
+        if hot is not None and not check:
+            self._hot.move_to_end(token)
+            hot.last_access = now
+            return hot
+        row = self._db.execute("SELECT length FROM sessions WHERE token = ?", (token,)).fetchone()
+        if row is None:
+            self._hot.pop(token, None)
+            raise KeyError(token)
+        length = row[0]
+        if hot is None or hot.length != length:
+            # Evicted, or another process appended to the session since
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE token = ? AND position >= ? ORDER BY position",
+                (token, max(length - self.hot_window, 0)),
+            ).fetchall()
+            hot = self._hot[token] = _HotSession(length, (Turn(role, content) for role, content in rows),
+                                                 self.hot_window, now)
+            self._hot.move_to_end(token)
+            self._evict_idle(now)
+        else:
+            self._hot.move_to_end(token)
+        hot.last_access = now
+        return hot
+
+    def _evict_idle(self, now):
+        """Drops the windows of idle sessions, and the oldest ones above max_hot_sessions (lock held)."""
+        evicted = 0
+        while self._hot:
+            token, hot = next(iter(self._hot.items()))
+            if len(self._hot) <= self.max_hot_sessions and now - hot.last_access < self.idle_seconds:
+                break
+            del self._hot[token]
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} idle conversation(s) from memory ({len(self._hot)} kept).")
+        return evicted
+
+    def evict_idle(self):
+        with self._lock:
+            return self._evict_idle(self._clock())
+
+    def _purge_expired(self, now):
+        """Deletes the sessions idle past the retention period, at most once per PURGE_INTERVAL."""
+        if now - self._last_purge < PURGE_INTERVAL:
+            return 0
+        self._last_purge = now
+        cutoff = now - self.retention_seconds
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "DELETE FROM messages WHERE token IN (SELECT token FROM sessions WHERE last_seen < ?)", (cutoff,)
+                )
+                purged = self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+        if purged:
+            logger.info(f"Deleted {purged} conversation(s) idle for more than {self.retention_seconds // 86400} days.")
+        return purged
+
+    def snapshot(self):
+        """Sessions and turns currently held in memory."""
+        with self._lock:
+            return {
+                "hot_sessions": len(self._hot),
+                "hot_turns": sum(len(hot.turns) for hot in self._hot.values()),
+            }
+
+
+class StoredTranscriptView(TranscriptView):
+    """Read-only view of the first `length` turns of a stored conversation.
+
+    The last turns come from the session's memory window; older ones are
+    read from SQLite one page at a time. The last page read is kept, so
+    walking backwards through a long conversation costs one query per
+    page.
+    """
+
+    __slots__ = ("_store", "_token", "_page")
+
+    def __init__(self, store, token, length):
+        super().__init__(None, length)
+        self._store = store
+        self._token = token
+        self._page = (0, [])
+
+    @property
+    def token(self):
+        return self._token
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        length = len(self)
+        for start in range(0, length, self._store.page_size):
+            yield from self._store.turns(self._token, start, min(start + self._store.page_size, length))
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            turns = self._store.turns(self._token, start, stop) if start < stop else []
+            return turns if step == 1 else turns[::step]
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("transcript index out of range")
+        page_start, page = self._page
+        if not page_start <= index < page_start + len(page):
+            if index >= length - self._store.hot_window:
+                # The last turns: the session's memory window, no query
+                page_start, page_stop = max(length - self._store.hot_window, 0), length
+            else:
+                page_start = max(index - self._store.page_size + 1, 0)
+                page_stop = page_start + self._store.page_size
+            page = self._store.turns(self._token, page_start, page_stop)
+            self._page = (page_start, page)
+        return page[index - page_start]
+
+    @property
+    def formatted(self):
+        """Prompt lines ("Étudiant: ...") for the turns in this view."""
+        return "\n".join(format_turn(turn) for turn in self)
+
+
+class StoredTranscript(StoredTranscriptView):
+    """Transcript of a stored conversation: appends go to SQLite.
+
+    It holds no turns itself, so keeping it in st.session_state costs a
+    few bytes whatever the length of the conversation.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, store, token):
+        super().__init__(store, token, None)
+
+    def __len__(self):
+        return self._store.length(self._token)
+
+    def append(self, message):
+        """Appends a Turn or message dict and returns its Turn record."""
+        turn = normalize_message(message)
+        self._store.append(self._token, turn)
+        return turn
+
+    def add(self, role, content):
+        return self.append(Turn(role, content))
+
+    def refresh(self):
+        """Catches up with other processes; False once the conversation was deleted."""
+        return self._store.refresh(self._token)
+
+    def snapshot(self):
+        """View of the conversation as it is now."""
+        return StoredTranscriptView(self._store, self._token, len(self))
+
+
+_store_lock = threading.Lock()
+_store = None
+_store_opened = False
+
+
+def get_store():
+    """The process-wide store (CONVERSATION_DB_PATH), or None if it is disabled or cannot be opened."""
+    global _store, _store_opened
+    with _store_lock:
+        if not _store_opened:
+            _store_opened = True
+            path = os.getenv("CONVERSATION_DB_PATH", DEFAULT_DB_PATH)
+            if path:
+                try:
+                    _store = ConversationStore(
+                        path,
+                        hot_window=int(os.getenv("CONVERSATION_HOT_WINDOW", DEFAULT_HOT_WINDOW)),
+                        idle_seconds=float(os.getenv("CONVERSATION_IDLE_MINUTES", DEFAULT_IDLE_SECONDS / 60)) * 60,
+                        retention_days=float(os.getenv("CONVERSATION_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+                    )
+                    logger.info(f"Conversation store: {path}")
+                except (OSError, sqlite3.Error) as store_err:
+                    logger.error(f"Conversation store unavailable ({store_err}); conversations stay in memory.")
+        return _store
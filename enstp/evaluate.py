@@ -0,0 +1,308 @@
+"""Batch evaluation: scripted conversations replayed through the advisor.
+
+    python -m enstp.evaluate conversations.jsonl --output results.jsonl
+    ENSTP_LLM_BACKEND=stub python -m enstp.evaluate conversations.jsonl --output results.jsonl
+
+Each input line is one conversation:
+{"id": "dms-structures", "turns": ["Bonjour", {"message": "Quels modules au DMS ?",
+"expect_modules": ["Calcul Automatique des structures"]}]}. Conversations
+run in parallel on --workers threads, each turn through
+advisor.get_enstp_response as the app sends it (history, student profile,
+language). Every turn becomes one output line with its reply, latency,
+tokens, model, generation profile and grounding checks: the guide
+modules the reply names, those it ties to a department that does not
+teach them, and expected modules it leaves out. A conversation's lines
+are written once it is complete, so an interrupted run resumes where it
+stopped: conversations already in the output are skipped (--fresh starts
+over). Each run starts with an empty answer cache and a closed circuit
+breaker, whatever earlier runs in the process left there. A JSON
+summary is printed at the end.
+
+Turns wait in the advisor's quota queue: --rpm/--tpm set the primary
+model's quotas (GEMINI_RPM/GEMINI_TPM by default). With the offline stub
+backend, quotas are lifted unless given.
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import backends
+from enstp import history
+from enstp import keypool
+from enstp import knowledge
+from enstp import language
+from enstp import ratelimit
+from enstp import telemetry
+from enstp.prompt import PROMPT_VERSION
+from enstp.student_profile import StudentProfile
+from enstp.text import fold_accents
+from enstp.transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+Conversation = collections.namedtuple("Conversation", ["id", "turns"])
+Turn = collections.namedtuple("Turn", ["message", "expect_modules"])
+Grounding = collections.namedtuple("Grounding", ["modules", "misattributed", "missing"])
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?؟;\n])\s+")
+_DEPARTMENT_RE = re.compile(r"\b(DMS|DIB)\b")
+
+
+def load_conversations(path):
+    """[Conversation] from a JSONL file; raises ValueError on a malformed line."""
+    conversations, seen = [], set()
+    with open(path, encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                turns = [
+                    Turn(turn, ()) if isinstance(turn, str)
+                    else Turn(turn["message"], tuple(turn.get("expect_modules", ())))
+                    for turn in entry["turns"]
+                ]
+                conversation_id = str(entry.get("id", number))
+            except (ValueError, KeyError, TypeError) as parse_err:
+                raise ValueError(f"{path}:{number}: invalid conversation ({parse_err})") from None
+            if not turns:
+                raise ValueError(f"{path}:{number}: conversation without turns")
+            if conversation_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate conversation id {conversation_id!r}")
+            seen.add(conversation_id)
+            conversations.append(Conversation(conversation_id, turns))
+    return conversations
+
+
+def check_grounding(reply, expect_modules=(), knowledge_base=None):
+    """Guide modules named in reply, misattributed ones, and expected ones missing.
+
+    A module is misattributed when a sentence naming a single department
+    names it too, and that department does not teach it. Only multi-word
+    names count there: "Ponts" or "Tunnels" are everyday words too.
+    """
+    knowledge_base = knowledge_base or knowledge.KNOWLEDGE_BASE
+    modules = knowledge_base.find_modules(reply)
+    misattributed = []
+    for sentence in _SENTENCE_RE.split(reply):
+        departments = set(_DEPARTMENT_RE.findall(sentence))
+        if len(departments) != 1:
+            continue
+        department = departments.pop()
+        for name, module in knowledge_base.module_mentions(sentence):
+            if " " in name and department not in module.departments and module.name not in misattributed:
+                misattributed.append(module.name)
+    named = {module.name for module in modules}
+    folded_reply = fold_accents(reply)
+    missing = []
+    for expected in expect_modules:
+        candidates = knowledge_base.find_modules(expected)
+        if candidates:
+            if not any(module.name in named for module in candidates):
+                missing.append(expected)
+        elif fold_accents(expected) not in folded_reply:
+            missing.append(expected)
+    return Grounding([module.name for module in modules], misattributed, missing)
+
+
+def run_conversation(conversation, recorder=None):
+    """Replays one conversation; returns its output records, one per turn."""
+    session_id = f"eval-{conversation.id}"
+    transcript = Transcript([{"role": "assistant", "content": advisor.WELCOME_MESSAGE}])
+    memory = history.ConversationMemory(token_budget=advisor.HISTORY_TOKEN_BUDGET,
+                                        recent_messages=advisor.HISTORY_RECENT_MESSAGES)
+    profile = StudentProfile()
+    response_language = language.DEFAULT_LANGUAGE
+    records = []
+    for index, turn in enumerate(conversation.turns):
+        history_for_api = transcript.snapshot()
+        transcript.add("user", turn.message)
+        profile.observe(turn.message)
+        response_language = language.requested_language(turn.message) or response_language
+        timer = telemetry.TurnTimer(session_id, mode="eval")
+        turn_info = {}
+        reply = advisor.get_enstp_response(turn.message, history_for_api, memory, response_language,
+                                           session_id=session_id, turn_info=turn_info, timer=timer, profile=profile)
+        timing = timer.finish(recorder or telemetry.TelemetryRecorder(window_size=1))
+        transcript.add("assistant", reply)
+        grounding = check_grounding(reply, turn.expect_modules)
+        records.append({
+            "conversation": conversation.id,
+            "turn": index,
+            "message": turn.message,
+            "reply": reply,
+            "latency_ms": timing["total_ms"],
+            "ttfb_ms": timing.get("ttfb_ms"),
+            "prompt_tokens": timing.get("prompt_tokens"),
+            "output_tokens": timing.get("output_tokens"),
+            "model": turn_info.get("model"),
+            "tier": turn_info.get("tier"),
+            "profile": turn_info.get("profile"),
+            "intent": turn_info.get("intent"),
+            "cache": timing.get("cache"),
+            "outcome": timing.get("outcome"),
+            "degraded": bool(turn_info.get("degraded")),
+            "modules": grounding.modules,
+            "misattributed": grounding.misattributed,
+            "missing_modules": grounding.missing,
+            "grounded": not grounding.misattributed and not grounding.missing,
+            "prompt_version": PROMPT_VERSION,
+        })
+        if turn_info.get("intent") == "clear_conversation":
+            # The student asked to start over, as the app would
+            transcript = Transcript([{"role": "assistant", "content": advisor.WELCOME_MESSAGE}])
+            memory.reset()
+            profile = StudentProfile()
+            response_language = language.DEFAULT_LANGUAGE
+    return records
+
+
+def completed_conversations(path, conversations):
+    """Ids of the conversations whose every turn is already in the output file.
+
+    Lines of unfinished conversations (and a line cut short by a crash)
+    are dropped from the file, which is rewritten in place if needed.
+    """
+    if not os.path.exists(path):
+        return set()
+    expected = {conversation.id: len(conversation.turns) for conversation in conversations}
+    records, dropped_lines = [], 0
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                dropped_lines += 1
+    turns = collections.Counter(record.get("conversation") for record in records)
+    done = {conversation_id for conversation_id, count in turns.items() if expected.get(conversation_id) == count}
+    kept = [record for record in records if record.get("conversation") in done]
+    if dropped_lines or len(kept) != len(records):
+        logger.warning(f"Dropping {len(records) - len(kept)} records of unfinished or unknown conversations "
+                       f"and {dropped_lines} unreadable lines from {path}.")
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as output:
+            output.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in kept)
+        os.replace(temporary_path, path)
+    versions = {record.get("prompt_version") for record in kept}
+    if versions - {PROMPT_VERSION}:
+        logger.warning(f"{path} holds results of another prompt version ({', '.join(sorted(map(str, versions)))}); "
+                       f"use --fresh to compare versions separately.")
+    return done
+
+
+def summarize(records):
+    """Turn counts, latency percentiles, tokens and grounding over the output records."""
+    if not records:
+        return {"conversations": 0, "turns": 0}
+    latencies = [record["latency_ms"] for record in records]
+    model_turns = [record for record in records if record.get("model")]
+    checked = [record for record in records if record.get("modules") or record.get("missing_modules")]
+    return {
+        "conversations": len({record["conversation"] for record in records}),
+        "turns": len(records),
+        "model_turns": len(model_turns),
+        "latency_ms": {f"p{round(q * 100)}": round(telemetry.percentile(latencies, q), 1)
+                       for q in telemetry.QUANTILES},
+        "prompt_tokens": sum(record.get("prompt_tokens") or 0 for record in records),
+        "output_tokens": sum(record.get("output_tokens") or 0 for record in records),
+        "outcomes": dict(collections.Counter(record.get("outcome") for record in records)),
+        "profiles": dict(collections.Counter(record["profile"] for record in records if record.get("profile"))),
+        "turns_naming_modules": len(checked),
+        "misattributed_turns": sum(1 for record in records if record.get("misattributed")),
+        "missing_module_turns": sum(1 for record in records if record.get("missing_modules")),
+        "grounded_rate": sum(1 for record in records if record.get("grounded")) / len(records),
+    }
+
+
+def evaluate(conversations, output_path, workers=DEFAULT_WORKERS, fresh=False):
+    """Runs the conversations not yet in output_path; returns the records of the whole file."""
+    if fresh and os.path.exists(output_path):
+        os.remove(output_path)
+    done = completed_conversations(output_path, conversations)
+    pending = [conversation for conversation in conversations if conversation.id not in done]
+    # Answers cached and failures counted by an earlier run would skew latencies and tokens
+    answer_cache.ANSWER_CACHE.clear()
+    advisor.BREAKER.reset()
+    logger.info(f"{len(conversations)} conversations: {len(done)} already done, {len(pending)} to run "
+                f"on {workers} workers.")
+    recorder = telemetry.TelemetryRecorder()
+    write_lock = threading.Lock()
+    finished = 0
+    executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="enstp-eval")
+    try:
+        with open(output_path, "a", encoding="utf-8") as output:
+            futures = {executor.submit(run_conversation, conversation, recorder): conversation
+                       for conversation in pending}
+            for future in concurrent.futures.as_completed(futures):
+                conversation = futures[future]
+                records = future.result()
+                with write_lock:
+                    output.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+                    output.flush()
+                finished += 1
+                seconds = sum(record["latency_ms"] for record in records) / 1000
+                logger.info(f"[{finished}/{len(pending)}] {conversation.id}: {len(records)} turns in {seconds:.1f}s")
+    finally:
+        # Interrupted: what was not written is run again on resume
+        executor.shutdown(wait=False, cancel_futures=True)
+    with open(output_path, encoding="utf-8") as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replays scripted conversations through the advisor.")
+    parser.add_argument("conversations", help="JSONL file, one conversation per line")
+    parser.add_argument("--output", required=True, help="JSONL results, one line per turn (resumed if present)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="conversations run at a time")
+    parser.add_argument("--rpm", type=int, help="primary model requests per minute")
+    parser.add_argument("--tpm", type=int, help="primary model prompt tokens per minute")
+    parser.add_argument("--fresh", action="store_true", help="discard existing results instead of resuming")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if a turn fails a grounding check")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Per-turn advisor logs would drown the progress lines
+    logging.getLogger("enstp").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    try:
+        conversations = load_conversations(args.conversations)
+    except (OSError, ValueError) as load_err:
+        parser.error(str(load_err))
+    api_keys = keypool.parse_keys(os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEY") or "")
+    backend = advisor.configure(api_keys=api_keys)
+    if backend is None:
+        logger.warning("No API key and no stub backend (ENSTP_LLM_BACKEND=stub): every answer comes from the guide.")
+    elif backend.name == backends.StubBackend.name and args.rpm is None and args.tpm is None:
+        advisor.GEMINI_RPM, advisor.GEMINI_TPM = 1_000_000, 1_000_000_000
+        ratelimit.KNOWN_QUOTAS.clear()
+    advisor.GEMINI_RPM = args.rpm or advisor.GEMINI_RPM
+    advisor.GEMINI_TPM = args.tpm or advisor.GEMINI_TPM
+    advisor.warm_up()
+
+    start = time.perf_counter()
+    try:
+        records = evaluate(conversations, args.output, workers=args.workers, fresh=args.fresh)
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted: completed conversations are in {args.output}; run again to resume.")
+        return 130
+    summary = summarize(records)
+    summary["wall_time_s"] = round(time.perf_counter() - start, 2)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.strict and summary["turns"] and summary["grounded_rate"] < 1:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
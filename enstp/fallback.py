@@ -0,0 +1,150 @@
+"""Retries with backoff across an ordered chain of Gemini models."""
+import collections
+import logging
+import random
+import threading
+import time
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.ratelimit import RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ATTEMPTS_PER_MODEL = 2
+DEFAULT_ATTEMPT_DEADLINE = 45.0
+DEFAULT_LATENCY_SLO = 25.0
+DEFAULT_BASE_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+
+
+class AttemptTimeout(Exception):
+    """Raised when one attempt did not answer within its deadline."""
+
+
+# Transient failures: worth retrying, or handing to the next model
+RETRYABLE_ERRORS = (
+    core_exceptions.ResourceExhausted,
+    core_exceptions.TooManyRequests,
+    core_exceptions.ServiceUnavailable,
+    core_exceptions.InternalServerError,
+    core_exceptions.DeadlineExceeded,
+    core_exceptions.GatewayTimeout,
+    AttemptTimeout,
+    RateLimitTimeout,
+)
+
+
+def _call_with_deadline(fn, deadline):
+    """Runs fn() in a helper thread and gives up after deadline seconds.
+
+    A late call cannot be cancelled; it finishes in the background and its
+    result is discarded.
+    """
+    if deadline is None:
+        return fn()
+    outcome = {}
+    done = threading.Event()
+
+    def run():
+        try:
+            outcome["result"] = fn()
+        except BaseException as err:
+            outcome["error"] = err
+        finally:
+            done.set()
+
+    threading.Thread(target=run, daemon=True, name="gemini-attempt").start()
+    if not done.wait(deadline):
+        raise AttemptTimeout(f"No answer within {deadline:.1f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class ModelChain:
+    """Ordered models, from the preferred one to the fastest fallback.
+
+    Each model gets up to attempts_per_model tries, with full-jitter
+    exponential backoff between retryable failures. Each try is bounded by
+    attempt_deadline. Once latency_slo seconds have passed, the request falls
+    through to the next model; the last model keeps its tries regardless.
+    Only when the whole chain fails is the last error raised.
+    """
+
+    def __init__(self, model_names, attempts_per_model=DEFAULT_ATTEMPTS_PER_MODEL,
+                 attempt_deadline=DEFAULT_ATTEMPT_DEADLINE, latency_slo=DEFAULT_LATENCY_SLO,
+                 base_backoff=DEFAULT_BASE_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 clock=time.monotonic, sleep=time.sleep, rng=random.random):
+        if not model_names:
+            raise ValueError("A model chain needs at least one model")
+        self.model_names = list(model_names)
+        self.attempts_per_model = attempts_per_model
+        self.attempt_deadline = attempt_deadline
+        self.latency_slo = latency_slo
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    @property
+    def primary_model(self):
+        return self.model_names[0]
+
+    def _backoff(self, attempt_number):
+        return self._rng() * min(self.max_backoff, self.base_backoff * 2 ** (attempt_number - 1))
+
+    def run(self, attempt, prepare=None, turn_info=None):
+        """Returns attempt(model_name) from the first model that succeeds.
+
+        prepare(model_name, timeout), if given, runs in the calling thread
+        before each try (e.g. waiting for quota; timeout is None on the last
+        model). turn_info, if given, is filled with the serving model, its
+        tier index and the number of tries.
+        """
+        start = self._clock()
+        tries = 0
+        last_error = None
+        for tier, model_name in enumerate(self.model_names):
+            last_tier = tier == len(self.model_names) - 1
+            for attempt_number in range(1, self.attempts_per_model + 1):
+                remaining = None if last_tier else self.latency_slo - (self._clock() - start)
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"Latency SLO of {self.latency_slo:.0f}s exceeded on {model_name}; falling back.")
+                    break
+                deadline = self.attempt_deadline if remaining is None else min(self.attempt_deadline, remaining)
+                tries += 1
+                try:
+                    if prepare is not None:
+                        prepare(model_name, remaining)
+                    result = _call_with_deadline(lambda: attempt(model_name), deadline)
+                except RETRYABLE_ERRORS as err:
+                    last_error = err
+                    with self._lock:
+                        self.stats[f"errors:{model_name}"] += 1
+                    logger.warning(f"Attempt {attempt_number} on {model_name} failed: {type(err).__name__}: {err}")
+                    if isinstance(err, RateLimitTimeout):
+                        # Retrying cannot create quota: go straight to the next model
+                        break
+                    if attempt_number < self.attempts_per_model:
+                        delay = self._backoff(attempt_number)
+                        if remaining is not None:
+                            delay = min(delay, max(0.0, self.latency_slo - (self._clock() - start)))
+                        self._sleep(delay)
+                    continue
+                with self._lock:
+                    self.stats[f"served:{model_name}"] += 1
+                if turn_info is not None:
+                    turn_info.update(model=model_name, tier=tier, attempts=tries)
+                log = logger.warning if tier else logger.info
+                log(f"Turn served by {model_name} (tier {tier}) after {tries} attempt(s) "
+                    f"in {self._clock() - start:.2f}s.")
+                return result
+        with self._lock:
+            self.stats["exhausted"] += 1
+        if turn_info is not None:
+            turn_info.update(model=None, tier=None, attempts=tries)
+        raise last_error
@@ -0,0 +1,273 @@
+"""Suggested follow-up questions and their speculative answers.
+
+After each reply, suggest() proposes the few questions a student most
+likely asks next (modules, careers, workload, internships, a
+recommendation), phrased for the department being discussed and ranked
+by what the conversation and the guide sections it touched already
+covered. PREFETCHER generates answers to the most likely ones in the
+background while the student reads, so a click renders at once; answers
+nobody clicked are evicted and their token cost is counted.
+"""
+import collections
+import concurrent.futures
+import logging
+import re
+import threading
+import time
+
+from enstp import retrieval
+from enstp.text import fold_accents, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUGGESTIONS = 4
+DEFAULT_WORKERS = 2
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_MAX_ENTRIES = 500
+
+Suggestion = collections.namedtuple("Suggestion", ["text", "topic", "score"])
+# A speculative answer, what it cost, whether it also went into the answer
+# cache, and its generation profile
+Prefetched = collections.namedtuple("Prefetched", ["text", "model", "tier", "usage", "cached", "profile"])
+
+# topic -> (prior likelihood, terms of student messages and guide titles about it)
+TOPICS = {
+    "modules": (0.30, {"module", "cour", "matiere", "programme", "course", "curriculum", "subject"}),
+    "careers": (0.30, {"debouche", "metier", "carriere", "emploi", "career", "employment", "job", "sector"}),
+    "workload": (0.20, {"charge", "rythme", "difficile", "difficulte", "workload", "difficulty"}),
+    "internships": (0.15, {"stage", "internship", "visite", "visit"}),
+    "recommendation": (0.20, {"recommande", "recommandez", "conseil", "conseillez", "choisir", "choix",
+                              "recommend", "choose"}),
+}
+# topic -> language -> (question about one department, question about both)
+TEMPLATES = {
+    "modules": {
+        "fr": ("Quels modules étudie-t-on au {department} ?", "Quels modules différencient le DMS et le DIB ?"),
+        "en": ("Which modules are taught in {department}?", "Which modules differ between DMS and DIB?"),
+        "ar": ("ما هي المواد التي تدرس في {department}؟", "ما هي المواد التي تميز DMS عن DIB؟"),
+    },
+    "careers": {
+        "fr": ("Quels sont les débouchés du {department} ?", "Quels débouchés pour le DMS et pour le DIB ?"),
+        "en": ("What careers does {department} lead to?", "What careers do DMS and DIB lead to?"),
+        "ar": ("ما هي آفاق العمل بعد {department}؟", "ما هي آفاق العمل بعد DMS و DIB؟"),
+    },
+    "workload": {
+        "fr": ("Quelle est la charge de travail au {department} ?", "Quel département demande le plus de travail ?"),
+        "en": ("How heavy is the workload in {department}?", "Which department has the heavier workload?"),
+        "ar": ("ما هو حجم العمل في {department}؟", "أي قسم يتطلب عملا أكثر؟"),
+    },
+    "internships": {
+        "fr": ("Quels stages fait-on au {department} ?", "Quels stages fait-on au DMS et au DIB ?"),
+        "en": ("Which internships are there in {department}?", "Which internships do DMS and DIB students do?"),
+        "ar": ("ما هي التربصات في {department}؟", "ما هي التربصات في DMS و DIB؟"),
+    },
+    "recommendation": {
+        "fr": ("Le {department} est-il fait pour moi ?", "Quel département me recommandez-vous ?"),
+        "en": ("Is {department} right for me?", "Which department do you recommend for me?"),
+        "ar": ("هل {department} مناسب لي؟", "أي قسم تنصحني به؟"),
+    },
+}
+_DEPARTMENT_RE = re.compile(r"\b(DMS|DIB)\b")
+
+
+def _department(conversation_history, profile):
+    """The department the last exchange is about, else the student's leaning, else None."""
+    last_turns = conversation_history[-2:]
+    # The student's own message first: replies tend to name both departments
+    for turns in ([turn for turn in last_turns if turn.role == "user"], last_turns):
+        mentioned = set(_DEPARTMENT_RE.findall(fold_accents(" ".join(turn.content for turn in turns)).upper()))
+        if len(mentioned) == 1:
+            return mentioned.pop()
+    if profile is not None and profile.evidence_count:
+        fit = profile.fit()
+        if abs(fit.dms - fit.dib) >= 0.2:
+            return "DMS" if fit.dms > fit.dib else "DIB"
+    return None
+
+
+def suggest(conversation_history, response_language="fr", profile=None, limit=DEFAULT_SUGGESTIONS):
+    """The limit most likely next questions after the last reply, best first.
+
+    A topic the student already asked about is less likely to come back;
+    one the guide sections of the last question touch on is more likely,
+    and so is a recommendation once the student has said a few things.
+    """
+    student_messages = [turn.content for turn in conversation_history if turn.role == "user"]
+    asked = set(tokenize(" ".join(student_messages)))
+    sections = retrieval.retrieve_sections(student_messages[-1]) if student_messages else []
+    section_terms = set(tokenize(" ".join(section.title for section in sections)))
+    department = _department(conversation_history, profile)
+    language = response_language if response_language in TEMPLATES["modules"] else "fr"
+    suggestions = []
+    for topic, (prior, terms) in TOPICS.items():
+        score = prior
+        if asked & terms:
+            score *= 0.3
+        if section_terms & terms:
+            score += 0.15
+        if topic == "recommendation" and len(student_messages) >= 3:
+            score *= 2
+        specific, both = TEMPLATES[topic][language]
+        text = specific.format(department=department) if department else both
+        suggestions.append(Suggestion(text, topic, round(score, 3)))
+    suggestions.sort(key=lambda suggestion: -suggestion.score)
+    return suggestions[:limit]
+
+
+def _normalized(question):
+    return " ".join(tokenize(question))
+
+
+class _Entry:
+    __slots__ = ("future", "created")
+
+    def __init__(self, future, created):
+        self.future = future
+        self.created = created
+
+
+class Prefetcher:
+    """Background answers to suggested questions, per session.
+
+    Never more than workers generations run at once, and a suggestion is
+    skipped rather than queued when they are all busy. A session's
+    entries are evicted as soon as it asks its next question (the one
+    asked is taken, if prefetched) and after ttl_seconds; stats count
+    the requests and tokens spent on answers nobody used (apart from
+    those kept in the answer cache for other sessions).
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="enstp-prefetch")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # (session, history length, question) -> _Entry, oldest first
+        self.stats = collections.Counter()
+
+    def submit(self, session_id, history_length, question, generate):
+        """Starts generate() -> Prefetched or None for question, if a worker is free."""
+        key = (session_id, history_length, _normalized(question))
+        with self._lock:
+            if key in self._entries:
+                return False
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["skipped_busy"] += 1
+            return False
+
+        def run():
+            try:
+                return generate()
+            except Exception as error:
+                logger.warning(f"Speculative answer failed: {error}")
+                return None
+
+        future = self._executor.submit(run)
+        # Also called for a generation cancelled before it started
+        future.add_done_callback(lambda _: self._slots.release())
+        future.add_done_callback(self._account)
+        with self._lock:
+            self._entries[key] = _Entry(future, self._clock())
+            self.stats["started"] += 1
+            expired = self._expire()
+        # Outside the lock: the callback of a finished generation runs at once
+        for entry in expired:
+            entry.future.add_done_callback(self._count_unused)
+        return True
+
+    def _account(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.stats["cancelled"] += 1
+            return
+        result = future.result()
+        with self._lock:
+            if result is None:
+                self.stats["declined"] += 1
+                return
+            self.stats["requests"] += 1
+            if result.usage is not None:
+                self.stats["prompt_tokens"] += result.usage.prompt_tokens
+                self.stats["output_tokens"] += result.usage.output_tokens
+
+    def take(self, session_id, history_length, question):
+        """The prefetched answer to the question a session just asked, or None.
+
+        The session's other entries are evicted as unused. A generation
+        still running is left to finish without being waited for (counted
+        as "joined"): the caller's own request for the same question can
+        follow it in flight.
+        """
+        with self._lock:
+            entry = self._entries.pop((session_id, history_length, _normalized(question)), None)
+        self.evict_session(session_id)
+        if entry is None:
+            return None
+        if not entry.future.done():
+            with self._lock:
+                self.stats["joined"] += 1
+            return None
+        result = entry.future.result()
+        if result is not None:
+            with self._lock:
+                self.stats["used"] += 1
+        return result
+
+    def evict_session(self, session_id):
+        """Drops a session's entries (its conversation moved on)."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == session_id]
+            entries = [self._entries.pop(key) for key in keys]
+        for entry in entries:
+            self._evicted(entry)
+
+    def _expire(self):
+        """Removes and returns the entries past their TTL or over max_entries (lock held)."""
+        now = self._clock()
+        expired = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.created < self.ttl_seconds:
+                break
+            del self._entries[key]
+            expired.append(entry)
+        return expired
+
+    def _evicted(self, entry):
+        if not entry.future.cancel():
+            # Counted once the generation is over
+            entry.future.add_done_callback(self._count_unused)
+
+    def _count_unused(self, future):
+        result = None if future.cancelled() else future.result()
+        if result is None:
+            return
+        if result.cached:
+            # Still of use to the sessions finding it in the answer cache
+            with self._lock:
+                self.stats["unused_cached"] += 1
+            return
+        usage = result.usage
+        with self._lock:
+            self.stats["unused"] += 1
+            if usage is not None:
+                self.stats["unused_prompt_tokens"] += usage.prompt_tokens
+                self.stats["unused_output_tokens"] += usage.output_tokens
+        logger.info(f"Unused speculative answer evicted ({usage.prompt_tokens if usage else '?'} prompt + "
+                    f"{usage.output_tokens if usage else '?'} output tokens wasted).")
+
+    def snapshot(self):
+        """Counters, the share of speculative answers used (whole or joined), and entries held."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        used = stats.get("used", 0) + stats.get("joined", 0)
+        stats["hit_rate"] = used / stats["requests"] if stats.get("requests") else 0.0
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
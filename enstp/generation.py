@@ -0,0 +1,71 @@
+"""Generation profiles: model, output budget, temperature and prompt variant per kind of turn.
+
+A clarifying exchange while the advisor is still getting to know the
+student, a factual question about the departments and a full DMS/DIB
+recommendation need neither the same answer length nor the same model.
+select() picks the profile of a turn from the student's message and the
+conversation state: a recommendation when one is asked for, or once the
+student profile holds enough evidence for one; a lookup for a question;
+a short clarification otherwise.
+"""
+import collections
+import os
+import re
+
+from enstp import answer_cache
+from enstp.text import fold_accents
+
+CLARIFY = "clarify"
+LOOKUP = "lookup"
+RECOMMEND = "recommend"
+
+# Evidence (student_profile signals) after which a statement gets a full answer
+DEFAULT_RECOMMEND_AFTER_EVIDENCE = 4
+
+GenerationProfile = collections.namedtuple(
+    "GenerationProfile", ["name", "model_names", "max_output_tokens", "temperature", "prompt_variant"]
+)
+
+# "quel département choisir ?", "le DMS est-il fait pour moi ?", "which one should I pick?"
+_RECOMMENDATION_RE = re.compile(
+    r"\b(recommand\w*|conseill\w*|quel\w* (departement|specialite|choisir)|choisir|choix|ton avis|votre avis|"
+    r"fait pour moi|me correspond\w*|recommend\w*|advise|advice|should i (choose|pick|go)|right for me|"
+    r"which (one|department) (should|would|fits|suits))\b"
+    r"|تنصح|انصح|اختار|مناسب لي"
+)
+
+
+def profile_from_env(name, model_names, max_output_tokens, temperature, prompt_variant, environ=os.environ):
+    """A profile whose settings GENERATION_<NAME>_MODELS, _MAX_OUTPUT_TOKENS and _TEMPERATURE override."""
+    prefix = f"GENERATION_{name.upper()}_"
+    models = environ.get(f"{prefix}MODELS")
+    if models:
+        model_names = [model.strip() for model in models.split(",") if model.strip()]
+    return GenerationProfile(
+        name,
+        tuple(model_names),
+        int(environ.get(f"{prefix}MAX_OUTPUT_TOKENS", max_output_tokens)),
+        float(environ.get(f"{prefix}TEMPERATURE", temperature)),
+        prompt_variant,
+    )
+
+
+def requests_recommendation(student_input):
+    """Whether the student explicitly asks which department to choose."""
+    return bool(_RECOMMENDATION_RE.search(fold_accents(student_input)))
+
+
+def select(student_input, profile=None, recommend_after=DEFAULT_RECOMMEND_AFTER_EVIDENCE):
+    """Name of the generation profile for a turn.
+
+    profile is the student_profile.StudentProfile, already updated with
+    this message.
+    """
+    if requests_recommendation(student_input):
+        return RECOMMEND
+    if answer_cache.is_question(student_input):
+        return LOOKUP
+    if profile is not None and profile.evidence_count >= recommend_after:
+        # Enough is known about the student: the guided flow may now recommend
+        return RECOMMEND
+    return CLARIFY
@@ -0,0 +1,672 @@
+"""The ENSTP DMS/DIB guide and its numbered sections."""
+import collections
+import re
+
+ENSTP_GUIDE_TEXT = """
+Comprehensive Analysis of DMS and DIB
+         Departments at ENSTP Algeria
+
+1     Introduction to ENSTP
+The École Nationale Supérieure des Travaux Publics (ENSTP) is one of Alge-
+ria's most prestigious engineering institutions, specializing in civil engineering
+and public works. Founded in 1966 and located in Kouba, Algiers, ENSTP
+has played a critical role in training the engineering workforce responsible for
+Algeria's infrastructure development. The institution operates under the super-
+vision of the Ministry of Higher Education and Scientific Research, providing
+high-quality education in civil engineering disciplines.
+    ENSTP is renowned for its rigorous academic programs, combining theoret-
+ical knowledge with practical applications, and maintaining strong relationships
+with industry partners. The school consistently ranks among Algeria's top en-
+gineering institutions, with graduates highly sought after in both public and
+private sectors across North Africa and beyond.
+
+
+2     Departmental Structure at ENSTP
+ENSTP's academic structure features several departments, with two major de-
+partments serving as the primary pathways for specialization in civil engineering:
+
+2.1    Département des Matériaux et Structures (DMS)
+The Department of Materials and Structures focuses on the analysis, design,
+and construction of various civil engineering structures, with emphasis on the
+behavior of materials under different loading conditions. The department's cur-
+riculum is centered around structural engineering principles, material science,
+and advanced analysis techniques.
+    Primary Specialization: Routes et Ouvrages (Roads and Structures)
+
+2.2    Département des Infrastructures de Base (DIB)
+The Department of Basic Infrastructure concentrates on the planning, design,
+and management of civil infrastructure systems, with particular attention to
+transportation networks, hydraulic systems, and urban development. The de-
+partment emphasizes systems integration, infrastructure planning, and network
+optimization.
+   Primary Specialization: Infrastructures de Base (Basic Infrastructure)
+
+
+3       Academic Programs and Degrees
+3.1     Degree Structure
+Both DMS and DIB departments offer identical degree designations, though the
+specialization is noted on the diploma:
+
+    • Ingénieur d'état en travaux publics (State Engineer in Public Works)
+      - The primary professional degree equivalent to a Bachelor's and Master's
+      combined in the Anglo-Saxon system
+
+    • Master en travaux publics (Master's in Public Works) - Advanced de-
+      gree for students seeking additional specialization or research preparation
+
+   The engineering program typically spans five years of study, with the first
+two years focusing on fundamental sciences and engineering basics, followed by
+three years of increasingly specialized coursework in the chosen department.
+
+3.2     Accreditation and Recognition
+Degrees from ENSTP are recognized by:
+    • The Algerian Ministry of Higher Education and Scientific Research
+    • Various international engineering accreditation bodies through mutual
+      recognition agreements
+    • Major engineering employers across North Africa, the Middle East, and
+      Francophone countries
+
+
+4       Curriculum Analysis: Common Elements
+4.1     Fundamental Modules (Common to Both Departments)
+Both DMS and DIB share a strong foundation of core engineering subjects that
+provide the essential knowledge base for civil engineering practice:
+
+4.1.1    Mathematics and Scientific Foundation
+    • Applied Mathematics
+    • Probability and Statistics
+    • Physics for Engineers
+    • Chemistry of Materials
+
+4.1.2   Core Engineering Sciences
+   • Résistance Des Matériaux (Strength of Materials): Study of material
+     behavior under applied loads, analyzing stress, strain, and deformation to
+     ensure structural integrity.
+   • Calcul des Structures (Structural Analysis): Mathematical methods for
+     analyzing forces, stresses, and displacements in various structural systems.
+   • Mécanique des structures (Structural Mechanics): Advanced analysis
+     of structural behavior, including dynamic responses and complex loading
+     conditions.
+   • Dynamique des Structures (Structural Dynamics): Analysis of struc-
+     tures under time-varying loads, including seismic considerations.
+
+   • Dynamique des sols (Soil Dynamics): Study of soil behavior under
+     dynamic loading conditions.
+   • Mécanique Des Sols (Soil Mechanics): Analysis of soil properties, be-
+     havior, and their interaction with structures.
+   • Mécanique des Milieux Continus (Continuum Mechanics): Mathe-
+     matical description of the mechanical behavior of continuous materials.
+   • Mécanique Des Fluides (Fluid Mechanics): Study of fluid behavior and
+     its interaction with structures and systems.
+   • Géologie (Geology): Study of earth materials and processes relevant to
+     civil engineering.
+   • Topographie (Topography): Techniques for surveying and mapping ter-
+     rain for engineering purposes.
+   • Mécanique des roches (Rock Mechanics): Analysis of rock behavior
+     under various loading and environmental conditions.
+
+4.2     Advanced Common Modules
+Both departments feature advanced modules that build upon the fundamental
+courses, providing more specialized knowledge applicable to various civil engi-
+neering domains:
+
+   • Ponts (Bridges): Design and analysis of bridge structures, including var-
+     ious typologies and loading conditions.
+   • Routes (Roads): Principles of road design, including geometric design,
+     pavement structure, and traffic considerations.
+   • Béton Armé (Reinforced Concrete): Design and analysis of reinforced
+     concrete structures, including beams, columns, slabs, and foundations.
+
+   • Béton Précontraint (Prestressed Concrete): Advanced concrete tech-
+     nology using prestressing techniques to enhance structural performance.
+   • Charpente Métallique (Steel Structures): Design and analysis of steel
+     structural systems, including connections and load considerations.
+
+   • Géotechnique Routière (Road Geotechnics): Specialized geotechnical
+     considerations for road infrastructure.
+   • Calcul d'ouvrages (Structural Design): Comprehensive approach to de-
+     signing various civil engineering structures.
+
+   • Matériaux de Construction (Construction Materials): Properties, test-
+     ing, and applications of various construction materials.
+   • Hydraulique appliquée (Applied Hydraulics): Principles of hydraulics
+     applied to civil engineering problems.
+   • Assainissement urbain et routier (Urban and Road Drainage): Design
+     of drainage systems for urban areas and transportation infrastructure.
+   • Procédés Généraux de Construction (General Construction Processes):
+     Construction methods, techniques, and equipment for various civil engi-
+     neering projects.
+
+   • Organisation De Chantier (Construction Site Organization): Plan-
+     ning, management, and optimization of construction sites.
+   • Méthode des éléments finis (Finite Element Method): Numerical tech-
+     nique for solving complex engineering problems through discretization.
+   • Pathologie des Ouvrages d'Art (Engineering Structures Pathology):
+     Analysis of structural defects, failures, and rehabilitation techniques.
+
+4.3   Common Transversal Modules
+Both departments include courses that develop broader professional skills nec-
+essary for engineering practice:
+
+   • Conférences (Conferences): Exposure to current industry trends and
+     research through guest lectures and seminars.
+   • Dessin Assisté par Ordinateur (Computer-Aided Design): Applica-
+     tion of software tools for engineering design and drafting.
+    • Anglais Technique (Technical English): Development of English lan-
+      guage skills specific to engineering contexts.
+   • Analyse numérique appliquée (Applied Numerical Analysis): Compu-
+      tational methods for solving engineering problems.
+
+    • Droit des Travaux Publics (Public Works Law): Legal aspects of civil
+      engineering projects, contracts, and regulations.
+    • Développement durable et aménagement de territoire (Sustain-
+      able Development and Territorial Planning): Integration of sustainability
+      principles in infrastructure development.
+    • Management des projets ou Entrepreneuriat (Project Management
+      or Entrepreneurship): Skills for managing engineering projects or creating
+      engineering enterprises.
+
+4.4    Common Practical Work and Laboratories
+Both departments emphasize hands-on experience through extensive laboratory
+work:
+
+    • TP RDM (Strength of Materials Lab): Experimental verification of ma-
+      terial behavior under various loading conditions.
+    • TP MDS (Soil Mechanics Lab): Testing and analysis of soil properties
+      relevant to civil engineering applications.
+    • TP Topo (Topography Lab): Field exercises in surveying and terrain
+      mapping.
+    • TP Géologie (Geology Lab): Identification and testing of geological ma-
+      terials relevant to construction.
+    • TP MDC (Construction Materials Lab): Testing and characterization of
+      various construction materials.
+    • TP MDF (Fluid Mechanics Lab): Experimental study of fluid behavior
+      in various engineering applications.
+
+    • TP Routes (Roads Lab): Testing of road materials and design principles
+      for pavement systems.
+
+5     Curriculum Differences: DMS vs. DIB
+5.1    DMS-Specific Engineering Modules
+The DMS department offers specialized courses focusing on materials behavior
+and structural analysis:
+   • Calcul Automatique des structures (Automated Structural Analysis):
+     Application of computational methods for complex structural analysis.
+   • Calcul économique des projets (Economic Project Calculation): Cost
+     analysis and optimization of structural engineering projects.
+
+   • Dynamique des Sols 2 (Advanced Soil Dynamics): Further exploration
+     of soil behavior under dynamic loading conditions.
+   • TP Hydraulique appliquée (Applied Hydraulics Lab): Practical appli-
+     cations of hydraulic principles in structural contexts.
+
+5.2     DIB-Specific Engineering Modules
+The DIB department offers specialized courses focusing on infrastructure sys-
+tems and transportation:
+
+   • Économie de Transport (Transport Economics): Economic analysis of
+     transportation systems and infrastructure investments.
+
+   • Analyse Numérique (Numerical Analysis): Advanced computational
+     methods specifically applied to infrastructure problems.
+   • Géologie 2 (Advanced Geology): Further exploration of geological con-
+     siderations for infrastructure development.
+
+   • TP GTR (Road Geotechnics Lab): Practical applications of geotechnical
+     principles to road infrastructure.
+   • TP Géologie2 (Advanced Geology Lab): Advanced testing and analysis
+     of geological materials for infrastructure applications.
+
+5.3     Optional Specialization Tracks
+5.3.1   DMS Optional Tracks
+Buildings Track (Bâtiments):
+
+   • Bâtiments (Buildings): Comprehensive structural design of buildings
+     considering various loading conditions.
+   • Contreventments (Bracing): Design of structural systems to resist lat-
+     eral loads in buildings.
+   • Calcul d'ouvrages élémentaires (Elementary Structural Calculation):
+     Simplified methods for structural analysis of common building elements.
+   • Thermique Bât (Building Thermics): Thermal behavior and energy ef-
+     ficiency in building design.
+   • Esquisse Bât (Building Design): Conceptual and preliminary design of
+     building structures.
+   Tunnels Track:
+
+   • Mécanique des Roches (Rock Mechanics): Behavior of rock masses
+     relevant to underground construction.
+   • Tun (Tunnels): Principles of tunnel design, construction, and mainte-
+     nance.
+
+   • Méthode de réalisation des Ouvrages Souterrains (Underground
+     Construction Methods): Techniques for constructing various underground
+     structures.
+   • Esquisse Tun (Tunnel Design): Conceptual and preliminary design of
+     tunnel structures.
+
+5.3.2   DIB Optional Tracks
+Railway and Rail Bridges Track:
+   • VF1, VF2 (Railway 1 & 2): Comprehensive study of railway infrastruc-
+     ture design and maintenance.
+   • Esquisse VF (Railway Design): Conceptual and preliminary design of
+     railway systems.
+
+   • PR1, PR2 (Rail Bridge 1 & 2): Specialized design of bridge structures
+     for railway applications.
+   • Esquisse PR (Rail Bridge Design): Conceptual and preliminary design
+     of railway bridges.
+
+   Maritime Works and Air Bases Track:
+   • TM1, TM2 (Maritime Works 1 & 2): Design and construction of coastal
+     and port structures.
+   • Esquisse TM (Maritime Design): Conceptual and preliminary design of
+     maritime infrastructure.
+   • Base1, Base2 (Air Base 1 & 2): Specialized infrastructure for aviation
+     facilities.
+   • Esquisse Base (Air Base Design): Conceptual and preliminary design of
+     airport infrastructure.
+
+5.4     Master's Program Specialization Differences
+5.4.1    DMS Master's Modules (Research-Oriented)
+The DMS master's program emphasizes advanced materials science and struc-
+tural optimization:
+
+    • Matériaux innovants (Innovative Materials): Study of emerging con-
+      struction materials with enhanced properties.
+    • Analyse expérimentale (Experimental Analysis): Advanced laboratory
+      techniques for materials and structural testing.
+    • Optimisation des Structures (Structural Optimization): Mathemati-
+      cal methods for optimizing structural designs.
+    • Mécanique des milieux continus approfondie (Advanced Continuum
+      Mechanics): Higher-level analysis of material behavior using continuum
+      mechanics principles.
+
+5.4.2    DIB Master's Modules (Practice-Oriented)
+The DIB master's program focuses on infrastructure performance and manage-
+ment:
+
+    • Pathologie des chaussées (Pavement Pathology): Analysis of pavement
+      deterioration mechanisms and rehabilitation techniques.
+    • Rhéologie des matériaux (Materials Rheology): Study of flow behavior
+      of construction materials under various conditions.
+    • Organisation de chantier (Construction Site Organization): Advanced
+      techniques for managing complex infrastructure projects (shared with
+      DMS).
+    • Droit des Travaux Publics (Public Works Law): Advanced legal con-
+      siderations for infrastructure development (shared with DMS).
+
+6       Practical Training and Field Experience
+6.1     Internship Requirements
+Both departments require students to complete multiple internships throughout
+their studies:
+
+    • Observation Internship (1st year): Introduction to civil engineering
+      practice in real-world settings.
+    • Worker Internship (2nd year): Hands-on experience as part of con-
+      struction teams.
+   • Technical Internship (3rd year): Application of technical knowledge in
+     professional settings.
+   • Engineering Internship (4th year): Advanced professional experience
+     with significant responsibilities.
+   • Graduation Project Internship (5th year): Comprehensive project
+     serving as the capstone experience.
+
+6.2     Field Trips and Educational Visits
+6.2.1   DMS Educational Visits
+Students in DMS typically visit:
+   • Bridge construction sites of various typologies
+   • Road construction and rehabilitation projects
+   • Materials testing laboratories
+   • Tunnel construction sites
+   • Dam construction and monitoring installations
+   • Building construction sites for high-rise or complex structures
+
+6.2.2   DIB Educational Visits
+Students in DIB typically visit:
+   • Bridge construction sites with emphasis on integration with transportation
+     networks
+   • Road network development projects
+   • Materials testing laboratories with focus on infrastructure applications
+   • Railway construction and maintenance operations
+   • Port facilities and maritime infrastructure
+   • Dam construction with emphasis on hydraulic systems
+
+6.3     Final Year Project Differences
+6.3.1   DMS Final Projects
+Typically focus on:
+   • Structural design optimization
+   • Advanced materials applications
+    • Seismic analysis and design
+   • Structural rehabilitation techniques
+   • Special structures (tall buildings, long-span bridges, etc.)
+
+6.3.2    DIB Final Projects
+Typically focus on:
+    • Transportation network optimization
+    • Infrastructure system integration
+    • Railway design and planning
+    • Port and maritime facilities development
+    • Airport infrastructure design
+
+
+7       Research Activities and Facilities
+7.1     Research Laboratories
+ENSTP hosts several research laboratories supporting both departments, with
+different emphasis:
+
+7.1.1    DMS-Affiliated Research Facilities
+    • Laboratory of Materials Engineering: Focuses on construction ma-
+      terials development and testing.
+    • Structural Analysis Laboratory: Equipped for experimental testing
+      of structural elements.
+    • Earthquake Engineering Laboratory: Specializes in seismic perfor-
+      mance of structures.
+    • Computational Mechanics Laboratory: Focuses on numerical mod-
+      eling of structures and materials.
+
+7.1.2    DIB-Affiliated Research Facilities
+    • Transportation Engineering Laboratory: Focuses on transportation
+      system analysis and planning.
+    • Geotechnical Engineering Laboratory: Specializes in soil-structure
+      interaction for infrastructure.
+    • Hydraulic Engineering Laboratory: Focuses on water resource sys-
+      tems and infrastructure.
+    • Infrastructure Planning Laboratory: Emphasizes integrated infras-
+      tructure development.
+
+7.2     Research Orientation
+The research orientation differs significantly between the two departments:
+
+    • DMS Research Focus: Materials science, structural behavior, seismic
+      design, structural optimization, and building science.
+    • DIB Research Focus: Transportation systems, infrastructure planning,
+      geotechnical engineering for infrastructure, and sustainable development.
+
+8       Faculty Profiles and Expertise
+8.1     Faculty Composition
+Both departments feature faculty members with various specializations:
+
+8.1.1    DMS Faculty Expertise
+    • Structural Engineering
+    • Earthquake Engineering
+    • Materials Science
+    • Computational Mechanics
+    • Geotechnical Engineering for Structures
+    • Building Science
+
+8.1.2    DIB Faculty Expertise
+    • Transportation Engineering
+    • Railway Engineering
+    • Maritime Engineering
+    • Airport Infrastructure
+    • Infrastructure Planning
+    • Geotechnical Engineering for Infrastructure
+
+8.2     Teaching Quality
+According to student feedback and institutional evaluations:
+
+    • Both departments have highly qualified professors, many with interna-
+      tional experience.
+    • Some professors are known for rigorous evaluation standards.
+    • Teaching effectiveness varies among faculty members.
+    • Industry experience among faculty tends to be higher in DIB, while re-
+      search credentials are often stronger in DMS.
+
+
+9       Career Prospects and Professional Outcomes
+9.1     Employment Sectors
+Graduates from both departments find employment in various sectors, with
+some differences in distribution:
+
+9.1.1    Common Employment Sectors
+    • Public works agencies
+    • Construction companies
+    • Consulting engineering firms
+    • Government ministries (Infrastructure, Housing, Transportation)
+    • Municipal engineering departments
+    • International development organizations
+
+9.1.2    DMS Graduate Predominant Sectors
+    • Structural engineering consultancies
+    • Building design firms
+    • Construction companies specializing in complex structures
+    • Research institutions
+    • Earthquake engineering specialists
+    • Building inspection and rehabilitation companies
+
+9.1.3   DIB Graduate Predominant Sectors
+   • Transportation planning agencies
+   • Railway companies
+   • Port authorities
+   • Airport development agencies
+   • Infrastructure management organizations
+   • Urban planning departments
+
+9.2     Professional Advancement
+Career progression patterns show some differences between graduates of the two
+departments:
+
+   • DMS Graduates: Often advance toward specialized technical roles (Se-
+     nior Structural Engineer, Technical Director) or management positions in
+     structural engineering firms.
+   • DIB Graduates: Often advance toward project management roles, sys-
+     tem planning positions, or infrastructure development management.
+
+9.3     Entrepreneurship Opportunities
+Both pathways offer entrepreneurial possibilities with different orientations:
+
+   • DMS Entrepreneurship: Specialized structural engineering consultan-
+     cies, materials testing laboratories, structural inspection services.
+   • DIB Entrepreneurship: Infrastructure planning consultancies, trans-
+     portation system analysis firms, project management services.
+
+
+10      Student Experience and Campus Life
+10.1     Student Demographics
+The student body composition shows some patterns:
+
+   • DMS typically attracts students with stronger mathematical backgrounds
+     and interest in detailed analysis.
+   • DIB typically attracts students with broader interests in systems and plan-
+     ning.
+   • Gender distribution is similar in both departments, though traditionally
+     DMS has had a slightly higher percentage of male students.
+
+10.2    Student Organizations
+Several student organizations are relevant to both departments:
+
+   • ENSTP Civil Engineering Society: General civil engineering student
+     organization
+   • Structural Engineering Club: Primarily attracts DMS students
+   • Infrastructure Development Association: Primarily attracts DIB
+     students
+   • ENSTP Research Group: Active in both departments but with stronger
+     DMS participation
+
+10.3    Academic Workload
+The academic demands show some differences:
+
+   • DMS Workload: Higher mathematical intensity, more detailed calcula-
+     tions, greater emphasis on analysis.
+   • DIB Workload: More diverse subject matter, greater emphasis on inte-
+     gration, more project-based assessments.
+
+11     International Collaboration and Mobility
+11.1    International Partnerships
+ENSTP maintains partnerships with international institutions relevant to both
+departments:
+
+   • Partnerships with French engineering schools (École des Ponts ParisTech,
+     INSA)
+   • Collaboration with Middle Eastern and African universities
+   • Exchange programs with European technical universities
+
+11.2    Student Mobility
+Opportunities for international experience exist for both departments:
+
+   • Exchange semester opportunities primarily in Francophone countries
+   • International internship placements
+   • Double-degree possibilities with partner institutions
+
+11.3     Research Collaboration
+International research collaboration patterns differ:
+   • DMS Research Collaboration: Stronger ties with materials science
+     and structural engineering research centers internationally.
+   • DIB Research Collaboration: Stronger ties with transportation and
+     infrastructure planning organizations internationally.
+
+
+12       Comparative Analysis: Making the Choice
+12.1     Student Aptitude Considerations
+Different aptitudes may be better suited to each department:
+
+12.1.1    DMS-Favored Aptitudes
+   • Strong mathematical abilities
+   • Detail-oriented thinking
+   • Interest in physical principles and behavior
+   • Comfort with complex analysis
+   • Precision and accuracy in work
+
+12.1.2    DIB-Favored Aptitudes
+   • Systems thinking abilities
+   • Integration of multiple disciplines
+   • Interest in transportation and networks
+   • Comfort with planning and optimization
+   • Spatial reasoning skills
+
+12.2     Learning Style Considerations
+Learning preferences that may influence department choice:
+
+12.2.1    DMS-Favored Learning Styles
+   • Analytical learning approach
+   • Step-by-step problem solving
+   • Detailed examination of components
+   • Theoretical foundation emphasis
+
+12.2.2    DIB-Favored Learning Styles
+   • Holistic learning approach
+   • Systems-level problem solving
+   • Integration of diverse elements
+   • Practical application emphasis
+
+12.3     Career Interest Alignment
+Career interests that may guide department selection:
+
+12.3.1    DMS-Aligned Career Interests
+   • Designing complex structures
+   • Analyzing structural behavior
+   • Developing advanced materials
+   • Earthquake-resistant design
+   • Building science research
+
+12.3.2    DIB-Aligned Career Interests
+   • Transportation system planning
+   • Infrastructure development
+   • Railway or maritime engineering
+   • Airport infrastructure design
+   • Urban system integration
+
+
+13       Future Trends and Departmental Evolution
+13.1     Emerging Technologies
+Both departments are adapting to technological advances, with different em-
+phases:
+
+13.1.1    DMS Technology Evolution
+   • Advanced computational methods for structural analysis
+   • Building Information Modeling (BIM) integration
+   • Smart materials and structures
+   • Sustainable building technologies
+   • 3D printing for construction
+
+13.1.2    DIB Technology Evolution
+   • Intelligent transportation systems
+   • Infrastructure management systems
+   • Geographic Information Systems (GIS) applications
+   • Remote sensing for infrastructure monitoring
+   • Smart city technologies
+
+13.2     Curriculum Evolution
+Both departments continue to evolve their curricula:
+
+   • DMS Curriculum Trends: Greater integration of sustainability, re-
+     silience, and digital technologies in structural design.
+   • DIB Curriculum Trends: Increased emphasis on smart infrastructure,
+     sustainable transportation, and integrated planning approaches.
+
+
+14       Conclusion: The Complementary Nature of
+         DMS and DIB
+The Département des Matériaux et Structures (DMS) and Département des
+Infrastructures de Base (DIB) at ENSTP represent complementary approaches
+to civil engineering education:
+
+   • DMS provides depth in structural engineering, materials science, and
+     detailed analysis, preparing engineers who can design and analyze complex
+     structures with precision and technical sophistication.
+   • DIB offers breadth in infrastructure systems, transportation engineering,
+     and integrated planning, developing engineers who can coordinate complex
+     infrastructure networks and optimize transportation systems.
+    Both departments contribute essential expertise to Algeria's infrastructure
+development, with graduates working together on major projects - DMS grad-
+uates ensuring structural integrity and safety, while DIB graduates ensuring
+system functionality and integration.
+    The choice between these departments should be guided by a student's natu-
+ral aptitudes, learning preferences, and career aspirations, recognizing that both
+pathways lead to rewarding engineering careers addressing critical infrastructure
+needs.
+
+
+15     References and Resources
+15.1    Official ENSTP Documentation
+   • ENSTP Academic Catalog
+   • Departmental Curriculum Guides
+   • ENSTP Strategic Plan 2020-2025
+
+15.2    Alumni Outcomes Reports
+   • Graduate Employment Surveys (2018-2024)
+   • Career Progression Analysis of ENSTP Graduates
+
+15.3    Industry Feedback
+   • Employer Satisfaction Surveys
+   • Industry Advisory Board Recommendations
+
+15.4    Comparative Studies
+   • Civil Engineering Education in North Africa (2022)
+   • Infrastructure Skills Development in Algeria (2023)
+"""
+
+GuideSection = collections.namedtuple("GuideSection", ["number", "title", "text"])
+
+# Numbered headings such as "5.3.2   DIB Optional Tracks": a section number
+# followed by at least two spaces, since wrapped body lines never look like that.
+_HEADING_RE = re.compile(r"^\s*(\d{1,2}(?:\.\d{1,2})*)\s{2,}(\S.*)$")
+
+
+def split_sections(guide_text):
+    """Splits the guide on its numbered headings into GuideSection chunks.
+
+    Headings without a body of their own (e.g. "5.3" directly followed by
+    "5.3.1") are dropped; their title is still carried by the subsections.
+    """
+    sections = []
+    number, title, body = None, None, []
+
+    def flush():
+        text = "\n".join(body).strip()
+        if number is not None and text:
+            sections.append(GuideSection(number, title, text))
+
+    for line in guide_text.splitlines():
+        match = _HEADING_RE.match(line)
+        if match:
+            flush()
+            number, title, body = match.group(1), match.group(2).strip(), []
+        elif number is not None:
+            body.append(line)
+    flush()
+    return sections
+
+
+# Split once per process; Streamlit reruns reuse the imported module.
+GUIDE_SECTIONS = split_sections(ENSTP_GUIDE_TEXT)
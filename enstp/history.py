@@ -0,0 +1,101 @@
+"""Token-budgeted conversation history with a rolling summary."""
+import re
+
+from enstp.text import estimate_tokens
+from enstp.transcript import format_turn, role_label
+
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_RECENT_MESSAGES = 6
+
+# Per-line character caps for folded turns; the student's own statements
+# carry the profile information, so they keep more than the advisor's.
+_SUMMARY_CHARS = {"user": 220, "assistant": 120}
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def condense(text, max_chars):
+    """Leading sentences of text, cut at a word boundary to max_chars."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    kept = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+    if not kept:
+        kept = text[:max_chars].rsplit(" ", 1)[0]
+    return kept + " …"
+
+
+class ConversationMemory:
+    """Keeps the last messages verbatim and folds older ones into a summary.
+
+    Folding is incremental: each message is condensed once, when it leaves
+    the verbatim window, and appended to the running summary. The rendered
+    history never exceeds token_budget (estimated tokens).
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, recent_messages=DEFAULT_RECENT_MESSAGES):
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_lines = []
+        self.folded_count = 0
+        self.dropped_count = 0
+
+    def reset(self):
+        self.summary_lines = []
+        self.folded_count = 0
+        self.dropped_count = 0
+
+    def _fold(self, turn):
+        line = f"- {role_label(turn.role)}: {condense(turn.content, _SUMMARY_CHARS.get(turn.role, 120))}"
+        self.summary_lines.append((turn.role, line))
+        self.folded_count += 1
+
+    def _summary_text(self):
+        if not self.summary_lines:
+            return ""
+        header = "Résumé des échanges précédents:"
+        if self.dropped_count:
+            header += f" ({self.dropped_count} messages plus anciens omis)"
+        return "\n".join([header] + [line for _, line in self.summary_lines])
+
+    def _trim_summary(self, max_tokens):
+        # Drop the oldest advisor lines first, then the oldest student lines
+        while self.summary_lines and estimate_tokens(self._summary_text()) > max_tokens:
+            for index, (role, _) in enumerate(self.summary_lines):
+                if role != "user":
+                    break
+            else:
+                index = 0
+            del self.summary_lines[index]
+            self.dropped_count += 1
+
+    def render(self, conversation_history):
+        """History fragment for the prompt: summary, then verbatim messages.
+
+        conversation_history is a Transcript (or view); only the turns that
+        are new since the last call or inside the verbatim window are read.
+        """
+        if len(conversation_history) < self.folded_count:
+            # The conversation was cleared or replaced
+            self.reset()
+        boundary = max(len(conversation_history) - self.recent_messages, self.folded_count)
+        for turn in conversation_history[self.folded_count:boundary]:
+            self._fold(turn)
+
+        recent = [format_turn(turn) for turn in conversation_history[boundary:]]
+        # Half of the budget is reserved for the verbatim window
+        self._trim_summary(self.token_budget // 2)
+        summary = self._summary_text()
+        used = estimate_tokens(summary) + sum(estimate_tokens(line) for line in recent)
+        while used > self.token_budget and recent:
+            # Over budget: fold the oldest verbatim message as well
+            self._fold(conversation_history[self.folded_count])
+            recent.pop(0)
+            self._trim_summary(self.token_budget // 2)
+            summary = self._summary_text()
+            used = estimate_tokens(summary) + sum(estimate_tokens(line) for line in recent)
+        return "\n\n".join(part for part in [summary, "\n".join(recent)] if part).strip()
@@ -0,0 +1,214 @@
+"""Local routing of trivial turns to template answers (FR/EN/AR).
+
+Greetings, thanks, "qui t'a créé ?", bare language-switch requests and
+"efface la conversation" need no generation. A turn is routed only when
+every one of its words belongs to one intent's vocabulary (rules); a
+small naive Bayes model trained on the example phrases below picks the
+intent and must be confident. Anything else is substantive and goes to
+the LLM.
+"""
+import collections
+import logging
+import math
+import re
+import threading
+import time
+
+from enstp import language
+from enstp.text import fold_accents
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TERMS = 8
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+_TERM_RE = re.compile(r"[a-z0-9]+|[؀-ۿ]+")
+
+# Words that may surround any intent without making the turn substantive
+FILLER_TERMS = frozenset("""
+a ah alors bien beaucoup cher chere conseiller de du encore et j je la le les m me moi
+mon monsieur madame oh ok okay please pls plz s so stp svp t te tes toi tres tu un une very
+vous you your well
+يا فضلك
+""".split())
+
+INTENT_EXAMPLES = {
+    "greeting": [
+        "bonjour", "bonsoir", "salut", "coucou", "bonjour a vous", "salut ca va", "bonjour comment allez vous",
+        "ca va", "hello", "hi", "hey there", "good morning", "good evening", "hello how are you",
+        "السلام عليكم", "سلام", "مرحبا", "اهلا", "صباح الخير", "مساء الخير", "اهلا وسهلا", "كيف حالك",
+    ],
+    "thanks": [
+        "merci", "merci beaucoup", "merci bien", "merci infiniment", "je vous remercie", "merci pour votre aide",
+        "merci c'est clair", "super merci", "parfait merci", "top merci", "merci pour les infos",
+        "merci pour les informations", "merci pour tout",
+        "thanks", "thank you", "thank you so much", "thanks a lot", "great thanks", "thank you for your help",
+        "شكرا", "شكرا جزيلا", "بارك الله فيك", "مشكور", "شكرا لك",
+    ],
+    "creator": [
+        "qui t'a cree", "qui t'a invente", "qui t'a concu", "qui t'a developpe", "qui est ton createur",
+        "qui vous a cree", "qui a cree ce chatbot", "qui est ton developpeur", "par qui as tu ete cree",
+        "who made you", "who created you", "who built you", "who is your creator", "who developed you",
+        "who invented you", "من صنعك", "من صممك", "من برمجك", "من طورك", "من هو صانعك",
+    ],
+    "language_switch": [
+        "parle en anglais", "parle anglais", "reponds en anglais", "en anglais", "passe en anglais",
+        "parle en arabe", "reponds en arabe", "en arabe", "parle en francais", "reviens au francais",
+        "revenons au francais", "en francais", "speak in english", "speak english", "english", "in english",
+        "answer in english", "reply in english", "switch to english", "speak arabic", "speak in french",
+        "in french", "switch to french", "تكلم بالعربية", "بالعربية", "اكتب بالعربية", "تكلم بالفرنسية",
+        "تكلم بالانجليزية",
+    ],
+    "clear_conversation": [
+        "efface la conversation", "effacer la conversation", "efface l'historique", "supprime la conversation",
+        "recommencer la conversation", "on recommence la conversation", "nouvelle conversation",
+        "reinitialiser la conversation", "reset la conversation", "clear the conversation", "clear chat",
+        "clear the chat", "delete the conversation", "reset the chat", "start a new conversation",
+        "new conversation", "امسح المحادثة", "ابدأ محادثة جديدة", "محادثة جديدة",
+    ],
+}
+
+TEMPLATES = {
+    "greeting": {
+        "fr": "Bonjour ! Je suis là pour vous aider à choisir entre le DMS et le DIB. Parlez-moi des matières que vous aimez le plus, ou posez-moi une question sur les deux départements.",
+        "en": "Hello! I'm here to help you choose between DMS and DIB. Tell me which subjects you enjoy most, or ask me anything about the two departments.",
+        "ar": "مرحبا! أنا هنا لمساعدتك على الاختيار بين قسمي DMS و DIB. حدثني عن المواد التي تفضلها، أو اسألني أي سؤال عن القسمين.",
+    },
+    "thanks": {
+        "fr": "Avec plaisir ! N'hésitez pas si vous avez d'autres questions sur le DMS ou le DIB.",
+        "en": "You're welcome! Feel free to ask if you have other questions about DMS or DIB.",
+        "ar": "على الرحب والسعة! لا تتردد إذا كانت لديك أسئلة أخرى حول DMS أو DIB.",
+    },
+    # The prompt requires exactly this answer, whatever the language
+    "creator": {
+        "fr": "Cherif tas",
+        "en": "Cherif tas",
+        "ar": "Cherif tas",
+    },
+    "language_switch": {
+        "fr": "D'accord, je continue en français. Que souhaitez-vous savoir sur le DMS et le DIB ?",
+        "en": "Of course, I'll answer in English from now on. What would you like to know about DMS and DIB?",
+        "ar": "بكل سرور، سأجيبك بالعربية من الآن. ماذا تريد أن تعرف عن قسمي DMS و DIB؟",
+    },
+    "clear_conversation": {
+        "fr": "La conversation a été effacée. Reprenons depuis le début !",
+        "en": "The conversation has been cleared. Let's start over!",
+        "ar": "تم مسح المحادثة. لنبدأ من جديد!",
+    },
+}
+
+# Clearing deletes the stored conversation: it takes a verb and its object
+# ("efface la conversation", "new chat"), never a bare "tout" or "reset"
+_CLEAR_REQUEST_RE = re.compile(
+    r"\b(efface[rz]?|effacons|supprime[rz]?|reinitialise[rz]?|reset|clear|vide[rz]?|delete|erase|wipe|"
+    r"recommence[rz]?|recommencons|restart|start)\b.*\b(conversation|discussion|chat|historique|history)\b"
+    r"|\b(nouvelle|new) (conversation|discussion|chat)\b"
+    r"|امسح المحادثة|محادثة جديدة"
+)
+
+Intent = collections.namedtuple("Intent", ["name", "confidence"])
+RoutedTurn = collections.namedtuple("RoutedTurn", ["intent", "language", "text"])
+
+
+def terms(text):
+    """Folded words of a message, apostrophes split ("t'a" -> "t", "a")."""
+    return _TERM_RE.findall(fold_accents(text))
+
+
+class IntentRouter:
+    """Rules plus a multinomial naive Bayes over the intents' example phrases."""
+
+    def __init__(self, examples=None, templates=None, max_terms=DEFAULT_MAX_TERMS,
+                 min_confidence=DEFAULT_MIN_CONFIDENCE):
+        examples = INTENT_EXAMPLES if examples is None else examples
+        self.templates = TEMPLATES if templates is None else templates
+        self.max_terms = max_terms
+        self.min_confidence = min_confidence
+        self._vocabularies = {}
+        self._log_likelihoods = {}
+        self._unknown_log_likelihood = {}
+        term_counts = {
+            name: collections.Counter(term for phrase in phrases for term in terms(phrase))
+            for name, phrases in examples.items()
+        }
+        # One-word messages must be an example on their own ("merci", not the "tout" of "merci pour tout")
+        self._single_terms = frozenset(
+            content[0] for phrases in examples.values() for phrase in phrases
+            for content in [[term for term in terms(phrase) if term not in FILLER_TERMS]] if len(content) == 1
+        )
+        all_terms = set().union(*term_counts.values())
+        for name, counts in term_counts.items():
+            self._vocabularies[name] = frozenset(counts)
+            denominator = sum(counts.values()) + len(all_terms) + 1
+            self._log_likelihoods[name] = {term: math.log((counts[term] + 1) / denominator) for term in counts}
+            self._unknown_log_likelihood[name] = math.log(1 / denominator)
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def classify(self, text):
+        """Intent of a trivial message, or None for a substantive one."""
+        message_terms = terms(text)
+        content_terms = [term for term in message_terms if term not in FILLER_TERMS]
+        if not content_terms or len(message_terms) > self.max_terms:
+            # Only filler ("ok", "svp") or a long message: leave it to the LLM
+            return None
+        if len(content_terms) == 1 and content_terms[0] not in self._single_terms:
+            return None
+        # Rule: the intent's vocabulary must cover every non-filler word
+        candidates = [
+            name for name, vocabulary in self._vocabularies.items()
+            if all(term in vocabulary for term in content_terms)
+        ]
+        if "language_switch" in candidates and language.requested_language(text) is None:
+            candidates.remove("language_switch")
+        if "clear_conversation" in candidates and not _CLEAR_REQUEST_RE.search(fold_accents(text)):
+            candidates.remove("clear_conversation")
+        if not candidates:
+            return None
+        scores = {
+            name: sum(self._log_likelihoods[name].get(term, self._unknown_log_likelihood[name]) for term in content_terms)
+            for name in candidates
+        }
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        confidence = 1 / normalizer
+        if confidence < self.min_confidence:
+            return None
+        return Intent(best, confidence)
+
+    def route(self, text, response_language=None):
+        """Template answer for a trivial turn, or None to call the LLM.
+
+        The answer is in response_language, or for a language switch in
+        the requested language.
+        """
+        start_time = time.perf_counter()
+        intent = self.classify(text)
+        routed = None
+        if intent is not None:
+            reply_language = response_language or language.DEFAULT_LANGUAGE
+            if intent.name == "language_switch":
+                reply_language = language.requested_language(text) or reply_language
+            templates = self.templates[intent.name]
+            reply_language = reply_language if reply_language in templates else language.DEFAULT_LANGUAGE
+            routed = RoutedTurn(intent.name, reply_language, templates[reply_language])
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self._lock:
+            self._stats[intent.name if intent else "llm"] += 1
+        if intent is not None:
+            logger.info(f"Intent router: {intent.name} ({intent.confidence:.2f}) answered locally in {elapsed_ms:.2f} ms")
+        else:
+            logger.info(f"Intent router: substantive turn, sent to the LLM ({elapsed_ms:.2f} ms)")
+        return routed
+
+    def snapshot(self):
+        """Routing decisions so far and the share of turns answered locally."""
+        with self._lock:
+            stats = dict(self._stats)
+        total = sum(stats.values())
+        stats["routed_rate"] = (total - stats.get("llm", 0)) / total if total else 0.0
+        return stats
+
+
+# Shared by every session of this process
+ROUTER = IntentRouter()
@@ -0,0 +1,240 @@
+"""Pool of Gemini API keys with quota-aware selection.
+
+Quotas are granted per key (per Google Cloud project), so N keys serve
+about N times as many requests. Each key has its own fair queue per
+model (ratelimit.RateLimiter) sized by its weight; a request goes to the
+key that can serve it soonest, then to the one with the most free
+capacity. A key that still gets ResourceExhausted (another process uses
+it, or its real quota is lower than configured) is quarantined for that
+model, twice as long after each consecutive failure; a key the API
+rejects (revoked, or without access to the model) is set aside for
+MAX_QUARANTINE_SECONDS at once.
+"""
+import collections
+import contextlib
+import hashlib
+import logging
+import threading
+import time
+
+from google.api_core import exceptions as core_exceptions
+
+from enstp.ratelimit import DEFAULT_ACQUIRE_TIMEOUT, RateLimiter, RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUARANTINE_SECONDS = 30.0
+MAX_QUARANTINE_SECONDS = 300.0
+
+# The API refused the key itself: retrying it soon is pointless
+AUTH_ERRORS = (core_exceptions.PermissionDenied, core_exceptions.Unauthenticated)
+
+
+def fingerprint(api_key):
+    """Short, non-reversible identifier for an API key (safe to log)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def parse_keys(spec):
+    """[(api_key, weight)] from "KEY1,KEY2:2" or a list of "KEY[:WEIGHT]" entries.
+
+    The weight (default 1) scales the key's quotas, e.g. 2 for a project
+    with twice the free-tier quota. Duplicate keys are dropped.
+    """
+    entries = spec.split(",") if isinstance(spec, str) else list(spec)
+    keys = {}
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        api_key, separator, weight = entry.rpartition(":")
+        if not separator:
+            api_key, weight = entry, "1"
+        try:
+            weight = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for API key {fingerprint(api_key.strip())}: {weight!r}") from None
+        if weight <= 0:
+            raise ValueError(f"Weight of API key {fingerprint(api_key.strip())} must be positive.")
+        keys.setdefault(api_key.strip(), weight)
+    return list(keys.items())
+
+
+class _ModelSlot:
+    """Quota state of one key for one model."""
+
+    __slots__ = ("limiter", "quarantined_until", "strikes")
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.quarantined_until = 0.0
+        self.strikes = 0
+
+
+class PooledKey:
+    """One API key of the pool; api_key is None for a backend's own credentials."""
+
+    def __init__(self, api_key, weight, clock, window_seconds):
+        self.api_key = api_key
+        self.weight = weight
+        self.label = fingerprint(api_key) if api_key else "default"
+        self._clock = clock
+        self._window_seconds = window_seconds
+        self._slots = {}  # model name -> _ModelSlot
+        self.stats = collections.Counter()
+
+    def slot(self, model_name, requests_per_minute, tokens_per_minute):
+        """The key's slot for a model, rebuilt if its quotas changed (pool lock held)."""
+        rpm = max(1, round(requests_per_minute * self.weight))
+        tpm = max(1, round(tokens_per_minute * self.weight))
+        slot = self._slots.get(model_name)
+        if slot is None or slot.limiter.requests_per_minute != rpm or slot.limiter.tokens_per_minute != tpm:
+            previous = slot
+            slot = self._slots[model_name] = _ModelSlot(RateLimiter(rpm, tpm, self._clock, self._window_seconds))
+            if previous is not None:
+                slot.quarantined_until, slot.strikes = previous.quarantined_until, previous.strikes
+        return slot
+
+    def __repr__(self):
+        return f"PooledKey({self.label}, weight={self.weight:g})"
+
+
+class KeyPool:
+    """Spreads requests over API keys by projected wait and free capacity."""
+
+    def __init__(self, keys, quarantine_seconds=DEFAULT_QUARANTINE_SECONDS, clock=time.monotonic,
+                 window_seconds=60.0):
+        if not keys:
+            raise ValueError("A key pool needs at least one key.")
+        self.quarantine_seconds = quarantine_seconds
+        self._clock = clock
+        self._condition = threading.Condition()
+        self.keys = [PooledKey(api_key, weight, clock, window_seconds) for api_key, weight in keys]
+
+    @property
+    def api_keys(self):
+        return [(key.api_key, key.weight) for key in self.keys]
+
+    def _select(self, model_name, estimated_tokens, requests_per_minute, tokens_per_minute, now):
+        """(key, slot) to queue on, or None if every key is quarantined for this model (lock held)."""
+        candidates = []
+        for index, key in enumerate(self.keys):
+            slot = key.slot(model_name, requests_per_minute, tokens_per_minute)
+            if slot.quarantined_until > now:
+                continue
+            wait = slot.limiter.projected_wait(estimated_tokens)
+            # Soonest first, then most free capacity, then the heavier key
+            candidates.append((wait, -slot.limiter.headroom(), -key.weight, index, key, slot))
+        if not candidates:
+            return None
+        return min(candidates)[4:]
+
+    def acquire(self, model_name, session_id, estimated_tokens, requests_per_minute, tokens_per_minute,
+                on_wait=None, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        """Picks a key and blocks in its queue until the request may be sent.
+
+        Returns (PooledKey, seconds waited). on_wait and timeout work as
+        in RateLimiter.acquire; while every key is quarantined for the
+        model, the request waits for the first one to come back.
+        """
+        start = self._clock()
+        reported = None
+        while True:
+            with self._condition:
+                now = self._clock()
+                selected = self._select(model_name, estimated_tokens, requests_per_minute, tokens_per_minute, now)
+                if selected is None:
+                    release = min(key.slot(model_name, requests_per_minute, tokens_per_minute).quarantined_until
+                                  for key in self.keys) - now
+                    elapsed = now - start
+                    if timeout is not None and elapsed + release > timeout:
+                        raise RateLimitTimeout(f"Every API key is quarantined for {model_name} "
+                                               f"for another {release:.0f}s")
+                    if on_wait is None or reported == round(release):
+                        self._condition.wait(max(0.01, min(release, 1.0)))
+                        continue
+                    reported = round(release)
+            if selected is None:
+                on_wait(0, release)
+                continue
+            key, slot = selected
+            remaining = None if timeout is None else max(0.0, timeout - (self._clock() - start))
+            slot.limiter.acquire(session_id, estimated_tokens, on_wait=on_wait, timeout=remaining)
+            with self._condition:
+                key.stats["requests"] += 1
+                key.stats["tokens"] += estimated_tokens
+            return key, self._clock() - start
+
+    def headroom(self, model_name, requests_per_minute, tokens_per_minute, estimated_tokens=None):
+        """Largest share of burst capacity free on a key not quarantined for the model.
+
+        estimated_tokens works as in RateLimiter.headroom.
+        """
+        with self._condition:
+            now = self._clock()
+            slots = [key.slot(model_name, requests_per_minute, tokens_per_minute) for key in self.keys]
+            return max((slot.limiter.headroom(estimated_tokens) for slot in slots if slot.quarantined_until <= now),
+                       default=0.0)
+
+    def report_exhausted(self, key, model_name):
+        """Quarantines a key for a model after a quota error."""
+        with self._condition:
+            slot = key._slots.get(model_name)
+            if slot is None:
+                return
+            slot.strikes += 1
+            seconds = min(MAX_QUARANTINE_SECONDS, self.quarantine_seconds * 2 ** (slot.strikes - 1))
+            slot.quarantined_until = self._clock() + seconds
+            key.stats["exhausted"] += 1
+        logger.warning(f"API key {key.label} exhausted its {model_name} quota; quarantined for {seconds:.0f}s "
+                       f"(strike {slot.strikes}).")
+
+    def report_rejected(self, key, model_name):
+        """Quarantines a key for a model for MAX_QUARANTINE_SECONDS after an authentication error."""
+        with self._condition:
+            slot = key._slots.get(model_name)
+            if slot is None:
+                return
+            slot.strikes += 1
+            slot.quarantined_until = self._clock() + MAX_QUARANTINE_SECONDS
+            key.stats["rejected"] += 1
+        logger.error(f"API key {key.label} rejected for {model_name}; quarantined for {MAX_QUARANTINE_SECONDS:.0f}s.")
+
+    def report_success(self, key, model_name):
+        with self._condition:
+            slot = key._slots.get(model_name)
+            if slot is not None and slot.strikes:
+                slot.strikes = 0
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def using(self, key, model_name):
+        """Reports the outcome of the block's request on key to the pool."""
+        try:
+            yield key
+        except core_exceptions.ResourceExhausted:
+            self.report_exhausted(key, model_name)
+            raise
+        except AUTH_ERRORS:
+            self.report_rejected(key, model_name)
+            raise
+        self.report_success(key, model_name)
+
+    def snapshot(self):
+        """Per-key counters and remaining quarantine, for the admin panel."""
+        with self._condition:
+            now = self._clock()
+            return [
+                {
+                    "key": key.label,
+                    "weight": key.weight,
+                    "requests": key.stats["requests"],
+                    "tokens": key.stats["tokens"],
+                    "exhausted": key.stats["exhausted"],
+                    "quarantined": {
+                        model_name: round(slot.quarantined_until - now)
+                        for model_name, slot in key._slots.items() if slot.quarantined_until > now
+                    },
+                }
+                for key in self.keys
+            ]
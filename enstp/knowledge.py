@@ -0,0 +1,442 @@
+"""Structured knowledge base compiled from the guide, for exact lookups.
+
+The guide's module lists, optional tracks, labs, internships, sectors and
+aptitudes are parsed once per process into an indexed model. Lookup
+questions ("DMS vs DIB modules", "what's in the Tunnels track", "which
+labs are shared") are answered as Markdown tables without calling the
+LLM; everything else returns None.
+"""
+import collections
+import logging
+import re
+import time
+
+from enstp import answer_cache
+from enstp.guide import GUIDE_SECTIONS
+from enstp.text import fold_accents
+
+logger = logging.getLogger(__name__)
+
+DEPARTMENTS = ("DMS", "DIB")
+DEFAULT_MAX_TERMS = 16
+
+Module = collections.namedtuple(
+    "Module", ["name", "english_name", "description", "departments", "category", "track", "section"]
+)
+Track = collections.namedtuple("Track", ["name", "department", "modules"])
+Internship = collections.namedtuple("Internship", ["year", "name", "description"])
+ResearchLab = collections.namedtuple("ResearchLab", ["name", "department", "description"])
+Department = collections.namedtuple("Department", [
+    "code", "name", "specialization", "description", "sectors", "advancement", "entrepreneurship",
+    "research_focus", "aptitudes", "learning_styles", "career_interests", "visits", "final_projects",
+])
+KnowledgeAnswer = collections.namedtuple("KnowledgeAnswer", ["kind", "text"])
+
+# Module categories, in curriculum order, by section title
+_MODULE_SECTIONS = [
+    (re.compile(r"^Mathematics and Scientific Foundation"), "fundamental"),
+    (re.compile(r"^Core Engineering Sciences"), "fundamental"),
+    (re.compile(r"^Advanced Common Modules"), "advanced"),
+    (re.compile(r"^Common Transversal Modules"), "transversal"),
+    (re.compile(r"^Common Practical Work"), "lab"),
+    (re.compile(r"^(DMS|DIB)-Specific Engineering Modules"), "specific"),
+    (re.compile(r"^(DMS|DIB) Optional Tracks"), "track"),
+    (re.compile(r"^(DMS|DIB) Master's Modules"), "master"),
+]
+CATEGORY_ORDER = ("fundamental", "advanced", "transversal", "lab", "specific", "track", "master")
+
+_BULLET_RE = re.compile(r"^\s*•\s*", re.M)
+_TRACK_HEADER_RE = re.compile(r"^\s*([A-Z][^•:\n]*Track[^:\n]*):\s*$", re.M)
+_ITEM_RE = re.compile(r"^(?P<name>[^(:]+?)\s*(?:\((?P<english>[^)]*)\))?\s*(?::\s*(?P<description>.*))?$", re.S)
+_SPECIALIZATION_RE = re.compile(r"Primary Specialization:\s*(.+)")
+_YEAR_RE = re.compile(r"(\d)(?:st|nd|rd|th) year")
+
+
+def _clean(text):
+    """Joins wrapped lines and words hyphenated across them."""
+    return " ".join(re.sub(r"-\n\s*", "", text).split())
+
+
+def _bullets(text):
+    """Text of each "•" item of a section, with wrapped lines joined."""
+    return [_clean(item) for item in _BULLET_RE.split(text)[1:] if item.strip()]
+
+
+def _department_of(title):
+    for code in DEPARTMENTS:
+        if title.startswith(code):
+            return code
+    return None
+
+
+def _parse_item(item):
+    match = _ITEM_RE.match(item)
+    name = match.group("name").strip()
+    return name, (match.group("english") or "").strip(), (match.group("description") or "").strip()
+
+
+def _track_blocks(text):
+    """(track title, block text) pairs of an optional-tracks section."""
+    headers = list(_TRACK_HEADER_RE.finditer(text))
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(text)
+        yield _clean(header.group(1)), text[header.end():end]
+
+
+class KnowledgeBase:
+    """Modules, tracks, labs, internships and departments, indexed for lookups."""
+
+    def __init__(self, sections=GUIDE_SECTIONS):
+        start_time = time.perf_counter()
+        by_title = {section.title: section for section in sections}
+        self.modules = []
+        self.tracks = []
+        for section in sections:
+            for pattern, category in _MODULE_SECTIONS:
+                if pattern.match(section.title):
+                    self._add_modules(section, category)
+                    break
+        self.internships = [
+            Internship(int(_YEAR_RE.search(english).group(1)), name, description)
+            for name, english, description in map(_parse_item, _bullets(self._section(by_title, "Internship Requirements")))
+        ]
+        self.research_labs = [
+            ResearchLab(name, code, description)
+            for code in DEPARTMENTS
+            for name, _, description in map(_parse_item, _bullets(self._section(by_title, f"{code}-Affiliated Research Facilities")))
+        ]
+        self.common_sectors = _bullets(self._section(by_title, "Common Employment Sectors"))
+        self.departments = {code: self._department(code, by_title) for code in DEPARTMENTS}
+
+        self._modules_by_key = {}
+        for module in self.modules:
+            for key in (module.name, module.english_name):
+                if len(key) >= 4:
+                    self._modules_by_key.setdefault(fold_accents(key), module)
+        # One alternation, longest names first, so "Géologie 2" wins over "Géologie"
+        self._module_names_re = re.compile(
+            r"(?<!\w)(" + "|".join(re.escape(key) for key in sorted(self._modules_by_key, key=len, reverse=True)) + r")(?!\w)"
+        )
+        self.compile_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(
+            f"Knowledge base compiled: {len(self.modules)} modules, {len(self.tracks)} tracks, "
+            f"{len(self.research_labs)} research labs in {self.compile_ms:.1f} ms"
+        )
+
+    @staticmethod
+    def _section(by_title, prefix):
+        for title, section in by_title.items():
+            if title.startswith(prefix):
+                return section.text
+        return ""
+
+    def _add_modules(self, section, category):
+        department = _department_of(section.title)
+        departments = (department,) if department else DEPARTMENTS
+        if category == "track":
+            blocks = list(_track_blocks(section.text))
+        else:
+            blocks = [(None, section.text)]
+        for track_title, block in blocks:
+            track_name = re.sub(r"\s*Track\b", "", track_title) if track_title else None
+            track_modules = []
+            for item in _bullets(block):
+                name, english, description = _parse_item(item)
+                module_departments = departments
+                if "(shared with DMS)" in description or "(shared with DIB)" in description:
+                    module_departments = DEPARTMENTS
+                    description = re.sub(r"\s*\(shared with (DMS|DIB)\)", "", description)
+                module = Module(name, english, description, module_departments, category, track_name, section.number)
+                self.modules.append(module)
+                track_modules.append(module)
+            if track_title:
+                self.tracks.append(Track(track_name, department, tuple(track_modules)))
+
+    def _labelled_items(self, by_title, prefix):
+        """{"DMS Graduates": "...", ...} for sections made of "Label: text" items."""
+        return {label: text for label, _, text in map(_parse_item, _bullets(self._section(by_title, prefix)))}
+
+    def _department(self, code, by_title):
+        description_section = next(section for title, section in by_title.items() if f"({code})" in title)
+        specialization = _SPECIALIZATION_RE.search(description_section.text)
+        description = _SPECIALIZATION_RE.sub("", description_section.text)
+        research = self._labelled_items(by_title, "Research Orientation")
+        advancement = self._labelled_items(by_title, "Professional Advancement")
+        entrepreneurship = self._labelled_items(by_title, "Entrepreneurship Opportunities")
+        return Department(
+            code=code,
+            name=re.sub(r"\s*\(\w+\)$", "", description_section.title),
+            specialization=_clean(specialization.group(1)) if specialization else "",
+            description=_clean(description),
+            sectors=_bullets(self._section(by_title, f"{code} Graduate Predominant Sectors")),
+            advancement=advancement.get(f"{code} Graduates", ""),
+            entrepreneurship=entrepreneurship.get(f"{code} Entrepreneurship", ""),
+            research_focus=research.get(f"{code} Research Focus", ""),
+            aptitudes=_bullets(self._section(by_title, f"{code}-Favored Aptitudes")),
+            learning_styles=_bullets(self._section(by_title, f"{code}-Favored Learning Styles")),
+            career_interests=_bullets(self._section(by_title, f"{code}-Aligned Career Interests")),
+            visits=_bullets(self._section(by_title, f"{code} Educational Visits")),
+            final_projects=_bullets(self._section(by_title, f"{code} Final Projects")),
+        )
+
+    # --- Lookups ---
+
+    def modules_of(self, department, category=None):
+        return [
+            module for module in self.modules
+            if department in module.departments and (category is None or module.category == category)
+        ]
+
+    def module_mentions(self, text):
+        """(folded name, Module) for each module name in text, in order of appearance."""
+        return [(key, self._modules_by_key[key]) for key in self._module_names_re.findall(fold_accents(text))]
+
+    def find_modules(self, text):
+        """Modules named in text (French or English name), longest names first."""
+        found = []
+        for _, module in self.module_mentions(text):
+            if module not in found:
+                found.append(module)
+        return found
+
+    def find_track(self, text):
+        folded = fold_accents(text)
+        for track in self.tracks:
+            if any(re.search(pattern, folded) for pattern in _TRACK_KEYWORDS.get(track.name, ())):
+                return track
+        return None
+
+
+# Words naming each optional track, in French and English
+_TRACK_KEYWORDS = {
+    "Buildings (Bâtiments)": (r"\bbatiment", r"\bbuilding"),
+    "Tunnels": (r"\btunnel", r"\bsouterrain", r"\bunderground"),
+    "Railway and Rail Bridges": (r"\bvf\b", r"\bpr\b", r"ferroviaire", r"\brail", r"chemin de fer", r"voie ferree", r"pont.rail"),
+    "Maritime Works and Air Bases": (r"\btm\b", r"\bbase\b", r"maritime", r"\bport", r"aerien", r"aeroport", r"airport", r"air base"),
+}
+
+# --- Query rules ---
+
+_LABELS = {
+    "fr": {
+        "module": "Module", "english": "Intitulé (EN)", "description": "Description", "department": "Département",
+        "category": "Catégorie", "track": "Option", "modules": "Modules", "year": "Année", "internship": "Stage",
+        "lab": "Laboratoire", "both": "DMS et DIB", "common": "Commun",
+        "fundamental": "Tronc commun fondamental", "advanced": "Modules avancés communs",
+        "transversal": "Modules transversaux", "lab_category": "Travaux pratiques", "specific": "Modules spécifiques",
+        "track_category": "Options", "master": "Master",
+        "sectors": "Secteurs", "aptitudes": "Aptitudes", "learning_styles": "Styles d'apprentissage",
+        "career_interests": "Intérêts professionnels", "visits": "Visites pédagogiques",
+        "final_projects": "Projets de fin d'études", "research_focus": "Axes de recherche",
+        "advancement": "Évolution de carrière", "entrepreneurship": "Entrepreneuriat",
+        "source": "Source: Guide ENSTP DMS/DIB, sections",
+    },
+    "en": {
+        "module": "Module", "english": "English title", "description": "Description", "department": "Department",
+        "category": "Category", "track": "Track", "modules": "Modules", "year": "Year", "internship": "Internship",
+        "lab": "Laboratory", "both": "DMS and DIB", "common": "Common",
+        "fundamental": "Fundamental core", "advanced": "Advanced common modules",
+        "transversal": "Transversal modules", "lab_category": "Practical work", "specific": "Specific modules",
+        "track_category": "Optional tracks", "master": "Master's",
+        "sectors": "Sectors", "aptitudes": "Aptitudes", "learning_styles": "Learning styles",
+        "career_interests": "Career interests", "visits": "Educational visits",
+        "final_projects": "Final projects", "research_focus": "Research focus",
+        "advancement": "Career advancement", "entrepreneurship": "Entrepreneurship",
+        "source": "Source: ENSTP DMS/DIB Guide, sections",
+    },
+}
+
+_MODULE_WORDS = r"\b(modules?|cours|matieres?|programmes?|curriculum|courses?|subjects?|enseignements?)\b"
+_COMPARE_WORDS = r"\b(vs|versus|compar\w*|differen\w*|entre)\b"
+_QUERY_RULES = [
+    ("internships", re.compile(r"\b(stages?|internships?)\b")),
+    ("shared_labs", re.compile(r"\b(labs?|laboratoires?|laboratories|tp|travaux pratiques)\b.*\b(partage\w*|commun\w*|shared|common|both|deux)\b"
+                               r"|\b(partage\w*|commun\w*|shared|common)\b.*\b(labs?|laboratoires?|laboratories|tp|travaux pratiques)\b")),
+    ("research_labs", re.compile(r"\b(labs?|laboratoires?|laboratories)\b.*\brecherche|\bresearch\b.*\b(labs?|laboratories|facilities)\b")),
+    ("labs", re.compile(r"\b(labs?|laboratoires?|laboratories|tp|travaux pratiques)\b")),
+    ("tracks", re.compile(r"\b(options?|tracks?|filieres?|parcours)\b")),
+    ("modules", re.compile(_MODULE_WORDS)),
+    ("sectors", re.compile(r"\b(debouches?|secteurs?|sectors?|emplois?|employment|jobs?|careers?|metiers?)\b")),
+    ("aptitudes", re.compile(r"\b(aptitudes?|qualites?|competences?|skills?|profils?)\b")),
+    ("visits", re.compile(r"\b(visites?|visits?|sorties?)\b")),
+    ("final_projects", re.compile(r"\b(pfe|projets? de fin|final projects?|graduation projects?)\b")),
+]
+# Explicit lookup forms: a list ("quels sont les...", "list"), a comparison
+# ("DMS vs DIB") or a definition ("c'est quoi", "what's in")
+_LOOKUP_FORM_RE = re.compile(
+    r"^(quel\w*|which|what|list\w*|show|donne\w*|enumere\w*|c ?est quoi|qu ?est ?ce)\b|\b(vs|versus|compar\w*)\b"
+)
+# Every other word of a lookup question is the topic, a department, a
+# track or glue. Any other word ("les plus difficiles", "rémunérés",
+# "obligatoires", "en anglais", "mieux payés") asks for more than a table.
+_LOOKUP_WORDS = frozenset("""
+quel quelle quels quelles which what whats s list liste lister listez show donne donnez donner la liste enumere
+enumerez c est quoi qu ce que compare comparer comparez comparaison compared comparison vs versus entre
+a au aux d de des du en et l le les ou un une dans pour par sur the an of in on for at and or to with
+sont est existe existent ya y il t ils elles are is there exist offered available propose proposes proposees
+enseigne enseignes enseignee enseignees etudie etudies etudiees taught studied seulement uniquement only
+specifique specifiques specific commun communs commune communes partage partages partagees shared common both deux
+dms dib department departement departements departments
+module modules cours matiere matieres programme programmes curriculum course courses subject subjects
+enseignement enseignements option options track tracks filiere filieres parcours lab labs laboratoire
+laboratoires laboratories tp travaux pratiques recherche research facilities stage stages internship
+internships debouche debouches secteur secteurs sector sectors emploi emplois employment job jobs career
+careers metier metiers aptitude aptitudes qualite qualites competence competences skill skills profil profils
+visite visites visit visits sortie sorties pfe projet projets project projects fin final graduation
+batiment batiments building buildings tunnel tunnels souterrain souterrains underground vf pr ferroviaire
+ferroviaires rail railway railways chemin chemins fer voie ferree pont ponts bridge bridges tm base bases
+maritime maritimes works aerien aerienne aeriennes aeroport aeroports airport airports air
+""".split())
+_MODULE_LOOKUP_RE = re.compile(r"\b(c ?est quoi|qu ?est ?ce|what is|what s|explique|describe|definition|contenu|content)\b")
+
+
+def _table(headers, rows):
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(str(cell).replace("|", "/") for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+class KnowledgeLookup:
+    """Recognizes lookup questions and renders their answer from the knowledge base.
+
+    Only explicit lookups are answered (a list, a comparison, "what's in
+    X", with nothing asked beyond it); any other question goes to the LLM.
+    """
+
+    def __init__(self, knowledge_base, max_terms=DEFAULT_MAX_TERMS):
+        self.kb = knowledge_base
+        self.max_terms = max_terms
+
+    def answer(self, question, response_language="fr"):
+        """KnowledgeAnswer for an exact lookup question, or None for the LLM."""
+        folded = " ".join(re.findall(r"\w+", fold_accents(question)))
+        if not folded or len(folded.split()) > self.max_terms or answer_cache.refers_to_context(question):
+            return None
+        if not self._is_lookup_form(question, folded):
+            return None
+        labels = _LABELS.get(response_language, _LABELS["fr"])
+        departments = [code for code in DEPARTMENTS if re.search(rf"\b{code.lower()}\b", folded)] or list(DEPARTMENTS)
+
+        track = self.kb.find_track(folded) if re.search(r"\b(options?|tracks?|filieres?|parcours)\b", folded) else None
+        if track is not None:
+            return self._render("track", labels, self._track_table(track, labels), [track.modules[0].section])
+        for kind, pattern in _QUERY_RULES:
+            if pattern.search(folded):
+                break
+        else:
+            kind = None
+        if kind in (None, "modules") and _MODULE_LOOKUP_RE.search(folded):
+            # "c'est quoi le Béton Précontraint ?": the named modules themselves
+            modules = self.kb.find_modules(question)
+            if modules:
+                return self._render("module", labels, self._module_table(modules, labels), sorted({m.section for m in modules}))
+        if kind is None:
+            return None
+        return getattr(self, f"_{kind}")(folded, departments, labels)
+
+    def _is_lookup_form(self, question, folded):
+        """Whether the question is an explicit list, comparison or definition and nothing more."""
+        if not _LOOKUP_FORM_RE.search(folded):
+            return False
+        # Module names ("c'est quoi le Béton Précontraint ?") are the topic too
+        remaining = self.kb._module_names_re.sub(" ", fold_accents(question))
+        return all(word in _LOOKUP_WORDS or word.isdigit() for word in re.findall(r"\w+", remaining))
+
+    def _render(self, kind, labels, table, sections):
+        return KnowledgeAnswer(kind, f"{table}\n\n_{labels['source']} {', '.join(sections)}._")
+
+    def _module_table(self, modules, labels):
+        return _table(
+            [labels["module"], labels["english"], labels["department"], labels["description"]],
+            [(m.name, m.english_name, " / ".join(m.departments), m.description) for m in modules],
+        )
+
+    def _track_table(self, track, labels):
+        header = f"**{labels['track']} {track.name} ({track.department})**\n\n"
+        return header + _table(
+            [labels["module"], labels["english"], labels["description"]],
+            [(m.name, m.english_name, m.description) for m in track.modules],
+        )
+
+    def _modules(self, folded, departments, labels):
+        compare = len(departments) == 2 or re.search(_COMPARE_WORDS, folded)
+        departments = list(DEPARTMENTS) if compare else departments
+        category_labels = {
+            "fundamental": labels["fundamental"], "advanced": labels["advanced"],
+            "transversal": labels["transversal"], "lab": labels["lab_category"],
+            "specific": labels["specific"], "track": labels["track_category"], "master": labels["master"],
+        }
+        common_rows, specific_rows = [], []
+        for category in CATEGORY_ORDER:
+            cells = [", ".join(m.name for m in self.kb.modules_of(code, category)) or "-" for code in departments]
+            if len(departments) == 2 and cells[0] == cells[1]:
+                common_rows.append([category_labels[category], cells[0]])
+            else:
+                specific_rows.append([category_labels[category]] + cells)
+        tables = []
+        if common_rows:
+            tables.append(f"**{labels['both']}**\n\n" + _table([labels["category"], labels["modules"]], common_rows))
+        tables.append(_table([labels["category"]] + departments, specific_rows))
+        sections = sorted({m.section for m in self.kb.modules}, key=lambda n: [int(p) for p in n.split(".")])
+        return self._render("modules", labels, "\n\n".join(tables), sections)
+
+    def _tracks(self, folded, departments, labels):
+        rows = [
+            (track.name, track.department, ", ".join(m.name for m in track.modules))
+            for track in self.kb.tracks if track.department in departments
+        ]
+        sections = sorted({track.modules[0].section for track in self.kb.tracks if track.department in departments})
+        return self._render("tracks", labels, _table([labels["track"], labels["department"], labels["modules"]], rows), sections)
+
+    def _shared_labs(self, folded, departments, labels):
+        labs = self.kb.modules_of("DMS", "lab")
+        return self._render("shared_labs", labels, self._module_table(labs, labels), sorted({m.section for m in labs}))
+
+    def _labs(self, folded, departments, labels):
+        labs = [
+            m for m in self.kb.modules
+            if m.name.startswith("TP") and any(code in m.departments for code in departments)
+        ]
+        rows = [
+            (m.name, m.english_name, labels["both"] if len(m.departments) == 2 else m.departments[0], m.description)
+            for m in labs
+        ]
+        sections = sorted({m.section for m in labs})
+        table = _table([labels["lab"], labels["english"], labels["department"], labels["description"]], rows)
+        return self._render("labs", labels, table, sections)
+
+    def _research_labs(self, folded, departments, labels):
+        rows = [(lab.name, lab.department, lab.description) for lab in self.kb.research_labs if lab.department in departments]
+        table = _table([labels["lab"], labels["department"], labels["description"]], rows)
+        return self._render("research_labs", labels, table, ["7.1.1", "7.1.2"])
+
+    def _internships(self, folded, departments, labels):
+        rows = [(internship.year, internship.name, internship.description) for internship in self.kb.internships]
+        table = _table([labels["year"], labels["internship"], labels["description"]], rows)
+        return self._render("internships", labels, table, ["6.1"])
+
+    def _side_by_side(self, kind, attribute, departments, labels, sections, common=None):
+        columns = [getattr(self.kb.departments[code], attribute) for code in departments]
+        depth = max(len(column) for column in columns)
+        rows = [[column[index] if index < len(column) else "" for column in columns] for index in range(depth)]
+        if common:
+            rows += [[f"{labels['common']}: {item}" for _ in departments] for item in common]
+        return self._render(kind, labels, _table(list(departments), rows), sections)
+
+    def _sectors(self, folded, departments, labels):
+        return self._side_by_side("sectors", "sectors", departments, labels, ["9.1.1", "9.1.2", "9.1.3"],
+                                  common=self.kb.common_sectors)
+
+    def _aptitudes(self, folded, departments, labels):
+        return self._side_by_side("aptitudes", "aptitudes", departments, labels, ["12.1.1", "12.1.2"])
+
+    def _visits(self, folded, departments, labels):
+        return self._side_by_side("visits", "visits", departments, labels, ["6.2.1", "6.2.2"])
+
+    def _final_projects(self, folded, departments, labels):
+        return self._side_by_side("final_projects", "final_projects", departments, labels, ["6.3.1", "6.3.2"])
+
+
+# Compiled once per process; Streamlit reruns reuse the imported module.
+KNOWLEDGE_BASE = KnowledgeBase()
+LOOKUP = KnowledgeLookup(KNOWLEDGE_BASE)
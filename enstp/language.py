@@ -0,0 +1,60 @@
+"""Detection of the student's requested response language."""
+import re
+
+from enstp.text import fold_accents
+
+DEFAULT_LANGUAGE = "fr"
+
+_LANGUAGE_NAMES = {
+    "en": re.compile(r"\b(english|anglais|inglizi)\b|انجليزي|الإنجليزية|الانجليزية"),
+    "ar": re.compile(r"\b(arabic|arabe|arab|3arbia|darija)\b|عربي|العربية|بالعربية"),
+    "fr": re.compile(r"\b(french|francais|fr)\b|فرنسي|الفرنسية"),
+}
+# Imperative verbs that turn a language name a few words after them into a
+# request to switch ("parle en anglais", "answer me in English")
+_SWITCH_VERB_RE = re.compile(
+    r"speak|talk|answer|reply|respond|write|switch|parle[rz]?|reponds?|repondez|repondre|ecris|ecrivez|ecrire|"
+    r"passe[rz]?|continue[rz]?|revenons|revenir|reviens|retour|back|تكلم|اكتب|جاوب"
+)
+_SWITCH_REACH = 4
+# What a bare request ("english please?", "en anglais stp") may add to the name
+_POLITENESS_RE = re.compile(r"\b(please|pls|plz|stp|svp|now|maintenant|ok|merci|thanks|in|en)\b|[^\w\s]")
+
+
+def requested_language(text):
+    """Language code the message asks to switch to, or None.
+
+    A language name only counts as a request when one of the few words
+    before it is a verb such as "speak"/"parle"/"switch", or when it is
+    all the message says ("english please?"): "je suis nul en anglais"
+    and "les cours sont-ils en anglais ?" ask for nothing.
+    """
+    folded = fold_accents(text)
+    for language, pattern in _LANGUAGE_NAMES.items():
+        if not pattern.search(folded):
+            continue
+        bare = not _POLITENESS_RE.sub(" ", pattern.sub(" ", folded)).split()
+        if bare or any(_SWITCH_VERB_RE.fullmatch(word) for word in _words_before(folded, pattern)):
+            return language
+    return None
+
+
+def _words_before(folded, pattern):
+    """The _SWITCH_REACH words before each mention of a language name."""
+    for match in pattern.finditer(folded):
+        yield from re.findall(r"\w+", folded[:match.start()])[-_SWITCH_REACH:]
+
+
+def current_language(conversation_history, student_input=None):
+    """Response language in effect: the latest switch request, else French."""
+    if student_input:
+        language = requested_language(student_input)
+        if language:
+            return language
+    for index in range(len(conversation_history) - 1, -1, -1):
+        turn = conversation_history[index]
+        if turn.role == "user":
+            language = requested_language(turn.content)
+            if language:
+                return language
+    return DEFAULT_LANGUAGE
@@ -0,0 +1,64 @@
+"""Extractive answers from the guide, for when the model cannot answer.
+
+No generation: the passages (a section's introduction or one of its
+bullet items) of the best-matching guide sections that share the most
+terms with the question are quoted as they are, under a notice that
+says the advisor is running in degraded mode.
+"""
+import re
+
+from enstp import retrieval
+from enstp.text import tokenize
+
+DEFAULT_SECTIONS = 2
+DEFAULT_PASSAGES = 3
+
+_BULLET_RE = re.compile(r"^\s*•\s*", re.M)
+# Words split across lines by the guide's hyphenation ("infrastruc-\n  ture")
+_HYPHENATION_RE = re.compile(r"(?<=\w)-\n\s*")
+
+NOTICES = {
+    "fr": "⚠️ *Mode dégradé : le conseiller IA est momentanément indisponible. Voici les passages du guide de l'ENSTP les plus proches de votre question.*",
+    "en": "⚠️ *Degraded mode: the AI advisor is temporarily unavailable. Here are the passages of the ENSTP guide closest to your question.*",
+    "ar": "⚠️ *وضع محدود: المستشار الذكي غير متاح مؤقتا. إليك مقاطع دليل ENSTP الأقرب إلى سؤالك.*",
+}
+NO_MATCH = {
+    "fr": "Je n'ai trouvé aucun passage du guide sur ce sujet. Réessayez dans quelques instants, ou reformulez votre question en citant un module, un parcours ou un département (DMS, DIB).",
+    "en": "No passage of the guide matches this question. Please try again in a few moments, or rephrase it with a module, track or department (DMS, DIB).",
+    "ar": "لم أجد أي مقطع من الدليل حول هذا الموضوع. أعد المحاولة بعد لحظات، أو أعد صياغة سؤالك بذكر مادة أو مسار أو قسم (DMS، DIB).",
+}
+
+
+def passages(section):
+    """A section's introduction and bullet items, with wrapped lines joined."""
+    parts = [" ".join(part.split()) for part in _BULLET_RE.split(_HYPHENATION_RE.sub("", section.text))]
+    return [part for part in parts if part]
+
+
+def _best_passages(section, query_terms, limit):
+    """Up to limit passages sharing the most terms with the query, in guide order."""
+    candidates = passages(section)
+    scored = [(len(query_terms.intersection(tokenize(passage))), position)
+              for position, passage in enumerate(candidates)]
+    matched = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))[:limit]
+    positions = sorted(position for _, position in matched)
+    if not positions and query_terms.intersection(tokenize(section.title)):
+        # The title matches ("Employment Sectors") but not the items: the section's opening
+        positions = range(min(limit, len(candidates)))
+    return [candidates[position] for position in positions]
+
+
+def extractive_answer(question, response_language="fr", index=None, sections=DEFAULT_SECTIONS,
+                      passages_per_section=DEFAULT_PASSAGES):
+    """Markdown answer quoting the guide passages closest to question."""
+    notice = NOTICES.get(response_language, NOTICES["fr"])
+    query_terms = set(retrieval.expand_query(question))
+    blocks = []
+    for section in retrieval.retrieve_sections(question, k=sections, index=index):
+        # Only passages or titles with words of the question: a loose semantic match quotes nothing
+        quoted = _best_passages(section, query_terms, passages_per_section)
+        if quoted:
+            blocks.append(f"**{section.number} {section.title}**\n" + "\n".join(f"> {passage}  " for passage in quoted))
+    if not blocks:
+        return f"{notice}\n\n{NO_MATCH.get(response_language, NO_MATCH['fr'])}"
+    return notice + "\n\n" + "\n\n".join(blocks)
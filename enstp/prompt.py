@@ -0,0 +1,255 @@
+"""Prompt assembly for the Conseiller ENSTP.
+
+The instructions are compiled once, at import: indentation, blank lines
+and runs of spaces are stripped, and one variant is kept per response
+language. Each turn joins the compiled text with its own segments (guide
+extracts, student profile, history) under a token budget; when the
+prompt would exceed it, those segments are trimmed, lowest priority
+first.
+"""
+import collections
+import functools
+import hashlib
+import logging
+import re
+
+from enstp import language
+from enstp import retrieval
+from enstp import telemetry
+from enstp.guide import ENSTP_GUIDE_TEXT
+from enstp.history import condense
+from enstp.text import estimate_tokens
+from enstp.transcript import as_transcript
+
+logger = logging.getLogger(__name__)
+
+# Estimated tokens of the whole prompt. Retrieval and history have their
+# own budgets; this one caps what they add up to with a long input.
+DEFAULT_TOKEN_BUDGET = 4000
+# Share of the budget a single student message may take
+MAX_INPUT_SHARE = 0.25
+
+# An optional part of the prompt. Over budget, parts are dropped one at a
+# time, lowest priority segment first: from the end with keep="first",
+# from the start with keep="last".
+Segment = collections.namedtuple("Segment", ["name", "header", "parts", "separator", "priority", "keep"])
+AssembledPrompt = collections.namedtuple("AssembledPrompt", ["text", "tokens", "trimmed"])
+
+_SPACE_RUN_RE = re.compile(r"[ \t]+")
+
+
+def minify(text):
+    """text without indentation, blank lines or runs of spaces."""
+    lines = (_SPACE_RUN_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+# --- Compiled instructions ---
+_PERSONA = minify("""
+    **PERSONA & MISSION:**
+    Vous êtes un conseiller d'orientation expert, amical et perspicace de l'ENSTP. Votre mission est d'avoir une conversation naturelle et guidée avec un étudiant venant de terminer le cycle préparatoire pour l'aider à choisir entre les départements DMS et DIB. Votre source principale d'information est le "Guide ENSTP DMS/DIB".
+""")
+
+_CONSTRAINTS = minify("""
+    **CONTRAINTES:**
+    1. **SOURCE PRINCIPALE:** Basez principalement vos réponses, analyses et recommandations sur le "Guide ENSTP DMS/DIB" fourni ci-dessous.
+    2. **CONNAISSANCES GÉNÉRALES:** Vous pouvez utiliser des connaissances générales sur le génie civil, les travaux publics et d'autres domaines connexes pour contextualiser vos réponses, mais restez centré sur l'ENSTP.
+    3. **ATTRIBUTION:** Si on vous demande qui vous a créé ou inventé, répondez UNIQUEMENT "Cherif tas".
+    4. **LANGUE:** {language_rule}
+""")
+
+# The language in effect is known before the call: each variant states
+# only the rule that applies to it.
+_LANGUAGE_RULES = {
+    "fr": "Répondez en FRANÇAIS par défaut. Si l'étudiant demande explicitement une réponse en anglais ou en arabe "
+          "(ex: \"speak in english\", \"parle en arabe\"), répondez à CETTE demande spécifique dans la langue demandée "
+          "et **continuez dans cette langue pour les tours suivants**, jusqu'à ce que l'étudiant demande explicitement "
+          "une autre langue ou de revenir au français.",
+    "en": "L'étudiant a demandé à échanger en anglais: répondez en ANGLAIS, et continuez en anglais jusqu'à ce qu'il "
+          "demande explicitement une autre langue.",
+    "ar": "L'étudiant a demandé à échanger en arabe: répondez en ARABE, et continuez en arabe jusqu'à ce qu'il "
+          "demande explicitement une autre langue.",
+}
+
+_FLOW = minify("""
+    **FLUX DE CONVERSATION GUIDÉE:**
+    1. **OUVERTURE (Premier Tour):** (Déjà géré par le message initial dans Streamlit)
+    2. **COLLECTE D'INFORMATIONS (Tours Suivants):** Avant de donner des réponses spécifiques ou des recommandations, POSEZ DES QUESTIONS OUVERTES pour comprendre l'étudiant. Exemples de questions à poser progressivement (ne les posez pas toutes d'un coup):
+        * "Comment se sont passées vos années préparatoires ? Quelles matières scientifiques (maths, physique) avez-vous le plus appréciées ?"
+        * "Qu'est-ce qui vous attire dans le métier d'ingénieur en travaux publics ?"
+        * "Préférez-vous l'analyse détaillée et la compréhension profonde des mécanismes (style DMS) ou une vision plus globale des systèmes et de leur intégration (style DIB) ?"
+        * "Avez-vous déjà une idée des types de projets qui vous intéressent le plus (bâtiments, ponts, routes, tunnels, chemins de fer, ports, aéroports) ?"
+        * "Comment envisagez-vous votre future carrière ? Plutôt dans la technique pure, la gestion de projet, la planification ?"
+        * Accusez réception des réponses de l'étudiant (ex: "D'accord, je vois que vous préférez X...") avant de poser une autre question ou de fournir une information.
+    3. **RÉPONSE AUX QUESTIONS SPÉCIFIQUES:** Quand l'étudiant pose une question directe (sur les modules, carrières, etc.), répondez PRÉCISÉMENT en utilisant PRINCIPALEMENT le guide. **Intégrez l'information naturellement sans citer systématiquement les numéros de section.** Référez-vous au contenu du guide, mais pas à sa structure.
+    4. **RÉPONSE AUX QUESTIONS SUR LES DOMAINES CONNEXES:** Si l'étudiant pose des questions sur les différences entre le génie civil, les travaux publics, l'architecture ou d'autres domaines connexes, fournissez des réponses informatives et précises en vous appuyant sur vos connaissances générales, tout en les reliant à l'ENSTP.
+    5. **RECOMMANDATION (sur demande ou quand prêt):**
+        * Ne recommandez PAS trop tôt. Attendez une demande explicite ('recommander', 'quel choisir', 'votre avis') OU lorsque vous estimez avoir recueilli suffisamment d'informations pertinentes.
+        * Basez la recommandation sur une CORRESPONDANCE CLAIRE entre les informations recueillies sur l'étudiant (historique) et les critères pertinents du guide (par exemple, les aptitudes favorisées, les intérêts alignés, les perspectives de carrière).
+        * Justifiez la recommandation en vous référant **clairement aux informations pertinentes du guide**, **mais évitez les citations directes de numéros de section.** (ex: "Étant donné votre intérêt pour l'analyse détaillée et votre attrait pour la conception de structures complexes, le DMS semble mieux aligné, car le guide indique que ce département favorise ces aspects.").
+        * Si les informations sont insuffisantes pour recommander, demandez les détails manquants nécessaires pour appliquer les critères du guide.
+    6. **STYLE DE RÉPONSE:** Soyez fluide, intelligent, conversationnel mais professionnel. Équilibrez la longueur des réponses. Utilisez des phrases de transition.
+""")
+
+INSTRUCTIONS = {
+    code: "\n".join([_PERSONA, _CONSTRAINTS.format(language_rule=rule), _FLOW])
+    for code, rule in _LANGUAGE_RULES.items()
+}
+
+GUIDE_SUMMARY = minify("""
+    Résumé simplifié pour les départements DMS et DIB à l'ENSTP:
+    DMS (Département des Matériaux et Structures):
+    - Spécialisation: Analyse et conception des structures d'ingénierie civile
+    - Focus: Comportement des matériaux, principes d'ingénierie structurelle
+    - Cours spécifiques: Analyse structurelle avancée, dynamique des structures, optimisation
+    - Aptitudes favorisées: Compétences mathématiques, pensée analytique, analyse détaillée
+    - Débouchés: Bureaux d'études structurelles, entreprises de construction spécialisées
+    DIB (Département des Infrastructures de Base):
+    - Spécialisation: Planification et gestion des systèmes d'infrastructure civile
+    - Focus: Réseaux de transport, systèmes hydrauliques, développement urbain
+    - Cours spécifiques: Économie des transports, géologie avancée, planification d'infrastructure
+    - Aptitudes favorisées: Pensée systémique, intégration multidisciplinaire, optimisation
+    - Débouchés: Agences de planification des transports, autorités portuaires, gestion d'infrastructure
+    Les deux départements partagent une base commune de cours fondamentaux en génie civil.
+    Information sur les domaines connexes:
+    - Génie Civil: Se concentre sur la conception, la construction et la maintenance de l'environnement bâti, y compris les bâtiments, les ponts, les barrages, etc.
+    - Travaux Publics: Met l'accent sur les infrastructures publiques comme les routes, les ponts, les tunnels, les systèmes d'approvisionnement en eau, et l'assainissement.
+    - Architecture: Se concentre sur la conception esthétique et fonctionnelle des bâtiments et autres structures physiques.
+    - Génie Urbain: Traite de la planification, de la conception et de la gestion des zones urbaines et des services municipaux.
+""")
+
+_GUIDE_OPEN = "**Guide ENSTP DMS/DIB (Source Principale):**\n--- DEBUT GUIDE ---"
+_GUIDE_CLOSE = "--- FIN GUIDE ---"
+_EXTRACTS_HEADER = "Extraits pertinents du guide complet:\n"
+_PROFILE_HEADER = "**Profil de l'Étudiant (indices extraits de ses messages):**\n"
+_HISTORY_OPEN = "**Historique de la Conversation Précédente:**\n--- DEBUT HISTORIQUE ---"
+_NO_HISTORY = "Aucune conversation précédente."
+_HISTORY_CLOSE = "--- FIN HISTORIQUE ---"
+_INPUT_HEADER = "**Dernière Entrée de l'Étudiant:**"
+_ACTION = minify("""
+    **Votre Prochaine Action:**
+    Générez la prochaine réponse ou question du "Conseiller ENSTP" en suivant scrupuleusement le flux de conversation guidée et toutes les instructions et contraintes ci-dessus.
+""")
+# Closing instruction per generation profile (see enstp.generation): the
+# full one lets the guided flow run its course, the others keep the answer short.
+ACTIONS = {
+    "full": _ACTION,
+    "clarify": minify("""
+        **Votre Prochaine Action:**
+        L'étudiant parle de lui-même. Répondez en 3 à 5 phrases: accusez réception de ce qu'il vient de dire, reliez-le brièvement à ce que le guide dit du DMS ou du DIB, puis posez UNE seule question ouverte pour mieux le connaître. Ne faites pas encore de recommandation.
+    """),
+    "lookup": minify("""
+        **Votre Prochaine Action:**
+        L'étudiant pose une question précise. Répondez-y directement, de façon concise et exacte, à partir du guide, sans reprendre le flux de collecte d'informations ni faire de recommandation. Une courte question de relance est permise à la fin.
+    """),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_section(section):
+    """A retrieved guide section as a prompt fragment, minified once per section."""
+    return minify(retrieval.format_sections([section]))
+
+
+def assemble(pieces, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Joins pieces (compiled strings and Segments) into an AssembledPrompt within token_budget.
+
+    Strings are always kept; a Segment left without parts disappears
+    with its header. If the strings alone exceed the budget, the prompt
+    is returned over budget.
+    """
+    segments = [piece for piece in pieces if isinstance(piece, Segment)]
+    kept = {segment.name: list(segment.parts) for segment in segments}
+
+    def render():
+        return "\n".join(
+            piece.header + piece.separator.join(kept[piece.name]) if isinstance(piece, Segment) else piece
+            for piece in pieces
+            if not isinstance(piece, Segment) or kept[piece.name]
+        )
+
+    text = render()
+    trimmed = collections.Counter()
+    for segment in sorted(segments, key=lambda segment: segment.priority):
+        parts = kept[segment.name]
+        while parts and estimate_tokens(text) > token_budget:
+            parts.pop(0 if segment.keep == "last" else -1)
+            trimmed[segment.name] += 1
+            text = render()
+    return AssembledPrompt(text, estimate_tokens(text), dict(trimmed))
+
+
+def build_prompt_messages(student_input, conversation_history, history_memory=None,
+                          retrieval_top_k=retrieval.DEFAULT_TOP_K,
+                          retrieval_token_budget=retrieval.DEFAULT_TOKEN_BUDGET, timer=None,
+                          retrieval_index=None, student_profile=None, response_language=None,
+                          token_budget=DEFAULT_TOKEN_BUDGET, variant="full"):
+    """Builds the message list sent to Gemini for one conversation turn.
+
+    conversation_history is a Transcript, a view of one, or a list of
+    message dicts. With a ConversationMemory, older turns are folded into its rolling
+    summary so the history stays within its token budget. retrieval_index
+    defaults to BM25 (retrieval.GUIDE_INDEX). student_profile is the
+    summary of a student_profile.StudentProfile, which carries what the
+    student said about themselves even after it left the history.
+    response_language picks the instructions' variant (French, with the
+    rule to switch on request, by default) and variant the closing
+    instruction (ACTIONS; the guided flow's by default). Over token_budget, the
+    guide extracts go first, then the profile, the oldest history lines
+    and the guide summary. A telemetry.TurnTimer, if given, receives the
+    history and retrieval times.
+    """
+    # Format conversation history for embedding within prompt
+    with telemetry.phase(timer, "history"):
+        conversation_history = as_transcript(conversation_history)
+        if history_memory is not None:
+            conversation_history_formatted = history_memory.render(conversation_history)
+        else:
+            conversation_history_formatted = conversation_history.formatted.strip()
+
+    # Only the guide sections relevant to this input are sent with the prompt
+    with telemetry.phase(timer, "retrieval"):
+        relevant_sections = retrieval.retrieve_sections(
+            student_input, k=retrieval_top_k, token_budget=retrieval_token_budget, index=retrieval_index
+        )
+
+    max_input_chars = int(token_budget * MAX_INPUT_SHARE) * 4
+    if len(student_input) > max_input_chars:
+        logger.warning(f"Student input of {len(student_input)} characters cut to {max_input_chars}.")
+        student_input = condense(student_input, max_input_chars)
+
+    has_history = bool(conversation_history) and bool(conversation_history_formatted)
+    prompt = assemble([
+        INSTRUCTIONS.get(response_language, INSTRUCTIONS[language.DEFAULT_LANGUAGE]),
+        _GUIDE_OPEN,
+        Segment("guide_summary", "", (GUIDE_SUMMARY,), "", 4, "first"),
+        Segment("guide_extracts", _EXTRACTS_HEADER, [_compiled_section(section) for section in relevant_sections],
+                "\n", 1, "first"),
+        _GUIDE_CLOSE,
+        # Signals gathered from every student message so far (see student_profile)
+        Segment("profile", _PROFILE_HEADER, (student_profile,) if student_profile else (), "", 2, "first"),
+        _HISTORY_OPEN,
+        Segment("history", "", conversation_history_formatted.split("\n") if has_history else (), "\n", 3, "last"),
+        _HISTORY_CLOSE if has_history else f"{_NO_HISTORY}\n{_HISTORY_CLOSE}",
+        f"{_INPUT_HEADER}\n{student_input}",
+        ACTIONS[variant],
+    ], token_budget)
+    if prompt.trimmed:
+        logger.warning(f"Prompt over its {token_budget}-token budget; dropped {prompt.trimmed} "
+                       f"(now ~{prompt.tokens} tokens).")
+
+    return [{"role": "user", "parts": [prompt.text]}]
+
+
+def _prompt_version():
+    # Guide text plus every compiled segment: editing either yields a new
+    # version, which invalidates answers cached under the old one.
+    compiled = [ENSTP_GUIDE_TEXT, GUIDE_SUMMARY, _GUIDE_OPEN, _GUIDE_CLOSE, _EXTRACTS_HEADER, _PROFILE_HEADER,
+                _HISTORY_OPEN, _NO_HISTORY, _HISTORY_CLOSE, _INPUT_HEADER]
+    compiled += [ACTIONS[variant] for variant in sorted(ACTIONS)]
+    compiled += [INSTRUCTIONS[code] for code in sorted(INSTRUCTIONS)]
+    digest = hashlib.sha256("\x00".join(compiled).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+PROMPT_VERSION = _prompt_version()
@@ -0,0 +1,231 @@
+"""Process-wide Gemini quota limiter with a fair queue across sessions."""
+import collections
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Free-tier quotas of gemini-1.5-pro; override with GEMINI_RPM / GEMINI_TPM.
+DEFAULT_REQUESTS_PER_MINUTE = 2
+DEFAULT_TOKENS_PER_MINUTE = 32000
+DEFAULT_ACQUIRE_TIMEOUT = 120.0
+
+# Free-tier (requests, prompt tokens) per minute of the models we chain
+KNOWN_QUOTAS = {
+    "gemini-1.5-pro-latest": (2, 32000),
+    "gemini-1.5-flash-latest": (15, 1000000),
+}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than its timeout for quota."""
+
+
+class TokenBucket:
+    """Token bucket that sustains its quota without exceeding it in any window.
+
+    Part of the quota is available as a burst (capacity) and the bucket
+    refills at quota per window, so a busy model gets its whole quota.
+    What was consumed during the last window is also kept: a burst right
+    after a window of full use waits until the quota window has room.
+    """
+
+    def __init__(self, quota, burst_fraction, clock, window_seconds=60.0):
+        self.quota = quota
+        self.capacity = max(1.0, quota * burst_fraction)
+        self.refill_per_second = quota / window_seconds
+        self.window_seconds = window_seconds
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._spent = collections.deque()  # (time, amount) consumed within the last window
+        self._spent_total = 0.0
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+        while self._spent and self._spent[0][0] <= now - self.window_seconds:
+            self._spent_total -= self._spent.popleft()[1]
+
+    def clamp(self, amount):
+        # A request larger than the bucket could never be served
+        return min(amount, self.capacity)
+
+    def seconds_until(self, amount):
+        self._refill()
+        amount = self.clamp(amount)
+        wait = max(0.0, (amount - self.tokens) / self.refill_per_second)
+        excess = self._spent_total + amount - max(self.quota, self.capacity)
+        freed = 0.0
+        for spent_at, spent in self._spent:
+            if freed >= excess:
+                break
+            # The quota window has room once this consumption leaves it
+            freed += spent
+            wait = max(wait, spent_at + self.window_seconds - self._updated)
+        return wait
+
+    def consume(self, amount):
+        self._refill()
+        amount = self.clamp(amount)
+        self.tokens -= amount
+        self._spent.append((self._updated, amount))
+        self._spent_total += amount
+
+
+class RateLimiter:
+    """RPM and TPM token buckets in front of one model.
+
+    Waiting requests are queued per session and served round-robin across
+    sessions, so a session with several requests in flight cannot starve
+    the others. acquire() blocks until the request may be sent.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, clock=time.monotonic, window_seconds=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        # window_seconds is the quota window; only simulations shorten it
+        self._requests = TokenBucket(requests_per_minute, 0.25, clock, window_seconds)
+        self._tokens = TokenBucket(tokens_per_minute, 0.5, clock, window_seconds)
+        self._condition = threading.Condition()
+        self._queues = collections.OrderedDict()  # session id -> deque of tickets, in serving order
+        self._tickets = itertools.count()
+        self.stats = collections.Counter()
+
+    def _serving_order(self):
+        """Waiting (session id, ticket, tokens) in round-robin order."""
+        queues = [list(queue) for queue in self._queues.values()]
+        order = []
+        for depth in range(max((len(queue) for queue in queues), default=0)):
+            order.extend(queue[depth] for queue in queues if depth < len(queue))
+        return order
+
+    def _estimated_wait(self, position, order):
+        # Time for the buckets to cover every request ahead plus this one
+        ahead = order[:position + 1]
+        tokens_needed = sum(self._tokens.clamp(tokens) for _, tokens in ahead)
+        wait_requests = max(0.0, len(ahead) - self._requests.tokens) / self._requests.refill_per_second
+        wait_tokens = max(0.0, tokens_needed - self._tokens.tokens) / self._tokens.refill_per_second
+        return max(wait_requests, wait_tokens)
+
+    def queue_status(self, ticket):
+        """(position, estimated wait in seconds) of a waiting ticket."""
+        with self._condition:
+            self._requests._refill()
+            self._tokens._refill()
+            order = self._serving_order()
+            position = next(index for index, (waiting, _) in enumerate(order) if waiting == ticket)
+            return position, self._estimated_wait(position, order)
+
+    def projected_wait(self, estimated_tokens):
+        """Estimated wait of a request queued now, behind every waiting one."""
+        with self._condition:
+            self._requests._refill()
+            self._tokens._refill()
+            order = self._serving_order() + [(None, estimated_tokens)]
+            return self._estimated_wait(len(order) - 1, order)
+
+    def headroom(self, estimated_tokens=None):
+        """Share of the burst capacity currently free (0 when requests are queued).
+
+        With estimated_tokens, the share that would remain once a request
+        of that size was sent.
+        """
+        with self._condition:
+            if self._queues:
+                return 0.0
+            self._requests._refill()
+            self._tokens._refill()
+            requests, tokens = (0, 0) if estimated_tokens is None else (1, self._tokens.clamp(estimated_tokens))
+            return max(0.0, min((self._requests.tokens - requests) / self._requests.capacity,
+                                (self._tokens.tokens - tokens) / self._tokens.capacity))
+
+    def acquire(self, session_id, estimated_tokens, on_wait=None, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        """Blocks until one request of estimated_tokens may be sent.
+
+        on_wait(position, estimated_wait_seconds) is called whenever the
+        request has to wait, with position 0 meaning next in line. Returns
+        the time spent waiting. Raises RateLimitTimeout after timeout seconds,
+        or right away once the estimated wait would exceed it.
+        """
+        start = self._clock()
+        ticket = next(self._tickets)
+        reported = None
+        with self._condition:
+            self._queues.setdefault(session_id, collections.deque()).append((ticket, estimated_tokens))
+        try:
+            while True:
+                with self._condition:
+                    head_session = next(iter(self._queues))
+                    queue = self._queues[head_session]
+                    if queue[0][0] == ticket:
+                        wait = max(self._requests.seconds_until(1), self._tokens.seconds_until(estimated_tokens))
+                        if wait <= 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(estimated_tokens)
+                            queue.popleft()
+                            # Served: this session goes to the back of the rotation
+                            del self._queues[head_session]
+                            if queue:
+                                self._queues[head_session] = queue
+                            self._condition.notify_all()
+                            waited = self._clock() - start
+                            self.stats["requests"] += 1
+                            self.stats["tokens"] += estimated_tokens
+                            if waited > 0:
+                                self.stats["queued"] += 1
+                                self.stats["wait_seconds"] += waited
+                            return waited
+                    else:
+                        wait = None
+                    order = self._serving_order()
+                    position = next(index for index, (waiting, _) in enumerate(order) if waiting == ticket)
+                    estimate = self._estimated_wait(position, order)
+                    elapsed = self._clock() - start
+                    if timeout is not None and elapsed >= timeout:
+                        raise RateLimitTimeout(f"No quota available after {elapsed:.0f}s")
+                    if timeout is not None and elapsed + estimate > timeout:
+                        # Fail fast instead of waiting for a slot that comes too late
+                        raise RateLimitTimeout(f"Estimated wait of {estimate:.0f}s exceeds the {timeout:.0f}s timeout")
+                    status = (position, round(estimate))
+                    if on_wait is None or status == reported:
+                        # Sleep until our turn can come up, or until the queue moves
+                        slice_seconds = wait if wait is not None else 1.0
+                        if timeout is not None:
+                            slice_seconds = min(slice_seconds, timeout - elapsed)
+                        self._condition.wait(max(0.01, min(slice_seconds, 1.0)))
+                        continue
+                reported = status
+                on_wait(position, estimate)
+        except BaseException:
+            with self._condition:
+                for session, queue in list(self._queues.items()):
+                    remaining = collections.deque(item for item in queue if item[0] != ticket)
+                    if remaining:
+                        self._queues[session] = remaining
+                    else:
+                        del self._queues[session]
+                self._condition.notify_all()
+            raise
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model_name, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+    """The process-wide limiter for a model, shared by every session."""
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if (limiter is None or limiter.requests_per_minute != requests_per_minute
+                or limiter.tokens_per_minute != tokens_per_minute):
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _limiters[model_name] = limiter
+            logger.info(f"Rate limiter for {model_name}: {requests_per_minute} RPM, {tokens_per_minute} TPM.")
+        return limiter
@@ -0,0 +1,122 @@
+"""BM25 retrieval over the numbered sections of the ENSTP guide."""
+import collections
+import logging
+import math
+import time
+
+from enstp.guide import GUIDE_SECTIONS
+from enstp.text import estimate_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 3
+DEFAULT_TOKEN_BUDGET = 1200
+
+# The guide is written in English with French module names, while students
+# mostly ask in French: expand common French query terms (folded, stemmed).
+QUERY_SYNONYMS = {
+    "debouche": ["career", "employment", "sector"],
+    "metier": ["career", "employment"],
+    "carriere": ["career"],
+    "emploi": ["employment"],
+    "travail": ["workload"],
+    "charge": ["workload"],
+    "stage": ["internship"],
+    "pont": ["bridge"],
+    "ferroviaire": ["railway", "rail"],
+    "chemin": ["railway"],
+    "fer": ["railway"],
+    "port": ["maritime"],
+    "aeroport": ["airport", "air", "base"],
+    "route": ["road"],
+    "batiment": ["building"],
+    "laboratoire": ["lab", "laboratory"],
+    "labo": ["lab", "laboratory"],
+    "recherche": ["research"],
+    "enseignant": ["faculty"],
+    "professeur": ["faculty"],
+    "option": ["optional", "track"],
+    "specialite": ["specialization", "track"],
+    "etranger": ["international", "mobility"],
+    "visite": ["visit"],
+    "projet": ["project"],
+    "fin": ["final"],
+}
+
+
+def expand_query(query):
+    """Query terms plus their English equivalents from QUERY_SYNONYMS."""
+    terms = tokenize(query)
+    for term in list(terms):
+        terms.extend(tokenize(" ".join(QUERY_SYNONYMS.get(term, []))))
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of GuideSection chunks."""
+
+    def __init__(self, sections, k1=1.5, b=0.75):
+        self.sections = list(sections)
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = []
+        doc_freqs = collections.Counter()
+        for section in self.sections:
+            # Titles carry most of the signal, so they are counted twice
+            terms = collections.Counter(tokenize(f"{section.title}\n{section.title}\n{section.text}"))
+            self._term_freqs.append(terms)
+            doc_freqs.update(terms.keys())
+        self._lengths = [sum(terms.values()) for terms in self._term_freqs]
+        self._avg_length = sum(self._lengths) / max(len(self._lengths), 1)
+        total = len(self.sections)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """Returns up to k (score, section) pairs, best first, score > 0."""
+        query_terms = [term for term in set(expand_query(query)) if term in self._idf]
+        if not query_terms:
+            return []
+        scored = []
+        for index, terms in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / self._avg_length)
+            score = 0.0
+            for term in query_terms:
+                freq = terms.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scored.append((score, index))
+        scored.sort(reverse=True)
+        return [(score, self.sections[index]) for score, index in scored[:k]]
+
+
+# Built once per process from the guide sections.
+GUIDE_INDEX = BM25Index(GUIDE_SECTIONS)
+
+
+def retrieve_sections(query, k=DEFAULT_TOP_K, token_budget=DEFAULT_TOKEN_BUDGET, index=None):
+    """Best-matching guide sections for query, within k and token_budget."""
+    index = index or GUIDE_INDEX
+    start_time = time.perf_counter()
+    selected, used_tokens = [], 0
+    for _, section in index.search(query, k):
+        section_tokens = estimate_tokens(section.text)
+        if used_tokens + section_tokens > token_budget:
+            continue
+        selected.append(section)
+        used_tokens += section_tokens
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    logger.info(
+        f"Retrieved {len(selected)} guide sections "
+        f"({', '.join(section.number for section in selected) or 'none'}, ~{used_tokens} tokens) "
+        f"in {elapsed_ms:.2f} ms"
+    )
+    return selected
+
+
+def format_sections(sections):
+    """Renders retrieved sections as a prompt fragment."""
+    return "\n\n".join(f"{section.number} {section.title}\n{section.text}" for section in sections)
@@ -0,0 +1,158 @@
+"""Single-flight deduplication of identical model requests across sessions.
+
+After an announcement, many students open with the same question and the
+same (empty) history: their prompts are identical. The first request for
+a prompt (the leader) makes the upstream call; requests for the same
+prompt made while it is in flight (followers) share its answer instead
+of making their own. Streamed answers are fanned out: followers replay
+the chunks received so far, then get the rest as they arrive.
+"""
+import collections
+import hashlib
+import threading
+
+
+class FlightAbandoned(Exception):
+    """Raised to followers when the leader stopped before the answer was complete."""
+
+
+def request_key(*parts):
+    """Digest of everything that determines the upstream answer (prompt, models, settings)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class Flight:
+    """One upstream request and the answer chunks it produced so far.
+
+    The leader publish()es chunks and finish()es the flight exactly once,
+    with the result (model, tier... of the turn) or the error; followers
+    read it with follow() or wait().
+    """
+
+    def __init__(self, group, key):
+        self._group = group
+        self.key = key
+        self.followers = 0
+        self.chunks = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self._condition = threading.Condition()
+
+    def publish(self, chunk):
+        with self._condition:
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        if self.done:
+            return
+        # Out of the group first: a request arriving now starts a new flight
+        self._group._remove(self)
+        with self._condition:
+            self.result = result
+            self.error = error
+            self.done = True
+            self._condition.notify_all()
+
+    def relay(self, chunks, result):
+        """Leader side: yields chunks while publishing them, then finishes with result().
+
+        An upstream error finishes the flight with it. If the leader's
+        consumer stops reading while followers wait, the rest of the
+        answer is still read for them.
+        """
+        iterator = iter(chunks)
+        try:
+            for chunk in iterator:
+                self.publish(chunk)
+                yield chunk
+        except GeneratorExit:
+            if not self.followers:
+                self.finish(error=FlightAbandoned("The leading request was abandoned."))
+                raise
+            try:
+                for chunk in iterator:
+                    self.publish(chunk)
+            except Exception as error:
+                self.finish(error=error)
+            else:
+                self.finish(result=result())
+            raise
+        except BaseException as error:
+            self.finish(error=error)
+            raise
+        self.finish(result=result())
+
+    def follow(self):
+        """Follower side: yields every chunk, then raises the leader's error if it failed."""
+        position = 0
+        while True:
+            with self._condition:
+                while position >= len(self.chunks) and not self.done:
+                    self._condition.wait()
+                pending = self.chunks[position:]
+                done = self.done
+            yield from pending
+            position += len(pending)
+            if done and position >= len(self.chunks):
+                break
+        if self.error is not None:
+            raise self.error
+
+    def wait(self):
+        """Follower side, blocking: the whole text and the result."""
+        with self._condition:
+            while not self.done:
+                self._condition.wait()
+        if self.error is not None:
+            raise self.error
+        return "".join(self.chunks), self.result
+
+
+class SingleFlight:
+    """In-flight requests by key; stats count upstream calls and the ones saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = collections.Counter()
+
+    def begin(self, key):
+        """(flight, True) for a new upstream request, (flight, False) to follow the one in flight.
+
+        key None gives a flight of its own, shared with nobody.
+        """
+        if key is None:
+            return Flight(self, None), True
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = Flight(self, key)
+            self.stats["upstream"] += 1
+            return flight, True
+
+    def _remove(self, flight):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def snapshot(self):
+        """Upstream calls, requests that shared one, and the share of calls saved."""
+        with self._lock:
+            upstream, coalesced = self.stats["upstream"], self.stats["coalesced"]
+            in_flight = len(self._flights)
+        total = upstream + coalesced
+        return {"upstream": upstream, "coalesced": coalesced, "in_flight": in_flight,
+                "saved_rate": coalesced / total if total else 0.0}
+
+
+# Shared by every session of the process.
+REQUESTS = SingleFlight()
@@ -0,0 +1,204 @@
+"""Incremental DMS/DIB fit of a student, from what they say about themselves.
+
+Section 12 of the guide lists the aptitudes, learning styles and career
+interests each department favors. Each of them is a Signal with FR/EN/AR
+keywords; the extractor matches one combined pattern against each new
+student message only, so the cost of a turn does not depend on the length
+of the conversation. A StudentProfile, kept in the session, accumulates
+the evidence (negated clauses count against a signal, questions count
+half) into a running weighted score and renders a compact summary for the
+prompt.
+"""
+import collections
+import math
+import re
+
+from enstp.text import fold_accents
+
+Signal = collections.namedtuple("Signal", ["name", "department", "kind", "guide_item", "label", "keywords"])
+Evidence = collections.namedtuple("Evidence", ["signal", "weight"])
+Fit = collections.namedtuple("Fit", ["dms", "dib", "evidence_count"])
+
+# Weight of one statement, by kind of signal: career interests say the
+# most about a choice of department, learning styles the least
+KIND_WEIGHTS = {
+    "stated_preference": 2.0,
+    "career_interest": 1.5,
+    "aptitude": 1.0,
+    "learning_style": 0.6,
+}
+QUESTION_FACTOR = 0.5
+# Repeating an interest adds evidence up to this total, in either direction
+MAX_SIGNAL_WEIGHT = 3.0
+# Score gap giving a 73/27 fit (logistic scale)
+FIT_SCALE = 2.0
+MAX_SUMMARY_SIGNALS = 4
+
+SIGNALS = [
+    # 12.1.1 DMS-Favored Aptitudes
+    Signal("math", "DMS", "aptitude", "Strong mathematical abilities", "Mathématiques",
+           [r"math\w*", r"calculs?", r"equations?", r"algebre", r"algebra", r"رياضيات", r"الرياضيات"]),
+    Signal("detail", "DMS", "aptitude", "Detail-oriented thinking", "Souci du détail",
+           [r"details?", r"minutie\w*", r"meticuleu\w*", r"rigueur", r"rigoureu\w*", r"detail-oriented"]),
+    Signal("physics", "DMS", "aptitude", "Interest in physical principles and behavior", "Physique et mécanique",
+           [r"physique", r"physics", r"mecanique", r"mechanics", r"rdm", r"resistance des materiaux",
+            r"strength of materials", r"فيزياء", r"الفيزياء"]),
+    Signal("analysis", "DMS", "aptitude", "Comfort with complex analysis", "Analyse et modélisation",
+           [r"analyses?", r"analyser", r"analy[sz]\w*", r"modelis\w*", r"modell?ing", r"elements? finis",
+            r"finite elements?", r"simulations?"]),
+    Signal("precision", "DMS", "aptitude", "Precision and accuracy in work", "Précision",
+           [r"precision", r"precis\w*", r"exactitude", r"accura\w*"]),
+    # 12.1.2 DIB-Favored Aptitudes
+    Signal("systems", "DIB", "aptitude", "Systems thinking abilities", "Vision systémique",
+           [r"systemes?", r"systems?", r"systemique", r"vision globale", r"vision d'ensemble", r"big picture"]),
+    Signal("multidisciplinary", "DIB", "aptitude", "Integration of multiple disciplines", "Pluridisciplinarité",
+           [r"pluridisciplin\w*", r"multidisciplin\w*", r"interdisciplin\w*", r"plusieurs domaines",
+            r"plusieurs disciplines"]),
+    Signal("transport", "DIB", "aptitude", "Interest in transportation and networks", "Transports et réseaux",
+           [r"transports?", r"transportation", r"reseaux?", r"networks?", r"mobilite", r"mobility", r"trafic",
+            r"traffic", r"circulation", r"النقل", r"نقل"]),
+    Signal("planning", "DIB", "aptitude", "Comfort with planning and optimization", "Planification et gestion",
+           [r"planifi\w*", r"planning", r"optimis\w*", r"optimiz\w*", r"organis\w*", r"organiz\w*", r"gestion",
+            r"gerer", r"project management", r"management"]),
+    Signal("spatial", "DIB", "aptitude", "Spatial reasoning skills", "Raisonnement spatial",
+           [r"topograph\w*", r"cartograph\w*", r"sig", r"gis", r"geograph\w*", r"spatial\w*"]),
+    # 12.2 Learning Style Considerations
+    Signal("theory", "DMS", "learning_style", "Theoretical foundation emphasis", "Fondements théoriques",
+           [r"theori\w*", r"theory", r"theoretical", r"fondamenta\w*", r"demonstrations?", r"en profondeur",
+            r"in depth", r"approche analytique", r"analytical"]),
+    Signal("step_by_step", "DMS", "learning_style", "Step-by-step problem solving", "Résolution pas à pas",
+           [r"etape par etape", r"step by step", r"pas a pas", r"methodique\w*", r"methodical"]),
+    Signal("practical", "DIB", "learning_style", "Practical application emphasis", "Application pratique",
+           [r"pratiques?", r"practical", r"concret\w*", r"hands on", r"terrain", r"chantiers?", r"field ?work",
+            r"ميدان\w*"]),
+    Signal("holistic", "DIB", "learning_style", "Holistic learning approach", "Approche globale",
+           [r"holisti\w*", r"vue d'ensemble", r"overview", r"approche globale"]),
+    # 12.3.1 DMS-Aligned Career Interests (and the DMS Tunnels track, 5.3.1)
+    Signal("structures", "DMS", "career_interest", "Designing complex structures", "Conception de structures",
+           [r"structures?", r"structur\w*", r"batiments?", r"buildings?", r"immeubles?", r"gratte-ciel",
+            r"skyscrapers?", r"ponts?", r"bridges?", r"charpentes?", r"مباني", r"هياكل", r"جسور"]),
+    Signal("materials", "DMS", "career_interest", "Developing advanced materials", "Matériaux",
+           [r"materiaux", r"materials?", r"beton", r"concrete", r"acier", r"steel", r"composites?"]),
+    Signal("seismic", "DMS", "career_interest", "Earthquake-resistant design", "Génie parasismique",
+           [r"seism\w*", r"sism\w*", r"parasism\w*", r"earthquakes?", r"زلازل", r"الزلازل"]),
+    Signal("research", "DMS", "career_interest", "Building science research", "Recherche",
+           [r"la recherche", r"research", r"doctorat", r"phd", r"master recherche", r"chercheur\w*"]),
+    Signal("tunnels", "DMS", "career_interest", "Tunnels", "Tunnels et ouvrages souterrains",
+           [r"tunnels?", r"souterrain\w*", r"underground", r"أنفاق"]),
+    # 12.3.2 DIB-Aligned Career Interests
+    Signal("infrastructure", "DIB", "career_interest", "Infrastructure development", "Infrastructures",
+           [r"infrastructures?", r"routes?", r"roads?", r"routier\w*", r"autoroutes?", r"highways?", r"barrages?",
+            r"dams?", r"hydrauli\w*", r"assainissement", r"eau potable", r"water supply", r"طرق", r"سدود"]),
+    Signal("rail_maritime", "DIB", "career_interest", "Railway or maritime engineering", "Ferroviaire et maritime",
+           [r"ferroviaire\w*", r"chemins? de fer", r"railways?", r"rail", r"trains?", r"metro", r"tramway",
+            r"ports?", r"portuaire\w*", r"maritime\w*", r"harbou?rs?", r"cotier\w*", r"coastal", r"سكك",
+            r"ميناء", r"موانئ"]),
+    Signal("airports", "DIB", "career_interest", "Airport infrastructure design", "Aéroports",
+           [r"aeroports?", r"airports?", r"aerodromes?", r"pistes? d'atterrissage", r"runways?",
+            r"bases? aeriennes?", r"air bases?", r"مطار\w*"]),
+    Signal("urban", "DIB", "career_interest", "Urban system integration", "Urbanisme",
+           [r"urbanis\w*", r"urbain\w*", r"urban", r"villes?", r"city", r"cities", r"amenagement", r"مدن"]),
+    # "le DMS me correspond", "I prefer DIB"
+    Signal("prefers_dms", "DMS", "stated_preference", None, "Préférence exprimée pour le DMS", []),
+    Signal("prefers_dib", "DIB", "stated_preference", None, "Préférence exprimée pour le DIB", []),
+]
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+_CLAUSE_SPLIT_RE = re.compile(r",|;|\b(?:mais|par contre|cependant|alors que|but|however|whereas)\b|لكن")
+_NEGATION_RE = re.compile(
+    r"\b(?:pas|jamais|moins|aucun\w*|nul(?:le)?|faibles?|deteste\w*|difficulte\w*|galere\w*|not|never|"
+    r"don't|dont|hate|dislike|weak|less|struggle\w*)\b|n'aime|bad at|لا|لست|أكره"
+)
+_PREFERENCE_RE = re.compile(
+    r"\b(dms|dib)\b.*\b(?:me correspond\w*|m'attire\w*|m'interesse\w*|me plait|suits me|fits me)\b|"
+    r"\b(?:je prefere|je choisis|je choisirais|je veux|je vais|j'aime|interesse par|attire par|i prefer|"
+    r"i want|i choose|i'd choose|i like|interested in)\b.*\b(dms|dib)\b"
+)
+
+
+class SignalExtractor:
+    """One compiled pattern over every signal's keywords."""
+
+    def __init__(self, signals=None):
+        self.signals = {signal.name: signal for signal in (SIGNALS if signals is None else signals)}
+        alternatives = [
+            f"(?P<{name}>{'|'.join(signal.keywords)})"
+            for name, signal in self.signals.items() if signal.keywords
+        ]
+        self._pattern = re.compile(r"(?<![\w'])(?:" + "|".join(alternatives) + r")(?![\w])")
+
+    def extract(self, message):
+        """Evidence found in one student message; each signal counts once per clause."""
+        evidence = []
+        for sentence_match in _SENTENCE_RE.finditer(fold_accents(message)):
+            sentence = sentence_match.group()
+            factor = QUESTION_FACTOR if sentence.rstrip().endswith("?") else 1.0
+            for clause in _CLAUSE_SPLIT_RE.split(sentence):
+                polarity = -1.0 if _NEGATION_RE.search(clause) else 1.0
+                names = {match.lastgroup for match in self._pattern.finditer(clause)}
+                preference = _PREFERENCE_RE.search(clause)
+                if preference and factor == 1.0:
+                    department = preference.group(1) or preference.group(2)
+                    names.add(f"prefers_{department}")
+                for name in sorted(names):
+                    signal = self.signals[name]
+                    evidence.append(Evidence(signal, KIND_WEIGHTS[signal.kind] * polarity * factor))
+        return evidence
+
+
+# Shared by every session of this process
+EXTRACTOR = SignalExtractor()
+
+
+class StudentProfile:
+    """Running DMS/DIB evidence of one student (kept in the session)."""
+
+    def __init__(self, extractor=None):
+        self.extractor = extractor or EXTRACTOR
+        self.weights = {}  # signal name -> accumulated weight, capped at +/-MAX_SIGNAL_WEIGHT
+        self.scores = {"DMS": 0.0, "DIB": 0.0}
+        self.evidence_count = 0
+        self.messages_seen = 0
+
+    def observe(self, message):
+        """Updates the profile with one new student message; returns its evidence."""
+        evidence = self.extractor.extract(message)
+        for signal, weight in evidence:
+            previous = self.weights.get(signal.name, 0.0)
+            updated = max(-MAX_SIGNAL_WEIGHT, min(MAX_SIGNAL_WEIGHT, previous + weight))
+            self.weights[signal.name] = updated
+            self.scores[signal.department] += updated - previous
+        self.evidence_count += len(evidence)
+        self.messages_seen += 1
+        return evidence
+
+    def fit(self):
+        """Fit shares (summing to 1): logistic in the score gap, 50/50 without evidence."""
+        dms = 1 / (1 + math.exp(-(self.scores["DMS"] - self.scores["DIB"]) / FIT_SCALE))
+        return Fit(dms, 1 - dms, self.evidence_count)
+
+    def strongest(self, department=None, positive=True, limit=MAX_SUMMARY_SIGNALS):
+        """Labels of the strongest signals, for one department and direction."""
+        signals = self.extractor.signals
+        chosen = [
+            (abs(weight), signals[name].label) for name, weight in self.weights.items()
+            if (weight > 0) == positive and weight != 0
+            and (department is None or signals[name].department == department)
+        ]
+        return [label for _, label in sorted(chosen, key=lambda item: (-item[0], item[1]))[:limit]]
+
+    def summary(self):
+        """Compact French summary for the prompt, or "" before any evidence."""
+        if not self.evidence_count:
+            return ""
+        fit = self.fit()
+        lines = [f"Orientation estimée d'après les messages de l'étudiant: DMS {fit.dms:.0%} / DIB {fit.dib:.0%} "
+                 f"({fit.evidence_count} indices; estimation indicative à confirmer)."]
+        for department in ("DMS", "DIB"):
+            strengths = self.strongest(department)
+            if strengths:
+                lines.append(f"- Intérêts et aptitudes alignés sur le {department}: {', '.join(strengths)}")
+        reservations = self.strongest(positive=False)
+        if reservations:
+            lines.append(f"- Réserves exprimées: {', '.join(reservations)}")
+        return "\n".join(lines)
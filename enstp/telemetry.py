@@ -0,0 +1,269 @@
+"""Structured per-turn timing and token records.
+
+A TurnTimer collects one turn's phase durations (intent routing,
+history normalization, retrieval, prompt build, quota queue, time to
+first byte, API time, rendering), token usage, model tier, cache outcome,
+the intent of turns answered locally, the generation profile of turns
+sent to the model and whether the turn shared an identical request in
+flight. Finished records go to the process-wide RECORDER, which keeps a
+rolling window for percentiles and exports them as JSON lines and as
+Prometheus text (with cumulative latency histograms per profile).
+"""
+import collections
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SIZE = 500
+PHASES = ("routing", "history", "retrieval", "prompt_build", "queue", "ttfb", "api", "render", "total")
+QUANTILES = (0.5, 0.95, 0.99)
+# Upper bounds (seconds) of the per-profile latency histogram buckets
+PROFILE_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+PROFILE_PHASES = ("ttfb", "total")
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile (fraction in [0, 1]) of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * fraction
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class TurnTimer:
+    """Timings and attributes of one turn, finished exactly once."""
+
+    def __init__(self, session_id=None, mode="blocking", clock=time.perf_counter):
+        self._clock = clock
+        self._start = clock()
+        self._finished = False
+        self.durations = collections.defaultdict(float)
+        self.fields = {"session": session_id, "mode": mode, "cache": "bypass", "outcome": "ok"}
+
+    def elapsed(self):
+        return self._clock() - self._start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the duration of the with-block to the named phase."""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.durations[name] += self._clock() - start
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+
+    def mark(self, name):
+        """Records the time since the turn started, once (e.g. ttfb)."""
+        if name not in self.durations:
+            self.durations[name] = self.elapsed()
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def set_usage(self, usage):
+        if usage is not None:
+            self.fields["prompt_tokens"] = usage.prompt_tokens
+            self.fields["output_tokens"] = usage.output_tokens
+
+    def finish(self, recorder=None):
+        """Builds the record and hands it to the recorder; later calls are ignored."""
+        if self._finished:
+            return None
+        self._finished = True
+        self.durations["total"] = self.elapsed()
+        record = {"ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")}
+        record.update(self.fields)
+        record.update({f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.durations.items()})
+        (recorder or RECORDER).record(record)
+        return record
+
+
+def phase(timer, name):
+    """timer.phase(name), or a no-op context when there is no timer."""
+    return timer.phase(name) if timer is not None else contextlib.nullcontext()
+
+
+class TelemetryRecorder:
+    """Rolling window of turn records plus cumulative counters.
+
+    - jsonl_path: every record is appended there as one JSON line
+    - prometheus_path: rewritten (atomically) after every record, for a
+      node_exporter textfile collector or any scraper reading files
+    """
+
+    def __init__(self, window_size=DEFAULT_WINDOW_SIZE, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._window = collections.deque(maxlen=window_size)
+        self._turns = collections.Counter()
+        self._tokens = collections.Counter()
+        self._intents = collections.Counter()
+        self._coalesced = 0
+        self._phase_sums = collections.Counter()
+        self._phase_counts = collections.Counter()
+        self._profile_buckets = collections.Counter()  # (profile, phase, bucket index) -> turns
+        self._profile_sums = collections.Counter()
+        self._profile_counts = collections.Counter()
+
+    def record(self, record):
+        with self._lock:
+            self._window.append(record)
+            tier = record.get("tier")
+            self._turns[(record.get("outcome"), record.get("cache"), "" if tier is None else str(tier))] += 1
+            for kind in ("prompt", "output"):
+                self._tokens[kind] += record.get(f"{kind}_tokens") or 0
+            if record.get("intent"):
+                self._intents[record["intent"]] += 1
+            if record.get("coalesced"):
+                self._coalesced += 1
+            for name in PHASES:
+                value = record.get(f"{name}_ms")
+                if value is not None:
+                    self._phase_sums[name] += value / 1000
+                    self._phase_counts[name] += 1
+            if record.get("profile"):
+                for name in PROFILE_PHASES:
+                    value = record.get(f"{name}_ms")
+                    if value is None:
+                        continue
+                    seconds = value / 1000
+                    bucket = next((index for index, bound in enumerate(PROFILE_BUCKETS) if seconds <= bound),
+                                  len(PROFILE_BUCKETS))
+                    self._profile_buckets[(record["profile"], name, bucket)] += 1
+                    self._profile_sums[(record["profile"], name)] += seconds
+                    self._profile_counts[(record["profile"], name)] += 1
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as jsonl:
+                        jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError as write_err:
+                    logger.warning(f"Could not append telemetry to {self.jsonl_path}: {write_err}")
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def records(self):
+        with self._lock:
+            return list(self._window)
+
+    def summary(self):
+        """Rolling p50/p95/p99 per phase (ms), outcome shares and per-profile latency over the window."""
+        records = self.records()
+        phases = {}
+        for name in PHASES:
+            values = [record[f"{name}_ms"] for record in records if record.get(f"{name}_ms") is not None]
+            if values:
+                phases[name] = {
+                    "count": len(values),
+                    **{f"p{round(q * 100)}": round(percentile(values, q), 1) for q in QUANTILES},
+                }
+        cache_lookups = [record["cache"] for record in records if record.get("cache") in ("hit", "miss")]
+        profiles = {}
+        for name in sorted({record["profile"] for record in records if record.get("profile")}):
+            profile_records = [record for record in records if record.get("profile") == name]
+            profiles[name] = {"turns": len(profile_records)}
+            for phase_name in PROFILE_PHASES:
+                values = [record[f"{phase_name}_ms"] for record in profile_records
+                          if record.get(f"{phase_name}_ms") is not None]
+                for q in (0.5, 0.95) if values else ():
+                    profiles[name][f"{phase_name}_p{round(q * 100)}"] = round(percentile(values, q), 1)
+            output_tokens = [record["output_tokens"] for record in profile_records if record.get("output_tokens")]
+            if output_tokens:
+                profiles[name]["output_tokens_p50"] = round(percentile(output_tokens, 0.5))
+        return {
+            "turns": len(records),
+            "phases_ms": phases,
+            "cache_hit_rate": cache_lookups.count("hit") / len(cache_lookups) if cache_lookups else 0.0,
+            "tiers": dict(collections.Counter(record["tier"] for record in records if record.get("tier") is not None)),
+            "outcomes": dict(collections.Counter(record.get("outcome") for record in records)),
+            "routed_rate": sum(1 for record in records if record.get("intent")) / len(records) if records else 0.0,
+            "coalesced_rate": sum(1 for record in records if record.get("coalesced")) / len(records) if records else 0.0,
+            "profiles": profiles,
+        }
+
+    def prometheus_text(self):
+        """Prometheus text exposition: cumulative counters, rolling quantiles."""
+        records = self.records()
+        with self._lock:
+            turns = dict(self._turns)
+            tokens = dict(self._tokens)
+            routed = dict(self._intents)
+            coalesced = self._coalesced
+            phase_sums = dict(self._phase_sums)
+            phase_counts = dict(self._phase_counts)
+            profile_buckets = dict(self._profile_buckets)
+            profile_sums = dict(self._profile_sums)
+            profile_counts = dict(self._profile_counts)
+        lines = [
+            "# HELP enstp_turns_total Advisor turns by outcome, answer cache result and model tier.",
+            "# TYPE enstp_turns_total counter",
+        ]
+        for (outcome, cache, tier), count in sorted(turns.items(), key=str):
+            lines.append(f'enstp_turns_total{{outcome="{outcome}",cache="{cache}",tier="{tier}"}} {count}')
+        lines += [
+            "# HELP enstp_routed_turns_total Turns answered locally by the intent router, by intent.",
+            "# TYPE enstp_routed_turns_total counter",
+        ]
+        for intent, count in sorted(routed.items()):
+            lines.append(f'enstp_routed_turns_total{{intent="{intent}"}} {count}')
+        lines += [
+            "# HELP enstp_coalesced_turns_total Turns that shared an identical request already in flight.",
+            "# TYPE enstp_coalesced_turns_total counter",
+            f"enstp_coalesced_turns_total {coalesced}",
+            "# HELP enstp_tokens_total Prompt and output tokens reported by the LLM backend.",
+            "# TYPE enstp_tokens_total counter",
+        ]
+        for kind in ("prompt", "output"):
+            lines.append(f'enstp_tokens_total{{kind="{kind}"}} {tokens.get(kind, 0)}')
+        lines += [
+            "# HELP enstp_turn_phase_seconds Turn phase durations (quantiles over the recent window).",
+            "# TYPE enstp_turn_phase_seconds summary",
+        ]
+        for name in PHASES:
+            values = [record[f"{name}_ms"] / 1000 for record in records if record.get(f"{name}_ms") is not None]
+            for q in QUANTILES if values else ():
+                lines.append(f'enstp_turn_phase_seconds{{phase="{name}",quantile="{q}"}} {percentile(values, q):.6f}')
+            if name in phase_counts:
+                lines.append(f'enstp_turn_phase_seconds_sum{{phase="{name}"}} {phase_sums[name]:.6f}')
+                lines.append(f'enstp_turn_phase_seconds_count{{phase="{name}"}} {phase_counts[name]}')
+        lines += [
+            "# HELP enstp_profile_turn_seconds Time to first byte and total time of model turns, by generation profile.",
+            "# TYPE enstp_profile_turn_seconds histogram",
+        ]
+        for profile, name in sorted(profile_counts):
+            labels = f'profile="{profile}",phase="{name}"'
+            cumulative = 0
+            for index, bound in enumerate(PROFILE_BUCKETS + (float("inf"),)):
+                cumulative += profile_buckets.get((profile, name, index), 0)
+                le = "+Inf" if index == len(PROFILE_BUCKETS) else f"{bound:g}"
+                lines.append(f'enstp_profile_turn_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"enstp_profile_turn_seconds_sum{{{labels}}} {profile_sums[(profile, name)]:.6f}")
+            lines.append(f"enstp_profile_turn_seconds_count{{{labels}}} {profile_counts[(profile, name)]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as metrics:
+                metrics.write(self.prometheus_text())
+            os.replace(temporary_path, path)
+        except OSError as write_err:
+            logger.warning(f"Could not write Prometheus metrics to {path}: {write_err}")
+
+
+# Shared by every session of this process
+RECORDER = TelemetryRecorder(
+    window_size=int(os.getenv("TELEMETRY_WINDOW_SIZE", DEFAULT_WINDOW_SIZE)),
+    jsonl_path=os.getenv("TELEMETRY_JSONL_PATH") or None,
+    prometheus_path=os.getenv("TELEMETRY_PROMETHEUS_PATH") or None,
+)
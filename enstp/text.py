@@ -0,0 +1,39 @@
+"""Text normalization shared by the lexical components (FR/EN)."""
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Words split across lines by the guide's hyphenation ("struc-\n  tures")
+_HYPHENATION_RE = re.compile(r"-\n\s*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by c ca can d de des du do does en est et for from
+how i il in is it j je l la le les leur lui m ma me mes moi mon n ne nous
+of on or ou par pas pour qu que quel quelle quels quelles qui s sa se ses
+son sont sur t ta te tes the their this to toi ton tu un une vous votre vos
+was what which with y you your
+""".split())
+
+
+def fold_accents(text):
+    """Lowercases text and strips diacritics ("Béton Armé" -> "beton arme")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(word):
+    # Light plural folding so "ponts"/"pont" and "tunnels"/"tunnel" match
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Folded, stopword-free terms of a French or English text."""
+    text = fold_accents(_HYPHENATION_RE.sub("", text))
+    return [_stem(word) for word in _WORD_RE.findall(text) if word not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about four characters per token)."""
+    return (len(text) + 3) // 4
@@ -0,0 +1,120 @@
+"""Append-only, normalized conversation transcript."""
+import collections
+
+Turn = collections.namedtuple("Turn", ["role", "content"])
+
+MISSING_CONTENT = "Error: No content found in message"
+
+
+def role_label(role):
+    """Speaker label used in the prompt for a message role."""
+    return "Étudiant" if role == "user" else "Conseiller ENSTP"
+
+
+def format_turn(turn):
+    """One verbatim history line, as embedded in the prompt."""
+    return f"{role_label(turn.role)}: {turn.content}"
+
+
+def normalize_message(message):
+    """Turn record for a Turn or a message dict in "content" or legacy "parts" form."""
+    if isinstance(message, Turn):
+        return message
+    if "content" in message:
+        content = message["content"]
+    elif "parts" in message and message["parts"]:
+        content = message["parts"][0]
+    else:
+        content = MISSING_CONTENT
+    return Turn(message["role"], content)
+
+
+class TranscriptView:
+    """Read-only view of the first `length` turns of a transcript.
+
+    Views share the transcript's storage, so taking one is O(1) and it stays
+    valid as later turns are appended.
+    """
+
+    __slots__ = ("_transcript", "_length")
+
+    def __init__(self, transcript, length):
+        self._transcript = transcript
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        turns = self._transcript._turns
+        for index in range(self._length):
+            yield turns[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            return self._transcript._turns[start:stop:step]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("transcript index out of range")
+        return self._transcript._turns[index]
+
+    @property
+    def formatted(self):
+        """Prompt lines ("Étudiant: ...") for the turns in this view."""
+        return self._transcript._joined(self._length).rstrip("\n")
+
+
+class Transcript(TranscriptView):
+    """Conversation turns, normalized once when appended.
+
+    Each append formats its prompt line once and records where the line
+    would end in the joined text, so appending costs the same at any
+    length. The lines are joined only when .formatted is read: the longest
+    text joined so far is kept, extended with the lines added since, and
+    shorter views slice it.
+    """
+
+    __slots__ = ("_turns", "_lines", "_offsets", "_joined_cache")
+
+    def __init__(self, messages=()):
+        self._turns = []
+        self._lines = []
+        self._offsets = [0]  # end of the first n lines (with their "\n") in the joined text
+        self._joined_cache = (0, "")
+        super().__init__(self, 0)
+        for message in messages:
+            self.append(message)
+
+    def append(self, message):
+        """Appends a Turn or message dict and returns its Turn record."""
+        turn = normalize_message(message)
+        self._turns.append(turn)
+        line = format_turn(turn)
+        self._lines.append(line)
+        self._offsets.append(self._offsets[-1] + len(line) + 1)
+        self._length += 1
+        return turn
+
+    def _joined(self, length):
+        """The first `length` prompt lines, each followed by "\n"."""
+        cached_length, text = self._joined_cache
+        if length > cached_length:
+            text += "".join(line + "\n" for line in self._lines[cached_length:length])
+            self._joined_cache = (length, text)
+        return text[:self._offsets[length]]
+
+    def add(self, role, content):
+        return self.append(Turn(role, content))
+
+    def snapshot(self):
+        """O(1) view of the transcript as it is now."""
+        return TranscriptView(self, self._length)
+
+
+def as_transcript(conversation_history):
+    """conversation_history as a Transcript or view (wrapping plain lists)."""
+    if isinstance(conversation_history, TranscriptView):
+        return conversation_history
+    return Transcript(conversation_history)
@@ -0,0 +1,226 @@
+"""Semantic index over the guide: hashed n-gram TF-IDF reduced by SVD (LSA).
+
+Everything runs locally on CPU with NumPy. The guide is split into chunks
+(section intros and bullet items, each prefixed with its section title),
+embedded as hashed word and character n-gram TF-IDF vectors, and
+projected onto the top singular vectors so loosely phrased questions
+("je veux construire des ponts ferroviaires") land near the right
+sections. The matrices are built once and saved as .npy files; later
+processes open them with mmap_mode="r", so cold starts skip the SVD and
+worker processes share the pages.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from enstp import retrieval
+from enstp.guide import ENSTP_GUIDE_TEXT, GUIDE_SECTIONS
+from enstp.text import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSIONS = 2 ** 13
+DEFAULT_COMPONENTS = 96
+DEFAULT_CHAR_NGRAM = 4
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".index")
+# Bump when the chunking or the features change, to rebuild saved indexes
+INDEX_FORMAT = 1
+
+_BULLET_RE = re.compile(r"^\s*•\s*", re.M)
+_ARRAYS = ("idf", "components", "chunk_vectors", "chunk_sections")
+
+
+def chunk_sections(sections):
+    """(section index, text) chunks: each section's intro and bullet items."""
+    chunks = []
+    for section_index, section in enumerate(sections):
+        parts = [part.strip() for part in _BULLET_RE.split(section.text) if part.strip()]
+        for part in parts or [section.text]:
+            chunks.append((section_index, f"{section.title}\n{part}"))
+    return chunks
+
+
+def _features(terms, char_ngram):
+    """Word terms and the character n-grams of each ("_pont_" -> "_pon", "pont", "ont_")."""
+    for term in terms:
+        yield "w:" + term
+        padded = f"_{term}_"
+        for start in range(max(len(padded) - char_ngram + 1, 1)):
+            yield "c:" + padded[start:start + char_ngram]
+
+
+def hashed_counts(terms, dimensions=DEFAULT_DIMENSIONS, char_ngram=DEFAULT_CHAR_NGRAM):
+    """{bucket: count} of the hashed features (crc32: stable across processes)."""
+    counts = {}
+    for feature in _features(terms, char_ngram):
+        bucket = zlib.crc32(feature.encode("utf-8")) % dimensions
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def fingerprint(sections, dimensions, components, char_ngram):
+    """Identifies the inputs of an index: a change means a rebuild."""
+    digest = hashlib.sha256(ENSTP_GUIDE_TEXT.encode("utf-8"))
+    for section in sections:
+        digest.update(f"\x00{section.number}\x00{section.text}".encode("utf-8"))
+    digest.update(f"\x00{INDEX_FORMAT}:{dimensions}:{components}:{char_ngram}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class VectorIndex:
+    """LSA vectors of the guide chunks; search() matches BM25Index.search()."""
+
+    def __init__(self, sections, idf, components, chunk_vectors, chunk_sections, char_ngram=DEFAULT_CHAR_NGRAM):
+        self.sections = list(sections)
+        self.idf = idf
+        self.components = components          # (components, dimensions)
+        self.chunk_vectors = chunk_vectors    # (chunks, components), unit rows
+        self.chunk_sections = chunk_sections  # (chunks,) section index per chunk
+        self.dimensions = idf.shape[0]
+        self.char_ngram = char_ngram
+
+    @classmethod
+    def build(cls, sections=GUIDE_SECTIONS, dimensions=DEFAULT_DIMENSIONS, n_components=DEFAULT_COMPONENTS,
+              char_ngram=DEFAULT_CHAR_NGRAM):
+        """Embeds the chunks and computes the SVD projection (the slow part)."""
+        chunks = chunk_sections(sections)
+        counts = np.zeros((len(chunks), dimensions), dtype=np.float32)
+        for row, (_, text) in enumerate(chunks):
+            for bucket, count in hashed_counts(tokenize(text), dimensions, char_ngram).items():
+                counts[row, bucket] = count
+        doc_freqs = np.count_nonzero(counts, axis=0)
+        idf = (np.log((1 + len(chunks)) / (1 + doc_freqs)) + 1).astype(np.float32)
+        weighted = np.log1p(counts) * idf
+        weighted /= np.linalg.norm(weighted, axis=1, keepdims=True) + 1e-9
+        n_components = min(n_components, len(chunks) - 1)
+        _, _, vt = np.linalg.svd(weighted, full_matrices=False)
+        components = np.ascontiguousarray(vt[:n_components], dtype=np.float32)
+        chunk_vectors = weighted @ components.T
+        chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True) + 1e-9
+        chunk_section_ids = np.array([section_index for section_index, _ in chunks], dtype=np.int32)
+        return cls(sections, idf, components, chunk_vectors.astype(np.float32), chunk_section_ids, char_ngram)
+
+    def save(self, directory, meta):
+        """Writes the arrays and meta.json into directory (created)."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+
+    @classmethod
+    def load(cls, directory, sections=GUIDE_SECTIONS, mmap_mode="r"):
+        """Opens a saved index; with mmap_mode="r" the pages are shared, read-only."""
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS}
+        return cls(sections, char_ngram=meta["char_ngram"], **arrays)
+
+    def embed(self, query):
+        """Unit LSA vector of a query (with the French-to-English expansion)."""
+        counts = hashed_counts(retrieval.expand_query(query), self.dimensions, self.char_ngram)
+        if not counts:
+            return None
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))) * self.idf[buckets]
+        vector = self.components[:, buckets] @ weights
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def search(self, query, k=retrieval.DEFAULT_TOP_K):
+        """Up to k (score, section) pairs, best first: each section scores its best chunk."""
+        vector = self.embed(query)
+        if vector is None:
+            return []
+        chunk_scores = self.chunk_vectors @ vector
+        section_scores = np.full(len(self.sections), -1.0, dtype=np.float32)
+        np.maximum.at(section_scores, self.chunk_sections, chunk_scores)
+        best = np.argsort(-section_scores)[:k]
+        return [(float(section_scores[index]), self.sections[index]) for index in best if section_scores[index] > 0]
+
+
+class HybridIndex:
+    """BM25 and vector rankings merged by reciprocal rank fusion."""
+
+    def __init__(self, keyword_index, vector_index, depth=10, rank_constant=60):
+        self.keyword_index = keyword_index
+        self.vector_index = vector_index
+        self.depth = depth
+        self.rank_constant = rank_constant
+
+    def search(self, query, k=retrieval.DEFAULT_TOP_K):
+        fused, by_number = {}, {}
+        for index in (self.keyword_index, self.vector_index):
+            for rank, (_, section) in enumerate(index.search(query, self.depth)):
+                fused[section.number] = fused.get(section.number, 0.0) + 1.0 / (self.rank_constant + rank + 1)
+                by_number[section.number] = section
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, by_number[number]) for number, score in ranked]
+
+
+def load_or_build(directory=DEFAULT_INDEX_DIR, sections=GUIDE_SECTIONS, dimensions=DEFAULT_DIMENSIONS,
+                  n_components=DEFAULT_COMPONENTS, char_ngram=DEFAULT_CHAR_NGRAM):
+    """Memory-maps the saved index for these inputs, building and saving it first if needed.
+
+    Each build goes to its own fingerprinted subdirectory, written under a
+    temporary name and renamed into place, so concurrent workers never
+    read a half-written index. If the directory is not writable the
+    index is kept in memory only.
+    """
+    key = fingerprint(sections, dimensions, n_components, char_ngram)
+    target = os.path.join(directory, f"guide-{key}")
+    if os.path.exists(os.path.join(target, "meta.json")):
+        start_time = time.perf_counter()
+        index = VectorIndex.load(target, sections)
+        logger.info(f"Vector index {key} memory-mapped in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        return index
+
+    start_time = time.perf_counter()
+    index = VectorIndex.build(sections, dimensions, n_components, char_ngram)
+    build_ms = (time.perf_counter() - start_time) * 1000
+    meta = {
+        "fingerprint": key, "format": INDEX_FORMAT, "dimensions": dimensions, "components": int(index.components.shape[0]),
+        "char_ngram": char_ngram, "chunks": int(index.chunk_vectors.shape[0]), "build_ms": round(build_ms, 1),
+    }
+    try:
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".guide-{key}-", dir=directory)
+        index.save(staging, meta)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another process saved the same index first
+            shutil.rmtree(staging, ignore_errors=True)
+        index = VectorIndex.load(target, sections)
+        logger.info(f"Vector index {key} built in {build_ms:.0f} ms ({meta['chunks']} chunks) and saved to {target}")
+    except OSError as save_err:
+        logger.warning(f"Vector index built in {build_ms:.0f} ms but not saved ({save_err}); kept in memory")
+    return index
+
+
+_index_lock = threading.Lock()
+_retrieval_indexes = {}
+
+
+def get_retrieval_index(mode="hybrid", directory=DEFAULT_INDEX_DIR):
+    """The process-wide index for a retrieval mode: "bm25", "vector" or "hybrid"."""
+    if mode == "bm25":
+        return retrieval.GUIDE_INDEX
+    if mode not in ("vector", "hybrid"):
+        raise ValueError(f"Unknown retrieval mode: {mode!r}")
+    with _index_lock:
+        if mode not in _retrieval_indexes:
+            vector_index = _retrieval_indexes.get("vector") or load_or_build(directory)
+            _retrieval_indexes["vector"] = vector_index
+            if mode == "hybrid":
+                _retrieval_indexes["hybrid"] = HybridIndex(retrieval.GUIDE_INDEX, vector_index)
+        return _retrieval_indexes[mode]
@@ -0,0 +1,106 @@
+import pytest
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import backends
+from enstp import breaker
+from enstp import ratelimit
+from enstp import singleflight
+from enstp.student_profile import StudentProfile
+from enstp.transcript import Transcript
+
+
+class RecordingStub(backends.StubBackend):
+    """Stub answering at once and keeping the prompts it was sent."""
+
+    def __init__(self):
+        super().__init__(latency="fixed:0", sleep=lambda seconds: None)
+        self.prompts = []
+
+    def _begin(self, model_name, prompt, api_key=None):
+        self.prompts.append(backends._prompt_text(prompt))
+        return super()._begin(model_name, prompt, api_key)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(advisor, "GEMINI_RPM", 1_000_000)
+    monkeypatch.setattr(advisor, "GEMINI_TPM", 1_000_000_000)
+    monkeypatch.setattr(advisor, "PREFETCH_FOLLOWUPS", False)
+    stub = RecordingStub()
+    advisor.configure(backend=stub)
+    answer_cache.ANSWER_CACHE.clear()
+    advisor.BREAKER.reset()
+    yield stub
+    answer_cache.ANSWER_CACHE.clear()
+
+
+def _session():
+    history = Transcript([{"role": "user", "content": "Je m'appelle Yasmine, j'habite à Tlemcen."},
+                          {"role": "assistant", "content": "Enchanté Yasmine !"}])
+    profile = StudentProfile()
+    profile.observe("J'adore le calcul de structures et la résistance des matériaux.")
+    return history, profile
+
+
+def test_cached_answer_comes_from_a_prompt_without_history_or_profile(backend):
+    history, profile = _session()
+    question = "Quelle est la charge de travail au DMS ?"
+    answer = advisor.get_enstp_response(question, history, response_language="fr", profile=profile)
+
+    prompt = backend.prompts[-1]
+    assert "Yasmine" not in prompt and "Orientation estimée" not in prompt
+    assert answer_cache.ANSWER_CACHE.get(question, "fr", advisor.ANSWER_CACHE_VERSION) == answer
+
+
+def test_turn_depending_on_the_student_keeps_history_and_profile(backend):
+    history, profile = _session()
+    chunks = list(advisor.stream_enstp_response("Et pour moi, lequel choisir ?", history, response_language="fr",
+                                                profile=profile))
+
+    prompt = backend.prompts[-1]
+    assert chunks and "Yasmine" in prompt and "Orientation estimée" in prompt
+    assert not any(answer_cache.ANSWER_CACHE.snapshot()["entries"].values())
+
+
+def test_speculative_request_following_a_flight_spends_no_quota(backend, monkeypatch):
+    monkeypatch.setattr(advisor, "PREFETCH_FOLLOWUPS", True)
+    monkeypatch.setattr(advisor, "PREFETCH_MIN_HEADROOM", 0.0)
+    monkeypatch.setattr(ratelimit, "KNOWN_QUOTAS", {})
+    monkeypatch.setattr(advisor, "_request_key", lambda messages, gen_profile: "same prompt")
+    generate = advisor._speculative_request("Quelle est la charge de travail au DIB ?", Transcript(), None, "fr", None)
+    sent = sum(entry["requests"] for entry in advisor.get_key_pool().snapshot())
+    flight, leader = singleflight.REQUESTS.begin("same prompt")
+    try:
+        assert leader and generate() is None
+    finally:
+        flight.finish()
+
+    assert sum(entry["requests"] for entry in advisor.get_key_pool().snapshot()) == sent
+    assert backend.prompts == []
+
+
+def test_local_quota_queue_timeouts_do_not_trip_the_breaker(backend, monkeypatch):
+    def queue_full(*args, **kwargs):
+        raise ratelimit.RateLimitTimeout("Estimated wait exceeds the timeout")
+
+    monkeypatch.setattr(advisor, "_wait_for_quota", queue_full)
+    history, profile = _session()
+    for index in range(advisor.BREAKER.minimum_calls + 1):
+        turn_info = {}
+        advisor.get_enstp_response(f"Et pour moi, lequel choisir ({index}) ?", history, response_language="fr",
+                                   turn_info=turn_info, profile=profile)
+        assert turn_info["degraded"]
+        list(advisor.stream_enstp_response(f"Et moi, je fais quoi ({index}) ?", history, response_language="fr",
+                                           profile=profile))
+
+    assert advisor.BREAKER.state == breaker.CLOSED
+    assert advisor.BREAKER.snapshot()["window_calls"] == 0
+
+
+def test_fallback_caption_follows_the_profile_chain():
+    pro, flash = advisor.MODEL_CHAIN.model_names[0], advisor.MODEL_CHAIN.model_names[-1]
+    assert advisor.fallback_caption({"model": pro, "tier": 0, "profile": "recommend"}) is None
+    assert "limiter l'attente" in advisor.fallback_caption({"model": flash, "tier": 1, "profile": "recommend"})
+    slower = advisor.fallback_caption({"model": pro, "tier": 1, "profile": "clarify"})
+    assert "limiter l'attente" not in slower and flash in slower
@@ -0,0 +1,28 @@
+import pytest
+
+from enstp.answer_cache import AnswerCache, is_history_independent
+
+VERSION = "v1"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Quels modules sont au DMS mais pas au DIB ?", "Quels modules sont au DIB mais pas au DMS ?"),
+    ("Quels modules sont au DMS ?", "Quels modules ne sont pas au DMS ?"),
+    ("Quels modules ne sont pas au DMS ?", "Quels modules sont au DMS ?"),
+    ("Quels modules sont au DMS ?", "Quels modules sont seulement au DMS ?"),
+    ("Which modules are in DMS?", "Which modules are not in DMS?"),
+])
+def test_negated_or_contrasted_question_never_gets_another_answer(cached, asked):
+    cache = AnswerCache()
+    cache.put(cached, "fr", "réponse", VERSION)
+
+    assert cache.get(asked, "fr", VERSION) is None
+    assert not (is_history_independent(cached) and is_history_independent(asked))
+
+
+def test_same_question_reworded_still_hits():
+    cache = AnswerCache()
+    cache.put("Quels modules sont au DMS ?", "fr", "réponse", VERSION)
+
+    assert cache.get("quels modules sont au DMS", "fr", VERSION) == "réponse"
+    assert is_history_independent("Quels modules sont au DMS ?")
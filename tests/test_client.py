@@ -0,0 +1,41 @@
+import pytest
+
+from enstp import advisor
+from enstp import backends
+from enstp import client
+from enstp.keypool import fingerprint
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(client, "_models", {})
+    monkeypatch.setattr(client, "_clients", {})
+    monkeypatch.setattr(advisor, "_key_pool", None)
+    monkeypatch.setattr(advisor, "_backend", None)
+    return client
+
+
+def test_models_carry_the_client_of_their_key(registry):
+    first = registry.get_model("key-one", "gemini-pro")
+    second = registry.get_model("key-two", "gemini-pro")
+    assert registry.get_model("key-one", "gemini-pro") is first
+    assert first._client is registry._clients[fingerprint("key-one")]
+    assert second._client is not first._client
+
+
+def test_configure_drops_the_clients_of_removed_keys(registry):
+    stub = backends.StubBackend(latency="fixed:0", sleep=lambda seconds: None)
+    advisor.configure(backend=stub, api_keys=[("key-one", 1.0), ("key-two", 1.0)])
+    registry.get_model("key-one", "gemini-pro")
+    registry.get_model("key-two", "gemini-pro")
+
+    advisor.configure(backend=stub, api_keys=[("key-two", 1.0), ("key-three", 1.0)])
+
+    assert set(registry._clients) == {fingerprint("key-two")}
+    assert {key[0] for key in registry._models} == {fingerprint("key-two")}
+
+
+def test_invalidate_without_keys_drops_everything(registry):
+    registry.get_model("key-one", "gemini-pro")
+    registry.invalidate()
+    assert not registry._clients and not registry._models
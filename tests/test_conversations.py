@@ -0,0 +1,59 @@
+from enstp.conversations import ConversationStore
+from enstp.transcript import Turn
+
+
+def _stores(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    return ConversationStore(path, hot_window=4), ConversationStore(path, hot_window=4)
+
+
+def test_two_stores_on_one_file_carry_on_the_same_session(tmp_path):
+    first, second = _stores(tmp_path)
+    token = first.create_session()
+    first.append(token, Turn("user", "bonjour"))
+    second.open(token).add("assistant", "Bonjour !")
+
+    transcript = first.open(token)
+    assert len(transcript) == 2
+    assert transcript.add("user", "DMS ou DIB ?") and first.length(token) == 3
+    assert [turn.content for turn in second.open(token)] == ["bonjour", "Bonjour !", "DMS ou DIB ?"]
+    first.close()
+    second.close()
+
+
+def test_session_deleted_by_another_store_reads_empty_and_starts_over(tmp_path):
+    first, second = _stores(tmp_path)
+    token = first.create_session()
+    transcript = first.transcript(token)
+    transcript.add("user", "bonjour")
+    second.delete(token)
+
+    assert not transcript.refresh()
+    assert len(transcript) == 0 and list(transcript) == []
+    transcript.add("user", "je reprends")
+    assert [turn.content for turn in second.open(token)] == ["je reprends"]
+    first.close()
+    second.close()
+
+
+def test_reads_between_two_refreshes_do_not_query_sqlite(tmp_path):
+    store, _ = _stores(tmp_path)
+    token = store.create_session()
+    for content in ("bonjour", "Bonjour !", "DMS ou DIB ?", "Cela dépend de vos goûts."):
+        store.append(token, Turn("user", content))
+    queries = []
+    store._db.set_trace_callback(queries.append)
+
+    transcript = store.open(token)
+    assert len(queries) == 1
+    for _ in range(3):
+        assert len(transcript) == 4 and transcript[-1].content == "Cela dépend de vos goûts."
+        assert [turn.content for turn in transcript[-2:]] == ["DMS ou DIB ?", "Cela dépend de vos goûts."]
+        assert transcript.snapshot()[0].content == "bonjour"
+    assert len(queries) == 1
+
+    transcript.add("user", "merci")
+    queries.clear()
+    assert len(transcript) == 5 and transcript[-1].content == "merci"
+    assert queries == []
+    store.close()
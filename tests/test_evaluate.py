@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from enstp import advisor
+from enstp import answer_cache
+from enstp import evaluate
+from enstp import ratelimit
+
+CONVERSATIONS = [
+    {"id": "dms", "turns": [
+        "Bonjour, j'aime le calcul de structures.",
+        {"message": "Quels sont les modules spécifiques au DMS ?",
+         "expect_modules": ["Calcul Automatique des structures", "Économie de Transport"]},
+    ]},
+    {"id": "dib", "turns": ["Quelle est la charge de travail au DIB ?"]},
+]
+FIELDS = {"conversation", "turn", "message", "reply", "latency_ms", "ttfb_ms", "prompt_tokens", "output_tokens",
+          "model", "tier", "profile", "intent", "cache", "outcome", "degraded", "modules", "misattributed",
+          "missing_modules", "grounded", "prompt_version"}
+
+
+@pytest.fixture
+def stub_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENSTP_LLM_BACKEND", "stub")
+    monkeypatch.setenv("ENSTP_STUB_LATENCY", "fixed:0")
+    monkeypatch.setenv("ENSTP_STUB_TOKENS_PER_SECOND", "1000000")
+    monkeypatch.delenv("GOOGLE_API_KEYS", raising=False)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    # main() lifts the quotas for the stub: keep that to this test
+    monkeypatch.setattr(advisor, "GEMINI_RPM", advisor.GEMINI_RPM)
+    monkeypatch.setattr(advisor, "GEMINI_TPM", advisor.GEMINI_TPM)
+    monkeypatch.setattr(ratelimit, "KNOWN_QUOTAS", dict(ratelimit.KNOWN_QUOTAS))
+    conversations_path = tmp_path / "conversations.jsonl"
+    conversations_path.write_text("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in CONVERSATIONS),
+                                  encoding="utf-8")
+    yield str(conversations_path), str(tmp_path / "results.jsonl")
+    answer_cache.ANSWER_CACHE.clear()
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as lines:
+        return [json.loads(line) for line in lines]
+
+
+def test_writes_one_line_per_turn_with_grounding(stub_environment):
+    conversations_path, output_path = stub_environment
+
+    assert evaluate.main([conversations_path, "--output", output_path, "--workers", "2"]) == 0
+    records = {(record["conversation"], record["turn"]): record for record in _records(output_path)}
+    assert sorted(records) == [("dib", 0), ("dms", 0), ("dms", 1)]
+    assert all(set(record) == FIELDS for record in records.values())
+
+    lookup = records[("dms", 1)]
+    assert lookup["intent"] == "knowledge:modules"
+    assert "Calcul Automatique des structures" in lookup["modules"]
+    assert lookup["misattributed"] == []
+    assert lookup["missing_modules"] == ["Économie de Transport"] and not lookup["grounded"]
+    model_turn = records[("dib", 0)]
+    assert model_turn["model"] and model_turn["tier"] == 0 and model_turn["outcome"] == "ok"
+    assert model_turn["prompt_tokens"] and model_turn["output_tokens"]
+
+
+def test_resume_skips_conversations_already_written(stub_environment, monkeypatch):
+    conversations_path, output_path = stub_environment
+    evaluate.main([conversations_path, "--output", output_path])
+    records = _records(output_path)
+    # A crash while writing "dms" left only its first line
+    with open(output_path, "w", encoding="utf-8") as output:
+        output.writelines(json.dumps(record, ensure_ascii=False) + "\n"
+                          for record in records if record["conversation"] == "dib" or record["turn"] == 0)
+
+    replayed = []
+    run_conversation = evaluate.run_conversation
+    monkeypatch.setattr(evaluate, "run_conversation",
+                        lambda conversation, recorder=None: replayed.append(conversation.id)
+                        or run_conversation(conversation, recorder))
+    evaluate.main([conversations_path, "--output", output_path])
+
+    assert replayed == ["dms"]
+    assert sorted((record["conversation"], record["turn"]) for record in _records(output_path)) == [
+        ("dib", 0), ("dms", 0), ("dms", 1)]
+
+
+def test_each_run_starts_with_an_empty_cache_and_a_closed_breaker(stub_environment):
+    conversations_path, output_path = stub_environment
+    question = CONVERSATIONS[1]["turns"][0]
+    answer_cache.ANSWER_CACHE.put(question, "fr", "Réponse d'un run précédent.", advisor.ANSWER_CACHE_VERSION)
+    for _ in range(advisor.BREAKER.minimum_calls):
+        advisor.BREAKER.record(0.1, True)
+
+    evaluate.main([conversations_path, "--output", output_path])
+    model_turn = next(record for record in _records(output_path) if record["conversation"] == "dib")
+
+    assert model_turn["cache"] == "miss" and not model_turn["degraded"]
+    assert model_turn["reply"] != "Réponse d'un run précédent."
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+from google.api_core import exceptions as core_exceptions
+
+from enstp.fallback import AttemptTimeout, ModelChain
+from enstp.ratelimit import RateLimitTimeout
+
+
+class FakeTime:
+    """Clock that only moves when slept on or advanced."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedModels:
+    """attempt(model_name) failing or taking time as scripted per model, then answering."""
+
+    def __init__(self, clock, failures=None, delays=None):
+        self.clock = clock
+        self.failures = {model: list(errors) for model, errors in (failures or {}).items()}
+        self.delays = delays or {}
+        self.calls = []
+
+    def __call__(self, model_name):
+        self.calls.append(model_name)
+        self.clock.now += self.delays.get(model_name, 0.0)
+        errors = self.failures.get(model_name)
+        if errors:
+            raise errors.pop(0)
+        return f"answer from {model_name}"
+
+
+def _chain(clock, **settings):
+    return ModelChain(["primary", "secondary", "fast"], clock=clock, sleep=clock.sleep, rng=lambda: 1.0, **settings)
+
+
+def test_falls_back_in_order_and_records_the_tier():
+    clock = FakeTime()
+    models = ScriptedModels(clock, failures={
+        "primary": [core_exceptions.ServiceUnavailable("down")] * 2,
+        "secondary": [core_exceptions.ResourceExhausted("quota")] * 2,
+    })
+    turn_info = {}
+
+    assert _chain(clock).run(models, turn_info=turn_info) == "answer from fast"
+    assert models.calls == ["primary", "primary", "secondary", "secondary", "fast"]
+    assert turn_info == {"model": "fast", "tier": 2, "attempts": 5}
+
+
+def test_backoff_doubles_between_retries_up_to_its_cap():
+    clock = FakeTime()
+    models = ScriptedModels(clock, failures={"primary": [core_exceptions.InternalServerError("oops")] * 4})
+    chain = ModelChain(["primary"], attempts_per_model=5, base_backoff=0.5, max_backoff=2.0,
+                       clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+
+    assert chain.run(models) == "answer from primary"
+    assert clock.sleeps == [0.5, 1.0, 2.0, 2.0]
+
+
+def test_non_retryable_error_is_raised_at_once():
+    clock = FakeTime()
+    models = ScriptedModels(clock, failures={"primary": [ValueError("bad prompt")]})
+
+    with pytest.raises(ValueError):
+        _chain(clock).run(models)
+    assert models.calls == ["primary"]
+
+
+def test_slow_model_past_the_latency_slo_falls_through_to_the_next():
+    clock = FakeTime()
+    models = ScriptedModels(clock, failures={"primary": [core_exceptions.DeadlineExceeded("slow")]},
+                            delays={"primary": 30.0})
+    turn_info = {}
+
+    assert _chain(clock, latency_slo=25.0).run(models, turn_info=turn_info) == "answer from fast"
+    # No second try on the primary, and no time left for the secondary either
+    assert models.calls == ["primary", "fast"]
+    assert turn_info["tier"] == 2
+
+
+def test_attempt_past_its_deadline_is_abandoned():
+    def attempt(model_name):
+        if model_name == "primary":
+            time.sleep(0.5)
+        return f"answer from {model_name}"
+
+    chain = ModelChain(["primary", "fast"], attempts_per_model=1, attempt_deadline=0.05, sleep=lambda seconds: None)
+    turn_info = {}
+
+    assert chain.run(attempt, turn_info=turn_info) == "answer from fast"
+    assert turn_info == {"model": "fast", "tier": 1, "attempts": 2}
+    assert chain.stats["errors:primary"] == 1
+
+
+def test_quota_timeout_skips_the_model_retries():
+    clock = FakeTime()
+    models = ScriptedModels(clock)
+
+    def prepare(model_name, timeout):
+        if model_name == "primary":
+            raise RateLimitTimeout("queue full")
+
+    assert _chain(clock).run(models, prepare=prepare) == "answer from secondary"
+    assert models.calls == ["secondary"] and clock.sleeps == []
+
+
+def test_whole_chain_failing_raises_the_last_error():
+    clock = FakeTime()
+    models = ScriptedModels(clock, failures={model: [AttemptTimeout(model)] * 2
+                                             for model in ("primary", "secondary", "fast")})
+    turn_info = {}
+
+    with pytest.raises(AttemptTimeout, match="fast"):
+        _chain(clock).run(models, turn_info=turn_info)
+    assert turn_info == {"model": None, "tier": None, "attempts": 6}
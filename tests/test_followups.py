@@ -0,0 +1,42 @@
+import threading
+import time
+
+from enstp import followups
+
+
+def _prefetched(text="Réponse"):
+    return followups.Prefetched(text, "model", 0, None, False, "lookup")
+
+
+def _wait_for_requests(prefetcher, count):
+    deadline = time.monotonic() + 2
+    while prefetcher.snapshot().get("requests") != count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_submit_after_ttl_counts_finished_entry_without_deadlock():
+    now = [0.0]
+    prefetcher = followups.Prefetcher(workers=2, clock=lambda: now[0])
+    prefetcher.submit("s", 1, "Quels modules au DMS ?", _prefetched)
+    _wait_for_requests(prefetcher, 1)
+    now[0] = followups.DEFAULT_TTL_SECONDS + 1
+
+    submitted = threading.Thread(target=prefetcher.submit, args=("s", 2, "Et le DIB ?", lambda: None), daemon=True)
+    submitted.start()
+    submitted.join(2)
+
+    assert not submitted.is_alive()
+    assert prefetcher.snapshot()["unused"] == 1
+    prefetcher.shutdown()
+
+
+def test_take_returns_finished_answer_and_evicts_the_others():
+    prefetcher = followups.Prefetcher(workers=2)
+    prefetcher.submit("s", 1, "Quels modules au DMS ?", lambda: _prefetched("DMS"))
+    prefetcher.submit("s", 1, "Quels stages au DIB ?", lambda: _prefetched("DIB"))
+    _wait_for_requests(prefetcher, 2)
+
+    assert prefetcher.take("s", 1, "quels modules au dms").text == "DMS"
+    stats = prefetcher.snapshot()
+    assert stats["used"] == 1 and stats["unused"] == 1 and stats["entries"] == 0
+    prefetcher.shutdown()
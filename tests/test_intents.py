@@ -0,0 +1,32 @@
+import pytest
+
+from enstp.intents import ROUTER
+
+
+@pytest.mark.parametrize("message", [
+    "Efface la conversation", "Nouvelle conversation", "clear the chat", "reset la conversation svp",
+    "start a new conversation", "امسح المحادثة",
+])
+def test_explicit_requests_clear_the_conversation(message):
+    assert ROUTER.classify(message).name == "clear_conversation"
+
+
+@pytest.mark.parametrize("message", [
+    "tout", "la conversation", "je recommence", "reset", "oublie tout", "efface tout", "start over",
+])
+def test_generic_words_never_clear_the_conversation(message):
+    intent = ROUTER.classify(message)
+    assert intent is None or intent.name != "clear_conversation"
+
+
+@pytest.mark.parametrize("message, name", [
+    ("merci", "thanks"), ("Bonjour !", "greeting"), ("english please", "language_switch"),
+    ("qui t'a créé ?", "creator"),
+])
+def test_trivial_turns_are_routed(message, name):
+    assert ROUTER.classify(message).name == name
+
+
+def test_single_word_answer_goes_to_the_llm():
+    # "tout" answers "which projects interest you?": it is not "merci pour tout"
+    assert ROUTER.classify("tout") is None
@@ -0,0 +1,109 @@
+import pytest
+from google.api_core import exceptions as core_exceptions
+
+from enstp.keypool import MAX_QUARANTINE_SECONDS, KeyPool, parse_keys
+from enstp.ratelimit import RateLimitTimeout
+
+MODEL = "gemini-1.5-pro-latest"
+RPM, TPM = 60, 1_000_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pool(spec, clock, quarantine_seconds=30.0):
+    return KeyPool(parse_keys(spec), quarantine_seconds=quarantine_seconds, clock=clock)
+
+
+def _fail_with(pool, key, error):
+    with pytest.raises(type(error)):
+        with pool.using(key, MODEL):
+            raise error
+
+
+def _served_per_minute(pool, clock, rpm):
+    """Requests the pool lets through over one minute, second by second."""
+    served = 0
+    for _ in range(60):
+        clock.now += 1.0
+        while True:
+            try:
+                pool.acquire(MODEL, "student", 100, rpm, TPM, timeout=0)
+            except RateLimitTimeout:
+                break
+            served += 1
+    return served
+
+
+@pytest.mark.parametrize("error", [core_exceptions.ResourceExhausted("429"),
+                                   core_exceptions.PermissionDenied("API key revoked")])
+def test_failing_key_is_quarantined_and_requests_go_to_the_other(error):
+    clock = FakeClock()
+    pool = _pool("KEY_A,KEY_B", clock)
+    key, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    _fail_with(pool, key, error)
+
+    for _ in range(3):
+        clock.now += 5.0
+        other, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+        assert other is not key
+    assert MODEL in next(entry for entry in pool.snapshot() if entry["key"] == key.label)["quarantined"]
+
+
+def test_quarantine_doubles_per_strike_then_recovers():
+    clock = FakeClock()
+    pool = _pool("KEY_A", clock, quarantine_seconds=10.0)
+    key, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    _fail_with(pool, key, core_exceptions.ResourceExhausted("429"))
+    with pytest.raises(RateLimitTimeout):
+        pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=5.0)
+
+    clock.now += 10.0
+    key, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    _fail_with(pool, key, core_exceptions.ResourceExhausted("429"))
+    clock.now += 10.0
+    with pytest.raises(RateLimitTimeout):
+        pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+
+    clock.now += 10.0
+    key, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    with pool.using(key, MODEL):
+        pass
+    assert pool.snapshot()[0]["quarantined"] == {} and pool.snapshot()[0]["exhausted"] == 2
+
+
+def test_rejected_key_is_set_aside_for_the_longest_quarantine():
+    clock = FakeClock()
+    pool = _pool("KEY_A", clock)
+    key, _ = pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    _fail_with(pool, key, core_exceptions.Unauthenticated("bad key"))
+
+    clock.now += MAX_QUARANTINE_SECONDS - 1
+    with pytest.raises(RateLimitTimeout):
+        pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)
+    clock.now += 1
+    assert pool.acquire(MODEL, "s", 100, RPM, TPM, timeout=0)[0] is key
+
+
+def test_capacity_grows_linearly_with_the_number_of_keys():
+    served = {}
+    for count in (1, 2, 4):
+        clock = FakeClock()
+        pool = _pool(",".join(f"KEY_{index}" for index in range(count)), clock)
+        _served_per_minute(pool, clock, 4)  # spends the initial bursts
+        served[count] = _served_per_minute(pool, clock, 4)
+
+    assert served == {1: 4, 2: 8, 4: 16}
+
+
+def test_weight_scales_a_key_quota():
+    clock = FakeClock()
+    pool = _pool("KEY_A:2", clock)
+    _served_per_minute(pool, clock, 4)
+
+    assert _served_per_minute(pool, clock, 4) == 8
@@ -0,0 +1,35 @@
+import pytest
+
+from enstp.knowledge import LOOKUP
+
+
+@pytest.mark.parametrize("question, kind", [
+    ("DMS vs DIB modules", "modules"),
+    ("What's in the Tunnels track?", "track"),
+    ("Which labs are shared?", "shared_labs"),
+    ("Quelles sont les options du DIB ?", "tracks"),
+    ("C'est quoi le béton précontraint ?", "module"),
+    ("Quels sont les stages ?", "internships"),
+    ("Quels laboratoires de recherche au DMS ?", "research_labs"),
+    ("Quels sont les débouchés du DIB ?", "sectors"),
+    ("Quels modules sont communs au DMS et au DIB ?", "modules"),
+    ("Which modules are specific to DMS?", "modules"),
+])
+def test_explicit_lookups_are_answered_from_the_knowledge_base(question, kind):
+    answer = LOOKUP.answer(question)
+    assert answer is not None and answer.kind == kind
+
+
+@pytest.mark.parametrize("question", [
+    "Est-ce que les stages sont rémunérés ?",
+    "Quelles matières sont les plus difficiles au DMS ?",
+    "Quels sont les métiers les mieux payés ?",
+    "Combien d'heures de TP par semaine ?",
+    "Quel est le programme de la première année ?",
+    "Y a-t-il des cours en anglais ?",
+    "Les options sont-elles obligatoires ?",
+    "Quelle est la différence entre DMS et DIB ?",
+    "Je suis perdu entre DMS et DIB, tu peux m'aider ?",
+])
+def test_other_questions_go_to_the_llm(question):
+    assert LOOKUP.answer(question) is None
@@ -0,0 +1,26 @@
+import pytest
+
+from enstp.language import requested_language
+
+
+@pytest.mark.parametrize("message, language", [
+    ("Parle en anglais", "en"),
+    ("Can you speak English?", "en"),
+    ("English please?", "en"),
+    ("Tu peux me répondre en anglais ?", "en"),
+    ("Réponds-moi en arabe s'il te plaît", "ar"),
+    ("Switch to English", "en"),
+    ("Revenons au français", "fr"),
+])
+def test_switch_requests(message, language):
+    assert requested_language(message) == language
+
+
+@pytest.mark.parametrize("message", [
+    "Je suis nul en anglais",
+    "Est-ce que les cours sont en anglais ?",
+    "Les cours de français sont-ils obligatoires ?",
+    "Quels modules au DMS ?",
+])
+def test_mentions_of_a_language_are_not_requests(message):
+    assert requested_language(message) is None
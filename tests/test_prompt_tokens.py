@@ -0,0 +1,106 @@
+"""Prompt size regression test: estimated tokens of fixed scenarios vs. a baseline.
+
+Builds the prompt of a few representative turns and compares their
+estimated tokens with tests/prompt_tokens.json. Fails if a prompt grew by
+more than TOLERANCE or went over the token budget, so a bloated template
+is caught before it ships. After an intended change, record the new
+sizes:
+
+    python tests/test_prompt_tokens.py --update
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enstp import prompt
+from enstp.history import ConversationMemory
+from enstp.student_profile import StudentProfile
+from enstp.text import estimate_tokens
+from enstp.transcript import Transcript
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_tokens.json")
+# Allowed growth, as a share of the baseline
+TOLERANCE = 0.02
+WELCOME = "Bonjour ! Félicitations pour avoir terminé le cycle préparatoire. Comment vous sentez-vous ?"
+STUDENT_LINES = [
+    "J'ai bien aimé les maths en prépa, surtout l'analyse et les probabilités.",
+    "Qu'est-ce qu'on étudie dans le module Béton Précontraint ?",
+    "Je m'intéresse beaucoup aux chemins de fer et aux ponts ferroviaires.",
+    "Est-ce que le DIB a beaucoup de stages sur le terrain ?",
+    "Je préfère comprendre les mécanismes en détail plutôt que la vue d'ensemble.",
+]
+ADVISOR_REPLY = (
+    "D'accord, je vois. Le DMS approfondit l'analyse des structures et le comportement des matériaux, "
+    "tandis que le DIB privilégie une vision d'ensemble des réseaux d'infrastructure. "
+) * 3 + "Qu'est-ce qui vous attire le plus dans ce domaine ?"
+
+
+def _conversation(turns):
+    history = Transcript([{"role": "assistant", "content": WELCOME}])
+    for turn in range(turns):
+        history.add("user", STUDENT_LINES[turn % len(STUDENT_LINES)])
+        history.add("assistant", ADVISOR_REPLY)
+    return history
+
+
+def scenarios():
+    """name -> keyword arguments of build_prompt_messages."""
+    long_history = _conversation(40)
+    memory = ConversationMemory()
+    profile = StudentProfile()
+    for turn in long_history:
+        if turn.role == "user":
+            profile.observe(turn.content)
+    return {
+        "first_turn_fr": dict(student_input="Quels sont les débouchés du DMS ?", conversation_history=_conversation(0)),
+        "first_turn_en": dict(student_input="What are the main differences between DMS and DIB?",
+                              conversation_history=_conversation(0), response_language="en"),
+        "long_conversation": dict(student_input="Quel département me recommandez-vous ?",
+                                  conversation_history=long_history, history_memory=memory,
+                                  student_profile=profile.summary()),
+        "oversized_input": dict(student_input="Je voudrais savoir tout sur le DMS. " * 2000,
+                                conversation_history=_conversation(3)),
+    }
+
+
+def measure(name):
+    return estimate_tokens(prompt.build_prompt_messages(**scenarios()[name])[0]["parts"][0])
+
+
+def _baseline():
+    with open(BASELINE_PATH, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+@pytest.mark.parametrize("name", sorted(scenarios()))
+def test_prompt_size_within_tolerance_of_baseline(name):
+    previous = _baseline().get(name)
+    assert previous, f"No baseline for {name}: run python tests/test_prompt_tokens.py --update"
+    tokens = measure(name)
+    assert tokens <= previous * (1 + TOLERANCE), f"{name} grew from {previous} to {tokens} tokens"
+    assert tokens <= prompt.DEFAULT_TOKEN_BUDGET, f"{name} is over the {prompt.DEFAULT_TOKEN_BUDGET}-token budget"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="record the current sizes as the baseline")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    current = {name: measure(name) for name in scenarios()}
+    for name, tokens in current.items():
+        print(f"{name:<20} {tokens:>7}")
+    if args.update:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as output:
+            json.dump(current, output, indent=2)
+            output.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from enstp.ratelimit import RateLimiter, RateLimitTimeout, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _served_in_a_window(bucket, clock, window_seconds, amount=1):
+    """Consumes whenever the bucket allows, for one window after it was first drained."""
+    served = 0
+    end = clock.now + window_seconds
+    while clock.now < end:
+        wait = bucket.seconds_until(amount)
+        if wait > 0:
+            clock.now += wait
+            continue
+        bucket.consume(amount)
+        served += 1
+    return served
+
+
+@pytest.mark.parametrize("quota", [2, 15, 60])
+def test_bucket_sustains_its_whole_quota_without_exceeding_it(quota):
+    clock = FakeClock()
+    bucket = TokenBucket(quota, 0.25, clock)
+    first = _served_in_a_window(bucket, clock, 60.0)
+    steady = [_served_in_a_window(bucket, clock, 60.0) for _ in range(5)]
+
+    assert first <= quota
+    assert all(quota - 1 <= served <= quota for served in steady)
+
+
+def test_token_quota_counts_each_request_tokens():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=10_000, clock=clock)
+    limiter.acquire("a", 3000, timeout=0)
+    limiter.acquire("b", 2000, timeout=0)
+
+    assert limiter.stats["tokens"] == 5000 and limiter.stats["requests"] == 2
+    # 5000 tokens of burst are spent: another large prompt has to wait for the refill
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("c", 3000, timeout=0)
+    clock.now += 18.0  # 3000 tokens at 10,000 per minute
+    assert limiter.acquire("c", 3000, timeout=0) == 0
+
+
+def test_request_waiting_longer_than_its_timeout_gives_up():
+    limiter = RateLimiter(requests_per_minute=4, tokens_per_minute=100_000)
+    limiter.acquire("a", 10)
+
+    start = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("b", 10, timeout=1.0)
+    # Failed fast on the estimated wait (15 s) instead of sleeping through the timeout
+    assert time.monotonic() - start < 0.5
+    # and left the queue
+    assert not limiter._queues
+
+
+def test_sessions_are_served_round_robin():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=4, tokens_per_minute=100_000, clock=clock)
+    limiter.acquire("warm-up", 10)  # the one-request burst is spent: everyone else queues
+    served = []
+    lock = threading.Lock()
+
+    def send(session_id):
+        limiter.acquire(session_id, 10, timeout=None)
+        with lock:
+            served.append(session_id)
+
+    threads = []
+    for session_id in ["chatty"] * 4 + ["quiet"]:
+        thread = threading.Thread(target=send, args=(session_id,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        while sum(len(queue) for queue in list(limiter._queues.values())) < len(threads):
+            time.sleep(0.001)
+    for count in range(1, len(threads) + 1):
+        clock.now += 15.0  # one request per 15 s
+        with limiter._condition:
+            limiter._condition.notify_all()
+        deadline = time.monotonic() + 2.0
+        while len(served) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(timeout=2.0)
+
+    # The quiet session does not wait behind the chatty one's backlog
+    assert served == ["chatty", "quiet", "chatty", "chatty", "chatty"]
@@ -0,0 +1,23 @@
+from enstp.transcript import Transcript, format_turn
+
+
+def test_views_format_their_own_turns_as_the_transcript_grows():
+    transcript = Transcript([{"role": "assistant", "content": "Bonjour !"}])
+    first = transcript.snapshot()
+    transcript.add("user", "J'aime les ponts.")
+    second = transcript.snapshot()
+    assert second.formatted == "Conseiller ENSTP: Bonjour !\nÉtudiant: J'aime les ponts."
+
+    transcript.add("assistant", "Le DMS, alors ?\n")
+    assert first.formatted == "Conseiller ENSTP: Bonjour !"
+    assert second.formatted == "Conseiller ENSTP: Bonjour !\nÉtudiant: J'aime les ponts."
+    assert transcript.formatted == "\n".join(format_turn(turn) for turn in transcript).rstrip("\n")
+    assert Transcript().formatted == ""
+
+
+def test_append_does_not_copy_the_formatted_history():
+    transcript = Transcript()
+    for index in range(1000):
+        transcript.add("user", f"message {index}")
+    assert transcript._joined_cache[0] == 0
+    assert transcript.formatted.count("\n") == 999